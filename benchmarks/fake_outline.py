@@ -0,0 +1,328 @@
+"""
+Local stand-in for the Outline API used by the benchmarks.
+
+Serves a synthetic workspace of documents nested in collections over real HTTP, with
+configurable latency, payload sizes, error rate and rate limit, and counts the
+requests it receives per endpoint.
+"""
+
+import asyncio
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+WORDS = (
+    "architecture deploy hiring policy onboarding runbook incident storage "
+    "network billing security roadmap release database cache search budget"
+).split()
+
+# Children per document in the synthetic collection trees.
+TREE_FANOUT = 5
+
+
+@dataclass
+class FakeOutlineSettings:
+    """Shape and behavior of the fake workspace."""
+
+    documents: int = 1000
+    collections: int = 10
+    document_bytes: int = 20_000
+    latency: float = 0.02
+    jitter: float = 0.005
+    error_rate: float = 0.0
+    rate_limit_rps: float = 0.0
+    seed: int = 0
+
+
+class FakeOutline:
+    """
+    In-memory Outline workspace exposed as a Starlette app.
+
+    Args:
+        settings: Workspace shape and server behavior
+    """
+
+    def __init__(self, settings: Optional[FakeOutlineSettings] = None):
+        self.settings = settings or FakeOutlineSettings()
+        self.requests: Counter = Counter()
+        self.statuses: Counter = Counter()
+        self._random = random.Random(self.settings.seed)
+        self._tokens = self.settings.rate_limit_rps
+        self._refilled = time.monotonic()
+
+        self.collections = [
+            {
+                "id": str(uuid.UUID(int=(1 << 64) + i)),
+                "urlId": f"col{i:07d}",
+                "name": f"Collection {i}",
+                "description": f"Synthetic collection {i}",
+                "color": "#4E5C6E",
+                "icon": None,
+                "permission": "read",
+                "sharing": True,
+                "sort": {"field": "title", "direction": "asc"},
+                "index": str(i),
+                "createdAt": "2024-01-01T00:00:00.000Z",
+                "updatedAt": "2024-01-01T00:00:00.000Z",
+            }
+            for i in range(max(1, self.settings.collections))
+        ]
+        self.documents = [
+            self._make_document(i) for i in range(self.settings.documents)
+        ]
+        self._by_id = {doc["id"]: doc for doc in self.documents}
+        self._by_id.update({doc["urlId"]: doc for doc in self.documents})
+        self._body = self._make_body(self.settings.document_bytes)
+
+        self.app = Starlette(
+            routes=[Route("/api/{endpoint}", self._handle, methods=["POST"])]
+        )
+        self._handlers: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+            "auth.info": self._auth_info,
+            "documents.info": self._documents_info,
+            "documents.export": self._documents_export,
+            "documents.list": self._documents_list,
+            "documents.search": self._documents_search,
+            "documents.drafts": self._documents_list,
+            "documents.viewed": self._documents_list,
+            "documents.archived": lambda data: self._page([], data),
+            "documents.answerQuestion": self._answer_question,
+            "collections.list": lambda data: self._page(self.collections, data),
+            "collections.info": self._collections_info,
+            "collections.documents": self._collections_documents,
+            "events.list": lambda data: self._page([], data),
+        }
+
+    def reset_counters(self) -> None:
+        self.requests.clear()
+        self.statuses.clear()
+
+    def _make_document(self, i: int) -> Dict[str, Any]:
+        word = WORDS[i % len(WORDS)]
+        collection = self.collections[i % len(self.collections)]
+        # The first TREE_FANOUT documents of a collection are its roots, the
+        # next ones fill the levels below them in order.
+        position, offset = divmod(i, len(self.collections))
+        parent = None
+        if position >= TREE_FANOUT:
+            parent_position = position // TREE_FANOUT - 1
+            parent = str(
+                uuid.UUID(int=parent_position * len(self.collections) + offset + 1)
+            )
+        updated = time.strftime(
+            "%Y-%m-%dT%H:%M:%S.000Z", time.gmtime(1_700_000_000 - i * 60)
+        )
+        return {
+            "id": str(uuid.UUID(int=i + 1)),
+            "urlId": f"doc{i:07d}",
+            "title": f"{word.title()} notes {i}",
+            "emoji": None,
+            "collectionId": collection["id"],
+            "parentDocumentId": parent,
+            "template": False,
+            "pinned": False,
+            "fullWidth": False,
+            "revision": 1,
+            "createdAt": "2024-01-01T00:00:00.000Z",
+            "updatedAt": updated,
+            "publishedAt": "2024-01-01T00:00:00.000Z",
+            "archivedAt": None,
+            "createdBy": {"id": "user-1", "name": "Bench User"},
+            "updatedBy": {"id": "user-1", "name": "Bench User"},
+            "collaborators": [{"id": "user-1", "name": "Bench User"}],
+        }
+
+    @staticmethod
+    def _make_body(size: int) -> str:
+        paragraph = " ".join(WORDS) + ".\n\n"
+        parts: List[str] = []
+        length = 0
+        section = 0
+        while length < size:
+            if section % 4 == 0:
+                chunk = f"## Section {section // 4}\n\n"
+            else:
+                chunk = paragraph * 3
+            parts.append(chunk)
+            length += len(chunk)
+            section += 1
+        return "".join(parts)[:size]
+
+    def title_path(self, doc: Dict[str, Any]) -> str:
+        """Titles from the collection root down to a document, joined by "/"."""
+        titles = [doc["title"]]
+        while doc["parentDocumentId"]:
+            doc = self._by_id[doc["parentDocumentId"]]
+            titles.append(doc["title"])
+        return "/".join(reversed(titles))
+
+    def _text(self, doc: Dict[str, Any]) -> str:
+        return f"# {doc['title']}\n\n{self._body}"
+
+    async def _handle(self, request: Request) -> JSONResponse:
+        endpoint = request.path_params["endpoint"]
+        self.requests[endpoint] += 1
+        settings = self.settings
+
+        delay = settings.latency + self._random.uniform(0, settings.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if settings.rate_limit_rps > 0 and not self._take_token():
+            return self._respond(
+                429,
+                {"ok": False, "error": "rate_limit_exceeded"},
+                {"Retry-After": "1", "RateLimit-Remaining": "0"},
+            )
+        if settings.error_rate > 0 and self._random.random() < settings.error_rate:
+            return self._respond(503, {"ok": False, "error": "unavailable"})
+
+        handler = self._handlers.get(endpoint)
+        if handler is None:
+            return self._respond(404, {"ok": False, "error": "not_found"})
+
+        data = await request.json() if await request.body() else {}
+        try:
+            payload = handler(data)
+        except KeyError:
+            return self._respond(404, {"ok": False, "error": "not_found"})
+        return self._respond(200, {"ok": True, **payload})
+
+    def _respond(
+        self, status: int, body: Dict[str, Any], headers: Optional[Dict] = None
+    ) -> JSONResponse:
+        self.statuses[status] += 1
+        return JSONResponse(body, status_code=status, headers=headers)
+
+    def _take_token(self) -> bool:
+        now = time.monotonic()
+        rate = self.settings.rate_limit_rps
+        self._tokens = min(rate, self._tokens + (now - self._refilled) * rate)
+        self._refilled = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    @staticmethod
+    def _page(items: List[Any], data: Dict[str, Any]) -> Dict[str, Any]:
+        offset = int(data.get("offset", 0))
+        limit = int(data.get("limit", 25))
+        return {
+            "data": items[offset : offset + limit],
+            "pagination": {"offset": offset, "limit": limit},
+        }
+
+    def _auth_info(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        return {"data": {"user": {"id": "user-1"}, "team": {"id": "team-1"}}}
+
+    def _documents_info(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        doc = self._by_id[data["id"]]
+        return {"data": {**doc, "text": self._text(doc)}}
+
+    def _documents_export(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        return {"data": self._text(self._by_id[data["id"]])}
+
+    def _documents_list(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        documents = self.documents
+        if data.get("collectionId"):
+            documents = [
+                d for d in documents if d["collectionId"] == data["collectionId"]
+            ]
+        if data.get("direction") == "ASC":
+            documents = documents[::-1]
+        return self._page(documents, data)
+
+    def _documents_search(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        terms = str(data.get("query", "")).lower().split()
+        results = [
+            {
+                "context": f"…<b>{terms[0] if terms else ''}</b> {self._body[:120]}…",
+                "ranking": 1.0 / (rank + 1),
+                "document": doc,
+            }
+            for rank, doc in enumerate(
+                d for d in self.documents if all(t in d["title"].lower() for t in terms)
+            )
+        ]
+        return self._page(results, data)
+
+    def _answer_question(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "search": {
+                "id": "search-1",
+                "query": data.get("query"),
+                "answer": "Synthetic answer.",
+                "source": "api",
+                "createdAt": "2024-01-01T00:00:00.000Z",
+            },
+            "documents": self.documents[:3],
+        }
+
+    def _collections_info(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        for collection in self.collections:
+            if data["id"] in (collection["id"], collection["urlId"]):
+                return {"data": collection}
+        raise KeyError(data["id"])
+
+    def _collections_documents(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        documents = [d for d in self.documents if d["collectionId"] == data["id"]]
+        nodes = {
+            d["id"]: {
+                "id": d["id"],
+                "title": d["title"],
+                "url": f"/doc/{d['urlId']}",
+                "children": [],
+            }
+            for d in documents
+        }
+        roots: List[Dict[str, Any]] = []
+        # Parents precede their children in the document list.
+        for d in documents:
+            parent = nodes.get(d["parentDocumentId"])
+            siblings = parent["children"] if parent is not None else roots
+            siblings.append(nodes[d["id"]])
+        return {"data": roots}
+
+
+class FakeOutlineServer:
+    """
+    Run a FakeOutline app with uvicorn in a background thread.
+
+    Use as a context manager; base_url points at the API root once started.
+    """
+
+    def __init__(self, fake: FakeOutline, host: str = "127.0.0.1", port: int = 0):
+        self.fake = fake
+        self._server = uvicorn.Server(
+            uvicorn.Config(
+                fake.app, host=host, port=port, log_level="warning", lifespan="off"
+            )
+        )
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self.base_url = ""
+
+    def __enter__(self) -> "FakeOutlineServer":
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if not self._thread.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError("Fake Outline server failed to start")
+            time.sleep(0.01)
+        host, port = self._server.servers[0].sockets[0].getsockname()[:2]
+        self.base_url = f"http://{host}:{port}/api"
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self._server.should_exit = True
+        self._thread.join(timeout=10)
@@ -0,0 +1,401 @@
+"""
+Benchmark the MCP tools against a local fake Outline API.
+
+Starts a FakeOutlineServer, builds the application context through the server's
+own lifespan (so OUTLINE_* environment variables apply as in production) and
+calls every registered tool at a fixed concurrency, starting each tool from an
+empty response cache. Reports latency percentiles, throughput, upstream requests
+per call and peak memory, and optionally fails when results regress against a
+saved baseline.
+
+Usage:
+    python -m benchmarks.run --requests 200 --concurrency 16
+    python -m benchmarks.run --json results.json
+    python -m benchmarks.run --baseline results.json --max-regression 0.2
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+from unittest.mock import patch
+
+from .fake_outline import WORDS, FakeOutline, FakeOutlineServer, FakeOutlineSettings
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+# Build the keyword arguments of one call of a tool.
+Scenario = Callable[[FakeOutline, random.Random], Dict[str, Any]]
+
+
+def _document_id(fake: FakeOutline, rng: random.Random) -> str:
+    return rng.choice(fake.documents)["id"]
+
+
+def _document_path(fake: FakeOutline, rng: random.Random) -> Dict[str, Any]:
+    doc = rng.choice(fake.documents)
+    return {"collection_id": doc["collectionId"], "path": fake.title_path(doc)}
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    "search_documents": lambda fake, rng: {"query": rng.choice(WORDS)},
+    "multi_search": lambda fake, rng: {"queries": rng.sample(WORDS, 3)},
+    "get_document": lambda fake, rng: {"document_id": _document_id(fake, rng)},
+    "get_documents": lambda fake, rng: {
+        "document_ids": [_document_id(fake, rng) for _ in range(10)]
+    },
+    "list_documents": lambda fake, rng: {"offset": rng.randrange(0, 100)},
+    "answer_question": lambda fake, rng: {"question": "What is our hiring policy?"},
+    "export_document": lambda fake, rng: {"document_id": _document_id(fake, rng)},
+    "get_document_outline": lambda fake, rng: {"document_id": _document_id(fake, rng)},
+    "get_document_section": lambda fake, rng: {
+        "document_id": _document_id(fake, rng),
+        "index": 1,
+    },
+    "get_document_range": lambda fake, rng: {
+        "document_id": _document_id(fake, rng),
+        "start_line": 1,
+        "end_line": 40,
+    },
+    "list_collections": lambda fake, rng: {},
+    "get_collection": lambda fake, rng: {
+        "collection_id": rng.choice(fake.collections)["id"]
+    },
+    "get_collection_documents": lambda fake, rng: {
+        "collection_id": rng.choice(fake.collections)["id"]
+    },
+    "resolve_document_path": _document_path,
+    "list_subtree": lambda fake, rng: {
+        "collection_id": rng.choice(fake.collections)["id"]
+    },
+    # A fresh archive per call measures complete, not incremental, exports.
+    "export_collection": lambda fake, rng: {
+        "collection_id": rng.choice(fake.collections)["id"],
+        "destination": f"bench-{rng.getrandbits(64):016x}.tar.gz",
+    },
+    "list_draft_documents": lambda fake, rng: {},
+    "list_recently_viewed_documents": lambda fake, rng: {},
+    "sync_workspace": lambda fake, rng: {},
+    "server_stats": lambda fake, rng: {},
+}
+
+
+class BenchContext:
+    """Minimal stand-in for the MCP request context passed to tools."""
+
+    class _RequestContext:
+        def __init__(self, lifespan_context: Any):
+            self.lifespan_context = lifespan_context
+
+    def __init__(self, lifespan_context: Any):
+        self.request_context = self._RequestContext(lifespan_context)
+
+    def info(self, message: str) -> None:
+        pass
+
+
+@dataclass
+class ToolResult:
+    """Measurements of one tool."""
+
+    tool: str
+    calls: int = 0
+    errors: int = 0
+    duration: float = 0.0
+    latencies_ms: List[float] = field(default_factory=list, repr=False)
+    upstream: Dict[str, int] = field(default_factory=dict)
+    peak_memory_bytes: Optional[int] = None
+    skipped: Optional[str] = None
+    first_error: Optional[str] = None
+
+    @property
+    def upstream_calls(self) -> int:
+        return sum(self.upstream.values())
+
+    def summary(self) -> Dict[str, Any]:
+        result = {
+            key: value for key, value in asdict(self).items() if key != "latencies_ms"
+        }
+        result["rps"] = round(self.calls / self.duration, 2) if self.duration else 0.0
+        result["upstream_per_call"] = (
+            round(self.upstream_calls / self.calls, 3) if self.calls else 0.0
+        )
+        for q in (50, 95, 99):
+            result[f"p{q}_ms"] = round(percentile(self.latencies_ms, q), 3)
+        return result
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of a list of values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, min(len(ordered), math.ceil(q / 100 * len(ordered))))
+    return ordered[rank - 1]
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Peak resident set size of the process, if the platform reports it."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+async def bench_tool(
+    name: str,
+    tool: Callable[..., Any],
+    scenario: Scenario,
+    context: BenchContext,
+    fake: FakeOutline,
+    requests: int,
+    concurrency: int,
+    seed: int,
+    trace_memory: bool,
+) -> ToolResult:
+    """Call a tool `requests` times with at most `concurrency` calls in flight."""
+    result = ToolResult(tool=name)
+    rng = random.Random(seed)
+    calls = [scenario(fake, rng) for _ in range(requests)]
+    queue = iter(calls)
+
+    async def worker() -> None:
+        for kwargs in queue:
+            started = time.perf_counter()
+            try:
+                await tool(context, **kwargs)
+            except Exception as e:
+                result.errors += 1
+                if result.first_error is None:
+                    result.first_error = str(e)
+            result.latencies_ms.append((time.perf_counter() - started) * 1000)
+            result.calls += 1
+
+    fake.reset_counters()
+    if trace_memory:
+        tracemalloc.reset_peak()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    result.duration = time.perf_counter() - started
+    result.upstream = dict(fake.requests)
+    if trace_memory:
+        result.peak_memory_bytes = tracemalloc.get_traced_memory()[1]
+    return result
+
+
+@asynccontextmanager
+async def _lifespan(server: Any, environment: Dict[str, str]) -> AsyncIterator[Any]:
+    """Enter the server lifespan with the given OUTLINE_* environment."""
+    with patch.dict(os.environ, environment):
+        async with server.app_lifespan(server.mcp) as app_context:
+            yield app_context
+
+
+async def run_benchmarks(
+    settings: FakeOutlineSettings,
+    requests: int = 100,
+    concurrency: int = 8,
+    tools: Optional[List[str]] = None,
+    trace_memory: bool = False,
+) -> Dict[str, Any]:
+    """
+    Run the benchmarks against a fresh fake Outline server.
+
+    Returns:
+        Report with the run configuration and per-tool summaries
+    """
+    from src import outline_mcp_server as server
+
+    fake = FakeOutline(settings)
+    results: List[ToolResult] = []
+
+    with (
+        tempfile.TemporaryDirectory() as data_dir,
+        FakeOutlineServer(fake) as fake_server,
+    ):
+        environment = {
+            "OUTLINE_API_TOKEN": "benchmark",
+            "OUTLINE_DATA_DIR": data_dir,
+            # Client-side throttling would measure the limiter, not the tools.
+            "OUTLINE_RATE_LIMIT_RPS": "0",
+            # The local index enables sync_workspace without its background loop.
+            "OUTLINE_LOCAL_INDEX": "true",
+            **{k: v for k, v in os.environ.items() if k.startswith("OUTLINE_")},
+            "OUTLINE_BASE_URL": fake_server.base_url,
+        }
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+
+        registered = [tool.name for tool in await server.mcp.list_tools()]
+        selected = [name for name in registered if not tools or name in tools]
+
+        if trace_memory:
+            tracemalloc.start()
+        async with _lifespan(server, environment) as app_context:
+            context = BenchContext(app_context)
+            for name in selected:
+                scenario = SCENARIOS.get(name)
+                if scenario is None:
+                    results.append(ToolResult(tool=name, skipped="no scenario"))
+                    continue
+                # Measure every tool from a cold response cache.
+                if app_context.response_cache is not None:
+                    app_context.response_cache.clear()
+                results.append(
+                    await bench_tool(
+                        name,
+                        getattr(server, name),
+                        scenario,
+                        context,
+                        fake,
+                        requests,
+                        concurrency,
+                        settings.seed,
+                        trace_memory,
+                    )
+                )
+        if trace_memory:
+            tracemalloc.stop()
+
+    return {
+        "settings": asdict(settings),
+        "requests": requests,
+        "concurrency": concurrency,
+        "peak_rss_bytes": peak_rss_bytes(),
+        "tools": [result.summary() for result in results],
+    }
+
+
+def find_regressions(
+    report: Dict[str, Any], baseline: Dict[str, Any], max_regression: float
+) -> List[str]:
+    """Compare a report with a baseline and describe every regression."""
+    previous = {tool["tool"]: tool for tool in baseline.get("tools", [])}
+    regressions = []
+    for tool in report["tools"]:
+        before = previous.get(tool["tool"])
+        if before is None or tool.get("skipped") or before.get("skipped"):
+            continue
+        name = tool["tool"]
+        if before["p95_ms"] and tool["p95_ms"] > before["p95_ms"] * (
+            1 + max_regression
+        ):
+            regressions.append(
+                f"{name}: p95 {before['p95_ms']}ms -> {tool['p95_ms']}ms"
+            )
+        if before["rps"] and tool["rps"] < before["rps"] * (1 - max_regression):
+            regressions.append(f"{name}: {before['rps']} -> {tool['rps']} req/s")
+        if tool["upstream_per_call"] > before["upstream_per_call"] + 1e-9:
+            regressions.append(
+                f"{name}: upstream calls per call "
+                f"{before['upstream_per_call']} -> {tool['upstream_per_call']}"
+            )
+        if tool["errors"] > before["errors"]:
+            regressions.append(f"{name}: errors {before['errors']} -> {tool['errors']}")
+    return regressions
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Render a report as a text table."""
+    header = (
+        f"{'tool':<32} {'calls':>6} {'err':>4} {'req/s':>9} {'p50 ms':>9} "
+        f"{'p95 ms':>9} {'p99 ms':>9} {'upstream':>9}"
+    )
+    lines = [header, "-" * len(header)]
+    for tool in report["tools"]:
+        if tool.get("skipped"):
+            lines.append(f"{tool['tool']:<32} skipped: {tool['skipped']}")
+            continue
+        lines.append(
+            f"{tool['tool']:<32} {tool['calls']:>6} {tool['errors']:>4} "
+            f"{tool['rps']:>9.1f} {tool['p50_ms']:>9.2f} {tool['p95_ms']:>9.2f} "
+            f"{tool['p99_ms']:>9.2f} {tool['upstream_per_call']:>9.2f}"
+        )
+    if report.get("peak_rss_bytes"):
+        lines.append(f"\npeak RSS: {report['peak_rss_bytes'] / 1024 / 1024:.1f} MiB")
+    return "\n".join(lines)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=100, help="calls per tool")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--tools", nargs="*", help="only benchmark these tools")
+    parser.add_argument("--documents", type=int, default=1000)
+    parser.add_argument("--collections", type=int, default=10)
+    parser.add_argument("--document-bytes", type=int, default=20_000)
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds")
+    parser.add_argument("--jitter", type=float, default=0.005, help="seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--rate-limit", type=float, default=0.0, help="server-side requests/s"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--trace-memory", action="store_true", help="report peak memory per tool"
+    )
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--baseline", help="compare with a previous --json report")
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=0.2,
+        help="tolerated relative slowdown against the baseline",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    settings = FakeOutlineSettings(
+        documents=args.documents,
+        collections=args.collections,
+        document_bytes=args.document_bytes,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit_rps=args.rate_limit,
+        seed=args.seed,
+    )
+    report = asyncio.run(
+        run_benchmarks(
+            settings,
+            requests=args.requests,
+            concurrency=args.concurrency,
+            tools=args.tools,
+            trace_memory=args.trace_memory,
+        )
+    )
+    print(format_report(report))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = find_regressions(report, baseline, args.max_regression)
+        if regressions:
+            print("\nRegressions against baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,12 +9,24 @@ __author__ = "Outline MCP Server Contributors"
 __email__ = "your.email@example.com"
 __license__ = "MIT"
 
-from .outline_mcp_server import mcp
+from typing import Any
+
+
+def __getattr__(name: str) -> Any:
+    # Importing the server pulls in the MCP SDK, httpx and pydantic; helpers such
+    # as the cache or the benchmarks should not pay for that.
+    if name == "mcp":
+        from .outline_mcp_server import mcp
+
+        return mcp
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def main():
     """Entry point for the MCP server."""
-    mcp.run()
+    from .outline_mcp_server import main
+
+    main()
 
 
 __all__ = ["mcp", "main"]
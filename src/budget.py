@@ -0,0 +1,419 @@
+"""
+Token budgets for tool results.
+
+A single document can run to hundreds of thousands of characters, more than an
+agent wants in its context. Tools that return document bodies accept a budget in
+estimated tokens and/or bytes; a body over budget is cut down to an excerpt and
+the result says where to continue reading.
+
+Tokens are estimated locally with a couple of regular expressions instead of a
+real tokenizer: words, numbers and punctuation marks count as one token each,
+long words and numbers as several. The estimate errs on the high side for prose.
+
+Two kinds of excerpt are built. A "head" excerpt is the longest prefix of the
+body that fits, cut at a line boundary. A "smart" excerpt keeps, in document
+order and as far as they fit: the paragraphs around query terms, the headings,
+and the first paragraph of the document and of every section. Skipped text is
+marked with an ellipsis line.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+TRUNCATION_MODES = ("smart", "head")
+
+# Line marking skipped text in an excerpt.
+ELISION = "…"
+
+# Characters of context kept on each side of a query term; longer paragraphs
+# matching the query are cut to this window.
+QUERY_WINDOW_CHARS = 300
+
+# Every word, number or other non-space character starts a token; runs of
+# ASCII letters and digits are counted as one piece.
+_PIECE_RE = re.compile(r"[A-Za-z]+|\d+|\S")
+# Long words are split into pieces of about six letters, numbers into groups of
+# three digits.
+_LONG_WORD_RE = re.compile(r"[A-Za-z]{7,}")
+_LONG_NUMBER_RE = re.compile(r"\d{4,}")
+
+_HEADING_RE = re.compile(r"^ {0,3}#{1,6}(?:[ \t]|$)")
+_FENCE_RE = re.compile(r"^ {0,3}(`{3,}|~{3,})")
+_TERM_RE = re.compile(r"\w{2,}", re.UNICODE)
+
+
+def estimate_text_tokens(text: str) -> int:
+    """Estimate the number of LLM tokens of a text."""
+    tokens = len(_PIECE_RE.findall(text))
+    tokens += sum((len(word) - 1) // 6 for word in _LONG_WORD_RE.findall(text))
+    tokens += sum((len(number) - 1) // 3 for number in _LONG_NUMBER_RE.findall(text))
+    return tokens
+
+
+@dataclass
+class Budget:
+    """Upper bounds on the size of a text; None means unbounded."""
+
+    max_tokens: Optional[int] = None
+    max_bytes: Optional[int] = None
+
+    def fits(self, tokens: int, size: int) -> bool:
+        return (self.max_tokens is None or tokens <= self.max_tokens) and (
+            self.max_bytes is None or size <= self.max_bytes
+        )
+
+    def fits_text(self, text: str) -> bool:
+        size = len(text.encode("utf-8"))
+        if self.max_bytes is not None and size > self.max_bytes:
+            return False
+        return self.max_tokens is None or estimate_text_tokens(text) <= self.max_tokens
+
+
+def resolve_budget(
+    max_tokens: Optional[int],
+    max_bytes: Optional[int],
+    default_max_tokens: int = 0,
+) -> Optional[Budget]:
+    """
+    Build the budget of a tool call from its arguments.
+
+    Args:
+        max_tokens: Token budget given by the caller
+        max_bytes: Byte budget given by the caller
+        default_max_tokens: Token budget applied when the caller gives neither,
+            0 for none
+
+    Returns:
+        The budget, or None when the result is not limited
+
+    Raises:
+        ValueError: If a budget is not positive
+    """
+    validate_budget("max_tokens", max_tokens)
+    validate_budget("max_bytes", max_bytes)
+    if max_tokens is None and max_bytes is None:
+        if default_max_tokens <= 0:
+            return None
+        max_tokens = default_max_tokens
+    return Budget(max_tokens=max_tokens, max_bytes=max_bytes)
+
+
+def validate_budget(name: str, value: Optional[int]) -> None:
+    if value is not None and value < 1:
+        raise ValueError(f"{name} must be at least 1")
+
+
+def validate_truncation(mode: str) -> None:
+    if mode not in TRUNCATION_MODES:
+        raise ValueError(f"truncation must be one of: {', '.join(TRUNCATION_MODES)}")
+
+
+def query_terms(query: Optional[str]) -> List[str]:
+    """Split a query into distinct case-folded terms of two or more characters."""
+    if not query:
+        return []
+    return list(dict.fromkeys(t.casefold() for t in _TERM_RE.findall(query)))
+
+
+@dataclass
+class Block:
+    """A heading or paragraph of a Markdown text, as a byte span."""
+
+    start: int
+    end: int
+    text: str
+    heading: bool
+    tokens: int
+
+
+def split_blocks(text: str) -> List[Block]:
+    """
+    Split Markdown into headings and blank-line separated paragraphs.
+
+    Fenced code blocks are kept whole. Offsets are in bytes of the UTF-8 text.
+    """
+    blocks: List[Block] = []
+    lines: List[str] = []
+    start = offset = 0
+    fence: Optional[str] = None
+
+    def close(end: int) -> None:
+        if lines:
+            chunk = "".join(lines)
+            blocks.append(
+                Block(start, end, chunk, False, estimate_text_tokens(chunk) + 1)
+            )
+            lines.clear()
+
+    for line in text.splitlines(keepends=True):
+        size = len(line.encode("utf-8"))
+        stripped = line.rstrip("\r\n")
+        fence_match = _FENCE_RE.match(stripped)
+        if fence is not None:
+            lines.append(line)
+            if fence_match and fence_match.group(1).startswith(fence):
+                fence = None
+        elif fence_match:
+            if not lines:
+                start = offset
+            lines.append(line)
+            fence = fence_match.group(1)
+        elif _HEADING_RE.match(stripped):
+            close(offset)
+            blocks.append(
+                Block(offset, offset + size, line, True, estimate_text_tokens(line) + 1)
+            )
+        elif not stripped.strip():
+            close(offset)
+        else:
+            if not lines:
+                start = offset
+            lines.append(line)
+        offset += size
+    close(offset)
+    return blocks
+
+
+@dataclass
+class Excerpt:
+    """A text cut down to a budget."""
+
+    text: str
+    truncated: bool
+    mode: str
+    total_bytes: int
+    # Byte spans of the original text kept in the excerpt, in order
+    spans: List[Tuple[int, int]] = field(default_factory=list)
+
+    @property
+    def shown_bytes(self) -> int:
+        return sum(end - start for start, end in self.spans)
+
+    @property
+    def next_byte(self) -> Optional[int]:
+        """First byte of the original text that was left out, if any."""
+        position = 0
+        for start, end in self.spans:
+            if start > position:
+                return position
+            position = max(position, end)
+        return position if position < self.total_bytes else None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "shown_bytes": self.shown_bytes,
+            "total_bytes": self.total_bytes,
+            "estimated_tokens": estimate_text_tokens(self.text),
+            "next_byte": self.next_byte,
+        }
+
+
+def truncate_text(
+    text: str,
+    budget: Optional[Budget],
+    query: Optional[str] = None,
+    mode: str = "smart",
+) -> Excerpt:
+    """
+    Cut a Markdown text down to a budget.
+
+    Args:
+        text: Text to cut
+        budget: Budget to fit, or None to keep the whole text
+        query: Terms whose surrounding paragraphs are kept first (smart mode)
+        mode: "smart" for an excerpt of headings, lead paragraphs and query
+            matches, or "head" for the longest prefix that fits
+
+    Returns:
+        The excerpt; its text is the original text when it fits
+
+    Raises:
+        ValueError: If the mode is unknown
+    """
+    validate_truncation(mode)
+    size = len(text.encode("utf-8"))
+    if budget is None or budget.fits_text(text):
+        return Excerpt(text, False, mode, size, [(0, size)] if size else [])
+
+    blocks = split_blocks(text)
+    if mode == "head":
+        return _head_excerpt(text, blocks, budget, size)
+    return _smart_excerpt(blocks, budget, query_terms(query), size)
+
+
+def _head_excerpt(text: str, blocks: List[Block], budget: Budget, size: int) -> Excerpt:
+    kept: List[Block] = []
+    tokens = 0
+    for block in blocks:
+        # The prefix runs on to the end of the block, blank lines included.
+        if not budget.fits(tokens + block.tokens, block.end):
+            break
+        kept.append(block)
+        tokens += block.tokens
+
+    end = kept[-1].end if kept else 0
+    if not kept and blocks:
+        # Not even the first paragraph fits: cut it by lines, then characters.
+        end = _fit_prefix(text, blocks[0].end, budget)
+    encoded = text.encode("utf-8")
+    excerpt = encoded[:end].decode("utf-8", errors="ignore")
+    return Excerpt(excerpt, True, "head", size, [(0, end)] if end else [])
+
+
+def _fit_prefix(text: str, limit: int, budget: Budget) -> int:
+    """Return the end of the longest line-aligned prefix within limit that fits."""
+    encoded = text.encode("utf-8")[:limit]
+    best = 0
+    offset = 0
+    for line in encoded.splitlines(keepends=True):
+        candidate = encoded[: offset + len(line)].decode("utf-8", errors="ignore")
+        if not budget.fits_text(candidate):
+            break
+        offset += len(line)
+        best = offset
+    if best:
+        return best
+
+    # A single line over budget: keep as many words, or characters, as fit.
+    low, high = 0, len(encoded)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if budget.fits_text(encoded[:middle].decode("utf-8", errors="ignore")):
+            low = middle
+        else:
+            high = middle - 1
+    prefix = encoded[:low].decode("utf-8", errors="ignore")
+    if low < len(encoded) and not prefix[-1:].isspace():
+        cut = max(prefix.rfind(" "), prefix.rfind("\t"))
+        if cut > 0:
+            prefix = prefix[: cut + 1]
+    return len(prefix.encode("utf-8"))
+
+
+def _smart_excerpt(
+    blocks: List[Block], budget: Budget, terms: Sequence[str], size: int
+) -> Excerpt:
+    # Candidates in order of priority; each is a block index and optionally a
+    # (start, end) character window of the block.
+    candidates: List[Tuple[int, Optional[Tuple[int, int]]]] = []
+    if terms:
+        matches = []
+        for index, block in enumerate(blocks):
+            folded = block.text.casefold()
+            hits = sum(term in folded for term in terms)
+            if hits:
+                matches.append((-hits, index))
+        candidates.extend((index, None) for _, index in sorted(matches))
+    candidates.extend((i, None) for i, block in enumerate(blocks) if block.heading)
+    leads = [
+        i
+        for i, block in enumerate(blocks)
+        if not block.heading and (i == 0 or blocks[i - 1].heading)
+    ]
+    candidates.extend((i, None) for i in leads)
+
+    chosen: Dict[int, Tuple[int, int, str]] = {}
+    tokens = size_used = 0
+    elision_tokens = estimate_text_tokens(ELISION) + 1
+    elision_bytes = len(ELISION.encode("utf-8")) + 2
+    for index, _ in candidates:
+        if index in chosen:
+            continue
+        block = blocks[index]
+        long_match = bool(terms) and len(block.text) > 2 * QUERY_WINDOW_CHARS
+        # Room for the block and for an elision mark next to it.
+        if not (long_match and _has_term(block, terms)) and budget.fits(
+            tokens + block.tokens + elision_tokens,
+            size_used + (block.end - block.start) + elision_bytes,
+        ):
+            chosen[index] = (block.start, block.end, block.text)
+            tokens += block.tokens + elision_tokens
+            size_used += block.end - block.start + elision_bytes
+            continue
+        if block.heading or not terms:
+            continue
+        window = _query_window(block, terms, budget, tokens, size_used)
+        if window is not None:
+            chosen[index] = window
+            piece = window[2]
+            tokens += estimate_text_tokens(piece) + 2 * elision_tokens
+            size_used += len(piece.encode("utf-8")) + 2 * elision_bytes
+
+    # The estimate above leaves out separators and the closing elision mark;
+    # drop the least important blocks until the rendered excerpt fits.
+    text, spans = _render_smart(blocks, chosen, size)
+    while chosen and not budget.fits_text(text):
+        del chosen[next(reversed(chosen))]
+        text, spans = _render_smart(blocks, chosen, size)
+    if not budget.fits_text(text):
+        text = ""
+    return Excerpt(text, True, "smart", size, spans)
+
+
+def _render_smart(
+    blocks: List[Block], chosen: Dict[int, Tuple[int, int, str]], size: int
+) -> Tuple[str, List[Tuple[int, int]]]:
+    """Join the chosen pieces in document order with elision marks between gaps."""
+    parts: List[str] = []
+    spans: List[Tuple[int, int]] = []
+    previous, cut = -1, False
+    for index in sorted(chosen):
+        start, end, piece = chosen[index]
+        block = blocks[index]
+        if end == block.end:
+            # Blank lines after a whole block count as shown.
+            end = blocks[index + 1].start if index + 1 < len(blocks) else size
+        if index > previous + 1 or cut or start > block.start:
+            parts.append(ELISION + "\n\n")
+            spans.append((start, end))
+        elif spans:
+            # Only blank lines lie between this block and the previous one.
+            spans[-1] = (spans[-1][0], end)
+        else:
+            spans.append((0, end))
+        parts.append(piece.rstrip("\n") + "\n\n")
+        previous, cut = index, end < block.end
+    if previous < len(blocks) - 1 or cut:
+        parts.append(ELISION + "\n")
+    return "".join(parts).rstrip("\n") + "\n", spans
+
+
+def _has_term(block: Block, terms: Sequence[str]) -> bool:
+    folded = block.text.casefold()
+    return any(term in folded for term in terms)
+
+
+def _query_window(
+    block: Block,
+    terms: Sequence[str],
+    budget: Budget,
+    tokens: int,
+    size_used: int,
+) -> Optional[Tuple[int, int, str]]:
+    """Cut the text around the first query term of a block, within the budget."""
+    folded = block.text.casefold()
+    positions = [folded.find(term) for term in terms if term in folded]
+    if not positions:
+        return None
+    hit = min(positions)
+    half = QUERY_WINDOW_CHARS
+    while half >= 20:
+        start = max(0, hit - half)
+        end = min(len(block.text), hit + half)
+        # Widen to word boundaries.
+        while start > 0 and not block.text[start - 1].isspace():
+            start -= 1
+        while end < len(block.text) and not block.text[end].isspace():
+            end += 1
+        piece = block.text[start:end].strip()
+        if budget.fits(
+            tokens + estimate_text_tokens(piece) + 4,
+            size_used + len(piece.encode("utf-8")) + 10,
+        ):
+            byte_start = block.start + len(block.text[:start].encode("utf-8"))
+            byte_end = block.start + len(block.text[:end].encode("utf-8"))
+            return byte_start, byte_end, piece
+        half //= 2
+    return None
@@ -0,0 +1,702 @@
+"""
+Response cache for Outline API calls.
+
+Caches JSON responses of read-only Outline endpoints keyed on the endpoint and a
+canonicalized request body. Entries expire after a per-endpoint TTL, the cache is
+bounded by the total size of the stored responses (least recently used entries
+are evicted first), and cached document reads are dropped as soon as a newer
+revision of the document is observed in any other response. Expired entries can
+be kept for a while longer to be served stale, while they are refreshed or while
+Outline is unreachable. The SQLite backend lets several worker processes share
+one cache; its calls block on disk and on other processes, so callers on an
+event loop run them in a thread (see ResponseCache.blocking).
+"""
+
+import functools
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Protocol,
+    Set,
+    Tuple,
+    runtime_checkable,
+)
+
+from . import jsoncodec
+
+# Default time-to-live in seconds for each cacheable endpoint. Endpoints that are
+# not listed here (e.g. documents.answerQuestion) are never cached.
+DEFAULT_TTLS: Dict[str, float] = {
+    "documents.info": 300.0,
+    "documents.export": 300.0,
+    "documents.list": 60.0,
+    "documents.search": 60.0,
+    "documents.drafts": 30.0,
+    "documents.viewed": 30.0,
+    "collections.list": 120.0,
+    "collections.info": 300.0,
+    "collections.documents": 120.0,
+}
+
+# TTLs used when the change feed or webhooks invalidate entries as soon as
+# Outline reports a change; expiry only bounds the damage of a missed event.
+CHANGE_FEED_TTLS: Dict[str, float] = {
+    "documents.info": 3600.0,
+    "documents.export": 3600.0,
+    "documents.list": 600.0,
+    "documents.search": 600.0,
+    "collections.list": 3600.0,
+    "collections.info": 3600.0,
+    "collections.documents": 3600.0,
+}
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# Number of documents whose latest revision marker is remembered.
+DEFAULT_MAX_REVISIONS = 20_000
+
+# Endpoints whose cached responses belong to a single document.
+DOCUMENT_ENDPOINTS = ("documents.info", "documents.export")
+# Endpoints whose cached responses belong to a single collection.
+COLLECTION_ENDPOINTS = ("collections.info", "collections.documents")
+
+
+def canonical_key(endpoint: str, data: Optional[Dict[str, Any]]) -> str:
+    """Build a cache key from an endpoint and its request body."""
+    body = jsoncodec.dumps(data or {}, sort_keys=True, default=str)
+    return f"{endpoint}:{body}"
+
+
+def revision_marker(doc: Dict[str, Any]) -> Optional[str]:
+    """Return a marker that changes whenever a document is edited."""
+    revision = doc.get("revision")
+    updated_at = doc.get("updatedAt")
+    if revision is None and updated_at is None:
+        return None
+    return f"{revision}:{updated_at}"
+
+
+@dataclass
+class CacheEntry:
+    """A cached API response."""
+
+    endpoint: str
+    value: Dict[str, Any]
+    size: int
+    stored_at: float
+    expires_at: float
+    tags: Set[str] = field(default_factory=set)
+
+    def is_expired(self, now: float) -> bool:
+        return now >= self.expires_at
+
+    def age(self, now: float) -> float:
+        return max(0.0, now - self.stored_at)
+
+    def outlived(self, now: float, max_stale: float) -> bool:
+        """Whether the entry expired at least max_stale seconds ago."""
+        return now >= self.expires_at + max_stale
+
+
+@dataclass
+class CacheStats:
+    """Counters describing cache effectiveness."""
+
+    hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    invalidations: int = 0
+    stale_hits: int = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = asdict(self)
+        lookups = self.hits + self.misses
+        stats["hit_ratio"] = round(self.hits / lookups, 4) if lookups else 0.0
+        return stats
+
+
+class CacheBackend(Protocol):
+    """Storage used by ResponseCache. Implementations must be size-bounded."""
+
+    def get(self, key: str) -> Optional[CacheEntry]: ...
+
+    def set(self, key: str, entry: CacheEntry) -> List[Tuple[str, CacheEntry]]:
+        """Store an entry and return the entries evicted to make room for it."""
+        ...
+
+    def delete(self, key: str) -> Optional[CacheEntry]: ...
+
+    def items(self) -> Iterable[Tuple[str, CacheEntry]]: ...
+
+    def clear(self) -> None: ...
+
+    @property
+    def current_bytes(self) -> int: ...
+
+    def __len__(self) -> int: ...
+
+
+class LRUBackend:
+    """In-memory LRU storage bounded by the total byte size of its entries."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._bytes = 0
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key: str, entry: CacheEntry) -> List[Tuple[str, CacheEntry]]:
+        if entry.size > self.max_bytes:
+            return []
+        self.delete(key)
+        self._entries[key] = entry
+        self._bytes += entry.size
+
+        evicted = []
+        while self._bytes > self.max_bytes:
+            old_key, old_entry = self._entries.popitem(last=False)
+            self._bytes -= old_entry.size
+            evicted.append((old_key, old_entry))
+        return evicted
+
+    def delete(self, key: str) -> Optional[CacheEntry]:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+        return entry
+
+    def items(self) -> Iterable[Tuple[str, CacheEntry]]:
+        return list(self._entries.items())
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    @property
+    def current_bytes(self) -> int:
+        return self._bytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+@runtime_checkable
+class TaggedBackend(Protocol):
+    """Backend shared between processes that indexes entry tags itself."""
+
+    def tagged(self, tag: str) -> List[str]:
+        """Return the keys of all entries carrying a tag, whoever stored them."""
+        ...
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    endpoint TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    tags TEXT NOT NULL,
+    used_at REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS tags (
+    tag TEXT NOT NULL,
+    key TEXT NOT NULL,
+    PRIMARY KEY (tag, key)
+) WITHOUT ROWID;
+"""
+
+
+class SQLiteBackend:
+    """
+    Storage in a SQLite database that several processes can share.
+
+    Bounded by the total byte size of its entries; the least recently used
+    entries, by any process, are evicted first. Entry times must come from a
+    clock that all processes share, such as time.time.
+
+    Args:
+        path: Database file
+        max_bytes: Size bound of all entries together
+        clock: Time source of last uses, shared by all processes
+    """
+
+    # Seconds within which repeated reads of an entry record one use, to spare
+    # a write per cache hit.
+    USE_RESOLUTION = 1.0
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        clock: Callable[[], float] = time.time,
+    ):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SQLITE_SCHEMA)
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            columns = [
+                row[1] for row in self._conn.execute("PRAGMA table_info(entries)")
+            ]
+            if "used_at" not in columns:
+                # Databases created before eviction by last use
+                self._conn.execute(
+                    "ALTER TABLE entries ADD COLUMN used_at REAL NOT NULL DEFAULT 0"
+                )
+                self._conn.execute("UPDATE entries SET used_at = stored_at")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS entries_used_at ON entries(used_at)"
+            )
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT endpoint, value, size, stored_at, expires_at, tags, used_at "
+                "FROM entries WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            now = self._clock()
+            if now - row[6] >= self.USE_RESOLUTION:
+                self._conn.execute(
+                    "UPDATE entries SET used_at = ? WHERE key = ?", (now, key)
+                )
+        return _entry_from_row(row[:6])
+
+    def set(self, key: str, entry: CacheEntry) -> List[Tuple[str, CacheEntry]]:
+        if entry.size > self.max_bytes:
+            return []
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._delete(key)
+                self._conn.execute(
+                    "INSERT INTO entries (key, endpoint, value, size, stored_at, "
+                    "expires_at, tags, used_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        key,
+                        entry.endpoint,
+                        jsoncodec.dumps(entry.value, default=str),
+                        entry.size,
+                        entry.stored_at,
+                        entry.expires_at,
+                        jsoncodec.dumps(sorted(entry.tags)),
+                        self._clock(),
+                    ),
+                )
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO tags VALUES (?, ?)",
+                    [(tag, key) for tag in entry.tags],
+                )
+                evicted = self._evict()
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return evicted
+
+    def delete(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                entry = self._delete(key)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return entry
+
+    def tagged(self, tag: str) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key FROM tags WHERE tag = ?", (tag,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def items(self) -> Iterable[Tuple[str, CacheEntry]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, endpoint, value, size, stored_at, expires_at, tags "
+                "FROM entries"
+            ).fetchall()
+        return [(row[0], _entry_from_row(row[1:])) for row in rows]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.execute("DELETE FROM tags")
+
+    @property
+    def current_bytes(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT coalesce(sum(size), 0) FROM entries"
+            ).fetchone()[0]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT count(*) FROM entries").fetchone()[0]
+
+    def _delete(self, key: str) -> Optional[CacheEntry]:
+        row = self._conn.execute(
+            "SELECT endpoint, value, size, stored_at, expires_at, tags "
+            "FROM entries WHERE key = ?",
+            (key,),
+        ).fetchone()
+        if row is None:
+            return None
+        self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+        self._conn.execute("DELETE FROM tags WHERE key = ?", (key,))
+        return _entry_from_row(row)
+
+    def _evict(self) -> List[Tuple[str, CacheEntry]]:
+        total = self._conn.execute(
+            "SELECT coalesce(sum(size), 0) FROM entries"
+        ).fetchone()[0]
+        evicted = []
+        while total > self.max_bytes:
+            row = self._conn.execute(
+                "SELECT key FROM entries ORDER BY used_at LIMIT 1"
+            ).fetchone()
+            entry = self._delete(row[0])
+            total -= entry.size
+            evicted.append((row[0], entry))
+        return evicted
+
+
+def _entry_from_row(row: Tuple[Any, ...]) -> CacheEntry:
+    endpoint, value, size, stored_at, expires_at, tags = row
+    return CacheEntry(
+        endpoint=endpoint,
+        value=jsoncodec.loads(value),
+        size=size,
+        stored_at=stored_at,
+        expires_at=expires_at,
+        tags=set(jsoncodec.loads(tags)),
+    )
+
+
+def _synchronized(method: Callable[..., Any]) -> Callable[..., Any]:
+    """Run a ResponseCache method under the cache lock."""
+
+    @functools.wraps(method)
+    def wrapper(self: "ResponseCache", *args: Any, **kwargs: Any) -> Any:
+        with self._lock:
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+class ResponseCache:
+    """
+    TTL and revision-aware cache for Outline API responses.
+
+    Safe to call from several threads at once.
+
+    Args:
+        ttls: Per-endpoint TTLs in seconds, merged over DEFAULT_TTLS. A TTL of
+            zero or less disables caching for that endpoint.
+        max_bytes: Size bound used when no backend is given
+        backend: Optional storage backend (defaults to an in-memory LRU)
+        clock: Monotonic time source, overridable for tests
+        max_stale: Seconds expired entries are kept for get_stale
+        max_revisions: Number of revision markers kept, least recently observed
+            markers are forgotten first
+    """
+
+    def __init__(
+        self,
+        ttls: Optional[Dict[str, float]] = None,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        backend: Optional[CacheBackend] = None,
+        clock: Callable[[], float] = time.monotonic,
+        max_stale: float = 0.0,
+        max_revisions: int = DEFAULT_MAX_REVISIONS,
+    ):
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.max_stale = max_stale
+        self.backend: CacheBackend = (
+            backend if backend is not None else LRUBackend(max_bytes)
+        )
+        self.stats = CacheStats()
+        self._clock = clock
+        self._lock = threading.RLock()
+        self._tags: Dict[str, Set[str]] = {}
+        self.max_revisions = max_revisions
+        self._revisions: "OrderedDict[str, str]" = OrderedDict()
+
+    @property
+    def blocking(self) -> bool:
+        """Whether calls do I/O that an event loop should run in a thread."""
+        return isinstance(self.backend, SQLiteBackend)
+
+    def is_cacheable(self, endpoint: str) -> bool:
+        return self.ttls.get(endpoint, 0) > 0
+
+    @_synchronized
+    def get(
+        self, endpoint: str, data: Optional[Dict[str, Any]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Return the cached response for a request, or None on a miss."""
+        if not self.is_cacheable(endpoint):
+            return None
+
+        key = canonical_key(endpoint, data)
+        entry = self.backend.get(key)
+        if entry is None:
+            self.stats.misses += 1
+            return None
+
+        now = self._clock()
+        if entry.is_expired(now):
+            if entry.outlived(now, self.max_stale):
+                self._remove(key)
+                self.stats.expirations += 1
+            self.stats.misses += 1
+            return None
+
+        self.stats.hits += 1
+        return entry.value
+
+    @_synchronized
+    def get_stale(
+        self, endpoint: str, data: Optional[Dict[str, Any]], max_stale: float
+    ) -> Optional[Tuple[Dict[str, Any], float]]:
+        """
+        Return a cached response, even if it expired less than max_stale ago.
+
+        Invalidated entries are never returned, as they are gone.
+
+        Args:
+            endpoint: API endpoint of the request
+            data: Request body of the request
+            max_stale: Seconds past expiry the entry may be, capped at the
+                max_stale of the cache
+
+        Returns:
+            The response and its age in seconds, or None
+        """
+        if not self.is_cacheable(endpoint):
+            return None
+        entry = self.backend.get(canonical_key(endpoint, data))
+        if entry is None:
+            return None
+        now = self._clock()
+        if entry.outlived(now, min(max_stale, self.max_stale)):
+            return None
+        self.stats.stale_hits += 1
+        return entry.value, entry.age(now)
+
+    @_synchronized
+    def set(
+        self,
+        endpoint: str,
+        data: Optional[Dict[str, Any]],
+        value: Dict[str, Any],
+        size: Optional[int] = None,
+        ttl: Optional[float] = None,
+    ) -> None:
+        """
+        Store a response and record any document revisions it contains.
+
+        Args:
+            endpoint: API endpoint the response came from
+            data: Request body that produced the response
+            value: Decoded JSON response
+            size: Size of the raw response in bytes, estimated when omitted
+            ttl: Seconds the response stays fresh, for responses that are not
+                new; capped at the TTL of the endpoint
+        """
+        self.observe(endpoint, data, value)
+
+        if not self.is_cacheable(endpoint):
+            return
+
+        if size is None:
+            size = len(jsoncodec.dumps(value, default=str))
+
+        lifetime = self.ttls[endpoint]
+        if ttl is not None:
+            lifetime = min(lifetime, ttl)
+        if lifetime <= 0:
+            return
+
+        now = self._clock()
+        key = canonical_key(endpoint, data)
+        entry = CacheEntry(
+            endpoint=endpoint,
+            value=value,
+            size=size,
+            stored_at=now,
+            expires_at=now + lifetime,
+            tags=self._tags_for(endpoint, data, value),
+        )
+
+        self._remove(key)
+        evicted = self.backend.set(key, entry)
+        if self.backend.get(key) is None:
+            return
+        self.stats.stores += 1
+        for tag in entry.tags:
+            self._tags.setdefault(tag, set()).add(key)
+        for evicted_key, evicted_entry in evicted:
+            self._untag(evicted_key, evicted_entry)
+            self.stats.evictions += 1
+
+    @_synchronized
+    def observe(
+        self, endpoint: str, data: Optional[Dict[str, Any]], value: Dict[str, Any]
+    ) -> None:
+        """Invalidate cached document reads when a response shows a newer revision."""
+        for doc in _documents_in(endpoint, value):
+            marker = revision_marker(doc)
+            if marker is None:
+                continue
+            ids = [i for i in (doc.get("id"), doc.get("urlId")) if i]
+            for doc_id in ids:
+                known = self._revisions.get(doc_id)
+                if known is not None and known != marker:
+                    self.invalidate_tag(f"document:{doc_id}")
+                self._revisions[doc_id] = marker
+                self._revisions.move_to_end(doc_id)
+        while len(self._revisions) > self.max_revisions:
+            doc_id, _ = self._revisions.popitem(last=False)
+            # Without its marker a newer revision would go unnoticed, so cached
+            # reads of the document go too.
+            if f"document:{doc_id}" in self._tags:
+                self.invalidate_tag(f"document:{doc_id}")
+
+    @_synchronized
+    def revision(self, document_id: str) -> Optional[str]:
+        """Return the latest revision marker observed for a document."""
+        return self._revisions.get(document_id)
+
+    @_synchronized
+    def invalidate_tag(self, tag: str) -> int:
+        """Drop every entry carrying the given tag. Returns the number dropped."""
+        keys = self._tags.pop(tag, set())
+        if isinstance(self.backend, TaggedBackend):
+            # Entries stored by other processes are only indexed by the backend.
+            keys.update(self.backend.tagged(tag))
+        dropped = 0
+        for key in list(keys):
+            if self._remove(key):
+                dropped += 1
+        self.stats.invalidations += dropped
+        return dropped
+
+    @_synchronized
+    def invalidate_document(self, document_id: str) -> int:
+        """Drop every cached read of a single document."""
+        self._revisions.pop(document_id, None)
+        return self.invalidate_tag(f"document:{document_id}")
+
+    def invalidate_collection(self, collection_id: str) -> int:
+        """Drop the cached info and document tree of a collection."""
+        return self.invalidate_tag(f"collection:{collection_id}")
+
+    def invalidate_endpoint(self, endpoint: str) -> int:
+        """Drop every cached response of an endpoint."""
+        return self.invalidate_tag(f"endpoint:{endpoint}")
+
+    @_synchronized
+    def clear(self) -> None:
+        self.backend.clear()
+        self._tags.clear()
+        self._revisions.clear()
+
+    @_synchronized
+    def snapshot(self) -> Dict[str, Any]:
+        """Return counters and occupancy for reporting."""
+        stats = self.stats.as_dict()
+        stats["entries"] = len(self.backend)
+        stats["bytes"] = self.backend.current_bytes
+        stats["revisions"] = len(self._revisions)
+        return stats
+
+    def _tags_for(
+        self, endpoint: str, data: Optional[Dict[str, Any]], value: Dict[str, Any]
+    ) -> Set[str]:
+        tags = {f"endpoint:{endpoint}"}
+        if endpoint in DOCUMENT_ENDPOINTS:
+            requested = (data or {}).get("id")
+            if requested:
+                tags.add(f"document:{requested}")
+            doc = value.get("data")
+            if isinstance(doc, dict):
+                for doc_id in (doc.get("id"), doc.get("urlId")):
+                    if doc_id:
+                        tags.add(f"document:{doc_id}")
+        elif endpoint in COLLECTION_ENDPOINTS:
+            requested = (data or {}).get("id")
+            if requested:
+                tags.add(f"collection:{requested}")
+            collection = value.get("data")
+            if endpoint == "collections.info" and isinstance(collection, dict):
+                for collection_id in (collection.get("id"), collection.get("urlId")):
+                    if collection_id:
+                        tags.add(f"collection:{collection_id}")
+        return tags
+
+    def _remove(self, key: str) -> bool:
+        entry = self.backend.delete(key)
+        if entry is None:
+            return False
+        self._untag(key, entry)
+        return True
+
+    def _untag(self, key: str, entry: CacheEntry) -> None:
+        for tag in entry.tags:
+            keys = self._tags.get(tag)
+            if keys is None:
+                continue
+            keys.discard(key)
+            if not keys:
+                del self._tags[tag]
+
+
+def _documents_in(endpoint: str, value: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Extract document payloads from a response."""
+    data = value.get("data")
+    if endpoint == "documents.info" and isinstance(data, dict):
+        return [data]
+    if not isinstance(data, list) or not endpoint.startswith("documents."):
+        return []
+    if endpoint == "documents.search":
+        return [item.get("document") or {} for item in data if isinstance(item, dict)]
+    return [item for item in data if isinstance(item, dict)]
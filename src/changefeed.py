@@ -0,0 +1,394 @@
+"""
+Cache invalidation driven by Outline's change feed.
+
+Outline records every change as an event: documents.update, documents.delete,
+collections.update and so on. The change feed polls events.list, newest first,
+down to the last event it processed, and turns the new events into targeted
+invalidations of cached documents, listings and collection trees. In HTTP mode
+Outline can push the same events as signed webhooks instead.
+
+With invalidation driven by changes rather than by expiry, cached responses can
+live much longer; see CHANGE_FEED_TTLS in the cache module.
+
+Worker processes sharing a data directory publish their invalidations to an
+InvalidationLog, so the others drop their in-process state as well.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import aclosing
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+from . import jsoncodec
+from .pagination import MAX_PAGE_SIZE, RequestFn, iter_pages
+
+logger = logging.getLogger(__name__)
+
+# Events read per poll before the feed gives up catching up and drops everything.
+MAX_CATCH_UP_EVENTS = 10 * MAX_PAGE_SIZE
+
+# Webhooks signed longer ago than this are rejected as replays.
+SIGNATURE_TOLERANCE = 300.0
+
+# Seconds between reads of the invalidation log by worker processes.
+INVALIDATION_LOG_INTERVAL = 1.0
+
+# Seconds published invalidations are kept in the log.
+INVALIDATION_LOG_RETENTION = 3600.0
+
+
+@dataclass
+class Invalidation:
+    """Cached data made stale by a batch of events."""
+
+    # Changed document ids, mapped to their collection id when known
+    documents: Dict[str, Optional[str]] = field(default_factory=dict)
+    collections: Set[str] = field(default_factory=set)
+    # Set when changes may have been missed; everything cached is suspect.
+    everything: bool = False
+
+    def __bool__(self) -> bool:
+        return bool(self.documents or self.collections or self.everything)
+
+    def add(
+        self, name: str, model_id: Optional[str], collection_id: Optional[str]
+    ) -> None:
+        """Record an event by name, e.g. "documents.update"."""
+        if name.startswith("documents.") and model_id:
+            if collection_id or model_id not in self.documents:
+                self.documents[model_id] = collection_id
+            if collection_id:
+                self.collections.add(collection_id)
+        elif name.startswith("collections.") and (collection_id or model_id):
+            self.collections.add(collection_id or model_id)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "documents": self.documents,
+            "collections": sorted(self.collections),
+            "everything": self.everything,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Invalidation":
+        return cls(
+            documents=dict(data.get("documents") or {}),
+            collections=set(data.get("collections") or ()),
+            everything=bool(data.get("everything")),
+        )
+
+
+def invalidation_for(events: Iterable[Dict[str, Any]]) -> Invalidation:
+    """Translate events.list items into an invalidation."""
+    invalidation = Invalidation()
+    for event in events:
+        name = event.get("name") or ""
+        if name.startswith("documents."):
+            model_id = event.get("documentId") or event.get("modelId")
+        else:
+            model_id = event.get("modelId")
+        invalidation.add(name, model_id, event.get("collectionId"))
+    return invalidation
+
+
+def webhook_invalidation(delivery: Dict[str, Any]) -> Invalidation:
+    """Translate the body of an Outline webhook delivery into an invalidation."""
+    invalidation = Invalidation()
+    payload = delivery.get("payload") or {}
+    model = payload.get("model") or {}
+    name = delivery.get("event") or ""
+    model_id = payload.get("id") or model.get("id")
+    if name.startswith("documents."):
+        collection_id = model.get("collectionId")
+    else:
+        collection_id = model_id
+    invalidation.add(name, model_id, collection_id)
+    return invalidation
+
+
+def verify_signature(
+    secret: str,
+    header: Optional[str],
+    body: bytes,
+    now: Optional[float] = None,
+    tolerance: float = SIGNATURE_TOLERANCE,
+) -> bool:
+    """
+    Check the Outline-Signature header of a webhook delivery.
+
+    The header has the form "t=<timestamp>,s=<signature>", where the signature
+    is the hex HMAC-SHA256 of "<timestamp>.<body>" keyed with the secret of the
+    webhook subscription.
+    """
+    if not header:
+        return False
+    parts = dict(item.split("=", 1) for item in header.split(",") if "=" in item)
+    timestamp, signature = parts.get("t"), parts.get("s")
+    if not timestamp or not signature:
+        return False
+    try:
+        signed_at = float(timestamp)
+    except ValueError:
+        return False
+    # Outline signs with milliseconds.
+    if signed_at > 1e11:
+        signed_at /= 1000
+    if abs((now if now is not None else time.time()) - signed_at) > tolerance:
+        return False
+    expected = hmac.new(
+        secret.encode("utf-8"), f"{timestamp}.".encode() + body, hashlib.sha256
+    ).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+INVALIDATION_LOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS invalidations (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    origin TEXT NOT NULL,
+    published_at REAL NOT NULL,
+    body TEXT NOT NULL
+);
+"""
+
+
+class InvalidationLog:
+    """
+    Invalidations shared by worker processes through SQLite.
+
+    Each process publishes the invalidations it applies and reads those of the
+    others, starting from the end of the log when it is opened.
+
+    Args:
+        path: Database file
+        retention: Seconds published invalidations are kept
+        clock: Wall-clock time source shared by all processes
+    """
+
+    def __init__(
+        self,
+        path: str,
+        retention: float = INVALIDATION_LOG_RETENTION,
+        clock: Callable[[], float] = time.time,
+    ):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.origin = uuid.uuid4().hex
+        self.retention = retention
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(INVALIDATION_LOG_SCHEMA)
+        row = self._conn.execute("SELECT MAX(seq) FROM invalidations").fetchone()
+        self._seq = row[0] or 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def publish(self, invalidation: Invalidation) -> None:
+        """Append an invalidation for the other processes to read."""
+        now = self._clock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO invalidations (origin, published_at, body) "
+                "VALUES (?, ?, ?)",
+                (self.origin, now, jsoncodec.dumps(invalidation.to_dict())),
+            )
+            self._conn.execute(
+                "DELETE FROM invalidations WHERE published_at < ?",
+                (now - self.retention,),
+            )
+
+    def read(self) -> List[Invalidation]:
+        """Return invalidations other processes published since the last read."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, origin, body FROM invalidations WHERE seq > ? "
+                "ORDER BY seq",
+                (self._seq,),
+            ).fetchall()
+        if rows:
+            self._seq = rows[-1][0]
+        return [
+            Invalidation.from_dict(jsoncodec.loads(body))
+            for _, origin, body in rows
+            if origin != self.origin
+        ]
+
+
+@dataclass
+class ChangeFeedResult:
+    """Outcome of a single poll of the change feed."""
+
+    events: int = 0
+    documents: int = 0
+    collections: int = 0
+    caught_up: bool = True
+    duration: float = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        result: Dict[str, Any] = asdict(self)
+        result["duration"] = round(self.duration, 3)
+        return result
+
+
+class ChangeFeed:
+    """
+    Poll events.list and report the invalidations new events cause.
+
+    The position in the feed is kept in the state store, so a restarted server
+    picks up changes made while it was down. The first poll only records the
+    current position.
+
+    Args:
+        request: Coroutine function sending an uncached request to Outline
+        state: Key-value store with get and set, such as the sync state
+        on_invalidate: Called with the invalidation of each poll with changes
+        interval: Seconds between polls of the background loop
+    """
+
+    CURSOR = "events_cursor"
+
+    def __init__(
+        self,
+        request: RequestFn,
+        state: Any,
+        on_invalidate: Callable[[Invalidation], Awaitable[None]],
+        interval: float = 30.0,
+    ):
+        self.request = request
+        self.state = state
+        self.on_invalidate = on_invalidate
+        self.interval = interval
+        self.last_result: Optional[ChangeFeedResult] = None
+        self.last_error: Optional[str] = None
+        self.polls = 0
+        self.webhooks = 0
+        self._lock = asyncio.Lock()
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    @property
+    def cursor(self) -> Optional[Dict[str, Any]]:
+        """Id and createdAt of the newest processed event."""
+        value = self.state.get(self.CURSOR)
+        return jsoncodec.loads(value) if value else None
+
+    async def run_once(self) -> ChangeFeedResult:
+        """Poll the feed once and apply the invalidation of new events."""
+        async with self._lock:
+            started = time.monotonic()
+            result = ChangeFeedResult()
+            cursor = self.cursor
+
+            events = []
+            newest = None
+            reached = cursor is None
+            pages_iter = iter_pages(
+                self.request,
+                "events.list",
+                {"sort": "createdAt", "direction": "DESC"},
+                # Without a cursor only the current position is needed.
+                max_results=1 if cursor is None else MAX_CATCH_UP_EVENTS,
+                prefetch=False,
+            )
+            async with aclosing(pages_iter) as pages:
+                async for page in pages:
+                    for event in page:
+                        if newest is None:
+                            newest = event
+                        if cursor is not None and (
+                            event.get("id") == cursor["id"]
+                            or (event.get("createdAt") or "") < cursor["created_at"]
+                        ):
+                            reached = True
+                            break
+                        events.append(event)
+                    if reached and cursor is not None:
+                        break
+
+            if cursor is not None:
+                # Running out of events before the cursor means the feed was
+                # read completely; hitting the cap means changes were skipped.
+                caught_up = reached or len(events) < MAX_CATCH_UP_EVENTS
+                invalidation = invalidation_for(events)
+                invalidation.everything = not caught_up
+                result.events = len(events)
+                result.documents = len(invalidation.documents)
+                result.collections = len(invalidation.collections)
+                result.caught_up = caught_up
+                if invalidation:
+                    await self.on_invalidate(invalidation)
+
+            if newest is not None:
+                self._save_cursor(newest)
+            elif cursor is None:
+                # No events yet: everything from now on is new.
+                self.state.set(
+                    self.CURSOR, jsoncodec.dumps({"id": None, "created_at": ""})
+                )
+
+            result.duration = time.monotonic() - started
+            self.last_result = result
+            self.polls += 1
+            return result
+
+    async def receive(self, delivery: Dict[str, Any]) -> Invalidation:
+        """Apply the invalidation of a webhook delivery."""
+        invalidation = webhook_invalidation(delivery)
+        self.webhooks += 1
+        if invalidation:
+            await self.on_invalidate(invalidation)
+        return invalidation
+
+    def start(self) -> "asyncio.Task[None]":
+        """Start the background polling loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run_forever())
+        return self._task
+
+    async def stop(self) -> None:
+        """Stop the background polling loop."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "polls": self.polls,
+            "webhooks": self.webhooks,
+            "cursor": self.cursor,
+            "last_result": self.last_result.as_dict() if self.last_result else None,
+            "last_error": self.last_error,
+        }
+
+    async def _run_forever(self) -> None:
+        while True:
+            try:
+                result = await self.run_once()
+                self.last_error = None
+                if result.events:
+                    logger.info(f"Change feed applied: {result.as_dict()}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Change feed poll failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def _save_cursor(self, event: Dict[str, Any]) -> None:
+        cursor = {"id": event.get("id"), "created_at": event.get("createdAt") or ""}
+        self.state.set(self.CURSOR, jsoncodec.dumps(cursor))
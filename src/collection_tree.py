@@ -0,0 +1,268 @@
+"""
+Indexed document trees of collections.
+
+Outline returns the navigation tree of a collection (collections.documents) as
+nested nodes. The tree is flattened once into an index with constant-time
+lookups by id, title and title path, so resolving "Team/Runbooks/Deploy" to a
+document id or listing the children of a document needs no further requests.
+Trees are cached per collection and replaced when the collection's updatedAt
+changes.
+"""
+
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_MAX_TREES = 64
+
+
+def normalize_title(title: str) -> str:
+    """Normalize a title for case- and whitespace-insensitive matching."""
+    return " ".join(title.split()).casefold()
+
+
+def split_path(path: str) -> Tuple[str, ...]:
+    """Split a "/"-separated title path into normalized segments."""
+    return tuple(normalize_title(part) for part in path.split("/") if part.strip())
+
+
+@dataclass
+class TreeNode:
+    """A document in a collection tree."""
+
+    id: str
+    title: str
+    url: Optional[str]
+    parent_id: Optional[str]
+    depth: int
+    path: Tuple[str, ...]
+    children: List[str] = field(default_factory=list)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "title": self.title,
+            "url": self.url,
+            "parent_id": self.parent_id,
+            "depth": self.depth,
+            "path": "/".join(self.path),
+            "children": len(self.children),
+        }
+
+
+class CollectionTree:
+    """
+    Flattened document tree of one collection.
+
+    Args:
+        collection_id: Collection the tree belongs to
+        nodes: Navigation tree as returned by collections.documents
+        marker: Collection version the tree was fetched at (its updatedAt)
+    """
+
+    def __init__(
+        self,
+        collection_id: str,
+        nodes: List[Dict[str, Any]],
+        marker: Optional[str] = None,
+    ):
+        self.collection_id = collection_id
+        self.marker = marker
+        self.raw = nodes
+        self.roots: List[str] = []
+        self._nodes: Dict[str, TreeNode] = {}
+        self._by_path: Dict[Tuple[str, ...], List[str]] = {}
+        self._by_title: Dict[str, List[str]] = {}
+        self._add(nodes)
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def __contains__(self, document_id: str) -> bool:
+        return document_id in self._nodes
+
+    def node(self, document_id: str) -> Optional[TreeNode]:
+        return self._nodes.get(document_id)
+
+    def resolve(self, path: str) -> List[TreeNode]:
+        """
+        Find documents by title path, e.g. "Engineering/Runbooks/Deploy".
+
+        Matching ignores case and extra whitespace. A path that does not start at
+        the top of the collection matches documents whose path ends with it, so
+        a single title finds every document with that title.
+        """
+        segments = split_path(path)
+        if not segments:
+            return []
+        exact = self._by_path.get(segments)
+        if exact:
+            return [self._nodes[i] for i in exact]
+
+        matches = []
+        for document_id in self._by_title.get(segments[-1], []):
+            node = self._nodes[document_id]
+            normalized = tuple(normalize_title(t) for t in node.path)
+            if normalized[-len(segments) :] == segments:
+                matches.append(node)
+        return matches
+
+    @property
+    def depth(self) -> int:
+        """Number of levels of the tree."""
+        return max((node.depth + 1 for node in self._nodes.values()), default=0)
+
+    def pruned(self, max_depth: int) -> List[Dict[str, Any]]:
+        """
+        Return the navigation tree cut below max_depth levels.
+
+        Documents whose children were cut off keep a "more" count of them
+        instead, to be listed with subtree.
+        """
+
+        def copy(nodes: List[Dict[str, Any]], depth: int) -> List[Dict[str, Any]]:
+            result = []
+            for raw in nodes:
+                node = {k: v for k, v in raw.items() if k != "children"}
+                children = raw.get("children") or []
+                if depth + 1 < max_depth:
+                    node["children"] = copy(children, depth + 1)
+                elif children:
+                    node["children"] = []
+                    node["more"] = len(children)
+                else:
+                    node["children"] = []
+                result.append(node)
+            return result
+
+        return copy(self.raw, 0)
+
+    def ancestors(self, document_id: str) -> List[TreeNode]:
+        """Return the ancestors of a document, from the top of the collection."""
+        chain = []
+        node = self._nodes.get(document_id)
+        while node is not None and node.parent_id is not None:
+            node = self._nodes[node.parent_id]
+            chain.append(node)
+        return chain[::-1]
+
+    def subtree(
+        self, document_id: Optional[str] = None, max_depth: Optional[int] = None
+    ) -> List[TreeNode]:
+        """
+        List the descendants of a document, or the whole tree, depth first.
+
+        Args:
+            document_id: Root of the subtree (not included), or None for the
+                whole collection
+            max_depth: Levels below the root to include, or None for all
+        """
+        if document_id is None:
+            start, base = self.roots, 0
+        else:
+            root = self._nodes[document_id]
+            start, base = root.children, root.depth + 1
+
+        result: List[TreeNode] = []
+        stack = list(reversed(start))
+        while stack:
+            node = self._nodes[stack.pop()]
+            result.append(node)
+            if max_depth is None or node.depth - base + 1 < max_depth:
+                stack.extend(reversed(node.children))
+        return result
+
+    def _add(self, nodes: List[Dict[str, Any]]) -> None:
+        stack: List[Tuple[Dict[str, Any], Optional[str], Tuple[str, ...], List[str]]]
+        stack = [(raw, None, (), self.roots) for raw in reversed(nodes)]
+        while stack:
+            raw, parent_id, parent_path, siblings = stack.pop()
+            document_id = raw.get("id")
+            if not document_id or document_id in self._nodes:
+                continue
+            title = raw.get("title") or ""
+            path = parent_path + (title,)
+            node = TreeNode(
+                id=document_id,
+                title=title,
+                url=raw.get("url"),
+                parent_id=parent_id,
+                depth=len(parent_path),
+                path=path,
+            )
+            self._nodes[document_id] = node
+            siblings.append(document_id)
+            key = tuple(normalize_title(t) for t in path)
+            self._by_path.setdefault(key, []).append(document_id)
+            self._by_title.setdefault(key[-1], []).append(document_id)
+            for child in reversed(raw.get("children") or []):
+                stack.append((child, document_id, path, node.children))
+
+
+@dataclass
+class TreeCacheStats:
+    """Counters describing collection tree cache effectiveness."""
+
+    hits: int = 0
+    misses: int = 0
+    invalidations: int = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class CollectionTreeCache:
+    """LRU cache of collection trees keyed by collection id."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_TREES):
+        self.max_entries = max_entries
+        self.stats = TreeCacheStats()
+        self._trees: "OrderedDict[str, CollectionTree]" = OrderedDict()
+
+    def get(
+        self, collection_id: str, marker: Optional[str]
+    ) -> Optional[CollectionTree]:
+        """Return the cached tree if it was fetched at the given collection version."""
+        tree = self._trees.get(collection_id)
+        if tree is None or marker is None or tree.marker != marker:
+            self.stats.misses += 1
+            return None
+        self._trees.move_to_end(collection_id)
+        self.stats.hits += 1
+        return tree
+
+    def put(self, tree: CollectionTree) -> None:
+        self._trees[tree.collection_id] = tree
+        self._trees.move_to_end(tree.collection_id)
+        while len(self._trees) > self.max_entries:
+            self._trees.popitem(last=False)
+
+    def invalidate(self, collection_id: str) -> bool:
+        """Drop the tree of a collection."""
+        if self._trees.pop(collection_id, None) is None:
+            return False
+        self.stats.invalidations += 1
+        return True
+
+    def clear(self) -> None:
+        self.stats.invalidations += len(self._trees)
+        self._trees.clear()
+
+    def invalidate_documents(self, document_ids: Iterable[str]) -> int:
+        """Drop every tree containing one of the documents."""
+        ids = set(document_ids)
+        stale = [
+            collection_id
+            for collection_id, tree in self._trees.items()
+            if any(document_id in tree for document_id in ids)
+        ]
+        for collection_id in stale:
+            self.invalidate(collection_id)
+        return len(stale)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._trees),
+            "documents": sum(len(tree) for tree in self._trees.values()),
+            **self.stats.as_dict(),
+        }
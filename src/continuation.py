@@ -0,0 +1,455 @@
+"""
+Continuation cursors for list and search endpoints.
+
+Outline pages its list endpoints by offset only. Paging by offset skips or
+repeats items when documents are created, moved or deleted between two calls,
+and every call is a fresh round trip. A continuation cursor is an opaque token
+returned with a page that carries the request filters, the offset of the next
+item and a watermark: the id and sort key of the last item served.
+
+On resume the next page is requested with a few items of overlap before the
+offset. If the last served item is found in the overlap, the page continues
+right after it; otherwise items on the already served side of the watermark
+are dropped. Shifts of up to OVERLAP positions are absorbed this way.
+
+Once a listing is continued with a cursor, the page after the one served is
+prefetched into a buffer named by the next cursor while the agent reads, so the
+following calls are usually served from memory. First pages are not prefetched:
+most listings are never continued.
+"""
+
+import asyncio
+import base64
+import binascii
+import logging
+import secrets
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from . import jsoncodec
+from .pagination import MAX_PAGE_SIZE, RequestFn
+
+logger = logging.getLogger(__name__)
+
+CURSOR_VERSION = 1
+
+# Items requested before the offset of a resumed page to realign it.
+OVERLAP = 5
+
+DEFAULT_MAX_BUFFERS = 256
+DEFAULT_BUFFER_TTL = 300.0
+
+
+def _item_object(item: Dict[str, Any]) -> Dict[str, Any]:
+    """The object of an item; search results wrap it in "document"."""
+    document = item.get("document")
+    return document if isinstance(document, dict) else item
+
+
+def _item_id(item: Dict[str, Any]) -> Optional[str]:
+    return _item_object(item).get("id")
+
+
+def _item_key(item: Dict[str, Any], sort: Optional[str]) -> Optional[str]:
+    if not sort:
+        return None
+    value = _item_object(item).get(sort)
+    return None if value is None else str(value)
+
+
+@dataclass
+class Continuation:
+    """Decoded continuation cursor."""
+
+    endpoint: str
+    # Request data without the offset
+    data: Dict[str, Any]
+    # Position of the next item at the time the cursor was issued
+    offset: int
+    last_id: Optional[str] = None
+    last_key: Optional[str] = None
+    buffer_id: Optional[str] = None
+
+    def encode(self) -> str:
+        payload = {
+            "v": CURSOR_VERSION,
+            "e": self.endpoint,
+            "d": self.data,
+            "o": self.offset,
+            "k": [self.last_id, self.last_key],
+            "b": self.buffer_id,
+        }
+        raw = base64.urlsafe_b64encode(jsoncodec.dumps(payload).encode("utf-8"))
+        return raw.decode("ascii").rstrip("=")
+
+    @classmethod
+    def decode(cls, token: str, endpoint: Optional[str] = None) -> "Continuation":
+        """
+        Decode a cursor returned by encode.
+
+        Raises:
+            ValueError: If the cursor is malformed or belongs to another endpoint
+        """
+        try:
+            raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+            payload = jsoncodec.loads(raw.decode("utf-8"))
+            if payload["v"] != CURSOR_VERSION:
+                raise ValueError("Unsupported cursor version")
+            last_id, last_key = payload["k"]
+            cursor = cls(
+                endpoint=str(payload["e"]),
+                data=dict(payload["d"]),
+                offset=max(int(payload["o"]), 0),
+                last_id=last_id,
+                last_key=last_key,
+                buffer_id=payload.get("b"),
+            )
+        except (binascii.Error, KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Invalid cursor: {e}") from None
+        if endpoint is not None and cursor.endpoint != endpoint:
+            raise ValueError(f"Cursor was issued for {cursor.endpoint}, not {endpoint}")
+        return cursor
+
+
+@dataclass
+class Page:
+    """A page of raw items and the cursor of the page after it."""
+
+    items: List[Dict[str, Any]]
+    offset: int
+    limit: int
+    next_cursor: Optional[str] = None
+    buffered: bool = False
+
+
+@dataclass
+class _Buffer:
+    endpoint: str
+    data: Dict[str, Any]
+    # Position of items[0]
+    offset: int
+    expires_at: float
+    items: List[Dict[str, Any]] = field(default_factory=list)
+    exhausted: bool = False
+    task: Optional["asyncio.Task[None]"] = None
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+
+@dataclass
+class PageBufferStats:
+    """Counters describing how continued pages were served."""
+
+    hits: int = 0
+    misses: int = 0
+    resumes: int = 0
+    prefetches: int = 0
+    prefetch_errors: int = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def _resume_window(offset: int, limit: int) -> Tuple[int, int]:
+    """Start and size of the request for a resumed page."""
+    overlap = min(OVERLAP, offset, MAX_PAGE_SIZE - limit)
+    return offset - max(overlap, 0), limit + max(overlap, 0)
+
+
+def _is_served(
+    item: Dict[str, Any], cursor: Continuation, position: int, descending: bool
+) -> bool:
+    """Whether an item lies on the already served side of the watermark."""
+    key = _item_key(item, cursor.data.get("sort"))
+    if cursor.last_key is None or key is None:
+        return position < cursor.offset
+    if key == cursor.last_key:
+        return position < cursor.offset
+    return key > cursor.last_key if descending else key < cursor.last_key
+
+
+def _next_cursor(
+    cursor: Continuation,
+    last_item: Dict[str, Any],
+    next_offset: int,
+    buffer_id: Optional[str] = None,
+) -> str:
+    return Continuation(
+        endpoint=cursor.endpoint,
+        data=cursor.data,
+        offset=next_offset,
+        last_id=_item_id(last_item),
+        last_key=_item_key(last_item, cursor.data.get("sort")),
+        buffer_id=buffer_id,
+    ).encode()
+
+
+async def resume_page(
+    request: RequestFn, cursor: Continuation
+) -> Tuple[List[Dict[str, Any]], int, bool]:
+    """
+    Fetch the page after a cursor from Outline, realigned on its watermark.
+
+    Returns:
+        Tuple of the items, the position after the last returned item and
+        whether the listing ran out
+    """
+    limit = cursor.data.get("limit", MAX_PAGE_SIZE)
+    start, size = _resume_window(cursor.offset, limit)
+    response = await request(
+        cursor.endpoint, {**cursor.data, "limit": size, "offset": start}
+    )
+    window = response.get("data", [])
+    exhausted = len(window) < size
+
+    ids = [_item_id(item) for item in window]
+    if cursor.last_id is not None and cursor.last_id in ids:
+        candidates = list(range(ids.index(cursor.last_id) + 1, len(window)))
+    else:
+        # The last item is gone or moved too far: fall back on its sort key.
+        descending = str(cursor.data.get("direction", "DESC")).upper() == "DESC"
+        candidates = [
+            i
+            for i, item in enumerate(window)
+            if not _is_served(item, cursor, start + i, descending)
+        ]
+
+    picked = candidates[:limit]
+    items = [window[i] for i in picked]
+    next_offset = start + picked[-1] + 1 if picked else start + len(window)
+    return items, next_offset, exhausted
+
+
+class PageBuffers:
+    """
+    Prefetched items of continued listings, keyed by the buffer id of a cursor.
+
+    Args:
+        request: Coroutine function sending a background request to Outline
+        max_buffers: Number of listings buffered at once; the least recently
+            continued are dropped first
+        ttl: Seconds a buffer is kept after it was last used
+        prefetch: Whether to fetch ahead; without it, cursors still realign
+            resumed pages but every page is a round trip
+        clock: Time source, for tests
+    """
+
+    def __init__(
+        self,
+        request: RequestFn,
+        max_buffers: int = DEFAULT_MAX_BUFFERS,
+        ttl: float = DEFAULT_BUFFER_TTL,
+        prefetch: bool = True,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.request = request
+        self.max_buffers = max_buffers
+        self.ttl = ttl
+        self.prefetch = prefetch
+        self.clock = clock
+        self.stats = PageBufferStats()
+        self._buffers: "OrderedDict[str, _Buffer]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buffers)
+
+    async def take(self, cursor: Continuation) -> Optional[Page]:
+        """
+        Serve the page after a cursor from its buffer.
+
+        Returns:
+            The page, or None if the buffer is gone, failed or does not hold a
+            full page yet
+        """
+        buffer = self._buffers.get(cursor.buffer_id or "")
+        if (
+            buffer is None
+            or buffer.endpoint != cursor.endpoint
+            or buffer.offset != cursor.offset
+            or buffer.expires_at <= self.clock()
+        ):
+            self._drop_expired()
+            self.stats.misses += 1
+            return None
+
+        limit = cursor.data.get("limit", MAX_PAGE_SIZE)
+        async with buffer.lock:
+            task = buffer.task
+            if task is not None:
+                try:
+                    await asyncio.shield(task)
+                except asyncio.CancelledError:
+                    # Only a cancelled prefetch is a miss, not a cancelled call.
+                    if not task.cancelled():
+                        raise
+            if (
+                buffer.offset != cursor.offset
+                or self._buffers.get(cursor.buffer_id) is not buffer
+                or (len(buffer.items) < limit and not buffer.exhausted)
+            ):
+                self.stats.misses += 1
+                return None
+
+            items = buffer.items[:limit]
+            del buffer.items[:limit]
+            buffer.offset += len(items)
+            self.stats.hits += 1
+            page = Page(items, cursor.offset, limit, buffered=True)
+            if items and (buffer.items or not buffer.exhausted):
+                page.next_cursor = _next_cursor(
+                    cursor, items[-1], buffer.offset, cursor.buffer_id
+                )
+                self._fill(cursor.buffer_id, buffer, limit)
+            else:
+                self.discard(cursor.buffer_id)
+            return page
+
+    def track(
+        self,
+        cursor: Continuation,
+        last_item: Dict[str, Any],
+        next_offset: int,
+    ) -> str:
+        """
+        Issue the cursor for the page after a continued page fetched from Outline.
+
+        Starts a buffer at next_offset and prefetches the next page into it.
+        """
+        buffer_id = None
+        if self.prefetch:
+            buffer_id = cursor.buffer_id or secrets.token_urlsafe(9)
+            self.discard(buffer_id)
+            buffer = _Buffer(
+                endpoint=cursor.endpoint,
+                data=cursor.data,
+                offset=next_offset,
+                expires_at=self.clock() + self.ttl,
+            )
+            self._buffers[buffer_id] = buffer
+            while len(self._buffers) > self.max_buffers:
+                _, evicted = self._buffers.popitem(last=False)
+                self._cancel(evicted)
+            self._fill(buffer_id, buffer, cursor.data.get("limit", MAX_PAGE_SIZE))
+        return _next_cursor(cursor, last_item, next_offset, buffer_id)
+
+    def discard(self, buffer_id: Optional[str]) -> None:
+        buffer = self._buffers.pop(buffer_id or "", None)
+        if buffer is not None:
+            self._cancel(buffer)
+
+    def clear(self) -> None:
+        """Drop every buffer, e.g. after changes in Outline."""
+        for buffer in self._buffers.values():
+            self._cancel(buffer)
+        self._buffers.clear()
+
+    def close(self) -> None:
+        self.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "prefetch": self.prefetch,
+            "buffers": len(self._buffers),
+            "buffered_items": sum(len(b.items) for b in self._buffers.values()),
+            **self.stats.as_dict(),
+        }
+
+    def _fill(self, buffer_id: str, buffer: _Buffer, limit: int) -> None:
+        """Prefetch the next page unless the buffer holds a full page already."""
+        buffer.expires_at = self.clock() + self.ttl
+        self._buffers.move_to_end(buffer_id)
+        if not self.prefetch or buffer.exhausted or len(buffer.items) >= limit:
+            buffer.task = None
+            return
+
+        async def fetch() -> None:
+            start = buffer.offset + len(buffer.items)
+            try:
+                response = await self.request(
+                    buffer.endpoint, {**buffer.data, "limit": limit, "offset": start}
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # The next call resumes from Outline instead.
+                self.stats.prefetch_errors += 1
+                logger.debug(f"Prefetch of {buffer.endpoint} failed: {e}")
+                buffer.task = None
+                if self._buffers.get(buffer_id) is buffer:
+                    del self._buffers[buffer_id]
+                return
+            items = response.get("data", [])
+            buffer.items.extend(items)
+            buffer.exhausted = len(items) < limit
+            buffer.task = None
+
+        self.stats.prefetches += 1
+        buffer.task = asyncio.create_task(fetch())
+
+    def _cancel(self, buffer: _Buffer) -> None:
+        if buffer.task is not None and not buffer.task.done():
+            buffer.task.cancel()
+
+    def _drop_expired(self) -> None:
+        now = self.clock()
+        for buffer_id in [
+            key for key, buffer in self._buffers.items() if buffer.expires_at <= now
+        ]:
+            self.discard(buffer_id)
+
+
+async def fetch_page(
+    request: RequestFn,
+    endpoint: str,
+    data: Dict[str, Any],
+    cursor: Optional[str] = None,
+    buffers: Optional[PageBuffers] = None,
+) -> Page:
+    """
+    Fetch one page of a list or search endpoint, starting at a cursor if given.
+
+    Args:
+        request: Coroutine function sending a request to Outline
+        endpoint: Paginated API endpoint
+        data: Request data of the first page, with limit and offset; ignored
+            when continuing from a cursor
+        cursor: next_cursor of the previous page
+        buffers: Prefetch buffers for pages after a continued page; without
+            them pages are always fetched
+
+    Returns:
+        The page with the cursor of the page after it, or no cursor if the
+        listing ran out
+
+    Raises:
+        ValueError: If the cursor is invalid or was issued for another endpoint
+    """
+    if cursor is not None:
+        continuation = Continuation.decode(cursor, endpoint)
+        if buffers is not None:
+            page = await buffers.take(continuation)
+            if page is not None:
+                return page
+            buffers.stats.resumes += 1
+        items, next_offset, exhausted = await resume_page(request, continuation)
+        offset = continuation.offset
+    else:
+        offset = data.get("offset", 0)
+        continuation = Continuation(
+            endpoint=endpoint,
+            data={k: v for k, v in data.items() if k != "offset"},
+            offset=offset,
+        )
+        response = await request(endpoint, data)
+        items = response.get("data", [])
+        next_offset = offset + len(items)
+        exhausted = len(items) < data.get("limit", MAX_PAGE_SIZE)
+
+    page = Page(items, offset, continuation.data.get("limit", MAX_PAGE_SIZE))
+    if items and not exhausted:
+        if buffers is not None and cursor is not None:
+            page.next_cursor = buffers.track(continuation, items[-1], next_offset)
+        else:
+            page.next_cursor = _next_cursor(continuation, items[-1], next_offset)
+    return page
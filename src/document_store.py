@@ -0,0 +1,330 @@
+"""
+Persistent on-disk store of Outline document bodies.
+
+Responses of documents.info and documents.export are kept in SQLite keyed on the
+endpoint and document id, so a restarted server can answer document reads
+without calling Outline. Bodies are content-addressed by their SHA-256 hash (the
+same Markdown returned by both endpoints is stored once) and compressed with
+zstd when the optional zstandard package is installed, zlib otherwise. Large
+compressed bodies live in separate blob files that are memory-mapped on read
+instead of being loaded into the SQLite page cache.
+"""
+
+import hashlib
+import mmap
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from . import jsoncodec
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - depends on the environment
+    zstandard = None
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    url_id TEXT,
+    marker TEXT,
+    metadata TEXT,
+    body_hash TEXT NOT NULL,
+    stored_at REAL NOT NULL,
+    PRIMARY KEY (id, endpoint)
+);
+CREATE INDEX IF NOT EXISTS entries_url_id ON entries (url_id);
+CREATE INDEX IF NOT EXISTS entries_body_hash ON entries (body_hash);
+CREATE TABLE IF NOT EXISTS bodies (
+    hash TEXT PRIMARY KEY,
+    codec TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    stored_size INTEGER NOT NULL,
+    data BLOB,
+    path TEXT
+);
+"""
+
+# Compressed bodies at least this large are written to memory-mapped blob files.
+DEFAULT_MMAP_THRESHOLD = 64 * 1024
+
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def default_codec() -> str:
+    """Return the best compression codec available."""
+    return "zstd" if zstandard is not None else "zlib"
+
+
+def compress(body: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd compression requires the zstandard package")
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+    if codec == "zlib":
+        return zlib.compress(body, ZLIB_LEVEL)
+    if codec == "raw":
+        return body
+    raise ValueError(f"Unknown codec: {codec}")
+
+
+def decompress(data: Any, codec: str, size: int) -> bytes:
+    """Decompress a bytes-like object (bytes or a memory map)."""
+    if codec == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd compression requires the zstandard package")
+        return zstandard.ZstdDecompressor().decompress(data, max_output_size=size)
+    if codec == "zlib":
+        return zlib.decompress(data, bufsize=max(size, 1))
+    if codec == "raw":
+        return bytes(data)
+    raise ValueError(f"Unknown codec: {codec}")
+
+
+@dataclass
+class StoredDocument:
+    """A document response read back from the store."""
+
+    id: str
+    endpoint: str
+    metadata: Optional[Dict[str, Any]]
+    body: str
+    marker: Optional[str]
+    stored_at: float
+
+    def age(self, now: float) -> float:
+        return max(0.0, now - self.stored_at)
+
+    def response(self) -> Dict[str, Any]:
+        """Rebuild the Outline response the entry was stored from."""
+        if self.endpoint == "documents.export":
+            return {"ok": True, "data": self.body}
+        return {"ok": True, "data": {**(self.metadata or {}), "text": self.body}}
+
+
+class DocumentStore:
+    """
+    SQLite-backed store of document responses with deduplicated bodies.
+
+    Args:
+        path: Directory holding the database and blob files
+        codec: Compression codec ("zstd", "zlib" or "raw"); defaults to the best
+            one available
+        mmap_threshold: Compressed size in bytes from which bodies are written to
+            blob files and memory-mapped on read
+        clock: Wall-clock time source, overridable for tests
+    """
+
+    def __init__(
+        self,
+        path: str,
+        codec: Optional[str] = None,
+        mmap_threshold: int = DEFAULT_MMAP_THRESHOLD,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.path = Path(path)
+        self.blob_dir = self.path / "blobs"
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        self.codec = codec or default_codec()
+        self.mmap_threshold = mmap_threshold
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            str(self.path / "documents.sqlite"), check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT count(*) FROM entries").fetchone()[0]
+
+    def get(self, endpoint: str, document_id: str) -> Optional[StoredDocument]:
+        """Return the stored response of an endpoint for a document id or urlId."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT e.id, e.marker, e.metadata, e.stored_at, "
+                "b.codec, b.size, b.data, b.path "
+                "FROM entries e JOIN bodies b ON b.hash = e.body_hash "
+                "WHERE e.endpoint = ? AND (e.id = ? OR e.url_id = ?)",
+                (endpoint, document_id, document_id),
+            ).fetchone()
+        if row is None:
+            return None
+
+        doc_id, marker, metadata, stored_at, codec, size, data, blob = row
+        try:
+            if blob is not None:
+                body = self._read_blob(blob, codec, size)
+            else:
+                body = decompress(data, codec, size)
+        except (OSError, ValueError, zlib.error):
+            # A missing blob file or an unavailable codec is treated as a miss.
+            return None
+
+        return StoredDocument(
+            id=doc_id,
+            endpoint=endpoint,
+            metadata=jsoncodec.loads(metadata) if metadata else None,
+            body=body.decode("utf-8"),
+            marker=marker,
+            stored_at=stored_at,
+        )
+
+    def put(
+        self,
+        endpoint: str,
+        document_id: str,
+        body: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        marker: Optional[str] = None,
+    ) -> None:
+        """
+        Store a document response.
+
+        Args:
+            endpoint: Endpoint the response came from
+            document_id: Document id, or the id the document was requested by
+            body: Markdown body of the document
+            metadata: Document payload without its text, if any
+            marker: Revision marker of the stored body, if known
+        """
+        raw = body.encode("utf-8")
+        body_hash = hashlib.sha256(raw).hexdigest()
+        url_id = (metadata or {}).get("urlId")
+        encoded = jsoncodec.dumps(metadata) if metadata else None
+
+        # Compress new bodies before taking the lock.
+        compressed = None
+        if not self._has_body(body_hash):
+            compressed = self._compress_body(raw)
+
+        # The body and the entry referring to it are written in one transaction,
+        # so a concurrent release of the same body cannot slip in between.
+        with self._lock, self._conn:
+            known = self._conn.execute(
+                "SELECT 1 FROM bodies WHERE hash = ?", (body_hash,)
+            ).fetchone()
+            if known is None:
+                self._insert_body(
+                    body_hash, raw, *(compressed or self._compress_body(raw))
+                )
+            previous = self._conn.execute(
+                "SELECT body_hash FROM entries WHERE id = ? AND endpoint = ?",
+                (document_id, endpoint),
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries "
+                "(id, endpoint, url_id, marker, metadata, body_hash, stored_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    document_id,
+                    endpoint,
+                    url_id,
+                    marker,
+                    encoded,
+                    body_hash,
+                    self._clock(),
+                ),
+            )
+            if previous is not None and previous[0] != body_hash:
+                self._release_body(previous[0])
+
+    def remove(self, document_id: str) -> int:
+        """Drop every stored response of a document. Returns the number dropped."""
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                "SELECT id, endpoint, body_hash FROM entries "
+                "WHERE id = ? OR url_id = ?",
+                (document_id, document_id),
+            ).fetchall()
+            for doc_id, endpoint, body_hash in rows:
+                self._conn.execute(
+                    "DELETE FROM entries WHERE id = ? AND endpoint = ?",
+                    (doc_id, endpoint),
+                )
+                self._release_body(body_hash)
+        return len(rows)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return occupancy counters for reporting."""
+        with self._lock:
+            entries = self._conn.execute("SELECT count(*) FROM entries").fetchone()[0]
+            bodies, size, stored_size, blobs = self._conn.execute(
+                "SELECT count(*), coalesce(sum(size), 0), "
+                "coalesce(sum(stored_size), 0), count(path) FROM bodies"
+            ).fetchone()
+        return {
+            "codec": self.codec,
+            "entries": entries,
+            "bodies": bodies,
+            "blobs": blobs,
+            "bytes": size,
+            "stored_bytes": stored_size,
+        }
+
+    def _has_body(self, body_hash: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM bodies WHERE hash = ?", (body_hash,)
+            ).fetchone()
+        return row is not None
+
+    def _compress_body(self, raw: bytes) -> Tuple[str, bytes]:
+        """Return the codec and data a body is stored with."""
+        data = compress(raw, self.codec)
+        if len(data) >= len(raw):
+            return "raw", raw
+        return self.codec, data
+
+    def _insert_body(self, body_hash: str, raw: bytes, codec: str, data: bytes) -> None:
+        """Write a compressed body. Must be called under the lock."""
+        blob = None
+        if raw and len(data) >= self.mmap_threshold:
+            blob = f"{body_hash[:2]}/{body_hash}"
+            target = self.blob_dir / blob
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp = target.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, target)
+
+        self._conn.execute(
+            "INSERT OR REPLACE INTO bodies "
+            "(hash, codec, size, stored_size, data, path) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (body_hash, codec, len(raw), len(data), None if blob else data, blob),
+        )
+
+    def _read_blob(self, blob: str, codec: str, size: int) -> bytes:
+        with open(self.blob_dir / blob, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return decompress(mapped, codec, size)
+
+    def _release_body(self, body_hash: str) -> None:
+        """Delete a body no entry refers to. Must be called under the lock."""
+        used = self._conn.execute(
+            "SELECT 1 FROM entries WHERE body_hash = ? LIMIT 1", (body_hash,)
+        ).fetchone()
+        if used is not None:
+            return
+        row = self._conn.execute(
+            "SELECT path FROM bodies WHERE hash = ?", (body_hash,)
+        ).fetchone()
+        self._conn.execute("DELETE FROM bodies WHERE hash = ?", (body_hash,))
+        if row is not None and row[0]:
+            try:
+                os.unlink(self.blob_dir / row[0])
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,503 @@
+"""
+Bulk export of collections to local Markdown files.
+
+A collection is exported by walking its document tree and downloading documents
+with documents.export, a bounded number at a time. Each body is written to the
+target as soon as it arrives, so memory use does not grow with the size of the
+collection. The target is a directory or a tar or zip archive; documents are
+laid out by title path ("Engineering/Runbooks/Deploy.md").
+
+A manifest of the exported id, revision and path of every document is kept next
+to the target. Re-running an export only downloads documents whose revision
+changed; unchanged files are kept (or, for archives, copied from the previous
+archive) and files of removed documents are deleted.
+"""
+
+import asyncio
+import os
+import re
+import shutil
+import tarfile
+import time
+import zipfile
+from abc import ABC, abstractmethod
+from contextlib import aclosing
+from dataclasses import asdict, dataclass, field
+from io import BytesIO
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Protocol, Tuple
+
+from . import jsoncodec
+from .collection_tree import CollectionTree
+from .pagination import RequestFn, iter_pages
+
+MANIFEST_VERSION = 1
+DIRECTORY_MANIFEST = ".outline-export.json"
+
+# Longest file name segment derived from a title, in characters.
+MAX_SEGMENT_LENGTH = 100
+
+_UNSAFE_CHARACTERS = re.compile(r'[\x00-\x1f<>:"/\\|?*]+')
+
+
+def export_kind(destination: str) -> str:
+    """Return "zip", "tar" or "directory" depending on the destination name."""
+    name = destination.lower()
+    if name.endswith(".zip"):
+        return "zip"
+    if name.endswith((".tar", ".tar.gz", ".tgz")):
+        return "tar"
+    return "directory"
+
+
+def safe_segment(title: str) -> str:
+    """Turn a document title into a portable file name segment."""
+    segment = _UNSAFE_CHARACTERS.sub("-", title).strip().strip(".")
+    return segment[:MAX_SEGMENT_LENGTH].strip() or "Untitled"
+
+
+def document_paths(tree: CollectionTree) -> Dict[str, str]:
+    """
+    Assign every document of a tree a relative Markdown path.
+
+    Children live in a directory named like their parent's file. Siblings with
+    the same title are told apart by a suffix of their id.
+    """
+    paths: Dict[str, str] = {}
+    directories: Dict[Optional[str], str] = {None: ""}
+    taken: Dict[str, set] = {}
+    for node in tree.subtree():
+        parent = directories[node.parent_id]
+        siblings = taken.setdefault(parent, set())
+        segment = safe_segment(node.title)
+        if segment.casefold() in siblings:
+            segment = f"{segment} ({node.id[:8]})"
+        siblings.add(segment.casefold())
+        directories[node.id] = f"{parent}{segment}/"
+        paths[node.id] = f"{parent}{segment}.md"
+    return paths
+
+
+class ExportManifest:
+    """
+    Exported revision and path of every document of a target.
+
+    Args:
+        path: JSON file the manifest is stored in
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.collection_id: Optional[str] = None
+        self.documents: Dict[str, Dict[str, Any]] = {}
+        try:
+            with open(path, "rb") as f:
+                data = jsoncodec.loads(f.read())
+        except (OSError, ValueError):
+            return
+        if data.get("version") == MANIFEST_VERSION:
+            self.collection_id = data.get("collection_id")
+            self.documents = data.get("documents") or {}
+
+    def unchanged(self, document_id: str, revision: Any, path: str) -> bool:
+        """Whether a document was exported at this revision to the same path."""
+        entry = self.documents.get(document_id)
+        return (
+            entry is not None
+            and revision is not None
+            and entry.get("revision") == revision
+            and entry.get("path") == path
+        )
+
+    def record(self, document_id: str, revision: Any, path: str) -> None:
+        self.documents[document_id] = {"revision": revision, "path": path}
+
+    def forget(self, document_id: str) -> None:
+        self.documents.pop(document_id, None)
+
+    def save(self) -> None:
+        """Write the manifest atomically."""
+        data = {
+            "version": MANIFEST_VERSION,
+            "collection_id": self.collection_id,
+            "exported_at": time.time(),
+            "documents": self.documents,
+        }
+        partial = f"{self.path}.partial"
+        with open(partial, "w", encoding="utf-8") as f:
+            f.write(jsoncodec.dumps(data, sort_keys=True))
+        os.replace(partial, self.path)
+
+
+class ExportWriter(Protocol):
+    """Target an export writes documents to, replaced as a whole on commit."""
+
+    kind: str
+    manifest_path: str
+
+    def keep(self, path: str) -> bool:
+        """Keep the file of an unchanged document. Returns False if it is missing."""
+        ...
+
+    def write(self, path: str, text: str) -> int:
+        """Write a document and return the number of bytes written."""
+        ...
+
+    def remove(self, path: str) -> None: ...
+
+    def commit(self) -> None: ...
+
+    def abort(self) -> None: ...
+
+
+class DirectoryWriter:
+    """Write documents as files below a directory."""
+
+    kind = "directory"
+
+    def __init__(self, root: str):
+        self.root = root
+        self.manifest_path = os.path.join(root, DIRECTORY_MANIFEST)
+        Path(root).mkdir(parents=True, exist_ok=True)
+
+    def keep(self, path: str) -> bool:
+        """Keep the file of an unchanged document. Returns False if it is missing."""
+        return os.path.isfile(self._full_path(path))
+
+    def write(self, path: str, text: str) -> int:
+        data = text.encode("utf-8")
+        full_path = self._full_path(path)
+        Path(full_path).parent.mkdir(parents=True, exist_ok=True)
+        partial = f"{full_path}.partial"
+        with open(partial, "wb") as f:
+            f.write(data)
+        os.replace(partial, full_path)
+        return len(data)
+
+    def remove(self, path: str) -> None:
+        full_path = self._full_path(path)
+        try:
+            os.remove(full_path)
+        except FileNotFoundError:
+            return
+        # Drop directories left empty by the removal.
+        parent = Path(full_path).parent
+        root = Path(self.root)
+        while parent != root and not any(parent.iterdir()):
+            parent.rmdir()
+            parent = parent.parent
+
+    def commit(self) -> None:
+        pass
+
+    def abort(self) -> None:
+        pass
+
+    def _full_path(self, path: str) -> str:
+        return os.path.join(self.root, *path.split("/"))
+
+
+class ArchiveWriter(ABC):
+    """
+    Base class of writers building a new archive next to the previous one.
+
+    Unchanged documents are copied from the previous archive entry by entry. The
+    new archive replaces the previous one on commit, so an interrupted export
+    leaves the previous archive intact.
+    """
+
+    kind = "archive"
+
+    def __init__(self, target: str):
+        self.target = target
+        self.manifest_path = f"{target}.manifest.json"
+        self.partial = f"{target}.partial"
+        Path(target).parent.mkdir(parents=True, exist_ok=True)
+        self._previous = self._open_previous() if os.path.isfile(target) else None
+        self._archive = self._open_partial()
+
+    def remove(self, path: str) -> None:  # noqa: B027
+        # Entries are only copied on request, so removed documents are dropped.
+        pass
+
+    def commit(self) -> None:
+        self._close()
+        os.replace(self.partial, self.target)
+
+    def abort(self) -> None:
+        self._close()
+        try:
+            os.remove(self.partial)
+        except FileNotFoundError:
+            pass
+
+    def _close(self) -> None:
+        self._archive.close()
+        if self._previous is not None:
+            self._previous.close()
+
+    @abstractmethod
+    def keep(self, path: str) -> bool:
+        """Copy the entry of an unchanged document from the previous archive."""
+
+    @abstractmethod
+    def write(self, path: str, text: str) -> int:
+        """Add a document to the new archive and return its size in bytes."""
+
+    @abstractmethod
+    def _open_previous(self) -> Any:
+        """Open the previous archive for reading."""
+
+    @abstractmethod
+    def _open_partial(self) -> Any:
+        """Open the new archive for writing."""
+
+
+class TarWriter(ArchiveWriter):
+    """Write documents into a tar archive, gzip-compressed for .tar.gz and .tgz."""
+
+    kind = "tar"
+
+    def __init__(self, target: str):
+        self._members: Dict[str, tarfile.TarInfo] = {}
+        super().__init__(target)
+
+    def keep(self, path: str) -> bool:
+        member = self._members.get(path)
+        if member is None:
+            return False
+        source = self._previous.extractfile(member)
+        if source is None:
+            return False
+        with source:
+            self._archive.addfile(member, source)
+        return True
+
+    def write(self, path: str, text: str) -> int:
+        data = text.encode("utf-8")
+        info = tarfile.TarInfo(path)
+        info.size = len(data)
+        info.mtime = int(time.time())
+        info.mode = 0o644
+        self._archive.addfile(info, BytesIO(data))
+        return len(data)
+
+    def _open_previous(self) -> tarfile.TarFile:
+        previous = tarfile.open(self.target, "r:*")
+        self._members = {m.name: m for m in previous.getmembers() if m.isfile()}
+        return previous
+
+    def _open_partial(self) -> tarfile.TarFile:
+        compressed = self.target.lower().endswith((".tar.gz", ".tgz"))
+        return tarfile.open(self.partial, "w:gz" if compressed else "w")
+
+
+class ZipWriter(ArchiveWriter):
+    """Write documents into a deflate-compressed zip archive."""
+
+    kind = "zip"
+
+    def keep(self, path: str) -> bool:
+        if self._previous is None:
+            return False
+        try:
+            info = self._previous.getinfo(path)
+        except KeyError:
+            return False
+        with self._previous.open(info) as source:
+            with self._archive.open(info, "w") as target:
+                shutil.copyfileobj(source, target)
+        return True
+
+    def write(self, path: str, text: str) -> int:
+        data = text.encode("utf-8")
+        self._archive.writestr(path, data)
+        return len(data)
+
+    def _open_previous(self) -> zipfile.ZipFile:
+        return zipfile.ZipFile(self.target)
+
+    def _open_partial(self) -> zipfile.ZipFile:
+        return zipfile.ZipFile(self.partial, "w", compression=zipfile.ZIP_DEFLATED)
+
+
+def open_writer(destination: str) -> ExportWriter:
+    """Open the writer matching the destination name (see export_kind)."""
+    kind = export_kind(destination)
+    if kind == "zip":
+        return ZipWriter(destination)
+    if kind == "tar":
+        return TarWriter(destination)
+    return DirectoryWriter(destination)
+
+
+@dataclass
+class ExportResult:
+    """Outcome of a collection export."""
+
+    destination: str
+    kind: str
+    documents: int = 0
+    fetched: int = 0
+    unchanged: int = 0
+    removed: int = 0
+    bytes_written: int = 0
+    failed: Dict[str, str] = field(default_factory=dict)
+    duration: float = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        result: Dict[str, Any] = asdict(self)
+        result["duration"] = round(self.duration, 3)
+        return result
+
+
+class CollectionExporter:
+    """
+    Export the documents of a collection tree to a directory or archive.
+
+    Args:
+        request: Coroutine function sending an uncached request to Outline
+        max_concurrency: Maximum number of concurrent export requests
+        checkpoint_every: Save the manifest of a directory export after this
+            many written documents, so an interrupted export resumes
+    """
+
+    def __init__(
+        self,
+        request: RequestFn,
+        max_concurrency: int = 8,
+        checkpoint_every: int = 50,
+    ):
+        self.request = request
+        self.max_concurrency = max(1, max_concurrency)
+        self.checkpoint_every = max(1, checkpoint_every)
+
+    async def export(
+        self, tree: CollectionTree, destination: str, full: bool = False
+    ) -> ExportResult:
+        """
+        Export every document of a tree.
+
+        Args:
+            tree: Document tree of the collection
+            destination: Directory, or archive path ending in .zip, .tar,
+                .tar.gz or .tgz
+            full: Download every document even if its revision is unchanged
+
+        Returns:
+            Counters describing the export; documents that failed to download
+            are listed with their error and retried by the next export
+        """
+        started = time.monotonic()
+        writer = await asyncio.to_thread(open_writer, destination)
+        result = ExportResult(destination=destination, kind=writer.kind)
+        try:
+            await self._export(tree, writer, result, full)
+        except BaseException:
+            await asyncio.to_thread(writer.abort)
+            raise
+        result.duration = time.monotonic() - started
+        return result
+
+    async def _export(
+        self,
+        tree: CollectionTree,
+        writer: ExportWriter,
+        result: ExportResult,
+        full: bool,
+    ) -> None:
+        manifest = ExportManifest(writer.manifest_path)
+        if manifest.collection_id not in (None, tree.collection_id):
+            raise ValueError(
+                f"{result.destination} holds an export of collection "
+                f"{manifest.collection_id}, not {tree.collection_id}"
+            )
+        manifest.collection_id = tree.collection_id
+
+        paths = document_paths(tree)
+        revisions = await self._revisions(tree.collection_id)
+        result.documents = len(paths)
+
+        pending: List[Tuple[str, str]] = []
+        for document_id, path in paths.items():
+            revision = revisions.get(document_id)
+            if not full and manifest.unchanged(document_id, revision, path):
+                if await asyncio.to_thread(writer.keep, path):
+                    result.unchanged += 1
+                    continue
+            pending.append((document_id, path))
+
+        for document_id in [i for i in manifest.documents if i not in paths]:
+            await asyncio.to_thread(
+                writer.remove, manifest.documents[document_id]["path"]
+            )
+            manifest.forget(document_id)
+            result.removed += 1
+
+        await self._download(pending, revisions, writer, manifest, result)
+
+        await asyncio.to_thread(writer.commit)
+        await asyncio.to_thread(manifest.save)
+
+    async def _revisions(self, collection_id: str) -> Dict[str, Any]:
+        """List the current revision of every document of the collection."""
+        revisions: Dict[str, Any] = {}
+        pages_iter = iter_pages(
+            self.request, "documents.list", {"collectionId": collection_id}
+        )
+        async with aclosing(pages_iter) as pages:
+            async for page in pages:
+                for doc in page:
+                    revisions[doc["id"]] = doc.get("revision")
+        return revisions
+
+    async def _download(
+        self,
+        pending: List[Tuple[str, str]],
+        revisions: Dict[str, Any],
+        writer: ExportWriter,
+        manifest: ExportManifest,
+        result: ExportResult,
+    ) -> None:
+        """Download documents with bounded concurrency, writing each on arrival."""
+        queue = iter(pending)
+        taken = {path for _, path in pending}
+        # Archives are written sequentially; the lock also orders checkpoints.
+        write_lock = asyncio.Lock()
+
+        async def worker() -> None:
+            for document_id, path in queue:
+                previous = manifest.documents.get(document_id, {}).get("path")
+                try:
+                    response = await self.request(
+                        "documents.export", {"id": document_id}
+                    )
+                except Exception as e:
+                    result.failed[document_id] = str(e)
+                    async with write_lock:
+                        # Keep the last exported version; a missing revision
+                        # makes the next export retry the download.
+                        if previous is not None and await asyncio.to_thread(
+                            writer.keep, previous
+                        ):
+                            manifest.record(document_id, None, previous)
+                        else:
+                            manifest.forget(document_id)
+                    continue
+                text = response.get("data") or ""
+                async with write_lock:
+                    if previous not in (None, path) and previous not in taken:
+                        await asyncio.to_thread(writer.remove, previous)
+                    result.bytes_written += await asyncio.to_thread(
+                        writer.write, path, text
+                    )
+                    manifest.record(document_id, revisions.get(document_id), path)
+                    result.fetched += 1
+                    if (
+                        isinstance(writer, DirectoryWriter)
+                        and result.fetched % self.checkpoint_every == 0
+                    ):
+                        await asyncio.to_thread(manifest.save)
+
+        workers = min(self.max_concurrency, len(pending))
+        await asyncio.gather(*(worker() for _ in range(workers)))
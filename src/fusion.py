@@ -0,0 +1,99 @@
+"""
+Merging of search results across several queries.
+
+Agents often search for several phrasings of one question. Reciprocal-rank
+fusion combines the ranked result lists into one: a document scores
+1 / (k + rank) for every list it appears in, so documents found by several
+queries rise to the top without comparing Outline's rankings across queries,
+which are not on a common scale. Snippets of a document found by several
+queries are deduplicated.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Sequence
+
+# Damping constant from Cormack et al. (2009); larger values flatten the
+# advantage of top ranks.
+DEFAULT_RRF_K = 60
+
+_TAGS = re.compile(r"<[^>]+>")
+
+
+def normalize_snippet(snippet: str) -> str:
+    """Strip highlight markup and whitespace differences from a snippet."""
+    return " ".join(_TAGS.sub("", snippet).split()).casefold()
+
+
+def dedupe_snippets(snippets: Sequence[str]) -> List[str]:
+    """
+    Drop empty snippets and snippets repeating another one.
+
+    A snippet repeats another if its text, ignoring highlighting, case and
+    whitespace, equals or is contained in the other's. The first of equal
+    snippets is kept.
+    """
+    kept: List[str] = []
+    normalized: List[str] = []
+    for snippet in snippets:
+        text = normalize_snippet(snippet)
+        if not text or any(text in other for other in normalized):
+            continue
+        # A longer snippet replaces the ones it contains.
+        covered = [i for i, other in enumerate(normalized) if other in text]
+        for i in reversed(covered):
+            del kept[i], normalized[i]
+        kept.append(snippet)
+        normalized.append(text)
+    return kept
+
+
+@dataclass
+class FusedResult:
+    """A document found by one or more queries."""
+
+    result: Dict[str, Any]
+    score: float = 0.0
+    queries: List[int] = field(default_factory=list)
+    snippets: List[str] = field(default_factory=list)
+    best_rank: int = 0
+
+
+def reciprocal_rank_fusion(
+    result_lists: Sequence[List[Dict[str, Any]]], k: int = DEFAULT_RRF_K
+) -> List[FusedResult]:
+    """
+    Merge documents.search result lists by document id.
+
+    Each list is ordered by Outline's ranking (highest first) before ranks are
+    assigned. The result kept for a document is the one where it ranked best.
+
+    Args:
+        result_lists: documents.search results of each query
+        k: Damping constant of the fusion
+
+    Returns:
+        Documents ordered by fused score, ties broken by best rank
+    """
+    fused: Dict[str, FusedResult] = {}
+    for query_index, results in enumerate(result_lists):
+        ranked = sorted(results, key=lambda r: -(r.get("ranking") or 0))
+        for rank, result in enumerate(ranked, start=1):
+            document_id = (result.get("document") or {}).get("id")
+            if not document_id:
+                continue
+            entry = fused.get(document_id)
+            if entry is None:
+                entry = fused[document_id] = FusedResult(result, best_rank=rank)
+            elif query_index in entry.queries:
+                continue
+            elif rank < entry.best_rank:
+                entry.result, entry.best_rank = result, rank
+            entry.score += 1.0 / (k + rank)
+            entry.queries.append(query_index)
+            entry.snippets.append(result.get("context") or "")
+
+    merged = sorted(fused.values(), key=lambda e: (-e.score, e.best_rank))
+    for entry in merged:
+        entry.snippets = dedupe_snippets(entry.snippets)
+    return merged
@@ -0,0 +1,186 @@
+"""
+JSON encoding and decoding for Outline responses, cache keys and tool results.
+
+Uses the fastest available backend: orjson or msgspec when installed, otherwise
+the standard library. All backends produce the same text for the same value:
+UTF-8 without ASCII escaping, compact separators unless indented. Values a fast
+backend cannot encode (such as integers beyond 64 bits) fall back to the
+standard library.
+"""
+
+import json
+import logging
+from typing import Any, Callable, Dict, List, Optional, Type, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # pragma: no cover - depends on the environment
+    msgspec = None
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("orjson", "msgspec", "json")
+
+
+class JSONCodec:
+    """Standard library backend; base class of the fast backends."""
+
+    name = "json"
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        return json.loads(data)
+
+    def dumps(
+        self,
+        value: Any,
+        indent: bool = False,
+        sort_keys: bool = False,
+        default: Optional[Callable[[Any], Any]] = None,
+    ) -> str:
+        """
+        Encode a value as JSON text.
+
+        Args:
+            value: JSON-serializable value
+            indent: Indent nested values by two spaces
+            sort_keys: Sort object keys
+            default: Converts values that are not serializable otherwise
+        """
+        return json.dumps(
+            value,
+            indent=2 if indent else None,
+            separators=None if indent else (",", ":"),
+            ensure_ascii=False,
+            sort_keys=sort_keys,
+            default=default,
+        )
+
+
+class OrjsonCodec(JSONCodec):
+    name = "orjson"
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        return orjson.loads(data)
+
+    def dumps(
+        self,
+        value: Any,
+        indent: bool = False,
+        sort_keys: bool = False,
+        default: Optional[Callable[[Any], Any]] = None,
+    ) -> str:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        try:
+            return orjson.dumps(value, default=default, option=option).decode()
+        except TypeError:
+            return super().dumps(value, indent, sort_keys, default)
+
+
+class MsgspecCodec(JSONCodec):
+    name = "msgspec"
+
+    def __init__(self) -> None:
+        self._decoder = msgspec.json.Decoder()
+        self._encoder = msgspec.json.Encoder()
+        self._sorted_encoder = msgspec.json.Encoder(order="sorted")
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        return self._decoder.decode(data)
+
+    def dumps(
+        self,
+        value: Any,
+        indent: bool = False,
+        sort_keys: bool = False,
+        default: Optional[Callable[[Any], Any]] = None,
+    ) -> str:
+        try:
+            if default is not None:
+                encoded = msgspec.json.encode(
+                    value, enc_hook=default, order="sorted" if sort_keys else None
+                )
+            elif sort_keys:
+                encoded = self._sorted_encoder.encode(value)
+            else:
+                encoded = self._encoder.encode(value)
+        except (TypeError, OverflowError, msgspec.EncodeError):
+            return super().dumps(value, indent, sort_keys, default)
+        if indent:
+            encoded = msgspec.json.format(encoded, indent=2)
+        return encoded.decode()
+
+
+_CODECS: Dict[str, Type[JSONCodec]] = {
+    "orjson": OrjsonCodec,
+    "msgspec": MsgspecCodec,
+    "json": JSONCodec,
+}
+
+
+def available_backends() -> List[str]:
+    """Return the installed backends, fastest first."""
+    installed = {"orjson": orjson, "msgspec": msgspec, "json": json}
+    return [name for name in BACKENDS if installed[name] is not None]
+
+
+def create_codec(backend: str = "auto") -> JSONCodec:
+    """
+    Create the codec of a backend.
+
+    Args:
+        backend: "orjson", "msgspec", "json", or "auto" for the fastest
+            installed backend
+
+    Raises:
+        ValueError: If the backend is unknown
+    """
+    available = available_backends()
+    if backend == "auto":
+        backend = available[0]
+    if backend not in _CODECS:
+        raise ValueError(f"JSON backend must be one of: auto, {', '.join(BACKENDS)}")
+    if backend not in available:
+        logger.warning(
+            f"JSON backend {backend!r} is not installed; using the standard library"
+        )
+        backend = "json"
+    return _CODECS[backend]()
+
+
+_codec = create_codec()
+
+
+def use_backend(backend: str) -> JSONCodec:
+    """Switch the codec used by loads and dumps. Returns the new codec."""
+    global _codec
+    _codec = create_codec(backend)
+    return _codec
+
+
+def backend() -> str:
+    """Return the name of the active backend."""
+    return _codec.name
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Decode JSON text or UTF-8 bytes."""
+    return _codec.loads(data)
+
+
+def dumps(
+    value: Any,
+    indent: bool = False,
+    sort_keys: bool = False,
+    default: Optional[Callable[[Any], Any]] = None,
+) -> str:
+    """Encode a value as JSON text; see JSONCodec.dumps."""
+    return _codec.dumps(value, indent, sort_keys, default)
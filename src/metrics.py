@@ -0,0 +1,477 @@
+"""
+Prometheus metrics for tool calls and Outline API requests.
+
+A small dependency-free registry of counters, gauges and histograms rendered in
+the Prometheus text exposition format. The server records per-tool and
+per-endpoint latency and response sizes, upstream errors by status, retries,
+cache lookups and in-flight requests. Metrics are exposed through the
+server_stats tool and, optionally, a local HTTP endpoint for scraping.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import functools
+import logging
+import math
+import time
+from dataclasses import dataclass
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LabelValues = Tuple[str, ...]
+
+
+class Metric:
+    """Base class of labelled metrics."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, Any] = {}
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _format_labels(self, values: LabelValues, extra: str = "") -> str:
+        pairs = [
+            f'{name}="{_escape(value)}"'
+            for name, value in zip(self.labelnames, values, strict=True)
+        ]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """Monotonically increasing count."""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}_total{self._format_labels(key)} {_number(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Gauge(Metric):
+    """Value that can go up and down."""
+
+    kind = "gauge"
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{self._format_labels(key)} {_number(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+@dataclass
+class HistogramValue:
+    """Bucket counts, sum and count of one labelled histogram."""
+
+    buckets: List[int]
+    sum: float = 0.0
+    count: int = 0
+
+
+class Histogram(Metric):
+    """Distribution of observed values over fixed buckets."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, help, labelnames)
+        self.bounds = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        entry = self._values.get(key)
+        if entry is None:
+            entry = self._values[key] = HistogramValue([0] * len(self.bounds))
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                entry.buckets[i] += 1
+                break
+        entry.sum += value
+        entry.count += 1
+
+    def get(self, **labels: Any) -> Optional[HistogramValue]:
+        return self._values.get(self._key(labels))
+
+    def quantile(self, q: float, **labels: Any) -> Optional[float]:
+        """Estimate a quantile by linear interpolation within buckets."""
+        entry = self.get(**labels)
+        if entry is None or entry.count == 0:
+            return None
+        rank = q * entry.count
+        cumulative = 0
+        lower = 0.0
+        for bound, count in zip(self.bounds, entry.buckets, strict=True):
+            if count and cumulative + count >= rank:
+                return lower + (bound - lower) * (rank - cumulative) / count
+            cumulative += count
+            lower = bound
+        # The quantile falls in the +Inf bucket.
+        return self.bounds[-1]
+
+    def summary(self, **labels: Any) -> Dict[str, Any]:
+        entry = self.get(**labels)
+        if entry is None or entry.count == 0:
+            return {"count": 0}
+        return {
+            "count": entry.count,
+            "mean": round(entry.sum / entry.count, 6),
+            "p50": round(self.quantile(0.5, **labels), 6),
+            "p95": round(self.quantile(0.95, **labels), 6),
+            "p99": round(self.quantile(0.99, **labels), 6),
+        }
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, entry in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.bounds, entry.buckets, strict=True):
+                cumulative += count
+                le = self._format_labels(key, f'le="{_number(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            le = self._format_labels(key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {entry.count}")
+            labels = self._format_labels(key)
+            lines.append(f"{self.name}_sum{labels} {_number(entry.sum)}")
+            lines.append(f"{self.name}_count{labels} {entry.count}")
+        return lines
+
+    def label_values(self) -> List[LabelValues]:
+        return sorted(self._values)
+
+
+class ToolCall:
+    """Upstream work done on behalf of the tool call running in this context."""
+
+    def __init__(self) -> None:
+        # Wall time the call spent waiting for Outline, overlapping waits of
+        # concurrent requests counted once
+        self.upstream_seconds = 0.0
+        self.upstream_requests = 0
+        # Age of the oldest stale response the call was answered from
+        self.stale_age: Optional[float] = None
+        self._waits = 0
+        self._waiting_since = 0.0
+
+    def begin_upstream_wait(self, now: float) -> None:
+        if self._waits == 0:
+            self._waiting_since = now
+        self._waits += 1
+
+    def end_upstream_wait(self, now: float) -> None:
+        self._waits -= 1
+        if self._waits == 0:
+            self.upstream_seconds += now - self._waiting_since
+
+
+_current_tool_call: contextvars.ContextVar[Optional[ToolCall]] = contextvars.ContextVar(
+    "outline_tool_call", default=None
+)
+
+
+def current_tool_call() -> Optional[ToolCall]:
+    """Return the tool call running in this context, if any."""
+    return _current_tool_call.get()
+
+
+def detach_tool_call() -> None:
+    """Stop attributing work in this context to a tool call, for background tasks."""
+    _current_tool_call.set(None)
+
+
+@contextlib.contextmanager
+def upstream_wait() -> Iterator[None]:
+    """Count the enclosed block as time the running tool call waits for Outline."""
+    call = _current_tool_call.get()
+    if call is None:
+        yield
+        return
+    call.begin_upstream_wait(time.perf_counter())
+    try:
+        yield
+    finally:
+        call.end_upstream_wait(time.perf_counter())
+
+
+def note_stale_response(age: float) -> None:
+    """Record that the running tool call used a stale response of the given age."""
+    call = _current_tool_call.get()
+    if call is not None and (call.stale_age is None or age > call.stale_age):
+        call.stale_age = age
+
+
+class ServerMetrics:
+    """Metrics recorded by the server."""
+
+    def __init__(self) -> None:
+        self.tool_duration = Histogram(
+            "outline_mcp_tool_duration_seconds",
+            "Wall time of tool calls.",
+            ["tool"],
+        )
+        self.tool_local_duration = Histogram(
+            "outline_mcp_tool_local_duration_seconds",
+            "Time of tool calls not spent waiting for Outline (parsing, "
+            "formatting, serialization).",
+            ["tool"],
+        )
+        self.tool_response_bytes = Histogram(
+            "outline_mcp_tool_response_bytes",
+            "Size of tool results.",
+            ["tool"],
+            buckets=SIZE_BUCKETS,
+        )
+        self.tool_errors = Counter(
+            "outline_mcp_tool_errors", "Tool calls that raised an error.", ["tool"]
+        )
+        self.tool_inflight = Gauge(
+            "outline_mcp_tool_inflight", "Tool calls in progress.", ["tool"]
+        )
+        self.upstream_duration = Histogram(
+            "outline_mcp_upstream_duration_seconds",
+            "Latency of single HTTP requests to Outline.",
+            ["endpoint"],
+        )
+        self.upstream_response_bytes = Histogram(
+            "outline_mcp_upstream_response_bytes",
+            "Size of Outline responses.",
+            ["endpoint"],
+            buckets=SIZE_BUCKETS,
+        )
+        self.upstream_errors = Counter(
+            "outline_mcp_upstream_errors",
+            "Failed Outline requests by HTTP status (or transport).",
+            ["endpoint", "status"],
+        )
+        self.upstream_retries = Counter(
+            "outline_mcp_upstream_retries", "Retried Outline requests.", ["endpoint"]
+        )
+        self.upstream_inflight = Gauge(
+            "outline_mcp_upstream_inflight",
+            "Outline requests in progress.",
+            ["endpoint"],
+        )
+        self.cache_lookups = Counter(
+            "outline_mcp_cache_lookups",
+            "Response cache lookups by result (hit, miss or store).",
+            ["endpoint", "result"],
+        )
+        self.metrics: List[Metric] = [
+            self.tool_duration,
+            self.tool_local_duration,
+            self.tool_response_bytes,
+            self.tool_errors,
+            self.tool_inflight,
+            self.upstream_duration,
+            self.upstream_response_bytes,
+            self.upstream_errors,
+            self.upstream_retries,
+            self.upstream_inflight,
+            self.cache_lookups,
+        ]
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        return "\n".join(metric.render() for metric in self.metrics) + "\n"
+
+    def observe_upstream(
+        self, endpoint: str, seconds: float, size: Optional[int] = None
+    ) -> None:
+        """Record a completed HTTP request to Outline."""
+        self.upstream_duration.observe(seconds, endpoint=endpoint)
+        if size is not None:
+            self.upstream_response_bytes.observe(size, endpoint=endpoint)
+        call = _current_tool_call.get()
+        if call is not None:
+            call.upstream_requests += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Summarize latency per tool and per endpoint for server_stats."""
+        tools = {}
+        for (tool,) in self.tool_duration.label_values():
+            tools[tool] = {
+                **self.tool_duration.summary(tool=tool),
+                "errors": int(self.tool_errors.value(tool=tool)),
+                "local": self.tool_local_duration.summary(tool=tool),
+            }
+        upstream = {}
+        for (endpoint,) in self.upstream_duration.label_values():
+            upstream[endpoint] = {
+                **self.upstream_duration.summary(endpoint=endpoint),
+                "retries": int(self.upstream_retries.value(endpoint=endpoint)),
+            }
+        return {"tools": tools, "upstream": upstream}
+
+
+def instrument_tool(
+    get_metrics: Callable[[Any], Optional[ServerMetrics]],
+) -> Callable[[Callable[..., Awaitable[Any]]], Callable[..., Awaitable[Any]]]:
+    """
+    Build a decorator recording latency, errors and result size of a tool.
+
+    The tool runs with a ToolCall in context whether or not metrics are enabled,
+    so that its result can report stale responses it was built from.
+
+    Args:
+        get_metrics: Returns the metrics of the server from the tool's context
+            argument, or None when metrics are disabled
+    """
+
+    def decorator(fn: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        name = fn.__name__
+
+        @functools.wraps(fn)
+        async def wrapper(ctx: Any, *args: Any, **kwargs: Any) -> Any:
+            metrics = get_metrics(ctx)
+            call = ToolCall()
+            token = _current_tool_call.set(call)
+            if metrics is None:
+                try:
+                    return await fn(ctx, *args, **kwargs)
+                finally:
+                    _current_tool_call.reset(token)
+
+            metrics.tool_inflight.inc(tool=name)
+            started = time.perf_counter()
+            try:
+                result = await fn(ctx, *args, **kwargs)
+            except BaseException:
+                metrics.tool_errors.inc(tool=name)
+                raise
+            finally:
+                elapsed = time.perf_counter() - started
+                metrics.tool_inflight.dec(tool=name)
+                _current_tool_call.reset(token)
+                metrics.tool_duration.observe(elapsed, tool=name)
+                metrics.tool_local_duration.observe(
+                    max(0.0, elapsed - call.upstream_seconds), tool=name
+                )
+            if isinstance(result, str):
+                metrics.tool_response_bytes.observe(
+                    len(result.encode("utf-8")), tool=name
+                )
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+async def serve_metrics(
+    metrics: ServerMetrics, host: str, port: int
+) -> asyncio.AbstractServer:
+    """
+    Serve GET /metrics over HTTP for Prometheus to scrape.
+
+    Returns:
+        The listening server; close it on shutdown
+    """
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1] == "/metrics":
+                status, body = "200 OK", metrics.render().encode("utf-8")
+            else:
+                status, body = "404 Not Found", b"Not Found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {CONTENT_TYPE}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+                + body
+            )
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+    return server
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
@@ -6,21 +6,103 @@ A Model Context Protocol server that provides access to Outline documents and co
 This server focuses on reading operations like searching, listing, and retrieving documents.
 """
 
+import argparse
 import asyncio
+import math
 import os
-from contextlib import asynccontextmanager
-from collections.abc import AsyncIterator
-from dataclasses import dataclass
-from typing import Optional, List, Dict, Any
+import time
+from contextlib import aclosing, asynccontextmanager
+from collections.abc import AsyncIterator, Callable
+from dataclasses import dataclass, field
+from typing import Optional, List, Dict, Any, Iterable, Tuple, TypeVar, Union
 import logging
 
+import anyio
 import httpx
 from mcp.server.fastmcp import FastMCP, Context
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from . import jsoncodec
+from .budget import (
+    Budget,
+    estimate_text_tokens,
+    resolve_budget,
+    truncate_text,
+    validate_budget,
+    validate_truncation,
+)
+from .cache import (
+    CHANGE_FEED_TTLS,
+    DEFAULT_MAX_BYTES,
+    DOCUMENT_ENDPOINTS,
+    ResponseCache,
+    SQLiteBackend,
+    canonical_key,
+    revision_marker,
+)
+from .changefeed import (
+    INVALIDATION_LOG_INTERVAL,
+    ChangeFeed,
+    Invalidation,
+    InvalidationLog,
+    verify_signature,
+)
+from .collection_tree import CollectionTree, CollectionTreeCache
+from .continuation import PageBuffers, fetch_page
+from .document_store import DocumentStore
+from .export import CollectionExporter
+from .fusion import reciprocal_rank_fusion
+from .metrics import (
+    ServerMetrics,
+    detach_tool_call,
+    instrument_tool,
+    note_stale_response,
+    serve_metrics,
+    upstream_wait,
+)
+from .output import (
+    DEFAULT_OUTPUT_FORMAT,
+    fields_of,
+    project,
+    render,
+    validate_fields,
+    validate_format,
+)
+from .pagination import MAX_PAGE_SIZE, iter_pages
+from .ratelimit import (
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryPolicy,
+    SharedTokenBucket,
+    TokenBucket,
+    parse_retry_after,
+)
+from .search_index import LocalSearchIndex
+from .sections import (
+    DocumentOutline,
+    OutlineCache,
+    snap_to_characters,
+)
+from .shared import LeaderLease, SharedLifespan
+from .singleflight import SingleFlight
+from .sync import SyncState, WorkspaceSync
+from .vector_index import (
+    DEFAULT_DIMENSIONS,
+    DEFAULT_EMBEDDER,
+    VectorIndex,
+    load_embedder,
+    vector_index_available,
+)
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+DEFAULT_DATA_DIR = os.path.join(os.path.expanduser("~"), ".cache", "outline-mcp-server")
+
 
 @dataclass
 class OutlineConfig:
@@ -28,54 +110,548 @@ class OutlineConfig:
 
     api_token: str
     base_url: str = "https://app.getoutline.com/api"
+    cache_enabled: bool = True
+    cache_max_bytes: int = DEFAULT_MAX_BYTES
+    cache_ttls: Dict[str, float] = field(default_factory=dict)
+    cache_stale_while_revalidate: float = 0.0
+    cache_stale_if_error: float = 86400.0
+    coalesce_requests: bool = True
+    default_max_tokens: int = 0
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry: float = 30.0
+    http2: bool = False
+    http_timeout: float = 30.0
+    http_connect_timeout: float = 10.0
+    endpoint_timeouts: Dict[str, float] = field(default_factory=dict)
+    prewarm_connection: bool = False
+    list_prefetch: bool = True
+    rate_limit_rps: float = 15.0
+    rate_limit_burst: int = 30
+    max_retries: int = 3
+    retry_base_delay: float = 0.5
+    retry_max_delay: float = 30.0
+    circuit_failure_threshold: int = 5
+    circuit_reset_timeout: float = 30.0
+    data_dir: str = DEFAULT_DATA_DIR
+    local_index_enabled: bool = False
+    vector_index_enabled: bool = False
+    vector_embedder: str = DEFAULT_EMBEDDER
+    vector_dimensions: int = DEFAULT_DIMENSIONS
+    document_store_enabled: bool = False
+    document_store_max_age: float = 3600.0
+    sync_enabled: bool = False
+    sync_interval: float = 300.0
+    sync_reconcile_interval: float = 6 * 3600.0
+    export_dir: str = os.path.join(DEFAULT_DATA_DIR, "exports")
+    change_feed_enabled: bool = False
+    change_feed_interval: float = 30.0
+    webhook_secret: Optional[str] = None
+    shared_state_enabled: bool = False
+    json_backend: str = "auto"
+    metrics_enabled: bool = True
+    metrics_host: str = "127.0.0.1"
+    metrics_port: int = 0
 
     def __post_init__(self):
         if not self.api_token:
             raise ValueError("OUTLINE_API_TOKEN environment variable is required")
 
+    def timeout_for(self, endpoint: str) -> Optional[httpx.Timeout]:
+        """Return the timeout override for an endpoint, if one is configured."""
+        seconds = self.endpoint_timeouts.get(endpoint)
+        if seconds is None:
+            return None
+        return httpx.Timeout(seconds, connect=self.http_connect_timeout)
+
+    @classmethod
+    def from_env(cls) -> "OutlineConfig":
+        """Build the configuration from environment variables."""
+        api_token = os.getenv("OUTLINE_API_TOKEN")
+        if not api_token:
+            raise ValueError("OUTLINE_API_TOKEN environment variable is required")
+
+        return cls(
+            api_token=api_token,
+            base_url=os.getenv("OUTLINE_BASE_URL", "https://app.getoutline.com/api"),
+            cache_enabled=_env_bool("OUTLINE_CACHE_ENABLED", True),
+            cache_max_bytes=int(
+                os.getenv("OUTLINE_CACHE_MAX_BYTES", str(DEFAULT_MAX_BYTES))
+            ),
+            cache_ttls=_parse_endpoint_seconds("OUTLINE_CACHE_TTLS"),
+            cache_stale_while_revalidate=float(
+                os.getenv("OUTLINE_CACHE_STALE_WHILE_REVALIDATE", "0")
+            ),
+            cache_stale_if_error=float(
+                os.getenv("OUTLINE_CACHE_STALE_IF_ERROR", "86400")
+            ),
+            coalesce_requests=_env_bool("OUTLINE_COALESCE_REQUESTS", True),
+            default_max_tokens=int(os.getenv("OUTLINE_DEFAULT_MAX_TOKENS", "0")),
+            http_max_connections=int(os.getenv("OUTLINE_HTTP_MAX_CONNECTIONS", "100")),
+            http_max_keepalive_connections=int(
+                os.getenv("OUTLINE_HTTP_MAX_KEEPALIVE_CONNECTIONS", "20")
+            ),
+            http_keepalive_expiry=float(
+                os.getenv("OUTLINE_HTTP_KEEPALIVE_EXPIRY", "30")
+            ),
+            http2=_env_bool("OUTLINE_HTTP2", False),
+            http_timeout=float(os.getenv("OUTLINE_HTTP_TIMEOUT", "30")),
+            http_connect_timeout=float(os.getenv("OUTLINE_HTTP_CONNECT_TIMEOUT", "10")),
+            endpoint_timeouts=_parse_endpoint_seconds("OUTLINE_ENDPOINT_TIMEOUTS"),
+            prewarm_connection=_env_bool("OUTLINE_HTTP_PREWARM", False),
+            list_prefetch=_env_bool("OUTLINE_LIST_PREFETCH", True),
+            rate_limit_rps=float(os.getenv("OUTLINE_RATE_LIMIT_RPS", "15")),
+            rate_limit_burst=int(os.getenv("OUTLINE_RATE_LIMIT_BURST", "30")),
+            max_retries=int(os.getenv("OUTLINE_MAX_RETRIES", "3")),
+            retry_base_delay=float(os.getenv("OUTLINE_RETRY_BASE_DELAY", "0.5")),
+            retry_max_delay=float(os.getenv("OUTLINE_RETRY_MAX_DELAY", "30")),
+            circuit_failure_threshold=int(
+                os.getenv("OUTLINE_CIRCUIT_FAILURE_THRESHOLD", "5")
+            ),
+            circuit_reset_timeout=float(
+                os.getenv("OUTLINE_CIRCUIT_RESET_TIMEOUT", "30")
+            ),
+            data_dir=os.path.expanduser(
+                os.getenv("OUTLINE_DATA_DIR", DEFAULT_DATA_DIR)
+            ),
+            local_index_enabled=_env_bool("OUTLINE_LOCAL_INDEX", False),
+            vector_index_enabled=_env_bool("OUTLINE_VECTOR_INDEX", False),
+            vector_embedder=os.getenv("OUTLINE_VECTOR_EMBEDDER", DEFAULT_EMBEDDER),
+            vector_dimensions=int(
+                os.getenv("OUTLINE_VECTOR_DIMENSIONS", str(DEFAULT_DIMENSIONS))
+            ),
+            document_store_enabled=_env_bool("OUTLINE_DOCUMENT_STORE", False),
+            document_store_max_age=float(
+                os.getenv("OUTLINE_DOCUMENT_STORE_MAX_AGE", "3600")
+            ),
+            sync_enabled=_env_bool("OUTLINE_SYNC", False),
+            sync_interval=float(os.getenv("OUTLINE_SYNC_INTERVAL", "300")),
+            sync_reconcile_interval=float(
+                os.getenv("OUTLINE_SYNC_RECONCILE_INTERVAL", "21600")
+            ),
+            export_dir=os.path.expanduser(
+                os.getenv(
+                    "OUTLINE_EXPORT_DIR",
+                    os.path.join(
+                        os.getenv("OUTLINE_DATA_DIR", DEFAULT_DATA_DIR), "exports"
+                    ),
+                )
+            ),
+            change_feed_enabled=_env_bool("OUTLINE_CHANGE_FEED", False),
+            change_feed_interval=float(os.getenv("OUTLINE_CHANGE_FEED_INTERVAL", "30")),
+            webhook_secret=os.getenv("OUTLINE_WEBHOOK_SECRET") or None,
+            shared_state_enabled=_env_bool("OUTLINE_SHARED_STATE", False),
+            json_backend=os.getenv("OUTLINE_JSON_BACKEND", "auto"),
+            metrics_enabled=_env_bool("OUTLINE_METRICS", True),
+            metrics_host=os.getenv("OUTLINE_METRICS_HOST", "127.0.0.1"),
+            metrics_port=int(os.getenv("OUTLINE_METRICS_PORT", "0")),
+        )
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    """Read a boolean flag from the environment."""
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _parse_endpoint_seconds(name: str) -> Dict[str, float]:
+    """Parse a per-endpoint setting given as "endpoint=seconds,endpoint=seconds"."""
+    values = {}
+    for item in os.getenv(name, "").split(","):
+        if not item.strip():
+            continue
+        endpoint, _, seconds = item.partition("=")
+        if not seconds:
+            raise ValueError(f"Invalid {name} entry: {item!r}")
+        values[endpoint.strip()] = float(seconds)
+    return values
+
+
+def _http2_available() -> bool:
+    """Check whether the optional h2 package needed for HTTP/2 is installed."""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def create_http_client(config: OutlineConfig) -> httpx.AsyncClient:
+    """Create the shared HTTP client with pooling and timeouts from the config."""
+    headers = {
+        "Authorization": f"Bearer {config.api_token}",
+        "Content-Type": "application/json",
+        "Accept": "application/json",
+    }
+
+    timeout = httpx.Timeout(config.http_timeout, connect=config.http_connect_timeout)
+    limits = httpx.Limits(
+        max_connections=config.http_max_connections,
+        max_keepalive_connections=config.http_max_keepalive_connections,
+        keepalive_expiry=config.http_keepalive_expiry,
+    )
+
+    http2 = config.http2
+    if http2 and not _http2_available():
+        logger.warning(
+            "OUTLINE_HTTP2 is enabled but the 'h2' package is not installed; "
+            "falling back to HTTP/1.1. Install with: pip install 'httpx[http2]'"
+        )
+        http2 = False
+
+    return httpx.AsyncClient(
+        headers=headers,
+        timeout=timeout,
+        limits=limits,
+        http2=http2,
+        follow_redirects=True,
+    )
+
+
+class DeferredHTTPClient:
+    """
+    HTTP client that is only built when the first request is sent.
+
+    Building an httpx client loads the CA bundle, which a freshly launched stdio
+    server would otherwise do before it can answer the host's initialize request.
+
+    Args:
+        factory: Builds the client
+    """
+
+    def __init__(self, factory: Callable[[], httpx.AsyncClient]):
+        self._factory = factory
+        self._client: Optional[httpx.AsyncClient] = None
+        self._closed = False
+
+    @property
+    def started(self) -> bool:
+        return self._client is not None
+
+    @property
+    def is_closed(self) -> bool:
+        return self._closed
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._closed:
+            raise RuntimeError("HTTP client has been closed")
+        if self._client is None:
+            self._client = self._factory()
+        return self._client
+
+    async def post(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.client.post(url, **kwargs)
+
+    async def aclose(self) -> None:
+        self._closed = True
+        if self._client is not None:
+            await self._client.aclose()
+
+    async def __aenter__(self) -> "DeferredHTTPClient":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
+
+
+async def prewarm_connection(
+    http_client: Union[httpx.AsyncClient, DeferredHTTPClient], config: OutlineConfig
+) -> None:
+    """Open a pooled connection (TCP + TLS handshake) before the first tool call."""
+    try:
+        response = await http_client.post(f"{config.base_url}/auth.info", json={})
+        logger.info(f"Pre-warmed Outline connection ({response.http_version})")
+    except httpx.HTTPError as e:
+        logger.warning(f"Failed to pre-warm Outline connection: {e}")
+
 
 @dataclass
 class AppContext:
     """Application context containing shared resources."""
 
     outline_config: OutlineConfig
-    http_client: httpx.AsyncClient
+    http_client: Union[httpx.AsyncClient, DeferredHTTPClient]
+    response_cache: Optional[ResponseCache] = None
+    single_flight: Optional[SingleFlight] = None
+    rate_limiter: Optional[TokenBucket] = None
+    retry_policy: Optional[RetryPolicy] = None
+    circuit_breaker: Optional[CircuitBreaker] = None
+    search_index: Optional[LocalSearchIndex] = None
+    vector_index: Optional[VectorIndex] = None
+    document_store: Optional[DocumentStore] = None
+    outline_cache: Optional[OutlineCache] = None
+    collection_trees: Optional[CollectionTreeCache] = None
+    workspace_sync: Optional[WorkspaceSync] = None
+    change_feed: Optional[ChangeFeed] = None
+    invalidation_log: Optional[InvalidationLog] = None
+    page_buffers: Optional[PageBuffers] = None
+    metrics: Optional[ServerMetrics] = None
+    # Background refreshes of stale cache entries by cache key
+    revalidations: Dict[str, "asyncio.Task[None]"] = field(default_factory=dict)
 
 
 @asynccontextmanager
-async def app_lifespan(server: FastMCP) -> AsyncIterator[AppContext]:
-    """Manage application lifecycle with shared HTTP client and configuration."""
+async def create_app_context() -> AsyncIterator[AppContext]:
+    """Create the shared HTTP client, caches and background tasks from the env."""
     # Get configuration from environment
-    api_token = os.getenv("OUTLINE_API_TOKEN")
-    if not api_token:
-        raise ValueError("OUTLINE_API_TOKEN environment variable is required")
-
-    base_url = os.getenv("OUTLINE_BASE_URL", "https://app.getoutline.com/api")
-
-    outline_config = OutlineConfig(api_token=api_token, base_url=base_url)
+    outline_config = OutlineConfig.from_env()
+    jsoncodec.use_backend(outline_config.json_backend)
+
+    # Worker processes share the cache and the rate limit through SQLite.
+    shared_path = None
+    if outline_config.shared_state_enabled:
+        shared_path = os.path.join(outline_config.data_dir, "shared.sqlite")
+
+    # Entries can live longer when Outline reports changes as they happen.
+    # Webhooks only arrive over HTTP; build_http_app raises the TTLs for them.
+    feed_enabled = bool(
+        outline_config.change_feed_enabled or outline_config.webhook_secret
+    )
+    cache_ttls = outline_config.cache_ttls
+    if outline_config.change_feed_enabled:
+        cache_ttls = {**CHANGE_FEED_TTLS, **cache_ttls}
+
+    # Expired entries are kept as long as they may still be served stale.
+    max_stale = max(
+        outline_config.cache_stale_while_revalidate,
+        outline_config.cache_stale_if_error,
+        0.0,
+    )
+    response_cache = None
+    if outline_config.cache_enabled and outline_config.cache_max_bytes > 0:
+        if shared_path is not None:
+            response_cache = ResponseCache(
+                ttls=cache_ttls,
+                backend=SQLiteBackend(shared_path, outline_config.cache_max_bytes),
+                clock=time.time,
+                max_stale=max_stale,
+            )
+        else:
+            response_cache = ResponseCache(
+                ttls=cache_ttls,
+                max_bytes=outline_config.cache_max_bytes,
+                max_stale=max_stale,
+            )
+
+    single_flight = SingleFlight() if outline_config.coalesce_requests else None
+
+    rate_limiter = None
+    if outline_config.rate_limit_rps > 0 and shared_path is not None:
+        rate_limiter = SharedTokenBucket(
+            shared_path, outline_config.rate_limit_rps, outline_config.rate_limit_burst
+        )
+    elif outline_config.rate_limit_rps > 0:
+        rate_limiter = TokenBucket(
+            outline_config.rate_limit_rps, outline_config.rate_limit_burst
+        )
+
+    retry_policy = RetryPolicy(
+        max_retries=outline_config.max_retries,
+        base_delay=outline_config.retry_base_delay,
+        max_delay=outline_config.retry_max_delay,
+    )
+
+    circuit_breaker = None
+    if outline_config.circuit_failure_threshold > 0:
+        circuit_breaker = CircuitBreaker(
+            failure_threshold=outline_config.circuit_failure_threshold,
+            reset_timeout=outline_config.circuit_reset_timeout,
+        )
+
+    search_index = None
+    if outline_config.local_index_enabled:
+        search_index = LocalSearchIndex(
+            os.path.join(outline_config.data_dir, "search.sqlite")
+        )
+
+    vector_index = None
+    if outline_config.vector_index_enabled and not vector_index_available():
+        logger.warning(
+            "OUTLINE_VECTOR_INDEX is enabled but numpy is not installed; "
+            "local retrieval is disabled. Install with: pip install numpy"
+        )
+    elif outline_config.vector_index_enabled:
+        vector_index = VectorIndex(
+            os.path.join(outline_config.data_dir, "vectors"),
+            load_embedder(
+                outline_config.vector_embedder, outline_config.vector_dimensions
+            ),
+            embedder_name=outline_config.vector_embedder,
+        )
+
+    document_store = None
+    if outline_config.document_store_enabled:
+        document_store = DocumentStore(
+            os.path.join(outline_config.data_dir, "documents")
+        )
+
+    metrics = ServerMetrics() if outline_config.metrics_enabled else None
 
     # Create shared HTTP client
-    headers = {
-        "Authorization": f"Bearer {api_token}",
-        "Content-Type": "application/json",
-        "Accept": "application/json",
-    }
-
-    timeout = httpx.Timeout(30.0, connect=10.0)
-
-    async with httpx.AsyncClient(
-        headers=headers, timeout=timeout, follow_redirects=True
+    async with DeferredHTTPClient(
+        lambda: create_http_client(outline_config)
     ) as http_client:
+        prewarm_task = None
+        if outline_config.prewarm_connection:
+            prewarm_task = asyncio.create_task(
+                prewarm_connection(http_client, outline_config)
+            )
+
+        app_context = AppContext(
+            outline_config=outline_config,
+            http_client=http_client,
+            response_cache=response_cache,
+            single_flight=single_flight,
+            rate_limiter=rate_limiter,
+            retry_policy=retry_policy,
+            circuit_breaker=circuit_breaker,
+            search_index=search_index,
+            vector_index=vector_index,
+            document_store=document_store,
+            outline_cache=OutlineCache(),
+            collection_trees=CollectionTreeCache(),
+            metrics=metrics,
+        )
+        app_context.page_buffers = create_page_buffers(app_context)
+
+        # Workers drop their in-process state on invalidations of the others.
+        follow_task = None
+        if shared_path is not None:
+            app_context.invalidation_log = InvalidationLog(shared_path)
+            follow_task = asyncio.create_task(
+                _follow_invalidations(app_context, app_context.invalidation_log)
+            )
+
+        metrics_server = None
+        if metrics is not None and outline_config.metrics_port > 0:
+            metrics_server = await serve_metrics(
+                metrics, outline_config.metrics_host, outline_config.metrics_port
+            )
+
+        local_indexes = search_index is not None or vector_index is not None
+        if outline_config.sync_enabled or local_indexes:
+            app_context.workspace_sync = create_workspace_sync(
+                app_context,
+                SyncState(os.path.join(outline_config.data_dir, "sync.sqlite")),
+            )
+
+        change_feed_state = None
+        if feed_enabled:
+            if app_context.workspace_sync is not None:
+                state = app_context.workspace_sync.state
+            else:
+                state = change_feed_state = SyncState(
+                    os.path.join(outline_config.data_dir, "sync.sqlite")
+                )
+            app_context.change_feed = create_change_feed(app_context, state)
+
+        def start_background_loops() -> None:
+            if outline_config.sync_enabled and app_context.workspace_sync is not None:
+                app_context.workspace_sync.start()
+            if outline_config.change_feed_enabled and app_context.change_feed:
+                app_context.change_feed.start()
+
+        # Worker processes sharing state run the loops in one of them only.
+        lease = None
+        lease_task = None
+        loops = outline_config.sync_enabled or outline_config.change_feed_enabled
+        if shared_path is not None and loops:
+            lease = LeaderLease(os.path.join(outline_config.data_dir, "leader.lock"))
+            lease_task = asyncio.create_task(
+                _run_when_leader(lease, start_background_loops)
+            )
+        else:
+            start_background_loops()
+
         logger.info("Outline MCP Server initialized")
         try:
-            yield AppContext(outline_config=outline_config, http_client=http_client)
+            yield app_context
         finally:
+            if prewarm_task is not None:
+                prewarm_task.cancel()
+            if lease_task is not None:
+                lease_task.cancel()
+            if follow_task is not None:
+                follow_task.cancel()
+            for task in list(app_context.revalidations.values()):
+                task.cancel()
+            app_context.page_buffers.close()
+            if metrics_server is not None:
+                metrics_server.close()
+                await metrics_server.wait_closed()
+            if app_context.change_feed is not None:
+                await app_context.change_feed.stop()
+            if change_feed_state is not None:
+                change_feed_state.close()
+            if app_context.workspace_sync is not None:
+                await app_context.workspace_sync.stop()
+                app_context.workspace_sync.state.close()
+            if search_index is not None:
+                search_index.close()
+            if vector_index is not None:
+                vector_index.close()
+            if document_store is not None:
+                document_store.close()
+            if app_context.invalidation_log is not None:
+                app_context.invalidation_log.close()
+            if isinstance(rate_limiter, SharedTokenBucket):
+                rate_limiter.close()
+            if response_cache is not None and isinstance(
+                response_cache.backend, SQLiteBackend
+            ):
+                response_cache.backend.close()
+            if lease is not None:
+                lease.release()
             logger.info("Outline MCP Server shutting down")
 
 
+async def _run_when_leader(lease: LeaderLease, start: Callable[[], None]) -> None:
+    """Start the background loops once this process holds the lease."""
+    if not lease.try_acquire():
+        logger.info("Background loops run in another worker; standing by")
+        await lease.acquire()
+    logger.info("Running background loops in this worker")
+    start()
+
+
+async def _follow_invalidations(app_context: AppContext, log: InvalidationLog) -> None:
+    """Apply invalidations published by other workers to this process."""
+    while True:
+        try:
+            for invalidation in await asyncio.to_thread(log.read):
+                _drop_local_state(app_context, invalidation)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Reading the invalidation log failed: {e}")
+        await asyncio.sleep(INVALIDATION_LOG_INTERVAL)
+
+
+# One application context for all sessions of this process.
+shared_context: SharedLifespan[AppContext] = SharedLifespan(create_app_context)
+
+
+# Path of the Outline webhook endpoint of the HTTP transports.
+WEBHOOK_PATH = "/webhooks/outline"
+
+
+@asynccontextmanager
+async def app_lifespan(server: FastMCP) -> AsyncIterator[AppContext]:
+    """Manage application lifecycle with shared HTTP client and configuration."""
+    async with shared_context.acquire() as app_context:
+        yield app_context
+
+
 # Initialize the MCP server
 mcp = FastMCP("Outline", lifespan=app_lifespan)
 
+# Records latency, errors and result size of each tool call; applied under
+# @mcp.tool() so the recorded function keeps the tool's signature.
+instrumented = instrument_tool(lambda ctx: ctx.request_context.lifespan_context.metrics)
+
 
 async def make_outline_request(
     ctx: Context, endpoint: str, data: Optional[Dict[str, Any]] = None
@@ -83,6 +659,15 @@ async def make_outline_request(
     """
     Make a request to the Outline API.
 
+    Responses of read-only endpoints are served from the response cache when a
+    fresh entry exists, and identical concurrent requests share a single upstream
+    call. Returned responses may be shared and must not be mutated.
+
+    Expired entries are returned while a background request refreshes them, for
+    up to OUTLINE_CACHE_STALE_WHILE_REVALIDATE seconds past expiry, and while
+    Outline is unreachable, for up to OUTLINE_CACHE_STALE_IF_ERROR seconds. Such
+    responses carry "stale": true and their "age" in seconds.
+
     Args:
         ctx: MCP context containing the HTTP client
         endpoint: API endpoint (without base URL)
@@ -94,33 +679,905 @@ async def make_outline_request(
     Raises:
         Exception: If the request fails
     """
-    app_context = ctx.request_context.lifespan_context
-    url = f"{app_context.outline_config.base_url}/{endpoint}"
+    return await outline_request(ctx.request_context.lifespan_context, endpoint, data)
+
+
+async def outline_request(
+    app_context: AppContext,
+    endpoint: str,
+    data: Optional[Dict[str, Any]] = None,
+    use_cache: bool = True,
+) -> Dict[str, Any]:
+    """
+    Make a request to the Outline API outside of a tool call.
+
+    Same as make_outline_request, for background tasks that only hold the
+    application context.
+
+    Args:
+        app_context: Application context containing the HTTP client
+        endpoint: API endpoint (without base URL)
+        data: Optional request data for POST requests
+        use_cache: Whether to read from and write to the response cache
+
+    Returns:
+        JSON response from the API
+    """
+    cache = app_context.response_cache if use_cache else None
+
+    if data is None:
+        data = {}
+
+    metrics = app_context.metrics
+
+    if cache is not None:
+        cached = await _run_cache(cache, cache.get, endpoint, data)
+        if cached is not None:
+            logger.debug(f"Cache hit for {endpoint}")
+            if metrics is not None:
+                metrics.cache_lookups.inc(endpoint=endpoint, result="hit")
+            return cached
+
+        revalidate = app_context.outline_config.cache_stale_while_revalidate
+        stale = None
+        if revalidate > 0:
+            stale = await _run_cache(cache, cache.get_stale, endpoint, data, revalidate)
+        if stale is not None:
+            logger.debug(f"Serving stale {endpoint} while refreshing it")
+            if metrics is not None:
+                metrics.cache_lookups.inc(endpoint=endpoint, result="stale")
+            _revalidate(app_context, endpoint, data, cache)
+            return _stale_response(*stale)
+
+    if use_cache and app_context.document_store is not None:
+        stored = await _read_document_store(app_context, endpoint, data)
+        if stored is not None:
+            logger.debug(f"Document store hit for {endpoint}")
+            if metrics is not None:
+                metrics.cache_lookups.inc(endpoint=endpoint, result="store")
+            response, fresh_for = stored
+            if cache is not None:
+                # The stored copy ages from when it was fetched, not from now.
+                await _run_cache(
+                    cache, cache.set, endpoint, data, response, ttl=fresh_for
+                )
+            return response
+
+    if cache is not None and metrics is not None:
+        metrics.cache_lookups.inc(endpoint=endpoint, result="miss")
 
     try:
-        if data is None:
-            data = {}
+        return await _fetch_outline_request(app_context, endpoint, data, cache)
+    except Exception as e:
+        if not use_cache or not _is_outage(e):
+            raise
+        fallback = await _offline_response(app_context, endpoint, data)
+        if fallback is None:
+            raise
+        logger.warning(f"Outline unavailable, serving stale {endpoint}: {e}")
+        if metrics is not None:
+            metrics.cache_lookups.inc(endpoint=endpoint, result="offline")
+        return fallback
+
+
+async def _fetch_outline_request(
+    app_context: AppContext,
+    endpoint: str,
+    data: Dict[str, Any],
+    cache: Optional[ResponseCache],
+) -> Dict[str, Any]:
+    """Request a response from Outline, sharing identical in-flight requests."""
+    # Callers coalesced onto another caller's request wait for Outline as well.
+    with upstream_wait():
+        single_flight = app_context.single_flight
+        if single_flight is None:
+            return await _post_outline_request(app_context, endpoint, data, cache)
+
+        return await single_flight.do(
+            canonical_key(endpoint, data),
+            lambda: _post_outline_request(app_context, endpoint, data, cache),
+        )
+
+
+def _stale_response(response: Dict[str, Any], age: float) -> Dict[str, Any]:
+    """Mark a response served past its TTL, and the tool call using it."""
+    note_stale_response(age)
+    return {**response, "stale": True, "age": round(age, 1)}
+
+
+def _revalidate(
+    app_context: AppContext,
+    endpoint: str,
+    data: Dict[str, Any],
+    cache: ResponseCache,
+) -> None:
+    """Refresh a stale cache entry in the background, once at a time per request."""
+    key = canonical_key(endpoint, data)
+    if key in app_context.revalidations:
+        return
+
+    async def refresh() -> None:
+        detach_tool_call()
+        try:
+            await _fetch_outline_request(app_context, endpoint, data, cache)
+        except Exception:
+            # Already logged; the stale entry is served until it ages out.
+            pass
+        finally:
+            app_context.revalidations.pop(key, None)
+
+    app_context.revalidations[key] = asyncio.create_task(refresh())
+
+
+def _is_outage(error: BaseException) -> bool:
+    """Whether a failed request means Outline is unreachable, not that it refused."""
+    if isinstance(error, CircuitOpenError):
+        return True
+    cause = error.__cause__
+    if isinstance(cause, httpx.TransportError):
+        return True
+    if isinstance(cause, httpx.HTTPStatusError):
+        status = cause.response.status_code
+        return status >= 500 or status == 429
+    return False
+
+
+async def _offline_response(
+    app_context: AppContext, endpoint: str, data: Dict[str, Any]
+) -> Optional[Dict[str, Any]]:
+    """Return the last good response to a request, or None if it is too old."""
+    max_stale = app_context.outline_config.cache_stale_if_error
+    if max_stale <= 0:
+        return None
+
+    cache = app_context.response_cache
+    if cache is not None:
+        stale = await _run_cache(cache, cache.get_stale, endpoint, data, max_stale)
+        if stale is not None:
+            return _stale_response(*stale)
+
+    store = app_context.document_store
+    if store is not None and _is_stored_request(endpoint, data):
+        stored = await asyncio.to_thread(store.get, endpoint, data["id"])
+        if stored is not None:
+            age = stored.age(time.time())
+            max_age = app_context.outline_config.document_store_max_age
+            if age <= max_age + max_stale:
+                return _stale_response(stored.response(), age)
+    return None
+
+
+async def _post_outline_request(
+    app_context: AppContext,
+    endpoint: str,
+    data: Dict[str, Any],
+    cache: Optional[ResponseCache],
+) -> Dict[str, Any]:
+    """POST a request to Outline and store the response in the cache."""
 
-        response = await app_context.http_client.post(url, json=data)
-        response.raise_for_status()
+    try:
+        response = await _send_with_retries(app_context, endpoint, data)
 
-        json_response = response.json()
+        content = response.content
+        if isinstance(content, bytes):
+            json_response = jsoncodec.loads(content)
+        else:
+            json_response = response.json()
 
         if not json_response.get("ok", True):
             error_msg = json_response.get("error", "Unknown error")
             raise Exception(f"Outline API error: {error_msg}")
 
+        if cache is not None:
+            size = len(content) if isinstance(content, bytes) else None
+            await _run_cache(cache, cache.set, endpoint, data, json_response, size=size)
+
+        if app_context.document_store is not None:
+            await _write_document_store(app_context, endpoint, data, json_response)
+
         return json_response
 
     except httpx.HTTPError as e:
         logger.error(f"HTTP error calling {endpoint}: {e}")
-        raise Exception(f"Failed to call Outline API: {e}")
+        raise Exception(f"Failed to call Outline API: {e}") from e
     except Exception as e:
         logger.error(f"Error calling {endpoint}: {e}")
         raise
 
 
+async def _send_with_retries(
+    app_context: AppContext, endpoint: str, data: Dict[str, Any]
+) -> httpx.Response:
+    """
+    Send a request through the rate limiter and circuit breaker.
+
+    Throttled (429) requests and transient failures of idempotent endpoints are
+    retried with jittered exponential backoff, honoring Retry-After.
+
+    Raises:
+        httpx.HTTPError: If the request fails and is not retried
+        CircuitOpenError: If Outline is considered unavailable
+    """
+    url = f"{app_context.outline_config.base_url}/{endpoint}"
+    timeout = app_context.outline_config.timeout_for(endpoint)
+    limiter = app_context.rate_limiter
+    breaker = app_context.circuit_breaker
+    policy = app_context.retry_policy
+    metrics = app_context.metrics
+    attempt = 0
+
+    while True:
+        if breaker is not None:
+            breaker.before_call()
+        if limiter is not None:
+            await limiter.acquire()
+
+        status = None
+        retry_after = None
+        if metrics is not None:
+            metrics.upstream_inflight.inc(endpoint=endpoint)
+        started = time.perf_counter()
+        try:
+            try:
+                if timeout is None:
+                    response = await app_context.http_client.post(url, json=data)
+                else:
+                    response = await app_context.http_client.post(
+                        url, json=data, timeout=timeout
+                    )
+            finally:
+                if metrics is not None:
+                    metrics.upstream_inflight.dec(endpoint=endpoint)
+            if metrics is not None:
+                content = response.content
+                metrics.observe_upstream(
+                    endpoint,
+                    time.perf_counter() - started,
+                    len(content) if isinstance(content, bytes) else None,
+                )
+            response.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            status = e.response.status_code
+            if metrics is not None:
+                metrics.upstream_errors.inc(endpoint=endpoint, status=status)
+            retry_after = parse_retry_after(e.response.headers.get("Retry-After"))
+            if breaker is not None:
+                if status >= 500:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+            error: httpx.HTTPError = e
+        except httpx.TransportError as e:
+            if metrics is not None:
+                metrics.observe_upstream(endpoint, time.perf_counter() - started)
+                metrics.upstream_errors.inc(endpoint=endpoint, status="transport")
+            if breaker is not None:
+                breaker.record_failure()
+            error = e
+        except BaseException:
+            if breaker is not None:
+                breaker.record_abandoned()
+            raise
+        else:
+            if breaker is not None:
+                breaker.record_success()
+            if limiter is not None:
+                await limiter.observe(response.headers)
+            return response
+
+        retry = policy is not None and policy.should_retry(endpoint, attempt, status)
+        if retry and retry_after is not None and retry_after > policy.max_delay:
+            retry = False
+
+        if status == 429 and limiter is not None:
+            await limiter.pause(retry_after if retry_after is not None else 1.0)
+
+        if not retry:
+            if policy is not None and attempt > 0:
+                policy.stats.exhausted += 1
+            raise error
+
+        delay = policy.delay(attempt, retry_after)
+        attempt += 1
+        policy.stats.retries += 1
+        if metrics is not None:
+            metrics.upstream_retries.inc(endpoint=endpoint)
+        logger.warning(
+            f"Retrying {endpoint} in {delay:.2f}s (attempt {attempt}): {error}"
+        )
+        await asyncio.sleep(delay)
+
+
+def _is_stored_request(endpoint: str, data: Dict[str, Any]) -> bool:
+    """Whether a request is a plain document read kept in the document store."""
+    return endpoint in DOCUMENT_ENDPOINTS and set(data) == {"id"}
+
+
+async def _read_document_store(
+    app_context: AppContext, endpoint: str, data: Dict[str, Any]
+) -> Optional[Tuple[Dict[str, Any], float]]:
+    """Return a fresh stored document response and the seconds it stays fresh."""
+    if not _is_stored_request(endpoint, data):
+        return None
+
+    store = app_context.document_store
+    stored = await asyncio.to_thread(store.get, endpoint, data["id"])
+    if stored is None:
+        return None
+
+    fresh_for = app_context.outline_config.document_store_max_age - stored.age(
+        time.time()
+    )
+    if fresh_for < 0:
+        return None
+
+    # A listing or search result may have shown a newer revision since.
+    cache = app_context.response_cache
+    if cache is not None:
+        observed = await _run_cache(cache, cache.revision, stored.id)
+        observed = observed or await _run_cache(cache, cache.revision, data["id"])
+        if observed is not None and observed != stored.marker:
+            return None
+
+    return stored.response(), fresh_for
+
+
+async def _write_document_store(
+    app_context: AppContext,
+    endpoint: str,
+    data: Dict[str, Any],
+    response: Dict[str, Any],
+) -> None:
+    """Persist a document response to the document store."""
+    if not _is_stored_request(endpoint, data):
+        return
+
+    store = app_context.document_store
+    payload = response.get("data")
+    try:
+        if isinstance(payload, dict) and payload.get("id"):
+            metadata = {k: v for k, v in payload.items() if k != "text"}
+            await asyncio.to_thread(
+                store.put,
+                endpoint,
+                payload["id"],
+                payload.get("text") or "",
+                metadata,
+                revision_marker(payload),
+            )
+        elif isinstance(payload, str):
+            cache = app_context.response_cache
+            marker = None
+            if cache is not None:
+                marker = await _run_cache(cache, cache.revision, data["id"])
+            await asyncio.to_thread(
+                store.put, endpoint, data["id"], payload, None, marker
+            )
+    except Exception as e:
+        logger.warning(f"Failed to store {endpoint} response: {e}")
+
+
+# Cached listings that may include a document changed by the workspace sync.
+LISTING_ENDPOINTS = (
+    "documents.list",
+    "documents.search",
+    "documents.drafts",
+    "documents.viewed",
+    "collections.documents",
+)
+
+
+def create_workspace_sync(app_context: AppContext, state: SyncState) -> WorkspaceSync:
+    """
+    Create the sync engine feeding the local index and invalidating the cache.
+
+    Args:
+        app_context: Application context whose client and sinks the sync uses
+        state: Persistent sync state
+
+    Returns:
+        The sync engine; its background loop is not started
+    """
+    config = app_context.outline_config
+
+    async def request(endpoint: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        return await outline_request(app_context, endpoint, data, use_cache=False)
+
+    async def on_upsert(items: List[Tuple[Dict[str, Any], str]]) -> None:
+        if app_context.search_index is not None:
+            await asyncio.to_thread(app_context.search_index.upsert_many, items)
+        if app_context.vector_index is not None:
+            await asyncio.to_thread(app_context.vector_index.upsert_many, items)
+        if app_context.document_store is not None:
+            await asyncio.to_thread(_store_synced_documents, app_context, items)
+        await _invalidate_synced_documents(app_context, [doc for doc, _ in items])
+
+    async def on_remove(document_ids: List[str]) -> None:
+        await asyncio.to_thread(_remove_synced_documents, app_context, document_ids)
+        await _invalidate_synced_documents(
+            app_context, [{"id": i} for i in document_ids]
+        )
+
+    return WorkspaceSync(
+        request,
+        state,
+        on_upsert,
+        on_remove,
+        interval=config.sync_interval,
+        reconcile_interval=config.sync_reconcile_interval,
+    )
+
+
+def _remove_synced_documents(app_context: AppContext, document_ids: List[str]) -> None:
+    """Drop documents removed from the workspace from the local indexes and store."""
+    for document_id in document_ids:
+        if app_context.search_index is not None:
+            app_context.search_index.remove(document_id)
+        if app_context.vector_index is not None:
+            app_context.vector_index.remove(document_id)
+        if app_context.document_store is not None:
+            app_context.document_store.remove(document_id)
+
+
+def _store_synced_documents(
+    app_context: AppContext, items: List[Tuple[Dict[str, Any], str]]
+) -> None:
+    """Write documents fetched by the workspace sync to the document store."""
+    for doc, text in items:
+        metadata = {k: v for k, v in doc.items() if k != "text"}
+        app_context.document_store.put(
+            "documents.info", doc["id"], text, metadata, revision_marker(doc)
+        )
+
+
+async def _run_cache(
+    cache: ResponseCache, fn: Callable[..., T], *args: Any, **kwargs: Any
+) -> T:
+    """Call fn on the response cache, in a thread when its backend does I/O."""
+    if cache.blocking:
+        return await asyncio.to_thread(fn, *args, **kwargs)
+    return fn(*args, **kwargs)
+
+
+async def _invalidate_synced_documents(
+    app_context: AppContext, docs: List[Dict[str, Any]]
+) -> None:
+    """Drop cached reads and trees of documents the sync found changed or removed."""
+    invalidation = Invalidation()
+    for doc in docs:
+        if doc.get("id"):
+            invalidation.add("documents.update", doc["id"], doc.get("collectionId"))
+    _drop_local_state(app_context, invalidation, page_buffers=False)
+
+    cache = app_context.response_cache
+    if cache is not None and docs:
+        await _run_cache(cache, _drop_cached_documents, cache, docs)
+    await _publish_invalidation(app_context, invalidation)
+
+
+def _drop_cached_documents(cache: ResponseCache, docs: List[Dict[str, Any]]) -> None:
+    for doc in docs:
+        for document_id in (doc.get("id"), doc.get("urlId")):
+            if document_id:
+                cache.invalidate_document(document_id)
+    for endpoint in LISTING_ENDPOINTS:
+        cache.invalidate_endpoint(endpoint)
+
+
+def create_change_feed(app_context: AppContext, state: SyncState) -> ChangeFeed:
+    """
+    Create the change feed invalidating caches on changes in Outline.
+
+    Args:
+        app_context: Application context whose client and caches the feed uses
+        state: Store for the position in the feed
+
+    Returns:
+        The change feed; its polling loop is not started
+    """
+
+    async def request(endpoint: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        return await outline_request(app_context, endpoint, data, use_cache=False)
+
+    async def on_invalidate(invalidation: Invalidation) -> None:
+        await apply_invalidation(app_context, invalidation)
+
+    return ChangeFeed(
+        request,
+        state,
+        on_invalidate,
+        interval=app_context.outline_config.change_feed_interval,
+    )
+
+
+def create_page_buffers(app_context: AppContext) -> PageBuffers:
+    """Create the buffers list tools prefetch continued pages into."""
+
+    async def request(endpoint: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        detach_tool_call()
+        # Prefetched pages are kept in the buffer, not in the response cache.
+        return await outline_request(app_context, endpoint, data, use_cache=False)
+
+    return PageBuffers(request, prefetch=app_context.outline_config.list_prefetch)
+
+
+async def apply_invalidation(
+    app_context: AppContext, invalidation: Invalidation
+) -> None:
+    """Drop cached reads, listings and trees made stale by changes in Outline."""
+    cache = app_context.response_cache
+    store = app_context.document_store
+    _drop_local_state(app_context, invalidation)
+    if invalidation.everything:
+        if cache is not None:
+            await _run_cache(cache, cache.clear)
+    else:
+        if invalidation.documents and cache is not None:
+            docs = [{"id": document_id} for document_id in invalidation.documents]
+            await _run_cache(cache, _drop_cached_documents, cache, docs)
+        if invalidation.documents and store is not None:
+            for document_id in invalidation.documents:
+                await asyncio.to_thread(store.remove, document_id)
+        if invalidation.collections and cache is not None:
+            await _run_cache(
+                cache, _drop_cached_collections, cache, invalidation.collections
+            )
+    await _publish_invalidation(app_context, invalidation)
+
+
+def _drop_local_state(
+    app_context: AppContext, invalidation: Invalidation, page_buffers: bool = True
+) -> None:
+    """Drop the trees and prefetched pages this process holds in memory."""
+    if page_buffers and app_context.page_buffers is not None:
+        app_context.page_buffers.clear()
+    trees = app_context.collection_trees
+    if trees is None:
+        return
+    if invalidation.everything:
+        trees.clear()
+        return
+    for collection_id in invalidation.collections:
+        trees.invalidate(collection_id)
+    trees.invalidate_documents(invalidation.documents)
+
+
+async def _publish_invalidation(
+    app_context: AppContext, invalidation: Invalidation
+) -> None:
+    """Pass an applied invalidation on to the other worker processes."""
+    log = app_context.invalidation_log
+    if log is not None and invalidation:
+        await asyncio.to_thread(log.publish, invalidation)
+
+
+def _drop_cached_collections(
+    cache: ResponseCache, collection_ids: Iterable[str]
+) -> None:
+    for collection_id in collection_ids:
+        cache.invalidate_collection(collection_id)
+    cache.invalidate_endpoint("collections.list")
+
+
+DEFAULT_MAX_RESULTS = 1000
+MAX_RESULTS_LIMIT = 10000
+
+# Bounds for the number of concurrent requests made by batch operations.
+DEFAULT_BATCH_CONCURRENCY = 8
+MAX_BATCH_CONCURRENCY = 32
+MAX_BATCH_SIZE = 100
+
+SEARCH_BACKENDS = ("remote", "local", "auto")
+LocalIndex = TypeVar("LocalIndex", LocalSearchIndex, VectorIndex)
+MAX_MULTI_SEARCH_QUERIES = 10
+MAX_LOCAL_ANSWER_DOCUMENTS = 25
+
+# Largest chunk of a document body returned by the section and range tools.
+DEFAULT_CHUNK_BYTES = 16 * 1024
+MAX_CHUNK_BYTES = 256 * 1024
+
+
+async def iter_outline_pages(
+    ctx: Context,
+    endpoint: str,
+    data: Optional[Dict[str, Any]] = None,
+    page_size: int = MAX_PAGE_SIZE,
+    max_results: Optional[int] = None,
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Walk a paginated Outline endpoint, yielding one page of items at a time.
+
+    The next page is prefetched while the current one is processed; see
+    pagination.iter_pages.
+
+    Args:
+        ctx: MCP context containing the HTTP client
+        endpoint: Paginated API endpoint
+        data: Request data; its offset is used as the starting point
+        page_size: Number of items requested per page (1-100)
+        max_results: Optional cap on the total number of items yielded
+
+    Yields:
+        Lists of raw items from the response "data" field
+    """
+
+    async def request(page_endpoint: str, page_data: Dict[str, Any]) -> Dict[str, Any]:
+        return await make_outline_request(ctx, page_endpoint, page_data)
+
+    async with aclosing(
+        iter_pages(request, endpoint, data, page_size, max_results)
+    ) as pages:
+        async for page in pages:
+            yield page
+
+
+async def fetch_list_results(
+    ctx: Context,
+    endpoint: str,
+    request_data: Dict[str, Any],
+    format_item: Callable[[Dict[str, Any]], Dict[str, Any]],
+    fetch_all: bool = False,
+    max_results: Optional[int] = None,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Fetch and format the items of a list or search endpoint.
+
+    Returns a single page unless fetch_all or max_results is given, in which case
+    pages are walked until they run out or max_results items were collected.
+    A single page comes with a next_cursor continuing after it; the request data
+    of a continued page is taken from its cursor.
+
+    Returns:
+        Tuple of the formatted items and the pagination metadata
+
+    Raises:
+        ValueError: If the cursor is invalid or combined with fetch_all or
+            max_results
+    """
+    if cursor is not None and (fetch_all or max_results is not None):
+        raise ValueError("cursor cannot be combined with fetch_all or max_results")
+
+    if not fetch_all and max_results is None:
+        page = await fetch_page(
+            lambda endpoint, data: make_outline_request(ctx, endpoint, data),
+            endpoint,
+            request_data,
+            cursor=cursor,
+            buffers=ctx.request_context.lifespan_context.page_buffers,
+        )
+        items = [format_item(item) for item in page.items]
+        pagination = {
+            "limit": page.limit,
+            "offset": page.offset,
+            "next_cursor": page.next_cursor,
+        }
+        return items, pagination
+
+    cap = min(max(max_results or DEFAULT_MAX_RESULTS, 1), MAX_RESULTS_LIMIT)
+    start = request_data.get("offset", 0)
+    formatted: List[Dict[str, Any]] = []
+    pages = 0
+
+    async for page in iter_outline_pages(ctx, endpoint, request_data, max_results=cap):
+        pages += 1
+        formatted.extend(format_item(item) for item in page)
+
+    pagination = {
+        "offset": start,
+        "pages": pages,
+        "max_results": cap,
+        "max_results_reached": len(formatted) >= cap,
+        "next_offset": start + len(formatted),
+    }
+    return formatted, pagination
+
+
+def _format_document(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Format a documents.info payload."""
+    return {
+        "id": doc.get("id"),
+        "title": doc.get("title"),
+        "text": doc.get("text"),
+        "url_id": doc.get("urlId"),
+        "emoji": doc.get("emoji"),
+        "collection_id": doc.get("collectionId"),
+        "parent_document_id": doc.get("parentDocumentId"),
+        "template": doc.get("template"),
+        "pinned": doc.get("pinned"),
+        "full_width": doc.get("fullWidth"),
+        "revision": doc.get("revision"),
+        "created_at": doc.get("createdAt"),
+        "updated_at": doc.get("updatedAt"),
+        "published_at": doc.get("publishedAt"),
+        "created_by": doc.get("createdBy", {}).get("name"),
+        "updated_by": doc.get("updatedBy", {}).get("name"),
+        "collaborators": [
+            collab.get("name") for collab in doc.get("collaborators", [])
+        ],
+    }
+
+
+def _format_search_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Format a documents.search result."""
+    doc = result.get("document", {})
+    return {
+        "id": doc.get("id"),
+        "title": doc.get("title"),
+        "url_id": doc.get("urlId"),
+        "context": result.get("context", ""),
+        "ranking": result.get("ranking"),
+        "collection_id": doc.get("collectionId"),
+        "created_at": doc.get("createdAt"),
+        "updated_at": doc.get("updatedAt"),
+        "created_by": doc.get("createdBy", {}).get("name"),
+        "updated_by": doc.get("updatedBy", {}).get("name"),
+    }
+
+
+def _format_listed_document(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Format a documents.list item."""
+    return {
+        "id": doc.get("id"),
+        "title": doc.get("title"),
+        "url_id": doc.get("urlId"),
+        "emoji": doc.get("emoji"),
+        "collection_id": doc.get("collectionId"),
+        "parent_document_id": doc.get("parentDocumentId"),
+        "template": doc.get("template"),
+        "pinned": doc.get("pinned"),
+        "revision": doc.get("revision"),
+        "created_at": doc.get("createdAt"),
+        "updated_at": doc.get("updatedAt"),
+        "published_at": doc.get("publishedAt"),
+        "created_by": doc.get("createdBy", {}).get("name"),
+        "updated_by": doc.get("updatedBy", {}).get("name"),
+    }
+
+
+def _format_draft_document(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Format a documents.drafts item."""
+    return {
+        "id": doc.get("id"),
+        "title": doc.get("title"),
+        "url_id": doc.get("urlId"),
+        "emoji": doc.get("emoji"),
+        "collection_id": doc.get("collectionId"),
+        "parent_document_id": doc.get("parentDocumentId"),
+        "template": doc.get("template"),
+        "revision": doc.get("revision"),
+        "created_at": doc.get("createdAt"),
+        "updated_at": doc.get("updatedAt"),
+        "created_by": doc.get("createdBy", {}).get("name"),
+        "updated_by": doc.get("updatedBy", {}).get("name"),
+    }
+
+
+def _format_viewed_document(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Format a documents.viewed item."""
+    return {
+        "id": doc.get("id"),
+        "title": doc.get("title"),
+        "url_id": doc.get("urlId"),
+        "emoji": doc.get("emoji"),
+        "collection_id": doc.get("collectionId"),
+        "parent_document_id": doc.get("parentDocumentId"),
+        "template": doc.get("template"),
+        "revision": doc.get("revision"),
+        "created_at": doc.get("createdAt"),
+        "updated_at": doc.get("updatedAt"),
+        "published_at": doc.get("publishedAt"),
+        "created_by": doc.get("createdBy", {}).get("name"),
+        "updated_by": doc.get("updatedBy", {}).get("name"),
+    }
+
+
+def _format_listed_collection(collection: Dict[str, Any]) -> Dict[str, Any]:
+    """Format a collections.list item."""
+    return {
+        "id": collection.get("id"),
+        "name": collection.get("name"),
+        "description": collection.get("description"),
+        "url_id": collection.get("urlId"),
+        "color": collection.get("color"),
+        "icon": collection.get("icon"),
+        "permission": collection.get("permission"),
+        "sharing": collection.get("sharing"),
+        "created_at": collection.get("createdAt"),
+        "updated_at": collection.get("updatedAt"),
+    }
+
+
+def _format_collection(collection: Dict[str, Any]) -> Dict[str, Any]:
+    """Format a collections.info response."""
+    return {
+        "id": collection.get("id"),
+        "name": collection.get("name"),
+        "description": collection.get("description"),
+        "url_id": collection.get("urlId"),
+        "color": collection.get("color"),
+        "icon": collection.get("icon"),
+        "permission": collection.get("permission"),
+        "sharing": collection.get("sharing"),
+        "sort": collection.get("sort"),
+        "index": collection.get("index"),
+        "created_at": collection.get("createdAt"),
+        "updated_at": collection.get("updatedAt"),
+        "archived_at": collection.get("archivedAt"),
+        "deleted_at": collection.get("deletedAt"),
+    }
+
+
+def _projection(
+    formatter: Callable[[Dict[str, Any]], Dict[str, Any]],
+    fields: Optional[List[str]],
+    kind: str,
+) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Compose an item formatter with a field projection.
+
+    Raises:
+        ValueError: If a requested field is not produced by the formatter
+    """
+    selected = validate_fields(fields, fields_of(formatter), kind)
+    if selected is None:
+        return formatter
+    return lambda item: project(formatter(item), selected)
+
+
+async def _local_index(
+    index: Optional[LocalIndex], backend: str, setting: str
+) -> Optional[LocalIndex]:
+    """
+    Return the local index a backend uses, or None to use Outline.
+
+    Args:
+        index: The local index, or None when it is disabled
+        backend: "remote", "local" or "auto" (local when the index is populated)
+        setting: Environment variable enabling the index, for error messages
+
+    Raises:
+        ValueError: If the backend is unknown, or local but the index is disabled
+    """
+    if backend not in SEARCH_BACKENDS:
+        raise ValueError(f"backend must be one of: {', '.join(SEARCH_BACKENDS)}")
+
+    if index is None:
+        if backend == "local":
+            raise ValueError(f"Local index is not enabled, set {setting}=true")
+        return None
+    if backend == "local":
+        return index
+    # Counting takes the index lock, which writers hold while they index.
+    if backend == "auto" and await asyncio.to_thread(len, index) > 0:
+        return index
+    return None
+
+
+def _search_request(
+    query: str,
+    limit: int,
+    offset: int,
+    collection_id: Optional[str] = None,
+    user_id: Optional[str] = None,
+    status_filter: Optional[str] = None,
+    date_filter: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Build the documents.search request data."""
+    request_data = {"query": query, "limit": limit, "offset": offset}
+    if collection_id:
+        request_data["collectionId"] = collection_id
+    if user_id:
+        request_data["userId"] = user_id
+    if status_filter:
+        request_data["statusFilter"] = status_filter
+    if date_filter:
+        request_data["dateFilter"] = date_filter
+    return request_data
+
+
 @mcp.tool()
+@instrumented
 async def search_documents(
     ctx: Context,
     query: str,
@@ -130,6 +1587,12 @@ async def search_documents(
     date_filter: Optional[str] = None,
     limit: int = 25,
     offset: int = 0,
+    fetch_all: bool = False,
+    max_results: Optional[int] = None,
+    cursor: Optional[str] = None,
+    backend: str = "remote",
+    fields: Optional[List[str]] = None,
+    format: str = DEFAULT_OUTPUT_FORMAT,
 ) -> str:
     """
     Search for documents using keywords.
@@ -142,73 +1605,236 @@ async def search_documents(
         date_filter: Optional date filter (day, week, month, year)
         limit: Number of results to return (1-100, default 25)
         offset: Pagination offset (default 0)
+        fetch_all: Walk all result pages instead of returning a single page
+        max_results: Maximum number of results when walking pages (default 1000,
+            at most 10000); implies fetch_all
+        cursor: next_cursor of a previous call, to continue after its page;
+            the other arguments except fields and format are taken from it.
+            Cursors continue searches in Outline, so not with backend "local".
+        backend: Where to search - "remote" (Outline), "local" (local index) or
+            "auto" (local index when populated, otherwise Outline)
+        fields: Optional fields to return for each result,
+            e.g. ["id", "title", "context"]
+        format: Output format - "compact" (default), "pretty" (indented JSON) or
+            "ndjson" (one result per line)
 
     Returns:
         JSON string containing search results with document snippets and metadata
     """
-    ctx.info(f"Searching documents for: {query}")
-
-    request_data = {"query": query, "limit": min(max(limit, 1), 100), "offset": offset}
+    if cursor is not None and backend == "local":
+        raise ValueError('cursor cannot be combined with backend="local"')
+    index = await _local_index(
+        ctx.request_context.lifespan_context.search_index,
+        backend,
+        "OUTLINE_LOCAL_INDEX",
+    )
+    validate_format(format)
+    format_result = _projection(_format_search_result, fields, "result")
+    # Cursors are only issued by Outline's search.
+    use_local = index is not None and cursor is None
 
-    if collection_id:
-        request_data["collectionId"] = collection_id
-    if user_id:
-        request_data["userId"] = user_id
-    if status_filter:
-        request_data["statusFilter"] = status_filter
-    if date_filter:
-        request_data["dateFilter"] = date_filter
+    ctx.info(f"Searching documents for: {query}")
 
-    response = await make_outline_request(ctx, "documents.search", request_data)
+    request_data = _search_request(
+        query,
+        min(max(limit, 1), 100),
+        offset,
+        collection_id,
+        user_id,
+        status_filter,
+        date_filter,
+    )
 
     # Format the response for better readability
-    results = response.get("data", [])
-    formatted_results = []
-
-    for result in results:
-        doc = result.get("document", {})
-        formatted_result = {
-            "id": doc.get("id"),
-            "title": doc.get("title"),
-            "url_id": doc.get("urlId"),
-            "context": result.get("context", ""),
-            "ranking": result.get("ranking"),
-            "collection_id": doc.get("collectionId"),
-            "created_at": doc.get("createdAt"),
-            "updated_at": doc.get("updatedAt"),
-            "created_by": doc.get("createdBy", {}).get("name"),
-            "updated_by": doc.get("updatedBy", {}).get("name"),
-        }
-        formatted_results.append(formatted_result)
-
-    pagination = response.get("pagination", {})
+    if use_local:
+        if fetch_all or max_results is not None:
+            local_limit = min(
+                max(max_results or DEFAULT_MAX_RESULTS, 1), MAX_RESULTS_LIMIT
+            )
+        else:
+            local_limit = request_data["limit"]
+        response = await asyncio.to_thread(
+            index.search,
+            query,
+            collection_id=collection_id,
+            user_id=user_id,
+            status_filter=status_filter,
+            date_filter=date_filter,
+            limit=local_limit,
+            offset=offset,
+        )
+        formatted_results = [format_result(r) for r in response["data"]]
+        pagination = response["pagination"]
+    else:
+        formatted_results, pagination = await fetch_list_results(
+            ctx,
+            "documents.search",
+            request_data,
+            format_result,
+            fetch_all=fetch_all,
+            max_results=max_results,
+            cursor=cursor,
+        )
 
     result_summary = {
         "query": query,
+        "backend": "local" if use_local else "remote",
         "total_results": len(formatted_results),
         "results": formatted_results,
         "pagination": pagination,
     }
 
-    import json
+    return render(result_summary, format, "results")
 
-    return json.dumps(result_summary, indent=2)
+
+@mcp.tool()
+@instrumented
+async def multi_search(
+    ctx: Context,
+    queries: List[str],
+    collection_id: Optional[str] = None,
+    user_id: Optional[str] = None,
+    status_filter: Optional[str] = None,
+    date_filter: Optional[str] = None,
+    limit_per_query: int = 25,
+    limit: int = 25,
+    backend: str = "remote",
+    fields: Optional[List[str]] = None,
+    format: str = DEFAULT_OUTPUT_FORMAT,
+) -> str:
+    """
+    Search for several phrasings of a question at once and merge the results.
+
+    The queries run concurrently. Results are merged by document with
+    reciprocal-rank fusion, so documents found by several queries rank first,
+    and repeated snippets are dropped.
+
+    Args:
+        queries: Search query strings (at most 10)
+        collection_id: Optional collection UUID to search within
+        user_id: Optional user UUID - filter to documents edited by this user
+        status_filter: Optional status filter (draft, archived, published)
+        date_filter: Optional date filter (day, week, month, year)
+        limit_per_query: Number of results fetched per query (1-100, default 25)
+        limit: Number of merged results to return (default 25)
+        backend: Where to search - "remote" (Outline), "local" (local index) or
+            "auto" (local index when populated, otherwise Outline)
+        fields: Optional fields to return for each result,
+            e.g. ["id", "title", "context"]
+        format: Output format - "compact" (default), "pretty" (indented JSON) or
+            "ndjson" (one result per line)
+
+    Returns:
+        JSON string containing the merged results, each with its fused score
+        and the indexes of the queries that found it, and per-query errors
+    """
+    unique_queries: List[str] = []
+    for query in queries:
+        query = query.strip()
+        if query and query.casefold() not in (q.casefold() for q in unique_queries):
+            unique_queries.append(query)
+    if not unique_queries:
+        raise ValueError("At least one non-empty query is required")
+    if len(unique_queries) > MAX_MULTI_SEARCH_QUERIES:
+        raise ValueError(f"At most {MAX_MULTI_SEARCH_QUERIES} queries can be searched")
+    index = await _local_index(
+        ctx.request_context.lifespan_context.search_index,
+        backend,
+        "OUTLINE_LOCAL_INDEX",
+    )
+    validate_format(format)
+    format_result = _projection(_format_search_result, fields, "result")
+
+    ctx.info(f"Searching documents for {len(unique_queries)} queries")
+
+    per_query = min(max(limit_per_query, 1), 100)
+    filters = {
+        "collection_id": collection_id,
+        "user_id": user_id,
+        "status_filter": status_filter,
+        "date_filter": date_filter,
+    }
+
+    async def search(query: str) -> List[Dict[str, Any]]:
+        try:
+            if index is not None:
+                response = await asyncio.to_thread(
+                    index.search, query, limit=per_query, **filters
+                )
+                return response["data"]
+            request_data = _search_request(query, per_query, 0, **filters)
+            response = await make_outline_request(ctx, "documents.search", request_data)
+        except Exception as e:
+            failed[query] = str(e)
+            return []
+        return response.get("data", [])
+
+    failed: Dict[str, str] = {}
+    result_lists = await asyncio.gather(*(search(q) for q in unique_queries))
+    errors = [{"query": q, "error": failed[q]} for q in unique_queries if q in failed]
+
+    fused = reciprocal_rank_fusion(result_lists)
+    results = []
+    for entry in fused[: max(limit, 1)]:
+        item = format_result(entry.result)
+        if "context" in item:
+            item["context"] = " … ".join(entry.snippets)
+        item["score"] = round(entry.score, 6)
+        item["matched_queries"] = entry.queries
+        results.append(item)
+
+    result_summary = {
+        "queries": unique_queries,
+        "backend": "local" if index is not None else "remote",
+        "unique_documents": len(fused),
+        "total_results": len(results),
+        "results": results,
+        "errors": errors,
+    }
+
+    return render(result_summary, format, "results")
 
 
 @mcp.tool()
+@instrumented
 async def get_document(
-    ctx: Context, document_id: str, share_id: Optional[str] = None
+    ctx: Context,
+    document_id: str,
+    share_id: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+    max_tokens: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+    query: Optional[str] = None,
+    truncation: str = "smart",
+    format: str = DEFAULT_OUTPUT_FORMAT,
 ) -> str:
     """
     Retrieve a document by its ID.
 
+    A text over budget is cut down to an excerpt and the result gets a
+    "truncation" entry; read the rest with get_document_range from its
+    next_byte.
+
     Args:
         document_id: Document UUID or urlId
         share_id: Optional share UUID if accessing via share link
+        fields: Optional document fields to return, e.g. ["id", "title", "text"]
+        max_tokens: Optional budget of estimated tokens for the text
+        max_bytes: Optional budget of bytes for the text
+        query: Optional terms whose surrounding paragraphs an excerpt keeps first
+        truncation: "smart" (default) to keep headings, first paragraphs and
+            query matches, or "head" to keep the beginning of the text
+        format: Output format - "compact" (default), "pretty" (indented JSON) or
+            "ndjson" (the document on a single line)
 
     Returns:
         JSON string containing full document details including content
     """
+    validate_format(format)
+    validate_truncation(truncation)
+    format_document = _projection(_format_document, fields, "document")
+    budget = _budget(ctx, max_tokens, max_bytes)
+
     ctx.info(f"Retrieving document: {document_id}")
 
     request_data = {"id": document_id}
@@ -217,37 +1843,145 @@ async def get_document(
 
     response = await make_outline_request(ctx, "documents.info", request_data)
 
-    doc = response.get("data", {})
-
     # Format the document data
-    formatted_doc = {
-        "id": doc.get("id"),
-        "title": doc.get("title"),
-        "text": doc.get("text"),
-        "url_id": doc.get("urlId"),
-        "emoji": doc.get("emoji"),
-        "collection_id": doc.get("collectionId"),
-        "parent_document_id": doc.get("parentDocumentId"),
-        "template": doc.get("template"),
-        "pinned": doc.get("pinned"),
-        "full_width": doc.get("fullWidth"),
-        "revision": doc.get("revision"),
-        "created_at": doc.get("createdAt"),
-        "updated_at": doc.get("updatedAt"),
-        "published_at": doc.get("publishedAt"),
-        "created_by": doc.get("createdBy", {}).get("name"),
-        "updated_by": doc.get("updatedBy", {}).get("name"),
-        "collaborators": [
-            collab.get("name") for collab in doc.get("collaborators", [])
-        ],
+    formatted_doc = format_document(response.get("data", {}))
+
+    text = formatted_doc.get("text")
+    if budget is not None and isinstance(text, str):
+        excerpt = truncate_text(text, budget, query, truncation)
+        if excerpt.truncated:
+            formatted_doc = {
+                **formatted_doc,
+                "text": excerpt.text,
+                "truncation": excerpt.as_dict(),
+            }
+
+    return render(formatted_doc, format)
+
+
+def _budget(
+    ctx: Context, max_tokens: Optional[int], max_bytes: Optional[int]
+) -> Optional[Budget]:
+    """Resolve the budget of a tool call, defaulting to OUTLINE_DEFAULT_MAX_TOKENS."""
+    config = ctx.request_context.lifespan_context.outline_config
+    return resolve_budget(max_tokens, max_bytes, config.default_max_tokens)
+
+
+@mcp.tool()
+@instrumented
+async def get_documents(
+    ctx: Context,
+    document_ids: List[str],
+    fields: Optional[List[str]] = None,
+    max_concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+    max_tokens: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+    query: Optional[str] = None,
+    truncation: str = "smart",
+    format: str = DEFAULT_OUTPUT_FORMAT,
+) -> str:
+    """
+    Retrieve several documents by their IDs in one call.
+
+    Documents are fetched concurrently and returned in the order of the input IDs.
+    A document that cannot be retrieved is reported with an error entry instead of
+    failing the whole batch.
+
+    The budget is shared by the texts of all documents. Texts over their share
+    are cut down to excerpts with a "truncation" entry; read the rest with
+    get_document_range from its next_byte.
+
+    Args:
+        document_ids: Document UUIDs or urlIds (at most 100)
+        fields: Optional document fields to return, e.g. ["id", "title", "text"]
+            (default all fields of get_document)
+        max_concurrency: Maximum number of concurrent requests (1-32, default 8)
+        max_tokens: Optional budget of estimated tokens for all texts together
+        max_bytes: Optional budget of bytes for all texts together
+        query: Optional terms whose surrounding paragraphs an excerpt keeps first
+        truncation: "smart" (default) to keep headings, first paragraphs and
+            query matches, or "head" to keep the beginning of each text
+        format: Output format - "compact" (default), "pretty" (indented JSON) or
+            "ndjson" (one document per line)
+
+    Returns:
+        JSON string containing the documents and per-document errors
+    """
+    if len(document_ids) > MAX_BATCH_SIZE:
+        raise ValueError(f"At most {MAX_BATCH_SIZE} document IDs can be requested")
+    validate_format(format)
+    validate_truncation(truncation)
+    format_document = _projection(_format_document, fields, "document")
+    budget = _budget(ctx, max_tokens, max_bytes)
+
+    ctx.info(f"Retrieving {len(document_ids)} documents")
+
+    semaphore = asyncio.Semaphore(min(max(max_concurrency, 1), MAX_BATCH_CONCURRENCY))
+
+    async def fetch(document_id: str) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                response = await make_outline_request(
+                    ctx, "documents.info", {"id": document_id}
+                )
+            except Exception as e:
+                return {"id": document_id, "error": str(e)}
+
+        return format_document(response.get("data", {}))
+
+    documents = await asyncio.gather(*(fetch(doc_id) for doc_id in document_ids))
+    if budget is not None:
+        _truncate_documents(documents, budget, query, truncation)
+    failed = sum(1 for doc in documents if "error" in doc)
+
+    result = {
+        "total_documents": len(documents),
+        "succeeded": len(documents) - failed,
+        "failed": failed,
+        "documents": documents,
     }
 
-    import json
+    return render(result, format, "documents")
 
-    return json.dumps(formatted_doc, indent=2)
+
+def _truncate_documents(
+    documents: List[Dict[str, Any]],
+    budget: Budget,
+    query: Optional[str],
+    truncation: str,
+) -> None:
+    """
+    Cut the texts of a batch of documents down to one shared budget, in place.
+
+    Shorter texts are fitted first, and what they leave of their share goes to
+    the longer ones.
+    """
+    with_text = sorted(
+        (i for i, doc in enumerate(documents) if isinstance(doc.get("text"), str)),
+        key=lambda i: len(documents[i]["text"]),
+    )
+    tokens, size = budget.max_tokens, budget.max_bytes
+    for position, i in enumerate(with_text):
+        remaining = len(with_text) - position
+        share = Budget(
+            max_tokens=None if tokens is None else tokens // remaining,
+            max_bytes=None if size is None else size // remaining,
+        )
+        excerpt = truncate_text(documents[i]["text"], share, query, truncation)
+        if excerpt.truncated:
+            documents[i] = {
+                **documents[i],
+                "text": excerpt.text,
+                "truncation": excerpt.as_dict(),
+            }
+        if tokens is not None:
+            tokens -= estimate_text_tokens(excerpt.text)
+        if size is not None:
+            size -= len(excerpt.text.encode("utf-8"))
 
 
 @mcp.tool()
+@instrumented
 async def list_documents(
     ctx: Context,
     collection_id: Optional[str] = None,
@@ -258,6 +1992,11 @@ async def list_documents(
     offset: int = 0,
     sort: str = "updatedAt",
     direction: str = "DESC",
+    fetch_all: bool = False,
+    max_results: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+    format: str = DEFAULT_OUTPUT_FORMAT,
 ) -> str:
     """
     List documents with various filters.
@@ -271,10 +2010,22 @@ async def list_documents(
         offset: Pagination offset (default 0)
         sort: Sort field (default updatedAt)
         direction: Sort direction - ASC or DESC (default DESC)
+        fetch_all: Walk all result pages instead of returning a single page
+        max_results: Maximum number of results when walking pages (default 1000,
+            at most 10000); implies fetch_all
+        cursor: next_cursor of a previous call, to continue after its page;
+            the other arguments except fields and format are taken from it
+        fields: Optional fields to return for each document,
+            e.g. ["id", "title", "updated_at"]
+        format: Output format - "compact" (default), "pretty" (indented JSON) or
+            "ndjson" (one document per line)
 
     Returns:
         JSON string containing list of documents
     """
+    validate_format(format)
+    format_item = _projection(_format_listed_document, fields, "document")
+
     ctx.info("Listing documents")
 
     request_data = {
@@ -293,32 +2044,16 @@ async def list_documents(
     if template is not None:
         request_data["template"] = template
 
-    response = await make_outline_request(ctx, "documents.list", request_data)
-
     # Format the response
-    documents = response.get("data", [])
-    formatted_docs = []
-
-    for doc in documents:
-        formatted_doc = {
-            "id": doc.get("id"),
-            "title": doc.get("title"),
-            "url_id": doc.get("urlId"),
-            "emoji": doc.get("emoji"),
-            "collection_id": doc.get("collectionId"),
-            "parent_document_id": doc.get("parentDocumentId"),
-            "template": doc.get("template"),
-            "pinned": doc.get("pinned"),
-            "revision": doc.get("revision"),
-            "created_at": doc.get("createdAt"),
-            "updated_at": doc.get("updatedAt"),
-            "published_at": doc.get("publishedAt"),
-            "created_by": doc.get("createdBy", {}).get("name"),
-            "updated_by": doc.get("updatedBy", {}).get("name"),
-        }
-        formatted_docs.append(formatted_doc)
-
-    pagination = response.get("pagination", {})
+    formatted_docs, pagination = await fetch_list_results(
+        ctx,
+        "documents.list",
+        request_data,
+        format_item,
+        fetch_all=fetch_all,
+        max_results=max_results,
+        cursor=cursor,
+    )
 
     result = {
         "total_documents": len(formatted_docs),
@@ -326,12 +2061,23 @@ async def list_documents(
         "pagination": pagination,
     }
 
-    import json
+    return render(result, format, "documents")
 
-    return json.dumps(result, indent=2)
+
+def _format_answer_document(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Format a supporting document of answer_question."""
+    return {
+        "id": doc.get("id"),
+        "title": doc.get("title"),
+        "url_id": doc.get("urlId"),
+        "collection_id": doc.get("collectionId"),
+        "created_at": doc.get("createdAt"),
+        "updated_at": doc.get("updatedAt"),
+    }
 
 
 @mcp.tool()
+@instrumented
 async def answer_question(
     ctx: Context,
     question: str,
@@ -340,10 +2086,15 @@ async def answer_question(
     user_id: Optional[str] = None,
     status_filter: Optional[str] = None,
     date_filter: Optional[str] = None,
+    backend: str = "remote",
+    limit: int = 5,
+    format: str = DEFAULT_OUTPUT_FORMAT,
 ) -> str:
     """
     Ask a natural language question about your documents using AI.
-    Note: This requires "AI answers" to be enabled in your Outline workspace.
+    Note: The remote backend requires "AI answers" to be enabled in your Outline
+    workspace. The local backend retrieves supporting passages from the local
+    vector index instead and returns no generated answer.
 
     Args:
         question: Natural language question to ask
@@ -352,12 +2103,54 @@ async def answer_question(
         user_id: Optional user UUID to filter by
         status_filter: Optional status filter (draft, archived, published)
         date_filter: Optional date filter (day, week, month, year)
+        backend: Where to answer - "remote" (Outline AI), "local" (local vector
+            index) or "auto" (local index when populated, otherwise Outline)
+        limit: Number of supporting documents of the local backend (1-25,
+            default 5)
+        format: Output format - "compact" (default) or "pretty" (indented JSON)
 
     Returns:
         JSON string containing the AI-generated answer and supporting documents
     """
+    index = await _local_index(
+        ctx.request_context.lifespan_context.vector_index,
+        backend,
+        "OUTLINE_VECTOR_INDEX",
+    )
+    validate_format(format)
+
     ctx.info(f"Answering question: {question}")
 
+    if index is not None:
+        results = await asyncio.to_thread(
+            index.search,
+            question,
+            collection_id=collection_id,
+            document_id=document_id,
+            user_id=user_id,
+            status_filter=status_filter,
+            date_filter=date_filter,
+            limit=min(max(limit, 1), MAX_LOCAL_ANSWER_DOCUMENTS),
+        )
+        result = {
+            "question": question,
+            "answer": None,
+            "supporting_documents": [
+                {
+                    **_format_answer_document(r["document"]),
+                    "score": r["score"],
+                    "passages": r["passages"],
+                }
+                for r in results
+            ],
+            "search_metadata": {
+                "query": question,
+                "source": "local",
+                "embedder": index.embedder_name,
+            },
+        }
+        return render(result, format)
+
     request_data = {"query": question}
 
     if collection_id:
@@ -377,22 +2170,10 @@ async def answer_question(
     search_result = response.get("search", {})
     documents = response.get("documents", [])
 
-    formatted_docs = []
-    for doc in documents:
-        formatted_doc = {
-            "id": doc.get("id"),
-            "title": doc.get("title"),
-            "url_id": doc.get("urlId"),
-            "collection_id": doc.get("collectionId"),
-            "created_at": doc.get("createdAt"),
-            "updated_at": doc.get("updatedAt"),
-        }
-        formatted_docs.append(formatted_doc)
-
     result = {
         "question": question,
         "answer": search_result.get("answer"),
-        "supporting_documents": formatted_docs,
+        "supporting_documents": [_format_answer_document(doc) for doc in documents],
         "search_metadata": {
             "id": search_result.get("id"),
             "query": search_result.get("query"),
@@ -401,31 +2182,279 @@ async def answer_question(
         },
     }
 
-    import json
-
-    return json.dumps(result, indent=2)
+    return render(result, format)
 
 
 @mcp.tool()
-async def export_document(ctx: Context, document_id: str) -> str:
+@instrumented
+async def export_document(
+    ctx: Context,
+    document_id: str,
+    max_tokens: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+    query: Optional[str] = None,
+    truncation: str = "smart",
+) -> str:
     """
     Export a document as Markdown.
 
+    Markdown over budget is cut down to an excerpt followed by a note pointing
+    to the section tools. Exported Markdown is not byte for byte the text those
+    tools read, so the note gives no offset to continue from.
+
     Args:
         document_id: Document UUID or urlId to export
+        max_tokens: Optional budget of estimated tokens
+        max_bytes: Optional budget of bytes
+        query: Optional terms whose surrounding paragraphs an excerpt keeps first
+        truncation: "smart" (default) to keep headings, first paragraphs and
+            query matches, or "head" to keep the beginning
 
     Returns:
         The document content in Markdown format
     """
+    validate_truncation(truncation)
+    budget = _budget(ctx, max_tokens, max_bytes)
+
     ctx.info(f"Exporting document: {document_id}")
 
     request_data = {"id": document_id}
     response = await make_outline_request(ctx, "documents.export", request_data)
 
-    return response.get("data", "")
+    markdown = response.get("data", "")
+    if budget is None or not isinstance(markdown, str):
+        return markdown
+    excerpt = truncate_text(markdown, budget, query, truncation)
+    if not excerpt.truncated:
+        return markdown
+    return (
+        f"{excerpt.text}\n[Excerpt of {excerpt.shown_bytes} of "
+        f"{excerpt.total_bytes} bytes; list the sections with get_document_outline "
+        f"and read on with get_document_section]\n"
+    )
+
+
+async def _load_document_outline(
+    ctx: Context, document_id: str
+) -> Tuple[Dict[str, Any], bytes, DocumentOutline]:
+    """Fetch a document and return it with its encoded body and parsed outline."""
+    response = await make_outline_request(ctx, "documents.info", {"id": document_id})
+    doc = response.get("data", {})
+    text = doc.get("text") or ""
+
+    cache = ctx.request_context.lifespan_context.outline_cache
+    if cache is None:
+        outline = DocumentOutline.parse(text)
+    else:
+        outline = cache.get_or_parse(
+            doc.get("id") or document_id, revision_marker(doc), text
+        )
+    return doc, text.encode("utf-8"), outline
+
+
+def _document_chunk(
+    doc: Dict[str, Any],
+    encoded: bytes,
+    outline: DocumentOutline,
+    start: int,
+    end: int,
+    max_bytes: int,
+    max_tokens: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Cut a byte range of a document body, truncated to at most max_bytes.
+
+    A truncated chunk ends on a line boundary when at least one full line fits,
+    and is cut further to fit max_tokens estimated tokens.
+    """
+    max_bytes = min(max(max_bytes, 1), MAX_CHUNK_BYTES)
+    start, end = snap_to_characters(encoded, start, end)
+    truncated = end - start > max_bytes
+    if truncated:
+        limit = start + max_bytes
+        line_end = outline.line_offsets[outline.line_at(limit) - 1]
+        end = line_end if line_end > start else limit
+        start, end = snap_to_characters(encoded, start, end)
+    if max_tokens is not None:
+        excerpt = truncate_text(
+            encoded[start:end].decode("utf-8"),
+            Budget(max_tokens=max_tokens),
+            mode="head",
+        )
+        if excerpt.truncated:
+            truncated = True
+            end = start + excerpt.shown_bytes
+
+    return {
+        "id": doc.get("id"),
+        "title": doc.get("title"),
+        "revision": doc.get("revision"),
+        "byte_start": start,
+        "byte_end": end,
+        "line_start": outline.line_at(start),
+        "line_end": outline.line_at(max(start, end - 1)),
+        "total_bytes": outline.size,
+        "total_lines": outline.lines,
+        "truncated": truncated,
+        "next_byte": end if end < outline.size else None,
+        "text": encoded[start:end].decode("utf-8"),
+    }
+
+
+@mcp.tool()
+@instrumented
+async def get_document_outline(
+    ctx: Context,
+    document_id: str,
+    max_level: int = 6,
+    format: str = DEFAULT_OUTPUT_FORMAT,
+) -> str:
+    """
+    Get the table of contents of a document without its body.
+
+    Each heading comes with its byte and line span and an estimated token count,
+    so a single section can then be read with get_document_section or
+    get_document_range.
+
+    Args:
+        document_id: Document UUID or urlId
+        max_level: Deepest heading level to include (1-6, default 6)
+        format: Output format - "compact" (default), "pretty" (indented JSON) or
+            "ndjson" (one section per line)
+
+    Returns:
+        JSON string containing document metadata and its sections
+    """
+    validate_format(format)
+    ctx.info(f"Outlining document: {document_id}")
+
+    doc, _, outline = await _load_document_outline(ctx, document_id)
+
+    result = {
+        "id": doc.get("id"),
+        "title": doc.get("title"),
+        "revision": doc.get("revision"),
+        "total_bytes": outline.size,
+        "total_lines": outline.lines,
+        "estimated_tokens": outline.tokens,
+        "sections": outline.toc(max_level),
+    }
+
+    return render(result, format, "sections")
+
+
+@mcp.tool()
+@instrumented
+async def get_document_section(
+    ctx: Context,
+    document_id: str,
+    heading: Optional[str] = None,
+    index: Optional[int] = None,
+    include_subsections: bool = True,
+    max_bytes: int = DEFAULT_CHUNK_BYTES,
+    max_tokens: Optional[int] = None,
+    format: str = DEFAULT_OUTPUT_FORMAT,
+) -> str:
+    """
+    Read a single section of a document.
+
+    Args:
+        document_id: Document UUID or urlId
+        heading: Heading title or anchor of the section, e.g. "Deployment"
+        index: Index of the section in get_document_outline (instead of heading)
+        include_subsections: Include the text of nested subsections (default true)
+        max_bytes: Maximum bytes of text to return (default 16384, at most
+            262144); read the rest with get_document_range from next_byte
+        max_tokens: Optional maximum of estimated tokens of text to return
+        format: Output format - "compact" (default) or "pretty" (indented JSON)
+
+    Returns:
+        JSON string containing the section text and its position in the document
+    """
+    validate_format(format)
+    validate_budget("max_tokens", max_tokens)
+    if (heading is None) == (index is None):
+        raise ValueError("Specify exactly one of heading or index")
+
+    ctx.info(f"Reading section of document: {document_id}")
+
+    doc, encoded, outline = await _load_document_outline(ctx, document_id)
+
+    if index is not None:
+        if not 0 <= index < len(outline.sections):
+            raise ValueError(
+                f"Section index {index} out of range, the document has "
+                f"{len(outline.sections)} sections"
+            )
+        section = outline.sections[index]
+    else:
+        section = outline.find(heading)
+        if section is None:
+            raise ValueError(f"No section with heading {heading!r}")
+
+    end = section.byte_end if include_subsections else section.body_end
+    result = _document_chunk(
+        doc, encoded, outline, section.byte_start, end, max_bytes, max_tokens
+    )
+    result["section"] = section.as_dict()
+
+    return render(result, format)
+
+
+@mcp.tool()
+@instrumented
+async def get_document_range(
+    ctx: Context,
+    document_id: str,
+    start_line: Optional[int] = None,
+    end_line: Optional[int] = None,
+    start_byte: Optional[int] = None,
+    end_byte: Optional[int] = None,
+    max_bytes: int = DEFAULT_CHUNK_BYTES,
+    max_tokens: Optional[int] = None,
+    format: str = DEFAULT_OUTPUT_FORMAT,
+) -> str:
+    """
+    Read a range of lines or bytes of a document.
+
+    Args:
+        document_id: Document UUID or urlId
+        start_line: First line to return (1-based)
+        end_line: Last line to return, inclusive (default end of document)
+        start_byte: First byte to return (instead of lines)
+        end_byte: Byte offset to stop at, exclusive (default end of document)
+        max_bytes: Maximum bytes of text to return (default 16384, at most
+            262144); continue from next_byte
+        max_tokens: Optional maximum of estimated tokens of text to return
+        format: Output format - "compact" (default) or "pretty" (indented JSON)
+
+    Returns:
+        JSON string containing the text and its position in the document
+    """
+    validate_format(format)
+    validate_budget("max_tokens", max_tokens)
+    by_line = start_line is not None or end_line is not None
+    by_byte = start_byte is not None or end_byte is not None
+    if by_line and by_byte:
+        raise ValueError("Specify either a line range or a byte range, not both")
+
+    ctx.info(f"Reading range of document: {document_id}")
+
+    doc, encoded, outline = await _load_document_outline(ctx, document_id)
+
+    if by_line:
+        start, end = outline.line_range(start_line or 1, end_line)
+    else:
+        start = start_byte or 0
+        end = outline.size if end_byte is None else end_byte
+
+    result = _document_chunk(doc, encoded, outline, start, end, max_bytes, max_tokens)
+
+    return render(result, format)
 
 
 @mcp.tool()
+@instrumented
 async def list_collections(
     ctx: Context,
     query: Optional[str] = None,
@@ -433,6 +2462,11 @@ async def list_collections(
     offset: int = 0,
     sort: str = "updatedAt",
     direction: str = "DESC",
+    fetch_all: bool = False,
+    max_results: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+    format: str = DEFAULT_OUTPUT_FORMAT,
 ) -> str:
     """
     List all collections.
@@ -443,10 +2477,21 @@ async def list_collections(
         offset: Pagination offset (default 0)
         sort: Sort field (default updatedAt)
         direction: Sort direction - ASC or DESC (default DESC)
+        fetch_all: Walk all result pages instead of returning a single page
+        max_results: Maximum number of results when walking pages (default 1000,
+            at most 10000); implies fetch_all
+        cursor: next_cursor of a previous call, to continue after its page;
+            the other arguments except fields and format are taken from it
+        fields: Optional fields to return for each collection, e.g. ["id", "name"]
+        format: Output format - "compact" (default), "pretty" (indented JSON) or
+            "ndjson" (one collection per line)
 
     Returns:
         JSON string containing list of collections
     """
+    validate_format(format)
+    format_item = _projection(_format_listed_collection, fields, "collection")
+
     ctx.info("Listing collections")
 
     request_data = {
@@ -459,28 +2504,16 @@ async def list_collections(
     if query:
         request_data["query"] = query
 
-    response = await make_outline_request(ctx, "collections.list", request_data)
-
     # Format the response
-    collections = response.get("data", [])
-    formatted_collections = []
-
-    for collection in collections:
-        formatted_collection = {
-            "id": collection.get("id"),
-            "name": collection.get("name"),
-            "description": collection.get("description"),
-            "url_id": collection.get("urlId"),
-            "color": collection.get("color"),
-            "icon": collection.get("icon"),
-            "permission": collection.get("permission"),
-            "sharing": collection.get("sharing"),
-            "created_at": collection.get("createdAt"),
-            "updated_at": collection.get("updatedAt"),
-        }
-        formatted_collections.append(formatted_collection)
-
-    pagination = response.get("pagination", {})
+    formatted_collections, pagination = await fetch_list_results(
+        ctx,
+        "collections.list",
+        request_data,
+        format_item,
+        fetch_all=fetch_all,
+        max_results=max_results,
+        cursor=cursor,
+    )
 
     result = {
         "total_collections": len(formatted_collections),
@@ -488,78 +2521,324 @@ async def list_collections(
         "pagination": pagination,
     }
 
-    import json
-
-    return json.dumps(result, indent=2)
+    return render(result, format, "collections")
 
 
 @mcp.tool()
-async def get_collection(ctx: Context, collection_id: str) -> str:
+@instrumented
+async def get_collection(
+    ctx: Context,
+    collection_id: str,
+    fields: Optional[List[str]] = None,
+    format: str = DEFAULT_OUTPUT_FORMAT,
+) -> str:
     """
     Retrieve a collection by its ID.
 
     Args:
         collection_id: Collection UUID to retrieve
+        fields: Optional collection fields to return, e.g. ["id", "name"]
+        format: Output format - "compact" (default) or "pretty" (indented JSON)
 
     Returns:
         JSON string containing collection details
     """
+    validate_format(format)
+    format_collection = _projection(_format_collection, fields, "collection")
+
     ctx.info(f"Retrieving collection: {collection_id}")
 
     request_data = {"id": collection_id}
     response = await make_outline_request(ctx, "collections.info", request_data)
 
-    collection = response.get("data", {})
-
     # Format the collection data
-    formatted_collection = {
-        "id": collection.get("id"),
-        "name": collection.get("name"),
-        "description": collection.get("description"),
-        "url_id": collection.get("urlId"),
-        "color": collection.get("color"),
-        "icon": collection.get("icon"),
-        "permission": collection.get("permission"),
-        "sharing": collection.get("sharing"),
-        "sort": collection.get("sort"),
-        "index": collection.get("index"),
-        "created_at": collection.get("createdAt"),
-        "updated_at": collection.get("updatedAt"),
-        "archived_at": collection.get("archivedAt"),
-        "deleted_at": collection.get("deletedAt"),
-    }
+    formatted_collection = format_collection(response.get("data", {}))
+
+    return render(formatted_collection, format)
 
-    import json
 
-    return json.dumps(formatted_collection, indent=2)
+def _export_destination(config: OutlineConfig, destination: str) -> str:
+    """
+    Resolve an export destination below the export directory.
+
+    Raises:
+        ValueError: If the destination is outside the export directory
+    """
+    root = os.path.realpath(config.export_dir)
+    path = os.path.realpath(os.path.join(root, destination))
+    if path == root or os.path.commonpath([root, path]) != root:
+        raise ValueError(
+            f"Export destination must be a path inside the export directory "
+            f"({config.export_dir}), set OUTLINE_EXPORT_DIR to export elsewhere"
+        )
+    return path
+
+
+async def _load_collection_tree(ctx: Context, collection_id: str) -> CollectionTree:
+    """
+    Return the indexed document tree of a collection.
+
+    The tree is reused while the collection's updatedAt is unchanged.
+    """
+    info = await make_outline_request(ctx, "collections.info", {"id": collection_id})
+    collection = info.get("data") or {}
+    canonical_id = collection.get("id") or collection_id
+    marker = collection.get("updatedAt")
+
+    trees = ctx.request_context.lifespan_context.collection_trees
+    if trees is not None:
+        tree = trees.get(canonical_id, marker)
+        if tree is not None:
+            return tree
+
+    response = await make_outline_request(
+        ctx, "collections.documents", {"id": canonical_id}
+    )
+    tree = CollectionTree(canonical_id, response.get("data") or [], marker)
+    if trees is not None:
+        trees.put(tree)
+    return tree
+
+
+def _format_tree_node(node: Dict[str, Any]) -> Dict[str, Any]:
+    """Format a document of a collection tree (see TreeNode.as_dict)."""
+    return {
+        "id": node.get("id"),
+        "title": node.get("title"),
+        "url": node.get("url"),
+        "parent_id": node.get("parent_id"),
+        "depth": node.get("depth"),
+        "path": node.get("path"),
+        "children": node.get("children"),
+    }
 
 
 @mcp.tool()
-async def get_collection_documents(ctx: Context, collection_id: str) -> str:
+@instrumented
+async def get_collection_documents(
+    ctx: Context,
+    collection_id: str,
+    max_tokens: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+    format: str = DEFAULT_OUTPUT_FORMAT,
+) -> str:
     """
     Retrieve the document structure/navigation tree for a collection.
 
+    A tree over budget is cut to the levels that fit. Documents whose children
+    were cut off have a "more" count; list them with list_subtree.
+
     Args:
         collection_id: Collection UUID to get documents for
+        max_tokens: Optional budget of estimated tokens for the tree
+        max_bytes: Optional budget of bytes for the tree
+        format: Output format - "compact" (default) or "pretty" (indented JSON)
 
     Returns:
         JSON string containing the hierarchical document structure
     """
+    validate_format(format)
+    budget = _budget(ctx, max_tokens, max_bytes)
+
     ctx.info(f"Retrieving document structure for collection: {collection_id}")
 
-    request_data = {"id": collection_id}
-    response = await make_outline_request(ctx, "collections.documents", request_data)
+    tree = await _load_collection_tree(ctx, collection_id)
+
+    result: Dict[str, Any] = {
+        "collection_id": collection_id,
+        "document_tree": tree.raw,
+    }
+    if budget is not None:
+        result.update(_fit_tree(tree, budget))
+
+    return render(result, format)
+
+
+def _fit_tree(tree: CollectionTree, budget: Budget) -> Dict[str, Any]:
+    """Cut a collection tree to the most levels, then top-level documents, that fit."""
+    if budget.fits_text(jsoncodec.dumps(tree.raw)):
+        return {}
+
+    for depth in range(tree.depth - 1, 0, -1):
+        nodes = tree.pruned(depth)
+        if budget.fits_text(jsoncodec.dumps(nodes)):
+            break
+    else:
+        # Not even the top level fits: keep as many top-level documents as fit.
+        depth = 1
+        roots = tree.pruned(1)
+        low, high = 0, len(roots)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if budget.fits_text(jsoncodec.dumps(roots[:middle])):
+                low = middle
+            else:
+                high = middle - 1
+        nodes = roots[:low]
+
+    return {
+        "document_tree": nodes,
+        "truncation": {
+            "max_depth": depth,
+            "total_documents": len(tree),
+            "shown_roots": len(nodes),
+            "total_roots": len(tree.roots),
+        },
+    }
+
+
+@mcp.tool()
+@instrumented
+async def resolve_document_path(
+    ctx: Context,
+    collection_id: str,
+    path: str,
+    format: str = DEFAULT_OUTPUT_FORMAT,
+) -> str:
+    """
+    Find documents in a collection by title or title path.
+
+    Uses the cached document tree of the collection, so repeated lookups do not
+    download the tree again.
+
+    Args:
+        collection_id: Collection UUID or urlId to search in
+        path: Document title, or titles separated by "/" such as
+            "Engineering/Runbooks/Deploy". Case and extra whitespace are
+            ignored, and a path may omit leading ancestors.
+        format: Output format - "compact" (default), "pretty" (indented JSON) or
+            "ndjson" (one match per line)
+
+    Returns:
+        JSON string containing the matching documents with their ancestors
+    """
+    validate_format(format)
+    if not path.strip("/ "):
+        raise ValueError("path must contain at least one title")
+
+    tree = await _load_collection_tree(ctx, collection_id)
+    matches = [
+        {
+            **_format_tree_node(node.as_dict()),
+            "ancestors": [
+                {"id": ancestor.id, "title": ancestor.title}
+                for ancestor in tree.ancestors(node.id)
+            ],
+        }
+        for node in tree.resolve(path)
+    ]
+
+    result = {
+        "collection_id": tree.collection_id,
+        "path": path,
+        "matches": matches,
+        "count": len(matches),
+    }
+    return render(result, format, items_key="matches")
+
+
+@mcp.tool()
+@instrumented
+async def list_subtree(
+    ctx: Context,
+    collection_id: str,
+    document_id: Optional[str] = None,
+    max_depth: Optional[int] = None,
+    fields: Optional[List[str]] = None,
+    format: str = DEFAULT_OUTPUT_FORMAT,
+) -> str:
+    """
+    List the documents below a document, or all documents of a collection.
+
+    Documents are listed depth first with their depth, parent and title path,
+    from the cached document tree of the collection.
+
+    Args:
+        collection_id: Collection UUID or urlId the document belongs to
+        document_id: Document UUID whose descendants to list; omit for the whole
+            collection
+        max_depth: Number of levels below the document to include (default all)
+        fields: Optional document fields to return, e.g. ["id", "title", "depth"]
+        format: Output format - "compact" (default), "pretty" (indented JSON) or
+            "ndjson" (one document per line)
+
+    Returns:
+        JSON string containing the documents of the subtree
+    """
+    validate_format(format)
+    format_node = _projection(_format_tree_node, fields, "document")
+    if max_depth is not None and max_depth < 1:
+        raise ValueError("max_depth must be at least 1")
+
+    tree = await _load_collection_tree(ctx, collection_id)
+    if document_id is not None and document_id not in tree:
+        raise ValueError(f"Document {document_id} is not in collection {collection_id}")
+
+    documents = [
+        format_node(node.as_dict()) for node in tree.subtree(document_id, max_depth)
+    ]
+
+    result = {
+        "collection_id": tree.collection_id,
+        "document_id": document_id,
+        "documents": documents,
+        "count": len(documents),
+    }
+    return render(result, format, items_key="documents")
+
+
+@mcp.tool()
+@instrumented
+async def export_collection(
+    ctx: Context,
+    collection_id: str,
+    destination: str,
+    full: bool = False,
+    max_concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+    format: str = DEFAULT_OUTPUT_FORMAT,
+) -> str:
+    """
+    Export every document of a collection as Markdown files.
+
+    Documents are written to a directory, or to a tar or zip archive, laid out by
+    title path. Re-running an export to the same destination only downloads
+    documents changed since the previous export.
+
+    Args:
+        collection_id: Collection UUID to export
+        destination: Directory, or archive file ending in .zip, .tar, .tar.gz
+            or .tgz, relative to the export directory (OUTLINE_EXPORT_DIR)
+        full: Download every document even if it is unchanged
+        max_concurrency: Maximum number of concurrent downloads (1-32, default 8)
+        format: Output format - "compact" (default) or "pretty" (indented JSON)
+
+    Returns:
+        JSON string containing counts of fetched, unchanged and removed documents
+        and the documents that failed to download
+    """
+    validate_format(format)
+    app_context = ctx.request_context.lifespan_context
+    path = _export_destination(app_context.outline_config, destination)
 
-    documents = response.get("data", [])
+    ctx.info(f"Exporting collection {collection_id} to {path}")
 
-    result = {"collection_id": collection_id, "document_tree": documents}
+    async def request(endpoint: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        # Bulk downloads would only evict the working set from the cache.
+        return await outline_request(app_context, endpoint, data, use_cache=False)
 
-    import json
+    tree = await _load_collection_tree(ctx, collection_id)
+    exporter = CollectionExporter(
+        request,
+        max_concurrency=min(max(max_concurrency, 1), MAX_BATCH_CONCURRENCY),
+    )
+    export_result = await exporter.export(tree, path, full=full)
+    result = {"collection_id": tree.collection_id, **export_result.as_dict()}
 
-    return json.dumps(result, indent=2)
+    return render(result, format)
 
 
 @mcp.tool()
+@instrumented
 async def list_draft_documents(
     ctx: Context,
     collection_id: Optional[str] = None,
@@ -568,6 +2847,11 @@ async def list_draft_documents(
     offset: int = 0,
     sort: str = "updatedAt",
     direction: str = "DESC",
+    fetch_all: bool = False,
+    max_results: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+    format: str = DEFAULT_OUTPUT_FORMAT,
 ) -> str:
     """
     List all draft documents belonging to the current user.
@@ -579,10 +2863,22 @@ async def list_draft_documents(
         offset: Pagination offset (default 0)
         sort: Sort field (default updatedAt)
         direction: Sort direction - ASC or DESC (default DESC)
+        fetch_all: Walk all result pages instead of returning a single page
+        max_results: Maximum number of results when walking pages (default 1000,
+            at most 10000); implies fetch_all
+        cursor: next_cursor of a previous call, to continue after its page;
+            the other arguments except fields and format are taken from it
+        fields: Optional fields to return for each document,
+            e.g. ["id", "title", "updated_at"]
+        format: Output format - "compact" (default), "pretty" (indented JSON) or
+            "ndjson" (one document per line)
 
     Returns:
         JSON string containing list of draft documents
     """
+    validate_format(format)
+    format_item = _projection(_format_draft_document, fields, "document")
+
     ctx.info("Listing draft documents")
 
     request_data = {
@@ -597,30 +2893,16 @@ async def list_draft_documents(
     if date_filter:
         request_data["dateFilter"] = date_filter
 
-    response = await make_outline_request(ctx, "documents.drafts", request_data)
-
     # Format the response
-    documents = response.get("data", [])
-    formatted_docs = []
-
-    for doc in documents:
-        formatted_doc = {
-            "id": doc.get("id"),
-            "title": doc.get("title"),
-            "url_id": doc.get("urlId"),
-            "emoji": doc.get("emoji"),
-            "collection_id": doc.get("collectionId"),
-            "parent_document_id": doc.get("parentDocumentId"),
-            "template": doc.get("template"),
-            "revision": doc.get("revision"),
-            "created_at": doc.get("createdAt"),
-            "updated_at": doc.get("updatedAt"),
-            "created_by": doc.get("createdBy", {}).get("name"),
-            "updated_by": doc.get("updatedBy", {}).get("name"),
-        }
-        formatted_docs.append(formatted_doc)
-
-    pagination = response.get("pagination", {})
+    formatted_docs, pagination = await fetch_list_results(
+        ctx,
+        "documents.drafts",
+        request_data,
+        format_item,
+        fetch_all=fetch_all,
+        max_results=max_results,
+        cursor=cursor,
+    )
 
     result = {
         "total_drafts": len(formatted_docs),
@@ -628,18 +2910,22 @@ async def list_draft_documents(
         "pagination": pagination,
     }
 
-    import json
-
-    return json.dumps(result, indent=2)
+    return render(result, format, "draft_documents")
 
 
 @mcp.tool()
+@instrumented
 async def list_recently_viewed_documents(
     ctx: Context,
     limit: int = 25,
     offset: int = 0,
     sort: str = "updatedAt",
     direction: str = "DESC",
+    fetch_all: bool = False,
+    max_results: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+    format: str = DEFAULT_OUTPUT_FORMAT,
 ) -> str:
     """
     List all documents recently viewed by the current user.
@@ -649,10 +2935,22 @@ async def list_recently_viewed_documents(
         offset: Pagination offset (default 0)
         sort: Sort field (default updatedAt)
         direction: Sort direction - ASC or DESC (default DESC)
+        fetch_all: Walk all result pages instead of returning a single page
+        max_results: Maximum number of results when walking pages (default 1000,
+            at most 10000); implies fetch_all
+        cursor: next_cursor of a previous call, to continue after its page;
+            the other arguments except fields and format are taken from it
+        fields: Optional fields to return for each document,
+            e.g. ["id", "title", "updated_at"]
+        format: Output format - "compact" (default), "pretty" (indented JSON) or
+            "ndjson" (one document per line)
 
     Returns:
         JSON string containing list of recently viewed documents
     """
+    validate_format(format)
+    format_item = _projection(_format_viewed_document, fields, "document")
+
     ctx.info("Listing recently viewed documents")
 
     request_data = {
@@ -662,31 +2960,16 @@ async def list_recently_viewed_documents(
         "direction": direction,
     }
 
-    response = await make_outline_request(ctx, "documents.viewed", request_data)
-
     # Format the response
-    documents = response.get("data", [])
-    formatted_docs = []
-
-    for doc in documents:
-        formatted_doc = {
-            "id": doc.get("id"),
-            "title": doc.get("title"),
-            "url_id": doc.get("urlId"),
-            "emoji": doc.get("emoji"),
-            "collection_id": doc.get("collectionId"),
-            "parent_document_id": doc.get("parentDocumentId"),
-            "template": doc.get("template"),
-            "revision": doc.get("revision"),
-            "created_at": doc.get("createdAt"),
-            "updated_at": doc.get("updatedAt"),
-            "published_at": doc.get("publishedAt"),
-            "created_by": doc.get("createdBy", {}).get("name"),
-            "updated_by": doc.get("updatedBy", {}).get("name"),
-        }
-        formatted_docs.append(formatted_doc)
-
-    pagination = response.get("pagination", {})
+    formatted_docs, pagination = await fetch_list_results(
+        ctx,
+        "documents.viewed",
+        request_data,
+        format_item,
+        fetch_all=fetch_all,
+        max_results=max_results,
+        cursor=cursor,
+    )
 
     result = {
         "total_viewed": len(formatted_docs),
@@ -694,14 +2977,425 @@ async def list_recently_viewed_documents(
         "pagination": pagination,
     }
 
-    import json
+    return render(result, format, "recently_viewed_documents")
+
+
+@mcp.tool()
+@instrumented
+async def sync_workspace(
+    ctx: Context,
+    collection_id: Optional[str] = None,
+    full: bool = False,
+    format: str = DEFAULT_OUTPUT_FORMAT,
+) -> str:
+    """
+    Sync the local workspace mirror (search index) with Outline.
+
+    Only documents changed since the last sync are fetched unless full is set.
+
+    Args:
+        collection_id: Optional collection UUID to limit the sync to
+        full: Re-fetch every document and drop documents that no longer exist
+        format: Output format - "compact" (default) or "pretty" (indented JSON)
+
+    Returns:
+        JSON string containing counts of listed, fetched and removed documents
+    """
+    validate_format(format)
+    workspace_sync = ctx.request_context.lifespan_context.workspace_sync
+    if workspace_sync is None:
+        raise ValueError(
+            "Workspace sync is not enabled, set OUTLINE_SYNC=true or "
+            "OUTLINE_LOCAL_INDEX=true"
+        )
+
+    ctx.info("Syncing workspace")
+
+    sync_result = await workspace_sync.run_once(full=full, collection_id=collection_id)
+    result = {**sync_result.as_dict(), "watermark": workspace_sync.watermark}
+
+    return render(result, format)
+
+
+@mcp.tool()
+@instrumented
+async def server_stats(ctx: Context, format: str = DEFAULT_OUTPUT_FORMAT) -> str:
+    """
+    Report runtime statistics of the server, such as response cache counters.
+
+    Args:
+        format: Output format - "compact" (default) or "pretty" (indented JSON)
+
+    Returns:
+        JSON string containing cache, coalescing, rate limit and retry counters,
+        and latency summaries per tool and per Outline endpoint
+    """
+    validate_format(format)
+    app_context = ctx.request_context.lifespan_context
+    cache = app_context.response_cache
+    cache_stats = await _run_cache(cache, cache.snapshot) if cache is not None else {}
+
+    single_flight = app_context.single_flight
+    limiter = app_context.rate_limiter
+    breaker = app_context.circuit_breaker
+    policy = app_context.retry_policy
+    workspace_sync = app_context.workspace_sync
+    document_store = app_context.document_store
+
+    result = {
+        "json_backend": jsoncodec.backend(),
+        "cache": (
+            {"enabled": True, **cache_stats}
+            if cache is not None
+            else {"enabled": False}
+        ),
+        "coalescing": (
+            {
+                "enabled": True,
+                "inflight": single_flight.inflight,
+                **single_flight.stats.as_dict(),
+            }
+            if single_flight is not None
+            else {"enabled": False}
+        ),
+        "rate_limit": (
+            {
+                "enabled": True,
+                "rate": limiter.rate,
+                "burst": limiter.burst,
+                **limiter.stats.as_dict(),
+            }
+            if limiter is not None
+            else {"enabled": False}
+        ),
+        "retries": policy.stats.as_dict() if policy is not None else {},
+        "circuit_breaker": (
+            {"enabled": True, **breaker.snapshot()}
+            if breaker is not None
+            else {"enabled": False}
+        ),
+        "collection_trees": (
+            app_context.collection_trees.snapshot()
+            if app_context.collection_trees is not None
+            else {}
+        ),
+        "outlines": (
+            app_context.outline_cache.snapshot()
+            if app_context.outline_cache is not None
+            else {}
+        ),
+        "vector_index": (
+            {"enabled": True, **app_context.vector_index.snapshot()}
+            if app_context.vector_index is not None
+            else {"enabled": False}
+        ),
+        "document_store": (
+            {"enabled": True, **document_store.snapshot()}
+            if document_store is not None
+            else {"enabled": False}
+        ),
+        "sync": (
+            {"enabled": True, **workspace_sync.snapshot()}
+            if workspace_sync is not None
+            else {"enabled": False}
+        ),
+        "change_feed": (
+            {"enabled": True, **app_context.change_feed.snapshot()}
+            if app_context.change_feed is not None
+            else {"enabled": False}
+        ),
+        "page_buffers": (
+            app_context.page_buffers.snapshot()
+            if app_context.page_buffers is not None
+            else {}
+        ),
+        "metrics": (
+            {"enabled": True, **app_context.metrics.snapshot()}
+            if app_context.metrics is not None
+            else {"enabled": False}
+        ),
+    }
+
+    return render(result, format)
+
+
+TRANSPORTS = ("stdio", "sse", "streamable-http")
+
+
+def build_http_app(transport: str) -> Starlette:
+    """
+    Build the ASGI app of an HTTP transport.
+
+    The app holds the shared application context from startup to shutdown, so
+    connection pool, caches and background sync outlive individual sessions.
 
-    return json.dumps(result, indent=2)
+    Args:
+        transport: "sse" or "streamable-http"
+
+    Returns:
+        Starlette app serving the MCP endpoint
+    """
+    if transport == "sse":
+        app = mcp.sse_app()
+    elif transport == "streamable-http":
+        app = mcp.streamable_http_app()
+    else:
+        raise ValueError(f"Unsupported HTTP transport: {transport}")
+
+    transport_lifespan = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def lifespan(app: Starlette) -> AsyncIterator[None]:
+        async with shared_context.acquire() as app_context:
+            config = app_context.outline_config
+            cache = app_context.response_cache
+            if config.webhook_secret and cache is not None:
+                # Webhooks served here report changes as they happen.
+                cache.ttls.update({**CHANGE_FEED_TTLS, **config.cache_ttls})
+            async with transport_lifespan(app):
+                yield
+
+    app.router.lifespan_context = lifespan
+    app.router.routes.append(
+        Route(WEBHOOK_PATH, receive_webhook, methods=["POST"], name="webhook")
+    )
+    return app
+
+
+async def receive_webhook(request: Request) -> JSONResponse:
+    """Invalidate caches on a signed Outline webhook delivery."""
+    app_context = shared_context.current
+    if (
+        app_context is None
+        or app_context.change_feed is None
+        or not app_context.outline_config.webhook_secret
+    ):
+        return JSONResponse(
+            {"ok": False, "error": "Webhooks are not enabled"}, status_code=404
+        )
+
+    body = await request.body()
+    signature = request.headers.get("outline-signature")
+    if not verify_signature(app_context.outline_config.webhook_secret, signature, body):
+        return JSONResponse(
+            {"ok": False, "error": "Invalid signature"}, status_code=401
+        )
+    try:
+        delivery = jsoncodec.loads(body)
+    except ValueError:
+        delivery = None
+    if not isinstance(delivery, dict):
+        return JSONResponse({"ok": False, "error": "Invalid body"}, status_code=400)
+
+    invalidation = await app_context.change_feed.receive(delivery)
+    return JSONResponse(
+        {
+            "ok": True,
+            "documents": len(invalidation.documents),
+            "collections": len(invalidation.collections),
+        }
+    )
+
+
+async def serve_http(
+    transport: str,
+    host: str,
+    port: int,
+    max_clients: Optional[int] = None,
+    shutdown_timeout: Optional[float] = None,
+) -> None:
+    """
+    Serve MCP over SSE or streamable HTTP until interrupted.
+
+    Args:
+        transport: "sse" or "streamable-http"
+        host: Address to listen on
+        port: Port to listen on
+        max_clients: Concurrent connections accepted before answering 503
+        shutdown_timeout: Seconds open sessions may take to finish on shutdown
+    """
+    import uvicorn
+
+    app = build_http_app(transport)
+    server = uvicorn.Server(
+        uvicorn.Config(
+            app,
+            host=host,
+            port=port,
+            log_level=mcp.settings.log_level.lower(),
+            limit_concurrency=max_clients or None,
+            timeout_graceful_shutdown=(
+                int(math.ceil(shutdown_timeout)) if shutdown_timeout else None
+            ),
+        )
+    )
+    await server.serve()
+
+
+def worker_app() -> Starlette:
+    """Build the ASGI app of one worker process started by serve_workers."""
+    # Sessions cannot follow a client from one worker process to another.
+    mcp.settings.stateless_http = True
+    mcp.settings.json_response = _env_bool("OUTLINE_JSON_RESPONSE", False)
+    return build_http_app("streamable-http")
+
+
+def serve_workers(
+    workers: int,
+    host: str,
+    port: int,
+    max_clients: Optional[int] = None,
+    shutdown_timeout: Optional[float] = None,
+) -> None:
+    """
+    Serve stateless streamable HTTP from several worker processes.
 
+    The workers share the response cache and the rate limit through SQLite in
+    OUTLINE_DATA_DIR, so cached responses and throttling stay consistent.
 
-def main():
+    Args:
+        workers: Number of worker processes
+        host: Address to listen on
+        port: Port to listen on
+        max_clients: Concurrent connections each worker accepts
+        shutdown_timeout: Seconds open requests may take to finish on shutdown
+    """
+    import uvicorn
+
+    os.environ.setdefault("OUTLINE_SHARED_STATE", "true")
+    if os.environ.pop("OUTLINE_METRICS_PORT", None):
+        logger.warning(
+            "OUTLINE_METRICS_PORT is ignored with several workers; "
+            "use the server_stats tool instead"
+        )
+    uvicorn.run(
+        f"{__package__}.outline_mcp_server:worker_app",
+        factory=True,
+        workers=workers,
+        host=host,
+        port=port,
+        log_level=mcp.settings.log_level.lower(),
+        limit_concurrency=max_clients or None,
+        timeout_graceful_shutdown=(
+            int(math.ceil(shutdown_timeout)) if shutdown_timeout else None
+        ),
+    )
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command line options; defaults come from the environment."""
+    parser = argparse.ArgumentParser(
+        prog="outline-mcp-server", description="MCP server for Outline"
+    )
+    parser.add_argument(
+        "--transport",
+        choices=TRANSPORTS,
+        default=os.getenv("OUTLINE_TRANSPORT", "stdio"),
+        help="stdio for a single client, sse or streamable-http to share one "
+        "server between many clients",
+    )
+    parser.add_argument("--host", default=os.getenv("OUTLINE_HOST", "127.0.0.1"))
+    parser.add_argument(
+        "--port", type=int, default=int(os.getenv("OUTLINE_PORT", "8000"))
+    )
+    parser.add_argument(
+        "--max-clients",
+        type=int,
+        default=int(os.getenv("OUTLINE_MAX_CLIENTS", "0")),
+        help="Maximum concurrent HTTP connections (0 for no limit)",
+    )
+    parser.add_argument(
+        "--shutdown-timeout",
+        type=float,
+        default=float(os.getenv("OUTLINE_SHUTDOWN_TIMEOUT", "30")),
+        help="Seconds to let open sessions finish on shutdown",
+    )
+    parser.add_argument(
+        "--stateless",
+        action="store_true",
+        default=_env_bool("OUTLINE_STATELESS_HTTP", False),
+        help="Serve streamable HTTP without per-client sessions",
+    )
+    parser.add_argument(
+        "--json-response",
+        action="store_true",
+        default=_env_bool("OUTLINE_JSON_RESPONSE", False),
+        help="Answer streamable HTTP requests with JSON instead of SSE streams",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.getenv("OUTLINE_WORKERS", "1")),
+        help="Worker processes serving stateless streamable HTTP",
+    )
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="Report import and setup times of the server, then exit",
+    )
+    args = parser.parse_args(argv)
+    if args.workers > 1 and args.transport != "streamable-http":
+        parser.error("--workers requires --transport streamable-http")
+    if args.workers > 1 and _env_bool("OUTLINE_VECTOR_INDEX", False):
+        # The vector files are appended to and resized by a single writer.
+        parser.error("OUTLINE_VECTOR_INDEX cannot be combined with --workers")
+    return args
+
+
+async def time_lifespan() -> float:
+    """Return how long entering the server lifespan takes, in seconds."""
+    started = time.perf_counter()
+    async with app_lifespan(mcp):
+        return time.perf_counter() - started
+
+
+def profile_startup() -> None:
+    """Print import timings of a fresh server process and its lifespan setup."""
+    from .startup import format_profile, measure_imports
+
+    imports = measure_imports()
+    lifespan_seconds = None
+    if os.getenv("OUTLINE_API_TOKEN"):
+        lifespan_seconds = anyio.run(time_lifespan)
+    print(format_profile(imports, lifespan_seconds))
+
+
+def main(argv: Optional[List[str]] = None):
     """Entry point for the MCP server."""
-    mcp.run()
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args(argv)
+    if args.profile_startup:
+        profile_startup()
+        return
+
+    if args.transport == "stdio":
+        mcp.run()
+        return
+
+    if args.workers > 1:
+        os.environ["OUTLINE_JSON_RESPONSE"] = str(args.json_response).lower()
+        serve_workers(
+            args.workers,
+            args.host,
+            args.port,
+            args.max_clients,
+            args.shutdown_timeout,
+        )
+        return
+
+    mcp.settings.stateless_http = args.stateless
+    mcp.settings.json_response = args.json_response
+    try:
+        anyio.run(
+            serve_http,
+            args.transport,
+            args.host,
+            args.port,
+            args.max_clients,
+            args.shutdown_timeout,
+        )
+    except KeyboardInterrupt:
+        pass
 
 
 if __name__ == "__main__":
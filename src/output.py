@@ -0,0 +1,96 @@
+"""
+Serialization of tool results.
+
+Tools return JSON text that is read by a language model, so every byte costs
+tokens. Results are serialized without indentation by default, callers can
+project list items onto the fields they need, and listings can be streamed as
+newline-delimited JSON with one item per line. Results built from stale cached
+responses say so with "stale" and "age" fields.
+"""
+
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from . import jsoncodec
+from .metrics import current_tool_call
+
+OUTPUT_FORMATS = ("compact", "pretty", "ndjson")
+DEFAULT_OUTPUT_FORMAT = "compact"
+
+
+def fields_of(formatter: Callable[[Dict[str, Any]], Dict[str, Any]]) -> Tuple[str, ...]:
+    """Return the output fields produced by an item formatter."""
+    return tuple(formatter({}))
+
+
+def validate_fields(
+    fields: Optional[Sequence[str]], allowed: Iterable[str], kind: str = "item"
+) -> Optional[List[str]]:
+    """
+    Check a field projection against the fields a tool can return.
+
+    Args:
+        fields: Requested fields, or None for all fields
+        allowed: Fields the tool can return
+        kind: Name of the projected items, used in error messages
+
+    Returns:
+        The requested fields, or None when every field is returned
+
+    Raises:
+        ValueError: If a field is unknown
+    """
+    if not fields:
+        return None
+    unknown = set(fields) - set(allowed)
+    if unknown:
+        raise ValueError(f"Unknown {kind} fields: {', '.join(sorted(unknown))}")
+    return list(fields)
+
+
+def validate_format(format: str) -> None:
+    if format not in OUTPUT_FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(OUTPUT_FORMATS)}")
+
+
+def project(item: Dict[str, Any], fields: Optional[Sequence[str]]) -> Dict[str, Any]:
+    """Keep only the requested fields of an item, in the requested order."""
+    if fields is None:
+        return item
+    return {field: item.get(field) for field in fields}
+
+
+def render(
+    result: Any, format: str = DEFAULT_OUTPUT_FORMAT, items_key: Optional[str] = None
+) -> str:
+    """
+    Serialize a tool result.
+
+    Args:
+        result: JSON-serializable result
+        format: "compact" (no whitespace), "pretty" (indented) or "ndjson"
+        items_key: Key of the item list in result. In ndjson output the rest of
+            the result is written on the first line and each item on its own line.
+
+    Returns:
+        The serialized result
+    """
+    validate_format(format)
+    call = current_tool_call()
+    if call is not None and call.stale_age is not None and isinstance(result, dict):
+        result = {**result, "stale": True, "age": round(call.stale_age, 1)}
+    if format == "pretty":
+        return jsoncodec.dumps(result, indent=True)
+    if format == "compact":
+        return _dumps(result)
+    if isinstance(result, list):
+        return "\n".join(_dumps(item) for item in result)
+    if not isinstance(result, dict) or items_key is None:
+        return _dumps(result)
+
+    items = result.get(items_key) or []
+    header = {key: value for key, value in result.items() if key != items_key}
+    return "\n".join([_dumps(header), *(_dumps(item) for item in items)])
+
+
+def _dumps(value: Any) -> str:
+    return jsoncodec.dumps(value)
@@ -0,0 +1,73 @@
+"""
+Pagination over Outline list and search endpoints.
+"""
+
+import asyncio
+from collections.abc import AsyncIterator, Awaitable, Callable
+from typing import Any, Dict, List, Optional
+
+# Outline caps the page size of list and search endpoints at 100.
+MAX_PAGE_SIZE = 100
+
+RequestFn = Callable[[str, Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+async def iter_pages(
+    request: RequestFn,
+    endpoint: str,
+    data: Optional[Dict[str, Any]] = None,
+    page_size: int = MAX_PAGE_SIZE,
+    max_results: Optional[int] = None,
+    prefetch: bool = True,
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Walk a paginated Outline endpoint, yielding one page of items at a time.
+
+    The request for the next page is sent before the current page is yielded, so
+    processing of page N overlaps with the round trip for page N+1.
+
+    Args:
+        request: Coroutine function sending a request to an endpoint
+        endpoint: Paginated API endpoint
+        data: Request data; its offset is used as the starting point
+        page_size: Number of items requested per page (1-100)
+        max_results: Optional cap on the total number of items yielded
+        prefetch: Request the next page before yielding the current one. Disable
+            when the caller is likely to stop early.
+
+    Yields:
+        Lists of raw items from the response "data" field
+    """
+    data = dict(data or {})
+    page_size = min(max(page_size, 1), MAX_PAGE_SIZE)
+    offset = data.get("offset", 0)
+    remaining = max_results
+
+    def fetch(page_offset: int) -> "asyncio.Future[Dict[str, Any]]":
+        page_data = {**data, "limit": page_size, "offset": page_offset}
+        return asyncio.ensure_future(request(endpoint, page_data))
+
+    pending: Optional["asyncio.Future[Dict[str, Any]]"] = fetch(offset)
+    try:
+        while pending is not None:
+            response = await pending
+            pending = None
+
+            items = response.get("data", [])
+            offset += len(items)
+            has_more = len(items) >= page_size
+
+            if remaining is not None:
+                items = items[:remaining]
+                remaining -= len(items)
+                has_more = has_more and remaining > 0
+
+            if has_more and prefetch:
+                pending = fetch(offset)
+            if items:
+                yield items
+            if has_more and not prefetch:
+                pending = fetch(offset)
+    finally:
+        if pending is not None:
+            pending.cancel()
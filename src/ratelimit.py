@@ -0,0 +1,427 @@
+"""
+Client-side throttling and failure handling for Outline API calls.
+
+Provides a token bucket shared by all tools (and optionally by all worker
+processes), a retry policy with exponential backoff and full jitter, parsing of
+Retry-After and rate-limit headers, and a circuit breaker that fails fast while
+Outline is unavailable.
+"""
+
+import asyncio
+import email.utils
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterator, Mapping, Optional
+
+# Read-only endpoints that are safe to send more than once.
+IDEMPOTENT_ENDPOINTS = frozenset(
+    {
+        "auth.info",
+        "collections.documents",
+        "collections.info",
+        "collections.list",
+        "documents.archived",
+        "documents.drafts",
+        "documents.export",
+        "documents.info",
+        "documents.list",
+        "documents.search",
+        "documents.viewed",
+        "events.list",
+    }
+)
+
+# Responses that indicate a transient condition worth retrying.
+RETRYABLE_STATUS_CODES = frozenset({429, 502, 503, 504})
+
+
+def parse_retry_after(
+    value: Optional[str], now: Optional[float] = None
+) -> Optional[float]:
+    """
+    Parse a Retry-After header value into a delay in seconds.
+
+    Accepts both the delta-seconds and the HTTP-date forms.
+    """
+    if not isinstance(value, str) or not value.strip():
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        parsed = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    current = time.time() if now is None else now
+    return max(0.0, parsed.timestamp() - current)
+
+
+def parse_rate_limit_reset(
+    value: Optional[str], now: Optional[float] = None
+) -> Optional[float]:
+    """
+    Parse a rate-limit reset header into a delay in seconds.
+
+    Outline and its proxies send either a delay in seconds or an epoch timestamp
+    in seconds or milliseconds.
+    """
+    if not isinstance(value, str) or not value.strip():
+        return None
+    try:
+        reset = float(value.strip())
+    except ValueError:
+        return None
+    current = time.time() if now is None else now
+    if reset > 1e12:
+        return max(0.0, reset / 1000 - current)
+    if reset > 1e9:
+        return max(0.0, reset - current)
+    return max(0.0, reset)
+
+
+def rate_limit_delay(headers: Mapping[str, str]) -> Optional[float]:
+    """Return how long to pause when the rate-limit headers report no budget left."""
+    for prefix in ("RateLimit", "X-RateLimit"):
+        remaining = headers.get(f"{prefix}-Remaining")
+        if not isinstance(remaining, str):
+            continue
+        try:
+            if int(float(remaining)) > 0:
+                return None
+        except ValueError:
+            return None
+        return parse_rate_limit_reset(headers.get(f"{prefix}-Reset"))
+    return None
+
+
+@dataclass
+class RateLimitStats:
+    """Counters describing client-side throttling."""
+
+    acquired: int = 0
+    throttled: int = 0
+    waited_seconds: float = 0.0
+    pauses: int = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = asdict(self)
+        stats["waited_seconds"] = round(self.waited_seconds, 3)
+        return stats
+
+
+class TokenBucket:
+    """
+    Async token bucket limiting the rate of upstream requests.
+
+    Args:
+        rate: Tokens added per second
+        burst: Maximum number of tokens (requests allowed back to back)
+        clock: Monotonic time source, overridable for tests
+        sleep: Async sleep function, overridable for tests
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[Any]] = asyncio.sleep,
+    ):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.stats = RateLimitStats()
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Wait until a request may be sent. Waiters are served in FIFO order."""
+        async with self._lock:
+            throttled = False
+            while True:
+                wait = await self._reserve(self._clock())
+                if wait <= 0:
+                    self.stats.acquired += 1
+                    return
+                if not throttled:
+                    throttled = True
+                    self.stats.throttled += 1
+                self.stats.waited_seconds += wait
+                await self._sleep(wait)
+
+    async def pause(self, seconds: float) -> None:
+        """Stop handing out tokens for the given number of seconds."""
+        if await self._request_pause(self._clock() + seconds):
+            self.stats.pauses += 1
+
+    async def observe(self, headers: Mapping[str, str]) -> None:
+        """Pause when the server reports that the rate-limit budget is exhausted."""
+        delay = rate_limit_delay(headers)
+        if delay:
+            await self.pause(delay)
+
+    async def _reserve(self, now: float) -> float:
+        return self._take(now)
+
+    async def _request_pause(self, until: float) -> bool:
+        return self._pause_until(until)
+
+    def _take(self, now: float) -> float:
+        """Take a token, or return how long to wait until one is available."""
+        self._refill(now)
+        wait = self._paused_until - now
+        if wait > 0:
+            return wait
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    def _pause_until(self, until: float) -> bool:
+        if until <= self._paused_until:
+            return False
+        self._paused_until = until
+        self._tokens = 0.0
+        return True
+
+    def _refill(self, now: float) -> None:
+        elapsed = max(0.0, now - self._updated)
+        self._tokens = min(float(self.burst), self._tokens + elapsed * self.rate)
+        self._updated = now
+
+
+SHARED_BUCKET_SCHEMA = """
+CREATE TABLE IF NOT EXISTS token_buckets (
+    name TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL,
+    paused_until REAL NOT NULL
+);
+"""
+
+
+class SharedTokenBucket(TokenBucket):
+    """
+    Token bucket whose state lives in SQLite, shared by worker processes.
+
+    All processes using the same database file and name draw from one budget,
+    and a pause requested by one of them (e.g. after a 429) applies to all.
+
+    Args:
+        path: Database file
+        rate: Tokens added per second
+        burst: Maximum number of tokens (requests allowed back to back)
+        name: Bucket name within the database
+        clock: Time source shared by all processes
+        sleep: Async sleep function, overridable for tests
+    """
+
+    def __init__(
+        self,
+        path: str,
+        rate: float,
+        burst: int,
+        name: str = "outline",
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], Awaitable[Any]] = asyncio.sleep,
+    ):
+        super().__init__(rate, burst, clock=clock, sleep=sleep)
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.name = name
+        self._conn_lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SHARED_BUCKET_SCHEMA)
+        self._conn.execute(
+            "INSERT OR IGNORE INTO token_buckets VALUES (?, ?, ?, 0)",
+            (name, float(self.burst), clock()),
+        )
+
+    def close(self) -> None:
+        self._conn.close()
+
+    async def _reserve(self, now: float) -> float:
+        # Transactions wait on other processes, so they run off the event loop.
+        return await asyncio.to_thread(self._take, now)
+
+    async def _request_pause(self, until: float) -> bool:
+        return await asyncio.to_thread(self._pause_until, until)
+
+    def _take(self, now: float) -> float:
+        with self._transaction():
+            wait = super()._take(now)
+        return wait
+
+    def _pause_until(self, until: float) -> bool:
+        with self._transaction():
+            paused = super()._pause_until(until)
+        return paused
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        """Load the shared state, let the caller update it, and write it back."""
+        with self._conn_lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._tokens, self._updated, self._paused_until = self._conn.execute(
+                    "SELECT tokens, updated, paused_until FROM token_buckets "
+                    "WHERE name = ?",
+                    (self.name,),
+                ).fetchone()
+                yield
+                self._conn.execute(
+                    "UPDATE token_buckets "
+                    "SET tokens = ?, updated = ?, paused_until = ? WHERE name = ?",
+                    (self._tokens, self._updated, self._paused_until, self.name),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+
+@dataclass
+class RetryStats:
+    """Counters describing retried requests."""
+
+    retries: int = 0
+    exhausted: int = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass
+class RetryPolicy:
+    """Exponential backoff with full jitter."""
+
+    max_retries: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+    stats: RetryStats = field(default_factory=RetryStats, compare=False)
+
+    def should_retry(self, endpoint: str, attempt: int, status: Optional[int]) -> bool:
+        """
+        Decide whether a failed attempt is retried.
+
+        Args:
+            endpoint: API endpoint of the request
+            attempt: Number of retries already made
+            status: HTTP status of the response, or None for transport errors
+        """
+        if attempt >= self.max_retries:
+            return False
+        if status == 429:
+            # A throttled request was not processed and is safe to resend.
+            return True
+        if endpoint not in IDEMPOTENT_ENDPOINTS:
+            return False
+        return status is None or status in RETRYABLE_STATUS_CODES
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Return the delay before the given retry, honoring Retry-After."""
+        if retry_after is not None:
+            return retry_after
+        ceiling = min(self.max_delay, self.base_delay * (2**attempt))
+        return random.uniform(0, ceiling)
+
+
+class CircuitOpenError(Exception):
+    """Raised when a request is rejected because Outline is considered down."""
+
+
+@dataclass
+class CircuitBreakerStats:
+    """Counters describing circuit breaker activity."""
+
+    opened: int = 0
+    rejected: int = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class CircuitBreaker:
+    """
+    Fail fast after repeated upstream failures.
+
+    After failure_threshold consecutive failures the circuit opens and requests
+    are rejected for reset_timeout seconds. Then a single trial request is let
+    through; its outcome closes or re-opens the circuit.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.stats = CircuitBreakerStats()
+        self._clock = clock
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_inflight = False
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError if the request must not be sent."""
+        if self.state == self.CLOSED:
+            return
+        if self.state == self.OPEN:
+            remaining = self._opened_at + self.reset_timeout - self._clock()
+            if remaining > 0:
+                self.stats.rejected += 1
+                raise CircuitOpenError(
+                    f"Outline API is unavailable, retry in {remaining:.0f}s"
+                )
+            self.state = self.HALF_OPEN
+        if self._trial_inflight:
+            self.stats.rejected += 1
+            raise CircuitOpenError("Outline API is unavailable, probe in progress")
+        self._trial_inflight = True
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self._failures = 0
+        self._trial_inflight = False
+
+    def record_abandoned(self) -> None:
+        """Release the trial slot of a request that ended without an outcome."""
+        self._trial_inflight = False
+
+    def record_failure(self) -> None:
+        self._trial_inflight = False
+        if self.state == self.HALF_OPEN:
+            self._open()
+            return
+        self._failures += 1
+        if self._failures >= self.failure_threshold:
+            self._open()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"state": self.state, "failures": self._failures, **self.stats.as_dict()}
+
+    def _open(self) -> None:
+        self.state = self.OPEN
+        self._opened_at = self._clock()
+        self.stats.opened += 1
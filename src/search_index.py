@@ -0,0 +1,292 @@
+"""
+Local full-text search index over Outline documents.
+
+Documents are stored in an on-disk SQLite database with an FTS5 table. Queries
+are ranked with BM25 (title matches weigh more than body matches) and return
+results shaped like Outline's documents.search response, so the same formatting
+code serves local and remote results.
+"""
+
+import re
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    rowid INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    url_id TEXT,
+    title TEXT,
+    collection_id TEXT,
+    parent_document_id TEXT,
+    status TEXT,
+    revision INTEGER,
+    created_at TEXT,
+    updated_at TEXT,
+    created_by_id TEXT,
+    created_by TEXT,
+    updated_by_id TEXT,
+    updated_by TEXT
+);
+CREATE INDEX IF NOT EXISTS documents_url_id ON documents (url_id);
+CREATE INDEX IF NOT EXISTS documents_collection ON documents (collection_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+    title, text, tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+# BM25 column weights for (title, text).
+TITLE_WEIGHT = 10.0
+TEXT_WEIGHT = 1.0
+
+SNIPPET_TOKENS = 24
+
+DATE_FILTERS = {
+    "day": timedelta(days=1),
+    "week": timedelta(weeks=1),
+    "month": timedelta(days=30),
+    "year": timedelta(days=365),
+}
+
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+_METADATA_COLUMNS = (
+    "url_id",
+    "title",
+    "collection_id",
+    "parent_document_id",
+    "status",
+    "revision",
+    "created_at",
+    "updated_at",
+    "created_by_id",
+    "created_by",
+    "updated_by_id",
+    "updated_by",
+)
+_COLUMNS = ", ".join(_METADATA_COLUMNS)
+_PLACEHOLDERS = ", ".join("?" for _ in _METADATA_COLUMNS)
+_ASSIGNMENTS = ", ".join(f"{column} = ?" for column in _METADATA_COLUMNS)
+
+
+def build_match_query(query: str) -> Optional[str]:
+    """
+    Translate a free-text query into an FTS5 MATCH expression.
+
+    Quoted phrases are kept as phrases, other words must all appear; the last
+    word also matches as a prefix so partially typed queries find results.
+    """
+    parts = []
+    for phrase, words in re.findall(r'"([^"]*)"|(\S+)', query):
+        terms = _TERM_RE.findall(phrase or words)
+        if not terms:
+            continue
+        if phrase:
+            parts.append('"' + " ".join(terms) + '"')
+        else:
+            parts.extend(f'"{term}"' for term in terms)
+    if not parts:
+        return None
+    if parts[-1].count(" ") == 0:
+        parts[-1] += "*"
+    return " ".join(parts)
+
+
+def document_status(doc: Dict[str, Any]) -> str:
+    """Return the Outline status filter value matching a document."""
+    if doc.get("archivedAt"):
+        return "archived"
+    if not doc.get("publishedAt"):
+        return "draft"
+    return "published"
+
+
+class LocalSearchIndex:
+    """
+    SQLite FTS5 index of Outline documents.
+
+    The connection is shared between the event loop and worker threads, so all
+    access goes through a lock.
+
+    Args:
+        path: Database file, or ":memory:" for a transient index
+    """
+
+    def __init__(self, path: str):
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT count(*) FROM documents").fetchone()[0]
+
+    def revisions(self) -> Dict[str, Optional[int]]:
+        """Return the indexed revision of every document."""
+        with self._lock:
+            rows = self._conn.execute("SELECT id, revision FROM documents").fetchall()
+        return dict(rows)
+
+    def upsert(self, doc: Dict[str, Any], text: Optional[str] = None) -> None:
+        """Index a single document; see upsert_many."""
+        self.upsert_many([(doc, text)])
+
+    def upsert_many(self, items: Iterable[Tuple[Dict[str, Any], Optional[str]]]) -> int:
+        """
+        Insert or replace documents in the index.
+
+        Args:
+            items: Pairs of an Outline document payload and its Markdown body. When
+                the body is None the payload's "text" field is used.
+
+        Returns:
+            Number of documents written
+        """
+        count = 0
+        with self._lock, self._conn:
+            for doc, text in items:
+                body = text if text is not None else doc.get("text") or ""
+                row = self._conn.execute(
+                    "SELECT rowid FROM documents WHERE id = ?", (doc["id"],)
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "DELETE FROM documents_fts WHERE rowid = ?", (row[0],)
+                    )
+                created_by = doc.get("createdBy") or {}
+                updated_by = doc.get("updatedBy") or {}
+                values = (
+                    doc.get("urlId"),
+                    doc.get("title") or "",
+                    doc.get("collectionId"),
+                    doc.get("parentDocumentId"),
+                    document_status(doc),
+                    doc.get("revision"),
+                    doc.get("createdAt"),
+                    doc.get("updatedAt"),
+                    created_by.get("id"),
+                    created_by.get("name"),
+                    updated_by.get("id"),
+                    updated_by.get("name"),
+                )
+                if row is not None:
+                    rowid = row[0]
+                    self._conn.execute(
+                        f"UPDATE documents SET {_ASSIGNMENTS} WHERE rowid = ?",
+                        (*values, rowid),
+                    )
+                else:
+                    cursor = self._conn.execute(
+                        f"INSERT INTO documents (id, {_COLUMNS}) "
+                        f"VALUES (?, {_PLACEHOLDERS})",
+                        (doc["id"], *values),
+                    )
+                    rowid = cursor.lastrowid
+                self._conn.execute(
+                    "INSERT INTO documents_fts (rowid, title, text) VALUES (?, ?, ?)",
+                    (rowid, doc.get("title") or "", body),
+                )
+                count += 1
+        return count
+
+    def remove(self, document_id: str) -> bool:
+        """Remove a document by id or urlId. Returns True if it was indexed."""
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT rowid FROM documents WHERE id = ? OR url_id = ?",
+                (document_id, document_id),
+            ).fetchone()
+            if row is None:
+                return False
+            self._conn.execute("DELETE FROM documents_fts WHERE rowid = ?", (row[0],))
+            self._conn.execute("DELETE FROM documents WHERE rowid = ?", (row[0],))
+        return True
+
+    def search(
+        self,
+        query: str,
+        collection_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+        status_filter: Optional[str] = None,
+        date_filter: Optional[str] = None,
+        limit: int = 25,
+        offset: int = 0,
+    ) -> Dict[str, Any]:
+        """
+        Search the index.
+
+        Returns:
+            Response shaped like Outline's documents.search: a "data" list of
+            {"context", "ranking", "document"} items and a "pagination" dict
+        """
+        match = build_match_query(query)
+        pagination = {"limit": limit, "offset": offset}
+        if match is None:
+            return {"ok": True, "data": [], "pagination": pagination}
+
+        conditions = ["documents_fts MATCH ?"]
+        params: List[Any] = [match]
+        if collection_id:
+            conditions.append("d.collection_id = ?")
+            params.append(collection_id)
+        if user_id:
+            conditions.append("(d.created_by_id = ? OR d.updated_by_id = ?)")
+            params.extend([user_id, user_id])
+        if status_filter:
+            conditions.append("d.status = ?")
+            params.append(status_filter)
+        if date_filter in DATE_FILTERS:
+            since = datetime.now(timezone.utc) - DATE_FILTERS[date_filter]
+            conditions.append("d.updated_at >= ?")
+            params.append(since.strftime("%Y-%m-%dT%H:%M:%S"))
+
+        sql = f"""
+            SELECT d.id, d.url_id, d.title, d.collection_id, d.parent_document_id,
+                   d.revision, d.created_at, d.updated_at, d.created_by,
+                   d.updated_by,
+                   snippet(documents_fts, 1, '<b>', '</b>', '…', {SNIPPET_TOKENS}),
+                   bm25(documents_fts, {TITLE_WEIGHT}, {TEXT_WEIGHT}) AS score
+            FROM documents_fts
+            JOIN documents d ON d.rowid = documents_fts.rowid
+            WHERE {" AND ".join(conditions)}
+            ORDER BY score
+            LIMIT ? OFFSET ?
+        """
+        params.extend([limit, offset])
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+
+        results = []
+        for row in rows:
+            results.append(
+                {
+                    "context": row[10],
+                    "ranking": round(-row[11], 6),
+                    "document": {
+                        "id": row[0],
+                        "urlId": row[1],
+                        "title": row[2],
+                        "collectionId": row[3],
+                        "parentDocumentId": row[4],
+                        "revision": row[5],
+                        "createdAt": row[6],
+                        "updatedAt": row[7],
+                        "createdBy": {"name": row[8]},
+                        "updatedBy": {"name": row[9]},
+                    },
+                }
+            )
+        return {"ok": True, "data": results, "pagination": pagination}
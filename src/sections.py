@@ -0,0 +1,226 @@
+"""
+Section-aware reads of large Markdown documents.
+
+A document body is parsed once into a flat list of headings with byte, line and
+token offsets, so tools can return a table of contents and then serve single
+sections or byte/line ranges instead of the whole body. Parsed outlines are
+cached by document id and revision.
+"""
+
+import re
+from bisect import bisect_right
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from .budget import estimate_text_tokens
+
+DEFAULT_MAX_OUTLINES = 256
+
+_HEADING_RE = re.compile(r"^ {0,3}(#{1,6})(?:[ \t]+(.*?))?(?:[ \t]+#+)?[ \t]*$")
+_FENCE_RE = re.compile(r"^ {0,3}(`{3,}|~{3,})")
+_ANCHOR_RE = re.compile(r"[^\w]+", re.UNICODE)
+
+
+def slugify(title: str) -> str:
+    """Build a heading anchor the way Outline does for heading links."""
+    return _ANCHOR_RE.sub("-", title.lower()).strip("-")
+
+
+@dataclass
+class Section:
+    """A heading and the span of the document it introduces."""
+
+    index: int
+    level: int
+    title: str
+    anchor: str
+    parent: Optional[int]
+    byte_start: int
+    # End of the section including its subsections.
+    byte_end: int
+    # End of the text before the first subsection.
+    body_end: int
+    line_start: int
+    line_end: int
+    # Estimated tokens of the section including its subsections.
+    tokens: int
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass
+class DocumentOutline:
+    """Heading tree and line offsets of a Markdown document."""
+
+    sections: List[Section]
+    line_offsets: List[int]
+    size: int
+    tokens: int
+
+    @classmethod
+    def parse(cls, text: str) -> "DocumentOutline":
+        """
+        Parse ATX headings ("# Title") outside of fenced code blocks.
+
+        Offsets are in bytes of the UTF-8 encoded text; lines are 1-based.
+        """
+        headings: List[Tuple[int, str, int, int, int]] = []
+        line_offsets: List[int] = []
+        fence: Optional[str] = None
+        offset = 0
+        tokens = 0
+
+        for number, line in enumerate(text.splitlines(keepends=True), start=1):
+            line_offsets.append(offset)
+            stripped = line.rstrip("\r\n")
+            fence_match = _FENCE_RE.match(stripped)
+            if fence is not None:
+                if fence_match and fence_match.group(1).startswith(fence):
+                    fence = None
+            elif fence_match:
+                fence = fence_match.group(1)
+            else:
+                heading = _HEADING_RE.match(stripped)
+                if heading:
+                    title = (heading.group(2) or "").strip()
+                    headings.append(
+                        (len(heading.group(1)), title, offset, number, tokens)
+                    )
+            offset += len(line.encode("utf-8"))
+            # Tokens never span lines, so the estimates of lines add up.
+            tokens += estimate_text_tokens(line)
+
+        sections: List[Section] = []
+        anchors: Dict[str, int] = {}
+        stack: List[Section] = []
+        for index, (level, title, start, line, token_start) in enumerate(headings):
+            anchor = slugify(title) or "section"
+            seen = anchors.get(anchor, 0)
+            anchors[anchor] = seen + 1
+            if seen:
+                anchor = f"{anchor}-{seen}"
+
+            while stack and stack[-1].level >= level:
+                stack.pop()
+
+            end, end_line, end_tokens = offset, len(line_offsets), tokens
+            body_end = offset
+            for following in headings[index + 1 :]:
+                if body_end == offset:
+                    body_end = following[2]
+                if following[0] <= level:
+                    end, end_line, end_tokens = (
+                        following[2],
+                        following[3] - 1,
+                        following[4],
+                    )
+                    break
+
+            section = Section(
+                index=index,
+                level=level,
+                title=title,
+                anchor=anchor,
+                parent=stack[-1].index if stack else None,
+                byte_start=start,
+                byte_end=end,
+                body_end=body_end,
+                line_start=line,
+                line_end=end_line,
+                tokens=end_tokens - token_start,
+            )
+            sections.append(section)
+            stack.append(section)
+
+        return cls(
+            sections=sections, line_offsets=line_offsets, size=offset, tokens=tokens
+        )
+
+    @property
+    def lines(self) -> int:
+        return len(self.line_offsets)
+
+    def toc(self, max_level: int = 6) -> List[Dict[str, Any]]:
+        """Return the table of contents down to the given heading level."""
+        return [s.as_dict() for s in self.sections if s.level <= max_level]
+
+    def find(self, heading: str) -> Optional[Section]:
+        """Find the first section whose title or anchor matches, ignoring case."""
+        wanted = heading.strip().lstrip("#").strip().lower()
+        for section in self.sections:
+            if section.title.lower() == wanted or section.anchor == wanted:
+                return section
+        wanted_anchor = slugify(wanted)
+        for section in self.sections:
+            if section.anchor == wanted_anchor:
+                return section
+        return None
+
+    def line_range(self, start_line: int, end_line: Optional[int]) -> Tuple[int, int]:
+        """Return the byte range of the given 1-based, inclusive line range."""
+        first = min(max(start_line, 1), self.lines + 1)
+        last = self.lines if end_line is None else min(end_line, self.lines)
+        start = self.line_offsets[first - 1] if first <= self.lines else self.size
+        end = self.line_offsets[last] if last < self.lines else self.size
+        return start, max(start, end)
+
+    def line_at(self, byte_offset: int) -> int:
+        """Return the 1-based line containing a byte offset."""
+        return max(1, bisect_right(self.line_offsets, byte_offset))
+
+
+def snap_to_characters(encoded: bytes, start: int, end: int) -> Tuple[int, int]:
+    """Move a byte range inwards so it does not split a UTF-8 character."""
+    start = min(max(start, 0), len(encoded))
+    end = min(max(end, start), len(encoded))
+    while start < end and (encoded[start] & 0xC0) == 0x80:
+        start += 1
+    while end < len(encoded) and end > start and (encoded[end] & 0xC0) == 0x80:
+        end -= 1
+    return start, end
+
+
+@dataclass
+class OutlineCacheStats:
+    """Counters describing outline cache effectiveness."""
+
+    hits: int = 0
+    misses: int = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class OutlineCache:
+    """LRU cache of parsed outlines keyed by document id and revision."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_OUTLINES):
+        self.max_entries = max_entries
+        self.stats = OutlineCacheStats()
+        self._entries: "OrderedDict[Tuple[str, Optional[str]], DocumentOutline]" = (
+            OrderedDict()
+        )
+
+    def get_or_parse(
+        self, document_id: str, revision: Optional[str], text: str
+    ) -> DocumentOutline:
+        """Return the cached outline of a document revision, parsing it on a miss."""
+        key = (document_id, revision)
+        outline = self._entries.get(key)
+        if outline is not None and revision is not None:
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return outline
+
+        self.stats.misses += 1
+        outline = DocumentOutline.parse(text)
+        if revision is not None:
+            self._entries[key] = outline
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return outline
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), **self.stats.as_dict()}
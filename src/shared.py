@@ -0,0 +1,141 @@
+"""
+Reference-counted resources shared by concurrent MCP sessions.
+
+FastMCP enters the server lifespan once per session: once for stdio, but once per
+connected client (or, in stateless mode, per request) over SSE and streamable
+HTTP. SharedLifespan enters the wrapped context manager for the first holder and
+exits it when the last holder lets go, so all sessions share one HTTP connection
+pool, cache and rate limiter.
+
+Worker processes serving the same data directory share state through files. A
+LeaderLease elects one of them to run background loops that must not run twice,
+such as the workspace sync and the change feed.
+"""
+
+import asyncio
+import os
+from contextlib import AbstractAsyncContextManager, AsyncExitStack, asynccontextmanager
+from pathlib import Path
+from typing import IO, AsyncIterator, Callable, Generic, Optional, TypeVar
+
+import anyio
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None  # type: ignore[assignment]
+    import msvcrt
+
+T = TypeVar("T")
+
+# Seconds between attempts of a follower to take over the lease.
+LEASE_RETRY_INTERVAL = 30.0
+
+
+class SharedLifespan(Generic[T]):
+    """
+    Share one instance of an async context manager between holders.
+
+    Args:
+        factory: Creates the context manager entered for the first holder
+    """
+
+    def __init__(self, factory: Callable[[], AbstractAsyncContextManager[T]]):
+        self._factory = factory
+        self._lock = asyncio.Lock()
+        self._stack: Optional[AsyncExitStack] = None
+        self._value: Optional[T] = None
+        self._holders = 0
+        self.opened = 0
+
+    @property
+    def holders(self) -> int:
+        return self._holders
+
+    @property
+    def current(self) -> Optional[T]:
+        """The shared value while any holder has it, otherwise None."""
+        return self._value if self._stack is not None else None
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[T]:
+        """Hold the shared value, creating it if this is the first holder."""
+        async with self._lock:
+            if self._stack is None:
+                stack = AsyncExitStack()
+                self._value = await stack.enter_async_context(self._factory())
+                self._stack = stack
+                self.opened += 1
+            self._holders += 1
+            value = self._value
+
+        try:
+            yield value
+        finally:
+            self._holders -= 1
+            if self._holders == 0:
+                # Sessions are released from cancelled tasks on shutdown; closing
+                # must still run to completion.
+                with anyio.CancelScope(shield=True):
+                    await self._close_if_unused()
+
+    async def _close_if_unused(self) -> None:
+        async with self._lock:
+            if self._holders > 0 or self._stack is None:
+                return
+            stack, self._stack, self._value = self._stack, None, None
+            await stack.aclose()
+
+
+class LeaderLease:
+    """
+    Exclusive lock on a file, held by at most one process at a time.
+
+    The operating system releases the lock when its holder exits, even on a
+    crash, so a waiting process takes over.
+
+    Args:
+        path: Lock file, created if missing
+    """
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._file: Optional[IO[str]] = None
+
+    @property
+    def held(self) -> bool:
+        return self._file is not None
+
+    def try_acquire(self) -> bool:
+        """Take the lease if no other holder has it. Returns whether it is held."""
+        if self._file is not None:
+            return True
+        file = open(self.path, "a+")
+        try:
+            if fcntl is not None:
+                fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            file.close()
+            return False
+        file.seek(0)
+        file.truncate()
+        file.write(f"{os.getpid()}\n")
+        file.flush()
+        self._file = file
+        return True
+
+    async def acquire(self, interval: float = LEASE_RETRY_INTERVAL) -> None:
+        """Wait until this process holds the lease, trying every interval seconds."""
+        while not self.try_acquire():
+            await asyncio.sleep(interval)
+
+    def release(self) -> None:
+        if self._file is None:
+            return
+        # Closing the file drops the lock.
+        self._file.close()
+        self._file = None
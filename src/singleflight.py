@@ -0,0 +1,68 @@
+"""
+Request coalescing for identical concurrent Outline calls.
+
+While a request for a given key is in flight, further callers with the same key
+await the same task instead of issuing their own request. All callers receive
+the same result or the same exception.
+"""
+
+import asyncio
+from dataclasses import asdict, dataclass
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass
+class SingleFlightStats:
+    """Counters describing how many calls were coalesced."""
+
+    executed: int = 0
+    coalesced: int = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class SingleFlight:
+    """Share one in-flight call between concurrent callers with the same key."""
+
+    def __init__(self) -> None:
+        self.stats = SingleFlightStats()
+        self._inflight: Dict[str, "asyncio.Task[Any]"] = {}
+
+    @property
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run fn once for all concurrent callers using the same key.
+
+        The call runs in its own task, so cancelling one caller does not cancel
+        the request for the others.
+
+        Args:
+            key: Identity of the call (e.g. endpoint plus canonical body)
+            fn: Zero-argument coroutine function performing the call
+
+        Returns:
+            The result of fn, shared between all callers
+        """
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats.coalesced += 1
+        else:
+            self.stats.executed += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: "asyncio.Task[Any]") -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved when every caller was cancelled.
+        if not task.cancelled():
+            task.exception()
@@ -0,0 +1,96 @@
+"""
+Startup profiling.
+
+MCP hosts launch the stdio server once per session, so the time until it can
+answer is user visible. The profile imports the server in a fresh interpreter
+with `python -X importtime`, reports the slowest imports, and measures how long
+entering the server lifespan takes.
+"""
+
+import os
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+SERVER_MODULE = f"{__package__}.outline_mcp_server"
+
+
+@dataclass
+class ImportTiming:
+    """Import time of one module, in seconds."""
+
+    module: str
+    self_seconds: float
+    cumulative_seconds: float
+
+
+def parse_importtime(text: str) -> List[ImportTiming]:
+    """Parse the stderr output of `python -X importtime`."""
+    timings = []
+    for line in text.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:") :].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            self_us, cumulative_us = int(parts[0]), int(parts[1])
+        except ValueError:
+            # Header line
+            continue
+        timings.append(
+            ImportTiming(parts[2].strip(), self_us / 1e6, cumulative_us / 1e6)
+        )
+    return timings
+
+
+def measure_imports(module: str = SERVER_MODULE) -> Dict[str, Any]:
+    """
+    Import a module in a fresh interpreter and time it.
+
+    Returns:
+        Wall time of the interpreter ("seconds") and per-module timings ("imports")
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        path for path in (root, env.get("PYTHONPATH")) if path
+    )
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return {
+        "seconds": time.perf_counter() - started,
+        "imports": parse_importtime(completed.stderr),
+    }
+
+
+def format_profile(
+    imports: Dict[str, Any], lifespan_seconds: Optional[float], top: int = 15
+) -> str:
+    """Format a startup profile for the terminal."""
+    timings = imports["imports"]
+    lines = [
+        f"Interpreter start and import: {imports['seconds'] * 1000:.0f} ms",
+        "",
+        "Slowest imports (cumulative ms, self ms):",
+    ]
+    slowest = sorted(timings, key=lambda t: -t.cumulative_seconds)[:top]
+    for timing in slowest:
+        lines.append(
+            f"  {timing.cumulative_seconds * 1000:8.1f} "
+            f"{timing.self_seconds * 1000:8.1f}  {timing.module.strip()}"
+        )
+    lines.append("")
+    if lifespan_seconds is None:
+        lines.append("Lifespan: skipped (OUTLINE_API_TOKEN is not set)")
+    else:
+        lines.append(f"Lifespan setup: {lifespan_seconds * 1000:.1f} ms")
+    return "\n".join(lines)
@@ -0,0 +1,353 @@
+"""
+Incremental workspace sync.
+
+Keeps a local mirror of the Outline workspace up to date with few API calls.
+Each pass pages documents.list sorted by updatedAt (newest first) and stops at
+the watermark stored by the previous pass, so only changed documents are
+fetched. Archived documents are picked up the same way from documents.archived,
+and a periodic reconciliation pass detects deleted documents. State is stored
+in SQLite so a restarted server resumes where it left off.
+"""
+
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import aclosing
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from .pagination import RequestFn, iter_pages
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS synced_documents (
+    id TEXT PRIMARY KEY,
+    url_id TEXT,
+    collection_id TEXT,
+    revision INTEGER,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS synced_documents_collection
+    ON synced_documents (collection_id);
+"""
+
+UpsertSink = Callable[[List[Tuple[Dict[str, Any], str]]], Awaitable[None]]
+RemoveSink = Callable[[List[str]], Awaitable[None]]
+
+
+class SyncState:
+    """SQLite-backed watermark and known document revisions."""
+
+    def __init__(self, path: str):
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM sync_state WHERE key = ?", (key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: Optional[str]) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)",
+                (key, value),
+            )
+
+    def revisions(self, collection_id: Optional[str] = None) -> Dict[str, Any]:
+        """Return the synced revision of every document, optionally per collection."""
+        sql = "SELECT id, revision FROM synced_documents"
+        params: Tuple[Any, ...] = ()
+        if collection_id:
+            sql += " WHERE collection_id = ?"
+            params = (collection_id,)
+        with self._lock:
+            return dict(self._conn.execute(sql, params).fetchall())
+
+    def record(self, docs: List[Dict[str, Any]]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO synced_documents "
+                "(id, url_id, collection_id, revision, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (
+                        doc["id"],
+                        doc.get("urlId"),
+                        doc.get("collectionId"),
+                        doc.get("revision"),
+                        doc.get("updatedAt"),
+                    )
+                    for doc in docs
+                ],
+            )
+
+    def forget(self, document_ids: List[str]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "DELETE FROM synced_documents WHERE id = ?",
+                [(doc_id,) for doc_id in document_ids],
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT count(*) FROM synced_documents"
+            ).fetchone()[0]
+
+
+@dataclass
+class SyncResult:
+    """Outcome of a single sync pass."""
+
+    listed: int = 0
+    fetched: int = 0
+    removed: int = 0
+    reconciled: bool = False
+    duration: float = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        result: Dict[str, Any] = asdict(self)
+        result["duration"] = round(self.duration, 3)
+        return result
+
+
+class WorkspaceSync:
+    """
+    Mirror Outline documents into local sinks.
+
+    Args:
+        request: Coroutine function sending an uncached request to Outline
+        state: Persistent sync state
+        on_upsert: Called with (document, Markdown body) pairs of changed documents
+        on_remove: Called with the IDs of deleted or archived documents
+        interval: Seconds between passes of the background loop
+        reconcile_interval: Seconds between passes that detect deleted documents
+        max_concurrency: Maximum number of concurrent export requests
+    """
+
+    WATERMARK = "watermark"
+    RECONCILED_AT = "reconciled_at"
+
+    def __init__(
+        self,
+        request: RequestFn,
+        state: SyncState,
+        on_upsert: UpsertSink,
+        on_remove: RemoveSink,
+        interval: float = 300.0,
+        reconcile_interval: float = 6 * 3600.0,
+        max_concurrency: int = 8,
+    ):
+        self.request = request
+        self.state = state
+        self.on_upsert = on_upsert
+        self.on_remove = on_remove
+        self.interval = interval
+        self.reconcile_interval = reconcile_interval
+        self.last_result: Optional[SyncResult] = None
+        self.last_error: Optional[str] = None
+        self.runs = 0
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        self._lock = asyncio.Lock()
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    @property
+    def watermark(self) -> Optional[str]:
+        return self.state.get(self.WATERMARK)
+
+    async def run_once(
+        self, full: bool = False, collection_id: Optional[str] = None
+    ) -> SyncResult:
+        """
+        Run a single sync pass.
+
+        Args:
+            full: Walk the whole workspace, re-fetch every document and drop
+                documents that no longer exist
+            collection_id: Limit the pass to one collection. Scoped passes never
+                move the workspace watermark.
+
+        Returns:
+            Counters describing the pass
+        """
+        async with self._lock:
+            started = time.monotonic()
+            result = SyncResult()
+
+            # State calls wait on SQLite, so they run off the event loop.
+            reconciled_at = float(
+                await asyncio.to_thread(self.state.get, self.RECONCILED_AT) or 0
+            )
+            reconcile = full or time.time() - reconciled_at >= self.reconcile_interval
+            watermark = None
+            if not reconcile:
+                watermark = await asyncio.to_thread(self.state.get, self.WATERMARK)
+
+            seen = await self._sync_listing(result, watermark, full, collection_id)
+
+            if watermark is not None:
+                try:
+                    await self._sync_archived(result, watermark, collection_id)
+                except Exception as e:
+                    logger.warning(f"Skipping archived documents in sync: {e}")
+
+            if reconcile:
+                known = await asyncio.to_thread(self.state.revisions, collection_id)
+                await self._remove(result, sorted(set(known) - seen))
+                result.reconciled = True
+                if collection_id is None:
+                    await asyncio.to_thread(
+                        self.state.set, self.RECONCILED_AT, str(time.time())
+                    )
+
+            result.duration = time.monotonic() - started
+            self.last_result = result
+            self.runs += 1
+            return result
+
+    def start(self) -> "asyncio.Task[None]":
+        """Start the background sync loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run_forever())
+        return self._task
+
+    async def stop(self) -> None:
+        """Stop the background sync loop."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "runs": self.runs,
+            "watermark": self.watermark,
+            "synced_documents": len(self.state),
+            "last_result": self.last_result.as_dict() if self.last_result else None,
+            "last_error": self.last_error,
+        }
+
+    async def _run_forever(self) -> None:
+        while True:
+            try:
+                result = await self.run_once()
+                self.last_error = None
+                logger.info(f"Workspace sync finished: {result.as_dict()}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Workspace sync failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def _sync_listing(
+        self,
+        result: SyncResult,
+        watermark: Optional[str],
+        full: bool,
+        collection_id: Optional[str],
+    ) -> Set[str]:
+        """Fetch documents changed since the watermark and advance it."""
+        known = await asyncio.to_thread(self.state.revisions, collection_id)
+        newest = watermark
+        seen: Set[str] = set()
+        data: Dict[str, Any] = {"sort": "updatedAt", "direction": "DESC"}
+        if collection_id:
+            data["collectionId"] = collection_id
+
+        # Incremental passes usually stop within the first page, so only
+        # prefetch when walking the whole workspace.
+        pages_iter = iter_pages(
+            self.request, "documents.list", data, prefetch=watermark is None
+        )
+        async with aclosing(pages_iter) as pages:
+            async for page in pages:
+                reached_watermark = False
+                changed = []
+                for doc in page:
+                    updated_at = doc.get("updatedAt")
+                    if watermark and updated_at and updated_at < watermark:
+                        reached_watermark = True
+                        break
+                    result.listed += 1
+                    seen.add(doc["id"])
+                    if updated_at and (newest is None or updated_at > newest):
+                        newest = updated_at
+                    if full or known.get(doc["id"]) != doc.get("revision"):
+                        changed.append(doc)
+
+                if changed:
+                    items = await asyncio.gather(*(self._with_body(d) for d in changed))
+                    await self.on_upsert(list(items))
+                    await asyncio.to_thread(self.state.record, changed)
+                    result.fetched += len(changed)
+
+                if reached_watermark:
+                    break
+
+        if collection_id is None and newest is not None:
+            await asyncio.to_thread(self.state.set, self.WATERMARK, newest)
+        return seen
+
+    async def _sync_archived(
+        self, result: SyncResult, watermark: str, collection_id: Optional[str]
+    ) -> None:
+        """Drop documents archived since the watermark."""
+        known = await asyncio.to_thread(self.state.revisions, collection_id)
+        data: Dict[str, Any] = {"sort": "updatedAt", "direction": "DESC"}
+        if collection_id:
+            data["collectionId"] = collection_id
+
+        archived = []
+        pages_iter = iter_pages(
+            self.request, "documents.archived", data, prefetch=False
+        )
+        async with aclosing(pages_iter) as pages:
+            async for page in pages:
+                recent = [
+                    doc for doc in page if (doc.get("updatedAt") or "") >= watermark
+                ]
+                archived.extend(doc["id"] for doc in recent if doc["id"] in known)
+                if len(recent) < len(page):
+                    break
+
+        await self._remove(result, archived)
+
+    async def _remove(self, result: SyncResult, document_ids: List[str]) -> None:
+        if not document_ids:
+            return
+        await self.on_remove(document_ids)
+        await asyncio.to_thread(self.state.forget, document_ids)
+        result.removed += len(document_ids)
+
+    async def _with_body(self, doc: Dict[str, Any]) -> Tuple[Dict[str, Any], str]:
+        text = doc.get("text")
+        if text is not None:
+            return doc, text
+        async with self._semaphore:
+            response = await self.request("documents.export", {"id": doc["id"]})
+        return doc, response.get("data", "")
@@ -0,0 +1,622 @@
+"""
+Local semantic retrieval over synced documents.
+
+Document bodies are split into passages along paragraphs and headings, and each
+passage is embedded into a fixed-size vector. Vectors are stored as rows of a
+float16 matrix in a memory-mapped .npy file; passage text and document metadata
+live next to it in SQLite. A query is embedded the same way and scored against
+all rows with blocked matrix products, so retrieval needs neither Outline's AI
+answers feature nor a network round trip.
+
+The default embedder hashes words and word pairs into the vector (the "hashing
+trick"). It is deterministic, needs no model and runs offline, but matches on
+shared vocabulary rather than meaning; any callable mapping a list of texts to
+an (n, dimensions) array can be plugged in instead.
+
+Requires numpy, which is optional; see vector_index_available. It is imported
+when an index or embedder is created, so the cold start of a server without the
+index does not pay for it.
+"""
+
+import importlib
+import importlib.util
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from itertools import pairwise
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .search_index import DATE_FILTERS, document_status
+
+# numpy, once _require_numpy has run.
+np: Any = None
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS documents (
+    key INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    url_id TEXT,
+    title TEXT,
+    collection_id TEXT,
+    status TEXT,
+    revision INTEGER,
+    created_at TEXT,
+    updated_at TEXT,
+    created_by_id TEXT,
+    updated_by_id TEXT
+);
+CREATE INDEX IF NOT EXISTS documents_url_id ON documents (url_id);
+CREATE TABLE IF NOT EXISTS passages (
+    row INTEGER PRIMARY KEY,
+    document_key INTEGER NOT NULL,
+    position INTEGER,
+    heading TEXT,
+    text TEXT
+);
+CREATE INDEX IF NOT EXISTS passages_document ON passages (document_key);
+"""
+
+DEFAULT_EMBEDDER = "hashing"
+DEFAULT_DIMENSIONS = 512
+DEFAULT_CHUNK_CHARS = 1200
+
+# Rows scored per matrix product; bounds the float32 copy of a block.
+SEARCH_BLOCK_ROWS = 65536
+INITIAL_CAPACITY = 1024
+# Holes left by replaced documents are compacted once they outnumber live rows.
+COMPACT_MIN_HOLES = 1024
+
+Embedder = Callable[[Sequence[str]], Any]
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_HEADING_RE = re.compile(r"^ {0,3}#{1,6}[ \t]+(.*?)(?:[ \t]+#+)?[ \t]*$")
+_PARAGRAPH_RE = re.compile(r"\n[ \t]*\n")
+
+
+def vector_index_available() -> bool:
+    """Check whether numpy, which the vector index needs, is installed."""
+    return np is not None or importlib.util.find_spec("numpy") is not None
+
+
+def _require_numpy() -> None:
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            raise RuntimeError("The vector index requires numpy") from None
+        np = numpy
+
+
+@dataclass
+class Passage:
+    """A chunk of a document body and the heading it appears under."""
+
+    position: int
+    heading: Optional[str]
+    text: str
+
+
+def _split_long(paragraph: str, max_chars: int) -> Iterable[str]:
+    """Split a paragraph longer than max_chars at whitespace."""
+    while len(paragraph) > max_chars:
+        cut = paragraph.rfind(" ", 0, max_chars)
+        if cut <= 0:
+            cut = max_chars
+        yield paragraph[:cut].rstrip()
+        paragraph = paragraph[cut:].lstrip()
+    if paragraph:
+        yield paragraph
+
+
+def chunk_text(text: str, max_chars: int = DEFAULT_CHUNK_CHARS) -> List[Passage]:
+    """
+    Split Markdown into passages of at most max_chars characters.
+
+    Paragraphs are packed into passages whole where possible; a heading always
+    starts a new passage.
+    """
+    passages: List[Passage] = []
+    parts: List[str] = []
+    size = 0
+    heading: Optional[str] = None
+    passage_heading: Optional[str] = None
+
+    def flush() -> None:
+        nonlocal parts, size
+        if parts:
+            passages.append(Passage(len(passages), passage_heading, "\n\n".join(parts)))
+        parts, size = [], 0
+
+    for paragraph in _PARAGRAPH_RE.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        match = _HEADING_RE.match(paragraph.split("\n", 1)[0])
+        if match:
+            flush()
+            heading = match.group(1).strip() or heading
+        for piece in _split_long(paragraph, max_chars):
+            if parts and size + len(piece) + 2 > max_chars:
+                flush()
+            if not parts:
+                passage_heading = heading
+            parts.append(piece)
+            size += len(piece) + 2
+    flush()
+    return passages
+
+
+class HashingEmbedder:
+    """
+    Embed texts by hashing words and adjacent word pairs into signed buckets.
+
+    Args:
+        dimensions: Length of the vectors
+    """
+
+    name = "hashing"
+
+    def __init__(self, dimensions: int = DEFAULT_DIMENSIONS):
+        _require_numpy()
+        self.dimensions = dimensions
+
+    def __call__(self, texts: Sequence[str]) -> Any:
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = _WORD_RE.findall(text.casefold())
+            features = words + [f"{a} {b}" for a, b in pairwise(words)]
+            if not features:
+                continue
+            # crc32 is stable across processes, unlike hash().
+            hashes = np.array(
+                [zlib.crc32(f.encode("utf-8")) for f in features], dtype=np.int64
+            )
+            signs = np.where(hashes & 0x80000000, 1.0, -1.0).astype(np.float32)
+            np.add.at(matrix[row], hashes % self.dimensions, signs)
+        # Dampen repeated terms.
+        return np.sign(matrix) * np.log1p(np.abs(matrix))
+
+
+def load_embedder(spec: str, dimensions: int = DEFAULT_DIMENSIONS) -> Embedder:
+    """
+    Load an embedder.
+
+    Args:
+        spec: "hashing", or "module:attribute" naming a callable that maps a
+            list of texts to an (n, dimensions) array
+        dimensions: Vector length of the hashing embedder
+
+    Raises:
+        ValueError: If the spec names no callable
+    """
+    if spec == DEFAULT_EMBEDDER:
+        return HashingEmbedder(dimensions)
+    module_name, _, attribute = spec.partition(":")
+    if not module_name or not attribute:
+        raise ValueError(
+            f"Embedder must be {DEFAULT_EMBEDDER!r} or 'module:attribute', got {spec!r}"
+        )
+    embedder = getattr(importlib.import_module(module_name), attribute, None)
+    if not callable(embedder):
+        raise ValueError(f"Embedder {spec!r} is not callable")
+    return embedder
+
+
+class VectorIndex:
+    """
+    Embedded passages of Outline documents.
+
+    Vectors of changed documents are appended to the matrix; rows of replaced
+    or removed documents become holes that are skipped when scoring and
+    compacted away once they outnumber live rows. The SQLite connection and the
+    matrix are shared between the event loop and worker threads, so all access
+    goes through a lock.
+
+    Args:
+        directory: Directory for the index files
+        embedder: Maps a list of texts to an (n, dimensions) array
+        embedder_name: Identifies the embedder; an index built by another
+            embedder or with other dimensions is cleared
+        max_chunk_chars: Longest passage, in characters
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        embedder: Embedder,
+        embedder_name: str = DEFAULT_EMBEDDER,
+        max_chunk_chars: int = DEFAULT_CHUNK_CHARS,
+    ):
+        _require_numpy()
+        Path(directory).mkdir(parents=True, exist_ok=True)
+        self.directory = directory
+        self.embedder = embedder
+        self.embedder_name = embedder_name
+        self.max_chunk_chars = max_chunk_chars
+        self.matrix_path = os.path.join(directory, "vectors.npy")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            os.path.join(directory, "passages.sqlite"), check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self.dimensions = getattr(embedder, "dimensions", None) or len(
+            self._embed(["dimensions"])[0]
+        )
+        self._open()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+                self._vectors = None
+            self._conn.close()
+
+    def __len__(self) -> int:
+        """Number of indexed documents."""
+        with self._lock:
+            return self._conn.execute("SELECT count(*) FROM documents").fetchone()[0]
+
+    def upsert_many(self, items: Iterable[Tuple[Dict[str, Any], Optional[str]]]) -> int:
+        """
+        Insert or replace documents in the index.
+
+        Args:
+            items: Pairs of an Outline document payload and its Markdown body. When
+                the body is None the payload's "text" field is used.
+
+        Returns:
+            Number of documents written
+        """
+        batch = []
+        texts = []
+        for doc, text in items:
+            body = text if text is not None else doc.get("text") or ""
+            passages = chunk_text(body, self.max_chunk_chars)
+            title = doc.get("title") or ""
+            batch.append((doc, passages))
+            # The title and heading give short passages their context.
+            texts.extend(f"{title}\n{p.heading or ''}\n{p.text}" for p in passages)
+        vectors = self._embed(texts) if texts else None
+
+        offset = 0
+        with self._lock, self._conn:
+            for doc, passages in batch:
+                key = self._upsert_document(doc)
+                self._drop_rows(key)
+                count = len(passages)
+                if count:
+                    rows = self._append(vectors[offset : offset + count], key)
+                    self._conn.executemany(
+                        "INSERT INTO passages "
+                        "(row, document_key, position, heading, text) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        [
+                            (row, key, p.position, p.heading, p.text)
+                            for row, p in zip(rows, passages, strict=True)
+                        ],
+                    )
+                offset += count
+            self._set_meta("rows", str(self._rows))
+            self._vectors.flush()
+            self._compact_if_sparse()
+        return len(batch)
+
+    def remove(self, document_id: str) -> bool:
+        """Remove a document by id or urlId. Returns True if it was indexed."""
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT key FROM documents WHERE id = ? OR url_id = ?",
+                (document_id, document_id),
+            ).fetchone()
+            if row is None:
+                return False
+            self._drop_rows(row[0])
+            self._conn.execute("DELETE FROM documents WHERE key = ?", (row[0],))
+        return True
+
+    def search(
+        self,
+        query: str,
+        collection_id: Optional[str] = None,
+        document_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+        status_filter: Optional[str] = None,
+        date_filter: Optional[str] = None,
+        limit: int = 5,
+        passages_per_document: int = 2,
+    ) -> List[Dict[str, Any]]:
+        """
+        Find the documents with the passages most similar to a query.
+
+        Returns:
+            Up to limit {"document", "score", "passages"} items, best first.
+            "document" is shaped like an Outline document payload, "score" is
+            the cosine similarity of the best passage and "passages" holds up
+            to passages_per_document {"heading", "text", "score"} items.
+        """
+        query_vector = self._embed([query])[0].astype(np.float32)
+        with self._lock:
+            rows = self._rows
+            owners = self._owners[:rows]
+            mask = owners >= 0
+            keys = self._filter(
+                collection_id, document_id, user_id, status_filter, date_filter
+            )
+            if keys is not None:
+                mask &= np.isin(owners, keys)
+            live = int(mask.sum())
+            if live == 0:
+                return []
+
+            scores = np.empty(rows, dtype=np.float32)
+            for start in range(0, rows, SEARCH_BLOCK_ROWS):
+                end = min(start + SEARCH_BLOCK_ROWS, rows)
+                block = self._vectors[start:end].astype(np.float32)
+                scores[start:end] = block @ query_vector
+            scores[~mask] = -np.inf
+
+            best = self._best_rows(scores, owners, live, limit, passages_per_document)
+            return self._load_results(best, scores)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            documents = self._conn.execute("SELECT count(*) FROM documents").fetchone()[
+                0
+            ]
+            passages = int((self._owners[: self._rows] >= 0).sum())
+            return {
+                "embedder": self.embedder_name,
+                "dimensions": self.dimensions,
+                "documents": documents,
+                "passages": passages,
+                "rows": self._rows,
+                "bytes": int(self._vectors.nbytes),
+            }
+
+    def _embed(self, texts: Sequence[str]) -> Any:
+        vectors = np.asarray(self.embedder(list(texts)), dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(texts):
+            raise ValueError("Embedder must return one vector per text")
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1.0, norms)
+
+    def _open(self) -> None:
+        """Load the matrix and row owners, clearing an incompatible index."""
+        built_by = (self._get_meta("embedder"), self._get_meta("dimensions"))
+        expected = (self.embedder_name, str(self.dimensions))
+        if built_by != expected or not os.path.exists(self.matrix_path):
+            with self._conn:
+                self._conn.execute("DELETE FROM passages")
+                self._conn.execute("DELETE FROM documents")
+                self._set_meta("embedder", expected[0])
+                self._set_meta("dimensions", expected[1])
+                self._set_meta("rows", "0")
+            self._vectors = self._create_matrix(self.matrix_path, INITIAL_CAPACITY)
+        else:
+            self._vectors = np.lib.format.open_memmap(self.matrix_path, mode="r+")
+
+        self._rows = int(self._get_meta("rows") or 0)
+        self._owners = np.full(len(self._vectors), -1, dtype=np.int64)
+        for row, key in self._conn.execute("SELECT row, document_key FROM passages"):
+            self._owners[row] = key
+
+    def _create_matrix(self, path: str, capacity: int) -> Any:
+        return np.lib.format.open_memmap(
+            path, mode="w+", dtype=np.float16, shape=(capacity, self.dimensions)
+        )
+
+    def _resize(self, capacity: int, keep: Any) -> None:
+        """Rewrite the matrix with the given rows at the top."""
+        partial = f"{self.matrix_path}.partial"
+        matrix = self._create_matrix(partial, capacity)
+        for start in range(0, len(keep), SEARCH_BLOCK_ROWS):
+            chunk = keep[start : start + SEARCH_BLOCK_ROWS]
+            matrix[start : start + len(chunk)] = self._vectors[chunk]
+        matrix.flush()
+        del matrix
+        self._vectors = None
+        os.replace(partial, self.matrix_path)
+        self._vectors = np.lib.format.open_memmap(self.matrix_path, mode="r+")
+
+    def _append(self, vectors: Any, key: int) -> List[int]:
+        start, end = self._rows, self._rows + len(vectors)
+        if end > len(self._vectors):
+            capacity = max(2 * len(self._vectors), end)
+            self._resize(capacity, np.arange(self._rows))
+            owners = np.full(capacity, -1, dtype=np.int64)
+            owners[: self._rows] = self._owners[: self._rows]
+            self._owners = owners
+        self._vectors[start:end] = vectors.astype(np.float16)
+        self._owners[start:end] = key
+        self._rows = end
+        return list(range(start, end))
+
+    def _compact_if_sparse(self) -> None:
+        live_rows = np.flatnonzero(self._owners[: self._rows] >= 0)
+        holes = self._rows - len(live_rows)
+        if holes < COMPACT_MIN_HOLES or holes < len(live_rows):
+            return
+        capacity = max(INITIAL_CAPACITY, 2 * len(live_rows))
+        self._resize(capacity, live_rows)
+        with self._conn:
+            self._conn.executemany(
+                "UPDATE passages SET row = ? WHERE row = ?",
+                [(new, int(old)) for new, old in enumerate(live_rows)],
+            )
+            self._set_meta("rows", str(len(live_rows)))
+        owners = np.full(capacity, -1, dtype=np.int64)
+        owners[: len(live_rows)] = self._owners[live_rows]
+        self._owners = owners
+        self._rows = len(live_rows)
+
+    def _upsert_document(self, doc: Dict[str, Any]) -> int:
+        values = (
+            doc.get("urlId"),
+            doc.get("title") or "",
+            doc.get("collectionId"),
+            document_status(doc),
+            doc.get("revision"),
+            doc.get("createdAt"),
+            doc.get("updatedAt"),
+            (doc.get("createdBy") or {}).get("id"),
+            (doc.get("updatedBy") or {}).get("id"),
+        )
+        row = self._conn.execute(
+            "SELECT key FROM documents WHERE id = ?", (doc["id"],)
+        ).fetchone()
+        if row is not None:
+            self._conn.execute(
+                "UPDATE documents SET url_id = ?, title = ?, collection_id = ?, "
+                "status = ?, revision = ?, created_at = ?, updated_at = ?, "
+                "created_by_id = ?, updated_by_id = ? WHERE key = ?",
+                (*values, row[0]),
+            )
+            return row[0]
+        cursor = self._conn.execute(
+            "INSERT INTO documents (id, url_id, title, collection_id, status, "
+            "revision, created_at, updated_at, created_by_id, updated_by_id) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (doc["id"], *values),
+        )
+        return cursor.lastrowid
+
+    def _drop_rows(self, key: int) -> None:
+        rows = [
+            row
+            for (row,) in self._conn.execute(
+                "SELECT row FROM passages WHERE document_key = ?", (key,)
+            )
+        ]
+        if rows:
+            self._owners[rows] = -1
+            self._conn.execute("DELETE FROM passages WHERE document_key = ?", (key,))
+
+    def _filter(
+        self,
+        collection_id: Optional[str],
+        document_id: Optional[str],
+        user_id: Optional[str],
+        status_filter: Optional[str],
+        date_filter: Optional[str],
+    ) -> Optional[Any]:
+        """Return the keys of the documents passing the filters, or None for all."""
+        conditions = []
+        params: List[Any] = []
+        if collection_id:
+            conditions.append("collection_id = ?")
+            params.append(collection_id)
+        if document_id:
+            conditions.append("(id = ? OR url_id = ?)")
+            params.extend([document_id, document_id])
+        if user_id:
+            conditions.append("(created_by_id = ? OR updated_by_id = ?)")
+            params.extend([user_id, user_id])
+        if status_filter:
+            conditions.append("status = ?")
+            params.append(status_filter)
+        if date_filter in DATE_FILTERS:
+            since = datetime.now(timezone.utc) - DATE_FILTERS[date_filter]
+            conditions.append("updated_at >= ?")
+            params.append(since.strftime("%Y-%m-%dT%H:%M:%S"))
+        if not conditions:
+            return None
+        keys = self._conn.execute(
+            f"SELECT key FROM documents WHERE {' AND '.join(conditions)}", params
+        ).fetchall()
+        return np.array([key for (key,) in keys], dtype=np.int64)
+
+    def _best_rows(
+        self,
+        scores: Any,
+        owners: Any,
+        live: int,
+        limit: int,
+        passages_per_document: int,
+    ) -> Dict[int, List[int]]:
+        """Pick the best passages of the best documents, best first."""
+        candidates = min(live, max(limit * passages_per_document * 8, 64))
+        while True:
+            top = np.argpartition(-scores, candidates - 1)[:candidates]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            best: Dict[int, List[int]] = {}
+            for row in top:
+                key = int(owners[row])
+                rows = best.get(key)
+                if rows is None:
+                    if len(best) == limit:
+                        continue
+                    rows = best[key] = []
+                if len(rows) < passages_per_document:
+                    rows.append(int(row))
+            complete = len(best) == limit and all(
+                len(rows) == passages_per_document for rows in best.values()
+            )
+            if complete or candidates >= live:
+                return best
+            candidates = min(live, candidates * 4)
+
+    def _load_results(
+        self, best: Dict[int, List[int]], scores: Any
+    ) -> List[Dict[str, Any]]:
+        results = []
+        for key, rows in best.items():
+            doc = self._conn.execute(
+                "SELECT id, url_id, title, collection_id, revision, created_at, "
+                "updated_at FROM documents WHERE key = ?",
+                (key,),
+            ).fetchone()
+            placeholders = ", ".join("?" for _ in rows)
+            passages = {
+                row: (heading, text)
+                for row, heading, text in self._conn.execute(
+                    f"SELECT row, heading, text FROM passages "
+                    f"WHERE row IN ({placeholders})",
+                    rows,
+                )
+            }
+            results.append(
+                {
+                    "document": {
+                        "id": doc[0],
+                        "urlId": doc[1],
+                        "title": doc[2],
+                        "collectionId": doc[3],
+                        "revision": doc[4],
+                        "createdAt": doc[5],
+                        "updatedAt": doc[6],
+                    },
+                    "score": round(float(scores[rows[0]]), 6),
+                    "passages": [
+                        {
+                            "heading": passages[row][0],
+                            "text": passages[row][1],
+                            "score": round(float(scores[row]), 6),
+                        }
+                        for row in rows
+                    ],
+                }
+            )
+        return results
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self._conn.execute(
+            "SELECT value FROM meta WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value)
+        )
@@ -0,0 +1,132 @@
+"""
+Smoke tests for the benchmark harness and its fake Outline server
+"""
+
+import httpx
+import pytest
+
+from benchmarks.fake_outline import (
+    TREE_FANOUT,
+    FakeOutline,
+    FakeOutlineServer,
+    FakeOutlineSettings,
+)
+from benchmarks.run import SCENARIOS, find_regressions, percentile, run_benchmarks
+from src.outline_mcp_server import mcp
+
+SMALL_WORKSPACE = FakeOutlineSettings(
+    documents=20, collections=2, document_bytes=2000, latency=0.0, jitter=0.0
+)
+
+
+class TestFakeOutline:
+    """Test the stand-in Outline API."""
+
+    def test_serves_documents_and_counts_requests(self):
+        fake = FakeOutline(SMALL_WORKSPACE)
+        with FakeOutlineServer(fake) as server:
+            doc_id = fake.documents[0]["urlId"]
+            info = httpx.post(f"{server.base_url}/documents.info", json={"id": doc_id})
+            page = httpx.post(
+                f"{server.base_url}/documents.list", json={"offset": 15, "limit": 10}
+            )
+
+        assert info.json()["data"]["text"].startswith("# ")
+        assert len(page.json()["data"]) == 5
+        assert fake.requests == {"documents.info": 1, "documents.list": 1}
+
+    def test_nests_documents_in_collection_trees(self):
+        fake = FakeOutline(SMALL_WORKSPACE)
+        root, leaf = fake.documents[0], fake.documents[-2]
+        with FakeOutlineServer(fake) as server:
+            response = httpx.post(
+                f"{server.base_url}/collections.documents",
+                json={"id": root["collectionId"]},
+            )
+
+        roots = response.json()["data"]
+        assert len(roots) == TREE_FANOUT
+        assert leaf["id"] in [child["id"] for child in roots[0]["children"]]
+        assert fake.title_path(leaf) == f"{root['title']}/{leaf['title']}"
+
+    def test_injects_errors(self):
+        fake = FakeOutline(
+            FakeOutlineSettings(documents=1, latency=0.0, jitter=0.0, error_rate=1.0)
+        )
+        with FakeOutlineServer(fake) as server:
+            response = httpx.post(f"{server.base_url}/auth.info", json={})
+
+        assert response.status_code == 503
+
+
+class TestHarness:
+    """Test running the benchmarks end to end."""
+
+    @pytest.mark.asyncio
+    async def test_runs_selected_tools(self):
+        report = await run_benchmarks(
+            SMALL_WORKSPACE,
+            requests=5,
+            concurrency=2,
+            tools=[
+                "get_document",
+                "list_collections",
+                "resolve_document_path",
+                "export_collection",
+            ],
+        )
+
+        tools = {tool["tool"]: tool for tool in report["tools"]}
+        assert set(tools) == {
+            "get_document",
+            "list_collections",
+            "resolve_document_path",
+            "export_collection",
+        }
+        assert tools["resolve_document_path"]["errors"] == 0
+        assert tools["export_collection"]["errors"] == 0
+        assert tools["get_document"]["calls"] == 5
+        assert tools["get_document"]["errors"] == 0
+        assert tools["get_document"]["upstream"]["documents.info"] >= 1
+
+    @pytest.mark.asyncio
+    async def test_every_tool_has_a_scenario(self):
+        tools = [tool.name for tool in await mcp.list_tools()]
+
+        assert [name for name in tools if name not in SCENARIOS] == []
+
+    def test_percentile(self):
+        values = [float(v) for v in range(1, 101)]
+
+        assert percentile(values, 50) == 50.0
+        assert percentile(values, 99) == 99.0
+        assert percentile([], 95) == 0.0
+
+    def test_find_regressions(self):
+        baseline = {
+            "tools": [
+                {
+                    "tool": "get_document",
+                    "p95_ms": 10.0,
+                    "rps": 100.0,
+                    "upstream_per_call": 1.0,
+                    "errors": 0,
+                }
+            ]
+        }
+        report = {
+            "tools": [
+                {
+                    "tool": "get_document",
+                    "p95_ms": 15.0,
+                    "rps": 95.0,
+                    "upstream_per_call": 1.0,
+                    "errors": 0,
+                }
+            ]
+        }
+
+        assert find_regressions(report, baseline, 0.2) == [
+            "get_document: p95 10.0ms -> 15.0ms"
+        ]
+        assert find_regressions(report, baseline, 0.6) == []
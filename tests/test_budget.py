@@ -0,0 +1,134 @@
+"""
+Tests for token budgets and excerpts of tool results
+"""
+
+import random
+
+import pytest
+
+from src.budget import (
+    ELISION,
+    Budget,
+    estimate_text_tokens,
+    resolve_budget,
+    split_blocks,
+    truncate_text,
+)
+
+RUNBOOK = "# Runbook\n\nThis runbook covers deploys.\n\n" + "\n\n".join(
+    f"## Step {i}\n\nIntro to step {i}.\n\n"
+    + "filler text " * 80
+    + ("rollback the release" if i == 7 else "")
+    for i in range(12)
+)
+
+
+class TestEstimateTokens:
+    """Test the local token estimate."""
+
+    def test_words_and_punctuation(self):
+        assert estimate_text_tokens("Deploy the app, then wait.") == 7
+
+    def test_long_words_and_numbers_count_more(self):
+        assert estimate_text_tokens("internationalization") == 4
+        assert estimate_text_tokens("1234567") == 3
+
+    def test_empty(self):
+        assert estimate_text_tokens("") == 0
+
+
+class TestResolveBudget:
+    """Test budgets from tool arguments."""
+
+    def test_no_budget(self):
+        assert resolve_budget(None, None) is None
+
+    def test_default_applies_without_arguments(self):
+        assert resolve_budget(None, None, 500) == Budget(max_tokens=500)
+        assert resolve_budget(None, 100, 500) == Budget(max_bytes=100)
+
+    def test_rejects_non_positive_budget(self):
+        with pytest.raises(ValueError, match="max_tokens"):
+            resolve_budget(0, None)
+
+
+class TestSplitBlocks:
+    """Test splitting Markdown into headings and paragraphs."""
+
+    def test_fenced_code_is_one_block(self):
+        text = "# Title\n\n```\ncode\n\n# not a heading\n```\n\nAfter.\n"
+        blocks = split_blocks(text)
+
+        assert [b.heading for b in blocks] == [True, False, False]
+        assert blocks[1].text == "```\ncode\n\n# not a heading\n```\n"
+        assert text.encode()[blocks[2].start : blocks[2].end] == b"After.\n"
+
+
+class TestTruncateText:
+    """Test head and smart excerpts."""
+
+    def test_text_within_budget_is_kept(self):
+        excerpt = truncate_text("# Short\n", Budget(max_tokens=100))
+
+        assert excerpt.truncated is False
+        assert excerpt.text == "# Short\n"
+        assert excerpt.next_byte is None
+
+    def test_head_excerpt_is_a_prefix(self):
+        excerpt = truncate_text(RUNBOOK, Budget(max_tokens=300), mode="head")
+
+        assert excerpt.truncated is True
+        assert RUNBOOK.startswith(excerpt.text)
+        assert estimate_text_tokens(excerpt.text) <= 300
+        assert excerpt.next_byte == len(excerpt.text.encode())
+
+    def test_head_excerpt_cuts_long_lines(self):
+        excerpt = truncate_text("word " * 100, Budget(max_bytes=12), mode="head")
+
+        assert excerpt.text == "word word "
+        assert excerpt.next_byte == 10
+
+    def test_smart_excerpt_keeps_structure_and_matches(self):
+        excerpt = truncate_text(RUNBOOK, Budget(max_tokens=300), query="rollback")
+
+        assert excerpt.truncated is True
+        assert estimate_text_tokens(excerpt.text) <= 300
+        for i in range(12):
+            assert f"## Step {i}\n" in excerpt.text
+        assert "This runbook covers deploys." in excerpt.text
+        assert "rollback the release" in excerpt.text
+        assert ELISION in excerpt.text
+        assert excerpt.next_byte == RUNBOOK.index("filler")
+
+    def test_byte_budget(self):
+        excerpt = truncate_text(RUNBOOK, Budget(max_bytes=500))
+
+        assert len(excerpt.text.encode()) <= 500
+        assert excerpt.text.startswith("# Runbook\n")
+
+    @pytest.mark.parametrize("seed", range(20))
+    def test_excerpts_never_exceed_budget(self, seed):
+        rng = random.Random(seed)
+        words = ["deploy", "rollback", "the", "release", "incident", "é", "note"]
+
+        for _ in range(50):
+            blocks = []
+            for _ in range(rng.randint(1, 30)):
+                if rng.random() < 0.3:
+                    blocks.append("#" * rng.randint(1, 3) + " " + rng.choice(words))
+                else:
+                    blocks.append(" ".join(rng.choices(words, k=rng.randint(1, 120))))
+            text = "\n\n".join(blocks) + "\n" * rng.randint(0, 2)
+            budget = Budget(
+                max_tokens=rng.choice([None, rng.randint(1, 400)]),
+                max_bytes=rng.randint(1, 1200),
+            )
+            for mode in ("smart", "head"):
+                excerpt = truncate_text(text, budget, query="rollback", mode=mode)
+
+                assert len(excerpt.text.encode()) <= budget.max_bytes
+                assert budget.fits_text(excerpt.text)
+
+    def test_unknown_mode(self):
+        with pytest.raises(ValueError, match="truncation must be one of"):
+            truncate_text(RUNBOOK, Budget(max_tokens=10), mode="tail")
@@ -0,0 +1,250 @@
+"""
+Tests for the Outline response cache
+"""
+
+import sqlite3
+
+from src.cache import LRUBackend, ResponseCache, SQLiteBackend, canonical_key
+
+
+class FakeClock:
+    """Manually advanced clock."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def document_response(doc_id="doc-1", revision=1, text="body"):
+    return {
+        "ok": True,
+        "data": {
+            "id": doc_id,
+            "urlId": f"url-{doc_id}",
+            "revision": revision,
+            "updatedAt": f"2024-01-0{revision}T00:00:00Z",
+            "text": text,
+        },
+    }
+
+
+class TestCanonicalKey:
+    """Test cache key construction."""
+
+    def test_key_ignores_body_key_order(self):
+        assert canonical_key("documents.list", {"a": 1, "b": 2}) == canonical_key(
+            "documents.list", {"b": 2, "a": 1}
+        )
+
+    def test_key_distinguishes_endpoints(self):
+        assert canonical_key("documents.info", {"id": "x"}) != canonical_key(
+            "documents.export", {"id": "x"}
+        )
+
+
+class TestResponseCache:
+    """Test TTLs, eviction and revision-based invalidation."""
+
+    def test_hit_and_miss_counters(self):
+        cache = ResponseCache()
+        assert cache.get("documents.info", {"id": "doc-1"}) is None
+
+        cache.set("documents.info", {"id": "doc-1"}, document_response())
+        assert cache.get("documents.info", {"id": "doc-1"}) == document_response()
+
+        stats = cache.snapshot()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["entries"] == 1
+
+    def test_entries_expire_after_ttl(self):
+        clock = FakeClock()
+        cache = ResponseCache(ttls={"documents.info": 10}, clock=clock)
+        cache.set("documents.info", {"id": "doc-1"}, document_response())
+
+        clock.now = 9.9
+        assert cache.get("documents.info", {"id": "doc-1"}) is not None
+        clock.now = 10.0
+        assert cache.get("documents.info", {"id": "doc-1"}) is None
+        assert cache.stats.expirations == 1
+
+    def test_ttl_is_capped_at_endpoint_ttl(self):
+        clock = FakeClock()
+        cache = ResponseCache(ttls={"documents.info": 10}, clock=clock)
+        cache.set("documents.info", {"id": "doc-1"}, document_response(), ttl=5)
+        cache.set("documents.info", {"id": "doc-2"}, document_response("doc-2"), ttl=60)
+
+        clock.now = 5.0
+        assert cache.get("documents.info", {"id": "doc-1"}) is None
+        assert cache.get("documents.info", {"id": "doc-2"}) is not None
+        clock.now = 10.0
+        assert cache.get("documents.info", {"id": "doc-2"}) is None
+
+    def test_uncacheable_endpoints_are_not_stored(self):
+        cache = ResponseCache()
+        cache.set("documents.answerQuestion", {"query": "q"}, {"ok": True})
+        assert cache.get("documents.answerQuestion", {"query": "q"}) is None
+        assert len(cache.backend) == 0
+
+    def test_lru_eviction_by_bytes(self):
+        cache = ResponseCache(backend=LRUBackend(max_bytes=250))
+        for i in range(3):
+            cache.set("documents.info", {"id": f"doc-{i}"}, {"ok": True}, size=100)
+
+        assert cache.get("documents.info", {"id": "doc-0"}) is None
+        assert cache.get("documents.info", {"id": "doc-2"}) is not None
+        assert cache.stats.evictions == 1
+        assert cache.backend.current_bytes == 200
+
+    def test_newer_revision_in_listing_invalidates_document(self):
+        cache = ResponseCache()
+        cache.set("documents.info", {"id": "url-doc-1"}, document_response())
+        cache.set("documents.export", {"id": "doc-1"}, {"ok": True, "data": "# Doc"})
+
+        listing = {"ok": True, "data": [document_response(revision=2)["data"]]}
+        cache.set("documents.list", {"limit": 25}, listing)
+
+        assert cache.get("documents.info", {"id": "url-doc-1"}) is None
+        assert cache.get("documents.export", {"id": "doc-1"}) is None
+        assert cache.stats.invalidations == 2
+
+    def test_unchanged_revision_keeps_document(self):
+        cache = ResponseCache()
+        cache.set("documents.info", {"id": "doc-1"}, document_response())
+
+        listing = {"ok": True, "data": [{"document": document_response()["data"]}]}
+        cache.set("documents.search", {"query": "body"}, listing)
+
+        assert cache.get("documents.info", {"id": "doc-1"}) is not None
+
+    def test_revision_markers_are_bounded(self):
+        cache = ResponseCache(max_revisions=4)
+        for doc_id in ("doc-1", "doc-2", "doc-3"):
+            cache.set("documents.info", {"id": doc_id}, document_response(doc_id))
+
+        assert cache.snapshot()["revisions"] == 4
+        assert cache.revision("doc-1") is None
+        assert cache.revision("doc-3") is not None
+        # A forgotten marker cannot flag a newer revision, so the read is dropped.
+        assert cache.get("documents.info", {"id": "doc-1"}) is None
+        assert cache.get("documents.info", {"id": "doc-2"}) is not None
+
+    def test_invalidate_collection(self):
+        cache = ResponseCache()
+        for collection_id in ("col-1", "col-2"):
+            info = {"ok": True, "data": {"id": collection_id, "updatedAt": "v1"}}
+            cache.set("collections.info", {"id": collection_id}, info)
+        cache.set("collections.documents", {"id": "col-1"}, {"ok": True, "data": []})
+
+        assert cache.invalidate_collection("col-1") == 2
+        assert cache.get("collections.info", {"id": "col-1"}) is None
+        assert cache.get("collections.documents", {"id": "col-1"}) is None
+        assert cache.get("collections.info", {"id": "col-2"}) is not None
+
+
+class TestStaleEntries:
+    """Test keeping expired entries to serve them stale."""
+
+    def test_expired_entries_are_kept_for_max_stale(self):
+        clock = FakeClock()
+        cache = ResponseCache(ttls={"documents.info": 10}, clock=clock, max_stale=60)
+        cache.set("documents.info", {"id": "doc-1"}, document_response())
+
+        clock.now = 30.0
+        assert cache.get("documents.info", {"id": "doc-1"}) is None
+        value, age = cache.get_stale("documents.info", {"id": "doc-1"}, 60)
+        assert value["data"]["id"] == "doc-1"
+        assert age == 30.0
+        assert cache.get_stale("documents.info", {"id": "doc-1"}, 10) is None
+        assert cache.stats.stale_hits == 1
+
+        clock.now = 70.0
+        assert cache.get("documents.info", {"id": "doc-1"}) is None
+        assert cache.get_stale("documents.info", {"id": "doc-1"}, 60) is None
+        assert cache.stats.expirations == 1
+
+    def test_invalidated_entries_are_not_served_stale(self):
+        clock = FakeClock()
+        cache = ResponseCache(ttls={"documents.info": 10}, clock=clock, max_stale=60)
+        cache.set("documents.info", {"id": "doc-1"}, document_response())
+
+        cache.invalidate_document("doc-1")
+        clock.now = 30.0
+
+        assert cache.get_stale("documents.info", {"id": "doc-1"}, 60) is None
+
+
+class TestSQLiteBackend:
+    """Test the cache shared by worker processes."""
+
+    def test_caches_share_entries(self, tmp_path):
+        clock = FakeClock()
+        path = str(tmp_path / "shared.sqlite")
+        first = ResponseCache(backend=SQLiteBackend(path), clock=clock)
+        second = ResponseCache(backend=SQLiteBackend(path), clock=clock)
+
+        first.set("documents.info", {"id": "doc-1"}, document_response())
+
+        assert second.get("documents.info", {"id": "doc-1"}) == document_response()
+        assert second.snapshot()["entries"] == 1
+
+    def test_invalidation_reaches_entries_of_other_processes(self, tmp_path):
+        path = str(tmp_path / "shared.sqlite")
+        first = ResponseCache(backend=SQLiteBackend(path))
+        second = ResponseCache(backend=SQLiteBackend(path))
+
+        first.set("documents.info", {"id": "doc-1"}, document_response())
+        second.invalidate_document("doc-1")
+
+        assert first.get("documents.info", {"id": "doc-1"}) is None
+
+    def test_evicts_oldest_entries_by_bytes(self, tmp_path):
+        clock = FakeClock()
+        path = str(tmp_path / "shared.sqlite")
+        cache = ResponseCache(
+            backend=SQLiteBackend(path, max_bytes=250, clock=clock), clock=clock
+        )
+
+        for i in range(3):
+            clock.now = float(i)
+            cache.set("documents.list", {"offset": i}, {"data": []}, size=100)
+
+        assert cache.get("documents.list", {"offset": 0}) is None
+        assert cache.get("documents.list", {"offset": 2}) == {"data": []}
+        assert cache.stats.evictions == 1
+        assert cache.backend.current_bytes == 200
+
+    def test_evicts_least_recently_used_entries(self, tmp_path):
+        clock = FakeClock()
+        path = str(tmp_path / "shared.sqlite")
+        cache = ResponseCache(
+            backend=SQLiteBackend(path, max_bytes=250, clock=clock), clock=clock
+        )
+        for i in range(2):
+            clock.now = float(i)
+            cache.set("documents.list", {"offset": i}, {"data": []}, size=100)
+
+        clock.now = 2.0
+        assert cache.get("documents.list", {"offset": 0}) is not None
+        clock.now = 3.0
+        cache.set("documents.list", {"offset": 2}, {"data": []}, size=100)
+
+        assert cache.get("documents.list", {"offset": 0}) is not None
+        assert cache.get("documents.list", {"offset": 1}) is None
+
+    def test_upgrades_databases_without_last_use(self, tmp_path):
+        path = str(tmp_path / "shared.sqlite")
+        conn = sqlite3.connect(path)
+        conn.execute(
+            "CREATE TABLE entries (key TEXT PRIMARY KEY, endpoint TEXT NOT NULL, "
+            "value TEXT NOT NULL, size INTEGER NOT NULL, stored_at REAL NOT NULL, "
+            "expires_at REAL NOT NULL, tags TEXT NOT NULL)"
+        )
+        conn.close()
+
+        cache = ResponseCache(backend=SQLiteBackend(path))
+        cache.set("documents.info", {"id": "doc-1"}, document_response())
+
+        assert cache.get("documents.info", {"id": "doc-1"}) == document_response()
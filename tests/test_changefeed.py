@@ -0,0 +1,233 @@
+"""
+Tests for change-feed driven cache invalidation
+"""
+
+import hashlib
+import hmac
+
+import pytest
+
+from src.changefeed import (
+    MAX_CATCH_UP_EVENTS,
+    ChangeFeed,
+    Invalidation,
+    InvalidationLog,
+    invalidation_for,
+    verify_signature,
+    webhook_invalidation,
+)
+from src.sync import SyncState
+
+
+class FakeEvents:
+    """In-memory stand-in for events.list."""
+
+    def __init__(self):
+        self.events = []
+
+    def emit(self, name, **fields):
+        index = len(self.events)
+        self.events.append(
+            {
+                "id": f"event-{index}",
+                "name": name,
+                "createdAt": f"2024-01-01T00:{index // 60:02d}:{index % 60:02d}.000Z",
+                **fields,
+            }
+        )
+
+    async def request(self, endpoint, data):
+        assert endpoint == "events.list"
+        newest_first = self.events[::-1]
+        page = newest_first[data["offset"] : data["offset"] + data["limit"]]
+        return {"ok": True, "data": page}
+
+
+def make_feed(events, applied):
+    async def on_invalidate(invalidation):
+        applied.append(invalidation)
+
+    return ChangeFeed(events.request, SyncState(":memory:"), on_invalidate)
+
+
+def sign(secret, body, timestamp):
+    digest = hmac.new(
+        secret.encode(), f"{timestamp}.".encode() + body, hashlib.sha256
+    ).hexdigest()
+    return f"t={timestamp},s={digest}"
+
+
+class TestInvalidation:
+    """Test translating events into invalidations."""
+
+    def test_events_map_to_documents_and_collections(self):
+        invalidation = invalidation_for(
+            [
+                {"name": "documents.update", "documentId": "d1", "collectionId": "c1"},
+                {"name": "documents.delete", "documentId": "d2"},
+                {"name": "collections.update", "modelId": "c2"},
+                {"name": "users.signin", "modelId": "u1"},
+            ]
+        )
+
+        assert invalidation.documents == {"d1": "c1", "d2": None}
+        assert invalidation.collections == {"c1", "c2"}
+        assert invalidation.everything is False
+
+    def test_unrelated_events_invalidate_nothing(self):
+        assert not invalidation_for([{"name": "users.signin", "modelId": "u1"}])
+
+    def test_webhook_delivery(self):
+        invalidation = webhook_invalidation(
+            {
+                "event": "documents.update",
+                "payload": {"id": "d1", "model": {"id": "d1", "collectionId": "c1"}},
+            }
+        )
+
+        assert invalidation.documents == {"d1": "c1"}
+        assert invalidation.collections == {"c1"}
+
+    def test_round_trip(self):
+        invalidation = Invalidation(documents={"d1": "c1", "d2": None})
+        invalidation.collections.add("c1")
+
+        assert Invalidation.from_dict(invalidation.to_dict()) == invalidation
+
+
+class TestInvalidationLog:
+    """Test passing invalidations between worker processes."""
+
+    def test_other_processes_read_published_invalidations(self, tmp_path):
+        path = str(tmp_path / "shared.sqlite")
+        first, second = InvalidationLog(path), InvalidationLog(path)
+
+        first.publish(Invalidation(documents={"d1": "c1"}))
+        first.publish(Invalidation(everything=True))
+
+        assert first.read() == []
+        assert [i.everything for i in second.read()] == [False, True]
+        assert second.read() == []
+
+    def test_reads_start_at_the_end_of_the_log(self, tmp_path):
+        path = str(tmp_path / "shared.sqlite")
+        InvalidationLog(path).publish(Invalidation(everything=True))
+
+        assert InvalidationLog(path).read() == []
+
+    def test_old_invalidations_are_dropped(self, tmp_path):
+        now = [0.0]
+        path = str(tmp_path / "shared.sqlite")
+        first = InvalidationLog(path, retention=60, clock=lambda: now[0])
+        second = InvalidationLog(path)
+
+        first.publish(Invalidation(collections={"c1"}))
+        now[0] = 61.0
+        first.publish(Invalidation(collections={"c2"}))
+
+        assert [i.collections for i in second.read()] == [{"c2"}]
+
+
+class TestVerifySignature:
+    """Test webhook signature checks."""
+
+    BODY = b'{"event": "documents.update"}'
+
+    def test_valid_signature(self):
+        header = sign("secret", self.BODY, 1700000000)
+        assert verify_signature("secret", header, self.BODY, now=1700000010)
+
+    def test_millisecond_timestamp(self):
+        header = sign("secret", self.BODY, 1700000000000)
+        assert verify_signature("secret", header, self.BODY, now=1700000010)
+
+    def test_wrong_secret(self):
+        header = sign("other", self.BODY, 1700000000)
+        assert not verify_signature("secret", header, self.BODY, now=1700000010)
+
+    def test_tampered_body(self):
+        header = sign("secret", self.BODY, 1700000000)
+        assert not verify_signature("secret", header, b"{}", now=1700000010)
+
+    def test_stale_timestamp(self):
+        header = sign("secret", self.BODY, 1700000000)
+        assert not verify_signature("secret", header, self.BODY, now=1700001000)
+
+    @pytest.mark.parametrize("header", [None, "", "s=abc", "t=soon,s=abc"])
+    def test_malformed_header(self, header):
+        assert not verify_signature("secret", header, self.BODY)
+
+
+class TestChangeFeed:
+    """Test polling the feed from a persisted cursor."""
+
+    @pytest.mark.asyncio
+    async def test_first_poll_only_records_position(self):
+        events, applied = FakeEvents(), []
+        events.emit("documents.update", documentId="d1", collectionId="c1")
+        feed = make_feed(events, applied)
+
+        result = await feed.run_once()
+
+        assert result.events == 0
+        assert applied == []
+        assert feed.cursor["id"] == "event-0"
+
+    @pytest.mark.asyncio
+    async def test_later_polls_invalidate_new_events(self):
+        events, applied = FakeEvents(), []
+        events.emit("documents.update", documentId="d1", collectionId="c1")
+        feed = make_feed(events, applied)
+        await feed.run_once()
+
+        events.emit("documents.update", documentId="d2", collectionId="c1")
+        events.emit("collections.update", modelId="c2")
+        result = await feed.run_once()
+
+        assert result.events == 2
+        assert result.caught_up is True
+        assert applied[0].documents == {"d2": "c1"}
+        assert applied[0].collections == {"c1", "c2"}
+        assert feed.cursor["id"] == "event-2"
+
+        result = await feed.run_once()
+        assert result.events == 0
+        assert len(applied) == 1
+
+    @pytest.mark.asyncio
+    async def test_empty_feed_treats_later_events_as_new(self):
+        events, applied = FakeEvents(), []
+        feed = make_feed(events, applied)
+        await feed.run_once()
+
+        events.emit("documents.delete", documentId="d1")
+        await feed.run_once()
+
+        assert applied[0].documents == {"d1": None}
+
+    @pytest.mark.asyncio
+    async def test_falling_behind_invalidates_everything(self):
+        events, applied = FakeEvents(), []
+        events.emit("documents.update", documentId="d0")
+        feed = make_feed(events, applied)
+        await feed.run_once()
+
+        for i in range(MAX_CATCH_UP_EVENTS + 5):
+            events.emit("documents.update", documentId=f"d{i}")
+        result = await feed.run_once()
+
+        assert result.caught_up is False
+        assert applied[0].everything is True
+        assert feed.cursor["id"] == events.events[-1]["id"]
+
+    @pytest.mark.asyncio
+    async def test_webhook_delivery_is_applied(self):
+        events, applied = FakeEvents(), []
+        feed = make_feed(events, applied)
+
+        await feed.receive(
+            {"event": "collections.delete", "payload": {"id": "c1", "model": {}}}
+        )
+
+        assert applied[0].collections == {"c1"}
+        assert feed.snapshot()["webhooks"] == 1
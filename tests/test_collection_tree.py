@@ -0,0 +1,105 @@
+"""
+Tests for indexed collection document trees
+"""
+
+from src.collection_tree import CollectionTree, CollectionTreeCache
+
+NODES = [
+    {
+        "id": "eng",
+        "title": "Engineering",
+        "url": "/doc/eng",
+        "children": [
+            {
+                "id": "runbooks",
+                "title": "Runbooks",
+                "children": [{"id": "deploy", "title": "Deploy", "children": []}],
+            },
+            {"id": "deploy-notes", "title": "Deploy ", "children": []},
+        ],
+    },
+    {"id": "hr", "title": "HR", "children": []},
+]
+
+
+class TestCollectionTree:
+    """Test lookups on a flattened tree."""
+
+    def test_subtree_is_depth_first(self):
+        tree = CollectionTree("col-1", NODES)
+
+        assert [n.id for n in tree.subtree()] == [
+            "eng",
+            "runbooks",
+            "deploy",
+            "deploy-notes",
+            "hr",
+        ]
+        assert [n.id for n in tree.subtree("eng", max_depth=1)] == [
+            "runbooks",
+            "deploy-notes",
+        ]
+
+    def test_resolve_full_and_partial_paths(self):
+        tree = CollectionTree("col-1", NODES)
+
+        assert [n.id for n in tree.resolve("engineering / RUNBOOKS/deploy")] == [
+            "deploy"
+        ]
+        assert [n.id for n in tree.resolve("Runbooks/Deploy")] == ["deploy"]
+        assert [n.id for n in tree.resolve("deploy")] == ["deploy", "deploy-notes"]
+        assert tree.resolve("Missing") == []
+
+    def test_ancestors_and_node_fields(self):
+        tree = CollectionTree("col-1", NODES)
+        node = tree.node("deploy")
+
+        assert [n.title for n in tree.ancestors("deploy")] == [
+            "Engineering",
+            "Runbooks",
+        ]
+        assert node.as_dict() == {
+            "id": "deploy",
+            "title": "Deploy",
+            "url": None,
+            "parent_id": "runbooks",
+            "depth": 2,
+            "path": "Engineering/Runbooks/Deploy",
+            "children": 0,
+        }
+
+    def test_pruned_tree_counts_cut_children(self):
+        tree = CollectionTree("col-1", NODES)
+
+        pruned = tree.pruned(2)
+
+        assert tree.depth == 3
+        runbooks = pruned[0]["children"][0]
+        assert runbooks == {
+            "id": "runbooks",
+            "title": "Runbooks",
+            "children": [],
+            "more": 1,
+        }
+        assert NODES[0]["children"][0]["children"][0]["id"] == "deploy"
+
+
+class TestCollectionTreeCache:
+    """Test caching trees by collection version."""
+
+    def test_marker_change_misses(self):
+        cache = CollectionTreeCache()
+        cache.put(CollectionTree("col-1", NODES, marker="v1"))
+
+        assert cache.get("col-1", "v1") is not None
+        assert cache.get("col-1", "v2") is None
+        assert cache.snapshot()["hits"] == 1
+
+    def test_invalidate_by_document(self):
+        cache = CollectionTreeCache()
+        cache.put(CollectionTree("col-1", NODES, marker="v1"))
+        cache.put(CollectionTree("col-2", [{"id": "other"}], marker="v1"))
+
+        assert cache.invalidate_documents(["deploy"]) == 1
+        assert cache.get("col-1", "v1") is None
+        assert cache.get("col-2", "v1") is not None
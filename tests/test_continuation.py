@@ -0,0 +1,261 @@
+"""
+Tests for continuation cursors and prefetched page buffers
+"""
+
+import asyncio
+
+import pytest
+
+from src.continuation import Continuation, PageBuffers, fetch_page
+
+
+class FakeListing:
+    """In-memory stand-in for documents.list sorted by updatedAt DESC."""
+
+    def __init__(self, count):
+        self.documents = [self.document(i) for i in range(count)]
+        self.requests = []
+
+    @staticmethod
+    def document(i):
+        return {
+            "id": f"doc-{i}",
+            "updatedAt": f"2024-01-01T00:{i // 60:02d}:{i % 60:02d}",
+        }
+
+    def ordered(self):
+        return sorted(self.documents, key=lambda d: d["updatedAt"], reverse=True)
+
+    async def request(self, endpoint, data):
+        assert endpoint == "documents.list"
+        self.requests.append(data)
+        page = self.ordered()[data["offset"] : data["offset"] + data["limit"]]
+        return {"ok": True, "data": page}
+
+
+FIRST_PAGE = {"limit": 10, "offset": 0, "sort": "updatedAt", "direction": "DESC"}
+
+
+async def read_all(listing, buffers=None):
+    """Follow cursors from the first page to the end of the listing."""
+    ids = []
+    cursor = None
+    while True:
+        page = await fetch_page(
+            listing.request, "documents.list", FIRST_PAGE, cursor, buffers
+        )
+        ids.extend(item["id"] for item in page.items)
+        cursor = page.next_cursor
+        if cursor is None:
+            return ids
+
+
+class TestContinuation:
+    """Test encoding of cursors."""
+
+    def test_round_trip(self):
+        cursor = Continuation(
+            endpoint="documents.list",
+            data={"limit": 25, "sort": "title"},
+            offset=25,
+            last_id="doc-24",
+            last_key="Zebra",
+            buffer_id="abc",
+        )
+
+        assert Continuation.decode(cursor.encode()) == cursor
+
+    def test_rejects_garbage(self):
+        with pytest.raises(ValueError, match="Invalid cursor"):
+            Continuation.decode("not a cursor")
+
+    def test_rejects_other_endpoint(self):
+        token = Continuation("collections.list", {"limit": 25}, 25).encode()
+
+        with pytest.raises(ValueError, match="issued for collections.list"):
+            Continuation.decode(token, "documents.list")
+
+
+class TestFetchPage:
+    """Test continuing listings from Outline."""
+
+    @pytest.mark.asyncio
+    async def test_walks_listing_without_buffers(self):
+        listing = FakeListing(25)
+
+        ids = await read_all(listing)
+
+        assert ids == [d["id"] for d in listing.ordered()]
+
+    @pytest.mark.asyncio
+    async def test_last_page_has_no_cursor(self):
+        listing = FakeListing(5)
+
+        page = await fetch_page(listing.request, "documents.list", FIRST_PAGE)
+
+        assert len(page.items) == 5
+        assert page.next_cursor is None
+
+    @pytest.mark.asyncio
+    async def test_insertion_does_not_repeat_items(self):
+        listing = FakeListing(30)
+        first = await fetch_page(listing.request, "documents.list", FIRST_PAGE)
+        listing.documents.append({"id": "new", "updatedAt": "2025-01-01T00:00:00"})
+
+        second = await fetch_page(
+            listing.request, "documents.list", FIRST_PAGE, first.next_cursor
+        )
+
+        served = [item["id"] for item in first.items]
+        assert not set(served) & {item["id"] for item in second.items}
+        assert second.items[0]["id"] == "doc-19"
+
+    @pytest.mark.asyncio
+    async def test_deletion_does_not_skip_items(self):
+        listing = FakeListing(30)
+        first = await fetch_page(listing.request, "documents.list", FIRST_PAGE)
+        del listing.documents[27]
+
+        second = await fetch_page(
+            listing.request, "documents.list", FIRST_PAGE, first.next_cursor
+        )
+
+        assert [item["id"] for item in second.items][:2] == ["doc-19", "doc-18"]
+
+    @pytest.mark.asyncio
+    async def test_deleted_last_item_falls_back_on_sort_key(self):
+        listing = FakeListing(30)
+        first = await fetch_page(listing.request, "documents.list", FIRST_PAGE)
+        assert first.items[-1]["id"] == "doc-20"
+        listing.documents = [d for d in listing.documents if d["id"] != "doc-20"]
+
+        second = await fetch_page(
+            listing.request, "documents.list", FIRST_PAGE, first.next_cursor
+        )
+
+        assert [item["id"] for item in second.items] == [
+            f"doc-{i}" for i in range(19, 9, -1)
+        ]
+
+
+class TestPageBuffers:
+    """Test serving continued pages from prefetched buffers."""
+
+    @pytest.mark.asyncio
+    async def test_first_page_is_not_prefetched(self):
+        listing = FakeListing(35)
+        buffers = PageBuffers(listing.request)
+
+        first = await fetch_page(
+            listing.request, "documents.list", FIRST_PAGE, buffers=buffers
+        )
+        await asyncio.sleep(0)
+
+        assert first.next_cursor is not None
+        assert len(listing.requests) == 1
+        assert len(buffers) == 0
+
+    @pytest.mark.asyncio
+    async def test_page_after_continued_page_is_served_from_buffer(self):
+        listing = FakeListing(45)
+        buffers = PageBuffers(listing.request)
+        first = await fetch_page(
+            listing.request, "documents.list", FIRST_PAGE, buffers=buffers
+        )
+        second = await fetch_page(
+            listing.request, "documents.list", FIRST_PAGE, first.next_cursor, buffers
+        )
+        await asyncio.sleep(0)
+
+        third = await fetch_page(
+            listing.request, "documents.list", FIRST_PAGE, second.next_cursor, buffers
+        )
+        fourth = await fetch_page(
+            listing.request, "documents.list", FIRST_PAGE, third.next_cursor, buffers
+        )
+
+        assert not second.buffered
+        assert third.buffered and fourth.buffered
+        # One page of the listing's page size is prefetched at a time.
+        assert [(r["offset"], r["limit"]) for r in listing.requests[2:]] == [
+            (20, 10),
+            (30, 10),
+        ]
+        assert [item["id"] for item in third.items][0] == "doc-24"
+        assert buffers.snapshot()["hits"] == 2
+
+    @pytest.mark.asyncio
+    async def test_buffered_walk_matches_listing(self):
+        listing = FakeListing(250)
+        buffers = PageBuffers(listing.request)
+
+        ids = await read_all(listing, buffers)
+
+        assert ids == [d["id"] for d in listing.ordered()]
+        assert len(buffers) == 0
+
+    @pytest.mark.asyncio
+    async def test_cleared_buffer_resumes_from_outline(self):
+        listing = FakeListing(30)
+        buffers = PageBuffers(listing.request)
+        first = await fetch_page(
+            listing.request, "documents.list", FIRST_PAGE, buffers=buffers
+        )
+        second = await fetch_page(
+            listing.request, "documents.list", FIRST_PAGE, first.next_cursor, buffers
+        )
+        buffers.clear()
+
+        third = await fetch_page(
+            listing.request, "documents.list", FIRST_PAGE, second.next_cursor, buffers
+        )
+
+        assert not third.buffered
+        assert third.items[0]["id"] == "doc-9"
+        assert buffers.snapshot()["resumes"] == 2
+
+    @pytest.mark.asyncio
+    async def test_failed_prefetch_resumes_from_outline(self):
+        listing = FakeListing(30)
+        calls = []
+
+        async def flaky(endpoint, data):
+            calls.append(data)
+            raise RuntimeError("Outline is down")
+
+        buffers = PageBuffers(flaky)
+        first = await fetch_page(
+            listing.request, "documents.list", FIRST_PAGE, buffers=buffers
+        )
+        second = await fetch_page(
+            listing.request, "documents.list", FIRST_PAGE, first.next_cursor, buffers
+        )
+
+        third = await fetch_page(
+            listing.request, "documents.list", FIRST_PAGE, second.next_cursor, buffers
+        )
+
+        assert calls
+        assert third.items[0]["id"] == "doc-9"
+        assert buffers.snapshot()["prefetch_errors"] >= 1
+
+    @pytest.mark.asyncio
+    async def test_expired_buffer_is_dropped(self):
+        now = [0.0]
+        listing = FakeListing(30)
+        buffers = PageBuffers(listing.request, ttl=60, clock=lambda: now[0])
+        first = await fetch_page(
+            listing.request, "documents.list", FIRST_PAGE, buffers=buffers
+        )
+        second = await fetch_page(
+            listing.request, "documents.list", FIRST_PAGE, first.next_cursor, buffers
+        )
+        await asyncio.sleep(0)
+        now[0] = 61
+
+        third = await fetch_page(
+            listing.request, "documents.list", FIRST_PAGE, second.next_cursor, buffers
+        )
+
+        assert not third.buffered
+        assert third.items[0]["id"] == "doc-9"
@@ -0,0 +1,146 @@
+"""
+Tests for the on-disk document store
+"""
+
+import pytest
+
+from src.document_store import DocumentStore, compress, decompress
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def store(tmp_path, clock):
+    store = DocumentStore(str(tmp_path / "documents"), codec="zlib", clock=clock)
+    yield store
+    store.close()
+
+
+class TestCodecs:
+    """Test body compression round trips."""
+
+    @pytest.mark.parametrize("codec", ["zlib", "raw"])
+    def test_round_trip(self, codec):
+        body = ("# Title\n\n" + "Lorem ipsum dolor sit amet. " * 100).encode()
+
+        assert decompress(compress(body, codec), codec, len(body)) == body
+
+    def test_unknown_codec(self):
+        with pytest.raises(ValueError, match="Unknown codec"):
+            compress(b"body", "lz4")
+
+
+class TestDocumentStore:
+    """Test storing and reading document responses."""
+
+    def test_round_trip_by_id_and_url_id(self, store, clock):
+        metadata = {"id": "doc-1", "urlId": "abc", "title": "Policy", "revision": 3}
+        store.put("documents.info", "doc-1", "# Policy\n\nBody", metadata, "3:t")
+
+        by_id = store.get("documents.info", "doc-1")
+        by_url_id = store.get("documents.info", "abc")
+
+        assert by_id.body == "# Policy\n\nBody"
+        assert by_id.marker == "3:t"
+        assert by_id.stored_at == clock.now
+        assert by_url_id.id == "doc-1"
+        assert by_id.response() == {
+            "ok": True,
+            "data": {**metadata, "text": "# Policy\n\nBody"},
+        }
+        assert store.get("documents.export", "doc-1") is None
+
+    def test_export_response(self, store):
+        store.put("documents.export", "doc-1", "# Policy")
+
+        assert store.get("documents.export", "doc-1").response() == {
+            "ok": True,
+            "data": "# Policy",
+        }
+
+    def test_identical_bodies_are_stored_once(self, store):
+        body = "Shared body " * 50
+        store.put("documents.info", "doc-1", body, {"id": "doc-1"})
+        store.put("documents.export", "doc-1", body)
+
+        snapshot = store.snapshot()
+        assert snapshot["entries"] == 2
+        assert snapshot["bodies"] == 1
+        assert snapshot["stored_bytes"] < snapshot["bytes"]
+
+    def test_replaced_body_is_released(self, store):
+        store.put("documents.info", "doc-1", "first", {"id": "doc-1"})
+        store.put("documents.info", "doc-1", "second", {"id": "doc-1"})
+
+        assert store.get("documents.info", "doc-1").body == "second"
+        assert store.snapshot()["bodies"] == 1
+
+    def test_body_released_during_put_is_written_again(self, store, monkeypatch):
+        body = "Shared body " * 50
+        store.put("documents.info", "doc-1", body, {"id": "doc-1"})
+        has_body = store._has_body
+
+        def release_first(body_hash):
+            # Another thread drops the only other entry with the same body.
+            known = has_body(body_hash)
+            store.remove("doc-1")
+            return known
+
+        monkeypatch.setattr(store, "_has_body", release_first)
+        store.put("documents.info", "doc-2", body, {"id": "doc-2"})
+
+        assert store.get("documents.info", "doc-2").body == body
+        assert store.snapshot()["bodies"] == 1
+
+    def test_large_bodies_are_memory_mapped(self, tmp_path):
+        store = DocumentStore(str(tmp_path / "docs"), codec="raw", mmap_threshold=1024)
+        body = "x" * 4096
+        store.put("documents.info", "doc-1", body, {"id": "doc-1"})
+
+        assert store.snapshot()["blobs"] == 1
+        assert store.get("documents.info", "doc-1").body == body
+
+        store.remove("doc-1")
+        assert store.snapshot()["blobs"] == 0
+        assert not [p for p in (tmp_path / "docs" / "blobs").rglob("*") if p.is_file()]
+        store.close()
+
+    def test_missing_blob_is_a_miss(self, tmp_path):
+        store = DocumentStore(str(tmp_path / "docs"), codec="raw", mmap_threshold=1)
+        store.put("documents.info", "doc-1", "body", {"id": "doc-1"})
+        for blob in (tmp_path / "docs" / "blobs").rglob("*"):
+            if blob.is_file():
+                blob.unlink()
+
+        assert store.get("documents.info", "doc-1") is None
+        store.close()
+
+    def test_remove(self, store):
+        store.put("documents.info", "doc-1", "body", {"id": "doc-1", "urlId": "abc"})
+        store.put("documents.export", "doc-1", "body")
+
+        assert store.remove("abc") == 1
+        assert store.remove("doc-1") == 1
+        assert len(store) == 0
+        assert store.snapshot()["bodies"] == 0
+
+    def test_persists_across_instances(self, tmp_path):
+        path = str(tmp_path / "docs")
+        store = DocumentStore(path)
+        store.put("documents.info", "doc-1", "body", {"id": "doc-1"})
+        store.close()
+
+        reopened = DocumentStore(path)
+        assert reopened.get("documents.info", "doc-1").body == "body"
+        reopened.close()
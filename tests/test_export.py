@@ -0,0 +1,156 @@
+"""
+Tests for bulk collection export
+"""
+
+import tarfile
+import zipfile
+
+import pytest
+
+from src.collection_tree import CollectionTree
+from src.export import CollectionExporter, document_paths, safe_segment
+
+TREE = [
+    {
+        "id": "eng",
+        "title": "Engineering",
+        "children": [
+            {"id": "deploy", "title": "Deploy: prod/staging"},
+            {"id": "deploy-2", "title": "Deploy: prod/staging"},
+        ],
+    },
+    {"id": "hr", "title": "HR"},
+]
+
+
+class FakeOutline:
+    """Serves documents.list and documents.export for a set of documents."""
+
+    def __init__(self):
+        self.revisions = {"eng": 1, "deploy": 1, "deploy-2": 1, "hr": 1}
+        self.failing = set()
+        self.exported = []
+
+    async def request(self, endpoint, data):
+        if endpoint == "documents.list":
+            docs = [{"id": i, "revision": r} for i, r in self.revisions.items()]
+            return {"data": docs[data["offset"] : data["offset"] + data["limit"]]}
+        assert endpoint == "documents.export"
+        document_id = data["id"]
+        if document_id in self.failing:
+            raise Exception("Failed to call Outline API: 500")
+        self.exported.append(document_id)
+        return {"data": f"# {document_id} r{self.revisions[document_id]}"}
+
+
+@pytest.fixture
+def outline():
+    return FakeOutline()
+
+
+def tree(nodes=TREE):
+    return CollectionTree("col-1", nodes)
+
+
+class TestDocumentPaths:
+    """Test mapping the tree to file paths."""
+
+    def test_paths_follow_titles(self):
+        paths = document_paths(tree())
+
+        assert paths["eng"] == "Engineering.md"
+        assert paths["deploy"] == "Engineering/Deploy- prod-staging.md"
+        assert paths["deploy-2"] == "Engineering/Deploy- prod-staging (deploy-2).md"
+        assert paths["hr"] == "HR.md"
+
+    def test_unsafe_titles(self):
+        assert safe_segment("../etc") == "-etc"
+        assert safe_segment("   ") == "Untitled"
+
+
+class TestCollectionExporter:
+    """Test exporting to directories and archives."""
+
+    @pytest.mark.asyncio
+    async def test_directory_export_resumes(self, tmp_path, outline):
+        exporter = CollectionExporter(outline.request, max_concurrency=2)
+        target = str(tmp_path / "kb")
+
+        first = await exporter.export(tree(), target)
+        outline.revisions["hr"] = 2
+        outline.exported.clear()
+        second = await exporter.export(tree(), target)
+
+        assert first.fetched == 4
+        assert (second.fetched, second.unchanged) == (1, 3)
+        assert outline.exported == ["hr"]
+        assert (tmp_path / "kb" / "HR.md").read_text() == "# hr r2"
+        assert (tmp_path / "kb" / "Engineering.md").read_text() == "# eng r1"
+
+    @pytest.mark.asyncio
+    async def test_removed_documents_are_deleted(self, tmp_path, outline):
+        exporter = CollectionExporter(outline.request)
+        target = str(tmp_path / "kb")
+        await exporter.export(tree(), target)
+
+        result = await exporter.export(tree(TREE[1:]), target)
+
+        assert result.removed == 3
+        assert not (tmp_path / "kb" / "Engineering").exists()
+        assert not (tmp_path / "kb" / "Engineering.md").exists()
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("name", ["kb.zip", "kb.tar.gz"])
+    async def test_archive_export_copies_unchanged(self, tmp_path, outline, name):
+        exporter = CollectionExporter(outline.request)
+        target = str(tmp_path / name)
+        await exporter.export(tree(), target)
+
+        outline.revisions["eng"] = 2
+        outline.exported.clear()
+        result = await exporter.export(tree(), target)
+
+        if name.endswith(".zip"):
+            with zipfile.ZipFile(target) as archive:
+                contents = {n: archive.read(n).decode() for n in archive.namelist()}
+        else:
+            with tarfile.open(target) as archive:
+                contents = {
+                    m.name: archive.extractfile(m).read().decode()
+                    for m in archive.getmembers()
+                }
+        assert outline.exported == ["eng"]
+        assert result.unchanged == 3
+        assert len(contents) == 4
+        assert contents["Engineering.md"] == "# eng r2"
+        assert contents["HR.md"] == "# hr r1"
+
+    @pytest.mark.asyncio
+    async def test_failed_download_keeps_previous_version(self, tmp_path, outline):
+        exporter = CollectionExporter(outline.request)
+        target = str(tmp_path / "kb.zip")
+        await exporter.export(tree(), target)
+
+        outline.revisions["hr"] = 2
+        outline.failing.add("hr")
+        failed = await exporter.export(tree(), target)
+        with zipfile.ZipFile(target) as archive:
+            assert archive.read("HR.md") == b"# hr r1"
+        outline.failing.clear()
+        outline.exported.clear()
+        retried = await exporter.export(tree(), target)
+
+        assert list(failed.failed) == ["hr"]
+        assert outline.exported == ["hr"]
+        with zipfile.ZipFile(target) as archive:
+            assert archive.read("HR.md") == b"# hr r2"
+        assert retried.failed == {}
+
+    @pytest.mark.asyncio
+    async def test_rejects_other_collection(self, tmp_path, outline):
+        exporter = CollectionExporter(outline.request)
+        target = str(tmp_path / "kb")
+        await exporter.export(tree(), target)
+
+        with pytest.raises(ValueError, match="holds an export of collection"):
+            await exporter.export(CollectionTree("col-2", TREE), target)
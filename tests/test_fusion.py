@@ -0,0 +1,53 @@
+"""
+Tests for merging search results across queries
+"""
+
+from src.fusion import dedupe_snippets, reciprocal_rank_fusion
+
+
+def hit(document_id, ranking, context=""):
+    return {"document": {"id": document_id}, "ranking": ranking, "context": context}
+
+
+class TestReciprocalRankFusion:
+    """Test fusing ranked result lists."""
+
+    def test_documents_found_by_several_queries_rank_first(self):
+        fused = reciprocal_rank_fusion(
+            [
+                [hit("a", 0.9), hit("b", 0.5), hit("c", 0.1)],
+                [hit("d", 0.8), hit("c", 0.7)],
+            ]
+        )
+
+        assert [e.result["document"]["id"] for e in fused] == ["c", "a", "d", "b"]
+        assert fused[0].queries == [0, 1]
+        assert fused[0].score == 1 / 63 + 1 / 62
+
+    def test_ranks_follow_outline_ranking(self):
+        fused = reciprocal_rank_fusion([[hit("low", 0.1), hit("high", 0.9)]])
+
+        assert [e.best_rank for e in fused] == [1, 2]
+        assert fused[0].result["document"]["id"] == "high"
+
+    def test_keeps_best_ranked_result_and_unique_snippets(self):
+        fused = reciprocal_rank_fusion(
+            [
+                [hit("x", 0.9), hit("a", 0.5, "Deploy <b>staging</b>")],
+                [hit("a", 0.8, "deploy staging"), hit("y", 0.1)],
+            ]
+        )
+
+        entry = next(e for e in fused if e.result["document"]["id"] == "a")
+        assert entry.best_rank == 1
+        assert entry.result["context"] == "deploy staging"
+        assert entry.snippets == ["Deploy <b>staging</b>"]
+
+
+class TestDedupeSnippets:
+    """Test dropping repeated snippets."""
+
+    def test_contained_snippets_are_dropped(self):
+        assert dedupe_snippets(
+            ["the <b>deploy</b>", "", "Run the deploy script", "other"]
+        ) == ["Run the deploy script", "other"]
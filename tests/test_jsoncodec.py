@@ -0,0 +1,54 @@
+"""
+Tests for the pluggable JSON backends
+"""
+
+import pytest
+
+from src import jsoncodec
+from src.jsoncodec import available_backends, create_codec
+
+VALUE = {"title": "Café ✓", "b": [1, 2.5, None, True], "a": {"nested": "x"}}
+
+
+@pytest.fixture(params=available_backends())
+def codec(request):
+    return create_codec(request.param)
+
+
+class TestCodecs:
+    """Test that every installed backend produces the same text."""
+
+    def test_compact(self, codec):
+        assert codec.dumps(VALUE) == (
+            '{"title":"Café ✓","b":[1,2.5,null,true],"a":{"nested":"x"}}'
+        )
+
+    def test_indent_and_sort_keys(self, codec):
+        reference = create_codec("json")
+
+        assert codec.dumps(VALUE, indent=True) == reference.dumps(VALUE, indent=True)
+        assert codec.dumps(VALUE, sort_keys=True).startswith('{"a":')
+
+    def test_default_and_round_trip(self, codec):
+        encoded = codec.dumps({"when": object}, default=lambda v: "object")
+
+        assert codec.loads(encoded) == {"when": "object"}
+        assert codec.loads(codec.dumps(VALUE).encode()) == VALUE
+
+    def test_big_integers_fall_back(self, codec):
+        assert codec.dumps({"n": 2**70}) == '{"n":1180591620717411303424}'
+
+
+def test_auto_selects_fastest_installed_backend():
+    assert create_codec("auto").name == available_backends()[0]
+
+
+def test_missing_backend_falls_back_to_stdlib(monkeypatch):
+    monkeypatch.setattr(jsoncodec, "available_backends", lambda: ["json"])
+
+    assert create_codec("orjson").name == "json"
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError, match="JSON backend must be one of"):
+        create_codec("simdjson")
@@ -0,0 +1,166 @@
+"""
+Tests for the Prometheus metrics registry
+"""
+
+import asyncio
+
+import pytest
+
+from src.metrics import (
+    Counter,
+    Histogram,
+    ServerMetrics,
+    ToolCall,
+    current_tool_call,
+    instrument_tool,
+    serve_metrics,
+    upstream_wait,
+)
+
+
+class TestMetricTypes:
+    """Test counters, gauges and histograms."""
+
+    def test_counter_renders_labelled_samples(self):
+        counter = Counter("requests", "Requests.", ["endpoint", "status"])
+        counter.inc(endpoint="documents.info", status=503)
+        counter.inc(2, endpoint="documents.info", status=503)
+
+        assert counter.value(endpoint="documents.info", status=503) == 3
+        assert counter.render() == (
+            "# HELP requests Requests.\n"
+            "# TYPE requests counter\n"
+            'requests_total{endpoint="documents.info",status="503"} 3'
+        )
+
+    def test_rejects_wrong_labels(self):
+        counter = Counter("requests", "Requests.", ["endpoint"])
+
+        with pytest.raises(ValueError, match="expects labels"):
+            counter.inc(tool="search_documents")
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram("latency", "Latency.", buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.5, 5.0):
+            histogram.observe(value)
+
+        assert histogram.samples() == [
+            'latency_bucket{le="0.1"} 1',
+            'latency_bucket{le="1"} 3',
+            'latency_bucket{le="+Inf"} 4',
+            "latency_sum 6.05",
+            "latency_count 4",
+        ]
+
+    def test_histogram_quantiles_interpolate_within_buckets(self):
+        histogram = Histogram("latency", "Latency.", buckets=(1.0, 2.0))
+        for value in (0.5, 1.5, 1.5, 1.5):
+            histogram.observe(value)
+
+        assert histogram.quantile(0.5) == pytest.approx(1 + 1 / 3)
+        assert histogram.summary()["count"] == 4
+        assert Histogram("empty", "Empty.").quantile(0.5) is None
+
+
+class TestInstrumentTool:
+    """Test the tool decorator."""
+
+    @pytest.mark.asyncio
+    async def test_records_latency_size_and_local_time(self):
+        metrics = ServerMetrics()
+
+        @instrument_tool(lambda ctx: metrics)
+        async def read(ctx, document_id):
+            with upstream_wait():
+                await asyncio.sleep(0.05)
+            metrics.observe_upstream("documents.info", 0.05, 100)
+            return "x" * 300
+
+        assert await read(None, "doc-1") == "x" * 300
+
+        assert metrics.tool_duration.get(tool="read").count == 1
+        assert metrics.tool_duration.get(tool="read").sum >= 0.05
+        assert metrics.tool_response_bytes.get(tool="read").sum == 300
+        # Upstream time of the call is excluded from the local time.
+        assert metrics.tool_local_duration.get(tool="read").sum < 0.05
+        assert metrics.tool_inflight.value(tool="read") == 0
+
+    @pytest.mark.asyncio
+    async def test_concurrent_upstream_waits_count_once(self):
+        metrics = ServerMetrics()
+        calls = []
+
+        async def fetch():
+            with upstream_wait():
+                await asyncio.sleep(0.05)
+
+        @instrument_tool(lambda ctx: metrics)
+        async def fan_out(ctx):
+            calls.append(current_tool_call())
+            await asyncio.gather(*(fetch() for _ in range(4)))
+            return ""
+
+        await fan_out(None)
+
+        # Four overlapping 50ms waits take about 50ms of wall time, not 200ms.
+        assert 0.05 <= calls[0].upstream_seconds < 0.15
+
+    def test_nested_waits_are_measured_from_the_first(self):
+        call = ToolCall()
+
+        call.begin_upstream_wait(1.0)
+        call.begin_upstream_wait(2.0)
+        call.end_upstream_wait(3.0)
+        assert call.upstream_seconds == 0.0
+        call.end_upstream_wait(4.0)
+
+        assert call.upstream_seconds == 3.0
+
+    @pytest.mark.asyncio
+    async def test_counts_errors(self):
+        metrics = ServerMetrics()
+
+        @instrument_tool(lambda ctx: metrics)
+        async def fail(ctx):
+            raise ValueError("bad argument")
+
+        with pytest.raises(ValueError):
+            await fail(None)
+
+        assert metrics.tool_errors.value(tool="fail") == 1
+        assert metrics.snapshot()["tools"]["fail"]["errors"] == 1
+
+    @pytest.mark.asyncio
+    async def test_disabled_metrics_pass_through(self):
+        @instrument_tool(lambda ctx: None)
+        async def echo(ctx, value):
+            return value
+
+        assert await echo(None, value="ok") == "ok"
+
+
+@pytest.mark.asyncio
+async def test_serve_metrics():
+    metrics = ServerMetrics()
+    metrics.upstream_retries.inc(endpoint="documents.info")
+    server = await serve_metrics(metrics, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+
+    async def get(path):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        return response.decode()
+
+    try:
+        found = await get("/metrics")
+        missing = await get("/")
+    finally:
+        server.close()
+        await server.wait_closed()
+
+    assert found.startswith("HTTP/1.1 200 OK")
+    assert 'outline_mcp_upstream_retries_total{endpoint="documents.info"} 1' in found
+    assert missing.startswith("HTTP/1.1 404")
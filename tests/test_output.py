@@ -0,0 +1,67 @@
+"""
+Tests for tool result serialization
+"""
+
+import json
+
+import pytest
+
+from src.output import fields_of, project, render, validate_fields
+
+
+def format_item(item):
+    return {"id": item.get("id"), "title": item.get("title"), "text": item.get("t")}
+
+
+class TestFieldProjection:
+    """Test validating and applying field projections."""
+
+    def test_fields_of_formatter(self):
+        assert fields_of(format_item) == ("id", "title", "text")
+
+    def test_no_projection(self):
+        assert validate_fields(None, ["id"]) is None
+        assert validate_fields([], ["id"]) is None
+
+    def test_unknown_fields(self):
+        with pytest.raises(ValueError, match="Unknown document fields: bogus"):
+            validate_fields(["id", "bogus"], ["id"], "document")
+
+    def test_project_keeps_requested_order(self):
+        item = {"id": "doc-1", "title": "Policy", "text": "..."}
+
+        assert list(project(item, ["title", "id"])) == ["title", "id"]
+        assert project(item, None) is item
+
+
+class TestRender:
+    """Test output formats."""
+
+    result = {"total": 2, "items": [{"id": 1}, {"id": 2}], "query": "héllo"}
+
+    def test_compact_has_no_whitespace(self):
+        output = render(self.result)
+
+        assert output == '{"total":2,"items":[{"id":1},{"id":2}],"query":"héllo"}'
+
+    def test_pretty_is_indented(self):
+        output = render(self.result, "pretty")
+
+        assert output.startswith('{\n  "total": 2')
+        assert json.loads(output) == self.result
+
+    def test_ndjson_writes_one_item_per_line(self):
+        lines = render(self.result, "ndjson", "items").splitlines()
+
+        assert [json.loads(line) for line in lines] == [
+            {"total": 2, "query": "héllo"},
+            {"id": 1},
+            {"id": 2},
+        ]
+
+    def test_ndjson_without_items_is_compact(self):
+        assert render({"id": 1}, "ndjson") == '{"id":1}'
+
+    def test_unknown_format(self):
+        with pytest.raises(ValueError, match="format must be one of"):
+            render(self.result, "yaml")
@@ -0,0 +1,176 @@
+"""
+Tests for rate limiting, retries and the circuit breaker
+"""
+
+import pytest
+
+from src.ratelimit import (
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryPolicy,
+    SharedTokenBucket,
+    TokenBucket,
+    parse_rate_limit_reset,
+    parse_retry_after,
+    rate_limit_delay,
+)
+
+
+class FakeClock:
+    """Manually advanced clock whose sleep advances time."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestHeaderParsing:
+    """Test Retry-After and rate-limit header parsing."""
+
+    def test_retry_after_seconds(self):
+        assert parse_retry_after("7") == 7.0
+
+    def test_retry_after_http_date(self):
+        delay = parse_retry_after("Wed, 21 Oct 2015 07:28:10 GMT", now=1445412480.0)
+        assert delay == 10.0
+
+    def test_retry_after_invalid(self):
+        assert parse_retry_after("soon") is None
+        assert parse_retry_after(None) is None
+
+    def test_rate_limit_reset_forms(self):
+        assert parse_rate_limit_reset("5") == 5.0
+        assert parse_rate_limit_reset("1700000010", now=1700000000.0) == 10.0
+        assert parse_rate_limit_reset("1700000010000", now=1700000000.0) == 10.0
+
+    def test_rate_limit_delay_only_when_exhausted(self):
+        assert rate_limit_delay({"RateLimit-Remaining": "3"}) is None
+        assert (
+            rate_limit_delay({"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "4"})
+            == 4.0
+        )
+
+
+class TestTokenBucket:
+    """Test client-side throttling."""
+
+    @pytest.mark.asyncio
+    async def test_burst_then_throttle(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, burst=3, clock=clock, sleep=clock.sleep)
+
+        for _ in range(3):
+            await bucket.acquire()
+        assert clock.sleeps == []
+
+        await bucket.acquire()
+        assert clock.sleeps == [0.5]
+        assert bucket.stats.throttled == 1
+
+    @pytest.mark.asyncio
+    async def test_pause_blocks_until_elapsed(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=10, burst=10, clock=clock, sleep=clock.sleep)
+
+        await bucket.pause(5)
+        await bucket.acquire()
+
+        assert clock.now >= 5
+        assert bucket.stats.pauses == 1
+
+
+class TestSharedTokenBucket:
+    """Test a rate limit shared by worker processes."""
+
+    @pytest.mark.asyncio
+    async def test_buckets_draw_from_one_budget(self, tmp_path):
+        clock = FakeClock()
+        path = str(tmp_path / "shared.sqlite")
+        first = SharedTokenBucket(path, 2, 2, clock=clock, sleep=clock.sleep)
+        second = SharedTokenBucket(path, 2, 2, clock=clock, sleep=clock.sleep)
+
+        await first.acquire()
+        await second.acquire()
+        await first.acquire()
+
+        assert clock.sleeps == [0.5]
+
+    @pytest.mark.asyncio
+    async def test_pause_applies_to_all_processes(self, tmp_path):
+        clock = FakeClock()
+        path = str(tmp_path / "shared.sqlite")
+        first = SharedTokenBucket(path, 10, 10, clock=clock, sleep=clock.sleep)
+        second = SharedTokenBucket(path, 10, 10, clock=clock, sleep=clock.sleep)
+
+        await first.pause(5)
+        await second.acquire()
+
+        assert clock.now >= 5
+        assert first.stats.pauses == 1
+
+
+class TestRetryPolicy:
+    """Test retry decisions and backoff."""
+
+    def test_retries_transient_errors_on_idempotent_endpoints(self):
+        policy = RetryPolicy(max_retries=2)
+        assert policy.should_retry("documents.info", 0, 503)
+        assert policy.should_retry("documents.info", 1, None)
+        assert not policy.should_retry("documents.info", 2, 503)
+        assert not policy.should_retry("documents.info", 0, 404)
+        assert policy.should_retry("documents.archived", 0, 503)
+
+    def test_only_429_retried_on_other_endpoints(self):
+        policy = RetryPolicy()
+        assert policy.should_retry("documents.answerQuestion", 0, 429)
+        assert not policy.should_retry("documents.answerQuestion", 0, 503)
+
+    def test_delay_is_bounded(self):
+        policy = RetryPolicy(base_delay=1, max_delay=4)
+        assert all(0 <= policy.delay(attempt) <= 4 for attempt in range(10))
+        assert policy.delay(0, retry_after=2.5) == 2.5
+
+
+class TestCircuitBreaker:
+    """Test failing fast while Outline is down."""
+
+    def test_opens_after_threshold_and_recovers(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+
+        for _ in range(2):
+            breaker.before_call()
+            breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+
+        clock.now = 10
+        breaker.before_call()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        with pytest.raises(CircuitOpenError, match="probe in progress"):
+            breaker.before_call()
+
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_failed_probe_reopens(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=clock)
+        breaker.before_call()
+        breaker.record_failure()
+
+        clock.now = 10
+        breaker.before_call()
+        breaker.record_failure()
+
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.stats.opened == 2
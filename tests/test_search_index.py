@@ -0,0 +1,108 @@
+"""
+Tests for the local full-text search index
+"""
+
+import pytest
+
+from src.search_index import LocalSearchIndex, build_match_query
+
+
+def make_doc(doc_id, title, text, collection_id="col-1", revision=1, **extra):
+    return {
+        "id": doc_id,
+        "urlId": f"url-{doc_id}",
+        "title": title,
+        "text": text,
+        "collectionId": collection_id,
+        "revision": revision,
+        "publishedAt": "2024-01-01T00:00:00.000Z",
+        "createdAt": "2024-01-01T00:00:00.000Z",
+        "updatedAt": "2024-01-02T00:00:00.000Z",
+        "createdBy": {"id": "user-1", "name": "John Doe"},
+        "updatedBy": {"id": "user-2", "name": "Jane Smith"},
+        **extra,
+    }
+
+
+@pytest.fixture
+def index():
+    index = LocalSearchIndex(":memory:")
+    index.upsert_many(
+        [
+            (make_doc("doc-1", "Hiring Policy", "How we hire engineers."), None),
+            (
+                make_doc("doc-2", "Onboarding", "New hires read the hiring policy."),
+                None,
+            ),
+            (
+                make_doc(
+                    "doc-3", "Deploy Runbook", "Steps to deploy.", collection_id="col-2"
+                ),
+                None,
+            ),
+        ]
+    )
+    yield index
+    index.close()
+
+
+class TestBuildMatchQuery:
+    """Test translation of free text into FTS5 syntax."""
+
+    def test_words_and_prefix(self):
+        assert build_match_query("hiring pol") == '"hiring" "pol"*'
+
+    def test_phrases_are_kept(self):
+        assert build_match_query('"hiring policy" docs') == '"hiring policy" "docs"*'
+
+    def test_operators_are_neutralized(self):
+        assert build_match_query("a OR b) NOT") == '"a" "OR" "b" "NOT"*'
+
+    def test_empty_query(self):
+        assert build_match_query("  ?! ") is None
+
+
+class TestLocalSearchIndex:
+    """Test indexing and searching."""
+
+    def test_title_matches_rank_first(self, index):
+        response = index.search("hiring policy")
+        ids = [item["document"]["id"] for item in response["data"]]
+
+        assert ids == ["doc-1", "doc-2"]
+        assert response["data"][0]["ranking"] > response["data"][1]["ranking"]
+
+    def test_result_shape_matches_outline(self, index):
+        item = index.search("deploy")["data"][0]
+
+        assert "<b>" in item["context"]
+        assert item["document"]["urlId"] == "url-doc-3"
+        assert item["document"]["createdBy"] == {"name": "John Doe"}
+
+    def test_filters(self, index):
+        assert index.search("deploy", collection_id="col-1")["data"] == []
+        assert len(index.search("hiring", user_id="user-2")["data"]) == 2
+        assert index.search("hiring", status_filter="draft")["data"] == []
+
+    def test_upsert_replaces_body(self, index):
+        index.upsert(make_doc("doc-3", "Deploy Runbook", "Rollback steps.", revision=2))
+
+        assert index.search("rollback")["data"][0]["document"]["revision"] == 2
+        assert len(index) == 3
+
+    def test_remove_by_url_id(self, index):
+        assert index.remove("url-doc-1")
+        assert not index.remove("doc-1")
+        assert [i["document"]["id"] for i in index.search("hiring")["data"]] == [
+            "doc-2"
+        ]
+
+    def test_persists_on_disk(self, tmp_path):
+        path = str(tmp_path / "index" / "search.sqlite")
+        index = LocalSearchIndex(path)
+        index.upsert(make_doc("doc-1", "Hiring Policy", "text"))
+        index.close()
+
+        reopened = LocalSearchIndex(path)
+        assert reopened.revisions() == {"doc-1": 1}
+        reopened.close()
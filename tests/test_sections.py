@@ -0,0 +1,107 @@
+"""
+Tests for section-aware document reads
+"""
+
+from src.budget import estimate_text_tokens
+from src.sections import DocumentOutline, OutlineCache, slugify, snap_to_characters
+
+TEXT = """Intro paragraph.
+# Architecture
+Overview.
+## Storage
+```
+# not a heading
+```
+Disks.
+## Network ##
+Links.
+# Appendix
+The end."""
+
+
+def section_text(outline, section, include_subsections=True):
+    end = section.byte_end if include_subsections else section.body_end
+    return TEXT.encode()[section.byte_start : end].decode()
+
+
+class TestDocumentOutline:
+    """Test parsing Markdown into sections."""
+
+    def test_headings_outside_code_blocks(self):
+        outline = DocumentOutline.parse(TEXT)
+
+        assert [(s.level, s.title) for s in outline.sections] == [
+            (1, "Architecture"),
+            (2, "Storage"),
+            (2, "Network"),
+            (1, "Appendix"),
+        ]
+        assert [s.parent for s in outline.sections] == [None, 0, 0, None]
+
+    def test_section_spans(self):
+        outline = DocumentOutline.parse(TEXT)
+        architecture, storage, _, appendix = outline.sections
+
+        assert section_text(outline, architecture).endswith("Links.\n")
+        assert section_text(outline, architecture, False) == (
+            "# Architecture\nOverview.\n"
+        )
+        assert "# not a heading" in section_text(outline, storage)
+        assert section_text(outline, appendix) == "# Appendix\nThe end."
+        assert (architecture.line_start, architecture.line_end) == (2, 10)
+
+    def test_find_by_title_or_anchor(self):
+        outline = DocumentOutline.parse(TEXT)
+
+        assert outline.find("storage").index == 1
+        assert outline.find("## Network").index == 2
+        assert outline.find("Missing") is None
+
+    def test_duplicate_anchors_are_numbered(self):
+        outline = DocumentOutline.parse("# Notes\n# Notes\n")
+
+        assert [s.anchor for s in outline.sections] == ["notes", "notes-1"]
+
+    def test_line_range(self):
+        outline = DocumentOutline.parse(TEXT)
+        start, end = outline.line_range(2, 3)
+
+        assert TEXT.encode()[start:end].decode() == "# Architecture\nOverview.\n"
+        assert outline.line_at(start) == 2
+
+    def test_token_estimate(self):
+        outline = DocumentOutline.parse("# A\n" + "word " * 100)
+
+        assert outline.sections[0].as_dict()["tokens"] == 102
+        assert outline.tokens == estimate_text_tokens("# A\n" + "word " * 100)
+
+
+def test_slugify():
+    assert slugify("Getting Started: Step 1!") == "getting-started-step-1"
+
+
+def test_snap_to_characters():
+    encoded = "a✓b".encode()
+
+    assert snap_to_characters(encoded, 2, 4) == (4, 4)
+    assert snap_to_characters(encoded, 0, 3) == (0, 1)
+    assert snap_to_characters(encoded, 0, 100) == (0, 5)
+
+
+class TestOutlineCache:
+    """Test caching parsed outlines by revision."""
+
+    def test_reuses_outline_of_same_revision(self):
+        cache = OutlineCache()
+        first = cache.get_or_parse("doc-1", "1", TEXT)
+
+        assert cache.get_or_parse("doc-1", "1", TEXT) is first
+        assert cache.get_or_parse("doc-1", "2", TEXT) is not first
+        assert cache.snapshot() == {"entries": 2, "hits": 1, "misses": 2}
+
+    def test_bounded(self):
+        cache = OutlineCache(max_entries=1)
+        cache.get_or_parse("doc-1", "1", TEXT)
+        cache.get_or_parse("doc-2", "1", TEXT)
+
+        assert cache.snapshot()["entries"] == 1
@@ -2,14 +2,120 @@
 Tests for the Outline MCP Server
 """
 
+import asyncio
+import hashlib
+import hmac
 import json
 import os
+import time
 import pytest
 from unittest.mock import AsyncMock, patch, MagicMock
 import httpx
+from starlette.testclient import TestClient
 
 # Import the server components
-from src.outline_mcp_server import OutlineConfig, AppContext, make_outline_request
+from src.cache import CHANGE_FEED_TTLS, ResponseCache, SQLiteBackend
+from src.changefeed import Invalidation
+from src.collection_tree import CollectionTree, CollectionTreeCache
+from src.document_store import DocumentStore
+from src.metrics import ServerMetrics
+from src.ratelimit import CircuitBreaker, RetryPolicy, SharedTokenBucket
+from src.search_index import LocalSearchIndex
+from src.sections import OutlineCache
+from src.singleflight import SingleFlight
+from src.sync import SyncState, WorkspaceSync
+from src.outline_mcp_server import (
+    OutlineConfig,
+    AppContext,
+    WEBHOOK_PATH,
+    answer_question,
+    app_lifespan,
+    apply_invalidation,
+    build_http_app,
+    create_app_context,
+    create_http_client,
+    export_collection,
+    export_document,
+    get_collection_documents,
+    get_document,
+    get_document_outline,
+    get_document_range,
+    get_document_section,
+    get_documents,
+    iter_outline_pages,
+    list_documents,
+    list_subtree,
+    make_outline_request,
+    mcp,
+    multi_search,
+    parse_args,
+    resolve_document_path,
+    create_workspace_sync,
+    search_documents,
+    shared_context,
+    sync_workspace,
+)
+
+
+def make_context(http_client, **resources):
+    """Create a mock MCP context around a real AppContext."""
+    context = MagicMock()
+    context.request_context.lifespan_context = AppContext(
+        outline_config=OutlineConfig(api_token="test_token"),
+        http_client=http_client,
+        **resources,
+    )
+    return context
+
+
+class ErrorBody(dict):
+    """Body of a response in which Outline refuses a request."""
+
+    def __init__(self, message):
+        super().__init__(ok=False, error=message)
+
+
+def paged(items):
+    """Return a handler serving a list endpoint from items by offset and limit."""
+    return lambda body: items[body["offset"] : body["offset"] + body["limit"]]
+
+
+def fake_outline(responses):
+    """
+    Create an http client answering Outline endpoints.
+
+    Args:
+        responses: Maps endpoint names to the response data, or to a function
+            of the request body returning it. Functions may be coroutines,
+            raise to fail the request or return an ErrorBody.
+    """
+
+    async def post(url, json):
+        endpoint = url.rsplit("/", 1)[-1]
+        if endpoint not in responses:
+            raise AssertionError(f"unexpected call to {endpoint}")
+        data = responses[endpoint]
+        if callable(data):
+            data = data(json)
+            if asyncio.iscoroutine(data):
+                data = await data
+        response = MagicMock()
+        response.raise_for_status.return_value = None
+        if isinstance(data, ErrorBody):
+            response.json.return_value = dict(data)
+        else:
+            response.json.return_value = {"ok": True, "data": data}
+        return response
+
+    http_client = AsyncMock()
+    http_client.post.side_effect = post
+    return http_client
+
+
+@pytest.fixture
+def mock_context_factory():
+    """Return a factory for contexts without any upstream responses."""
+    return lambda **resources: make_context(AsyncMock(), **resources)
 
 
 class TestOutlineConfig:
@@ -43,16 +149,9 @@ class TestMakeOutlineRequest:
     @pytest.fixture
     def mock_context(self):
         """Create a mock context for testing."""
-        context = MagicMock()
-        app_context = MagicMock()
-        app_context.outline_config.base_url = "https://app.getoutline.com/api"
-
         # Mock HTTP client
         http_client = AsyncMock()
-        app_context.http_client = http_client
-
-        context.request_context.lifespan_context = app_context
-        return context, http_client
+        return make_context(http_client), http_client
 
     @pytest.mark.asyncio
     async def test_successful_request(self, mock_context):
@@ -114,6 +213,1180 @@ class TestMakeOutlineRequest:
             "https://app.getoutline.com/api/documents.list", json={}
         )
 
+    @pytest.mark.asyncio
+    async def test_endpoint_timeout_override(self, mock_context):
+        """Test that per-endpoint timeouts are passed to the HTTP client."""
+        context, http_client = mock_context
+        config = context.request_context.lifespan_context.outline_config
+        config.endpoint_timeouts = {"documents.export": 90.0}
+
+        mock_response = MagicMock()
+        mock_response.json.return_value = {"ok": True, "data": ""}
+        mock_response.raise_for_status.return_value = None
+        http_client.post.return_value = mock_response
+
+        await make_outline_request(context, "documents.export", {"id": "doc"})
+
+        timeout = http_client.post.call_args.kwargs["timeout"]
+        assert timeout.read == 90.0
+        assert timeout.connect == 10.0
+
+    @pytest.mark.asyncio
+    async def test_cached_response_skips_http_call(self, mock_context):
+        """Test that a cached read is served without calling Outline again."""
+        context, http_client = mock_context
+        context.request_context.lifespan_context.response_cache = ResponseCache()
+
+        mock_response = MagicMock()
+        mock_response.json.return_value = {"ok": True, "data": {"id": "test"}}
+        mock_response.content = b'{"ok": true, "data": {"id": "test"}}'
+        mock_response.raise_for_status.return_value = None
+        http_client.post.return_value = mock_response
+
+        first = await make_outline_request(context, "documents.info", {"id": "test"})
+        second = await make_outline_request(context, "documents.info", {"id": "test"})
+
+        assert first == second == {"ok": True, "data": {"id": "test"}}
+        http_client.post.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_concurrent_identical_requests_are_coalesced(self, mock_context):
+        """Test that identical concurrent requests share one HTTP call."""
+        context, http_client = mock_context
+        single_flight = SingleFlight()
+        context.request_context.lifespan_context.single_flight = single_flight
+
+        release = asyncio.Event()
+        mock_response = MagicMock()
+        mock_response.json.return_value = {"ok": True, "data": "# Doc"}
+        mock_response.raise_for_status.return_value = None
+
+        async def slow_post(*args, **kwargs):
+            await release.wait()
+            return mock_response
+
+        http_client.post.side_effect = slow_post
+
+        calls = [
+            make_outline_request(context, "documents.export", {"id": "doc"})
+            for _ in range(5)
+        ]
+        gathered = asyncio.gather(*calls)
+        await asyncio.sleep(0)
+        release.set()
+        results = await gathered
+
+        assert all(r == {"ok": True, "data": "# Doc"} for r in results)
+        http_client.post.assert_called_once()
+        assert single_flight.stats.coalesced == 4
+
+    @pytest.mark.asyncio
+    async def test_transient_error_is_retried(self, mock_context):
+        """Test that a 503 on a read endpoint is retried."""
+        context, http_client = mock_context
+        context.request_context.lifespan_context.retry_policy = RetryPolicy(
+            base_delay=0
+        )
+        request = httpx.Request("POST", "https://app.getoutline.com/api/documents.info")
+
+        http_client.post.side_effect = [
+            httpx.Response(503, request=request),
+            httpx.Response(
+                200, json={"ok": True, "data": {"id": "test"}}, request=request
+            ),
+        ]
+
+        result = await make_outline_request(context, "documents.info", {"id": "test"})
+
+        assert result["data"] == {"id": "test"}
+        assert http_client.post.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_metrics_record_errors_retries_and_cache(self, mock_context):
+        """Test that upstream requests and cache lookups are measured."""
+        context, http_client = mock_context
+        app_context = context.request_context.lifespan_context
+        app_context.retry_policy = RetryPolicy(base_delay=0)
+        app_context.response_cache = ResponseCache()
+        app_context.metrics = metrics = ServerMetrics()
+        request = httpx.Request("POST", "https://app.getoutline.com/api/documents.info")
+        http_client.post.side_effect = [
+            httpx.Response(503, request=request),
+            httpx.Response(
+                200, json={"ok": True, "data": {"id": "test"}}, request=request
+            ),
+        ]
+
+        for _ in range(2):
+            await make_outline_request(context, "documents.info", {"id": "test"})
+
+        endpoint = "documents.info"
+        assert metrics.upstream_errors.value(endpoint=endpoint, status=503) == 1
+        assert metrics.upstream_retries.value(endpoint=endpoint) == 1
+        assert metrics.upstream_duration.get(endpoint=endpoint).count == 2
+        assert metrics.upstream_inflight.value(endpoint=endpoint) == 0
+        assert metrics.cache_lookups.value(endpoint=endpoint, result="miss") == 1
+        assert metrics.cache_lookups.value(endpoint=endpoint, result="hit") == 1
+
+    @pytest.mark.asyncio
+    async def test_long_retry_after_is_not_waited(self, mock_context):
+        """Test that a 429 asking for a longer wait than allowed fails."""
+        context, http_client = mock_context
+        context.request_context.lifespan_context.retry_policy = RetryPolicy(max_delay=5)
+        request = httpx.Request("POST", "https://app.getoutline.com/api/documents.info")
+        http_client.post.return_value = httpx.Response(
+            429, headers={"Retry-After": "60"}, request=request
+        )
+
+        with pytest.raises(Exception, match="Failed to call Outline API"):
+            await make_outline_request(context, "documents.info", {"id": "test"})
+        http_client.post.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_open_circuit_fails_fast(self, mock_context):
+        """Test that an open circuit rejects requests without HTTP calls."""
+        context, http_client = mock_context
+        breaker = CircuitBreaker(failure_threshold=1)
+        context.request_context.lifespan_context.circuit_breaker = breaker
+        http_client.post.side_effect = httpx.ConnectError("Connection refused")
+
+        with pytest.raises(Exception, match="Failed to call Outline API"):
+            await make_outline_request(context, "documents.info", {"id": "test"})
+        with pytest.raises(Exception, match="Outline API is unavailable"):
+            await make_outline_request(context, "documents.info", {"id": "test"})
+        http_client.post.assert_called_once()
+
+
+class TestOutlineConfigFromEnv:
+    """Test building OutlineConfig from environment variables."""
+
+    def test_from_env_parses_cache_settings(self):
+        env = {
+            "OUTLINE_API_TOKEN": "test_token",
+            "OUTLINE_CACHE_MAX_BYTES": "1024",
+            "OUTLINE_CACHE_TTLS": "documents.info=600, documents.search=0",
+            "OUTLINE_CACHE_STALE_WHILE_REVALIDATE": "30",
+        }
+        with patch.dict(os.environ, env, clear=True):
+            config = OutlineConfig.from_env()
+
+        assert config.cache_enabled is True
+        assert config.cache_max_bytes == 1024
+        assert config.cache_ttls == {"documents.info": 600.0, "documents.search": 0.0}
+        assert config.cache_stale_while_revalidate == 30.0
+        assert config.cache_stale_if_error == 86400.0
+
+    def test_from_env_parses_http_settings(self):
+        env = {
+            "OUTLINE_API_TOKEN": "test_token",
+            "OUTLINE_HTTP_MAX_CONNECTIONS": "50",
+            "OUTLINE_HTTP_KEEPALIVE_EXPIRY": "120",
+            "OUTLINE_HTTP2": "true",
+            "OUTLINE_ENDPOINT_TIMEOUTS": "documents.export=90",
+        }
+        with patch.dict(os.environ, env, clear=True):
+            config = OutlineConfig.from_env()
+
+        assert config.http_max_connections == 50
+        assert config.http_keepalive_expiry == 120.0
+        assert config.http2 is True
+        assert config.timeout_for("documents.export").read == 90.0
+        assert config.timeout_for("documents.info") is None
+
+    @pytest.mark.asyncio
+    async def test_http2_falls_back_without_h2(self):
+        config = OutlineConfig(api_token="test_token", http2=True)
+        with patch("src.outline_mcp_server._http2_available", return_value=False):
+            async with create_http_client(config) as client:
+                assert client.headers["Authorization"] == "Bearer test_token"
+
+    def test_from_env_requires_token(self):
+        with patch.dict(os.environ, {}, clear=True):
+            with pytest.raises(ValueError, match="OUTLINE_API_TOKEN"):
+                OutlineConfig.from_env()
+
+
+class TestSharedContext:
+    """Test sharing one application context between sessions and transports."""
+
+    ENV = {"OUTLINE_API_TOKEN": "test_token", "OUTLINE_METRICS": "false"}
+
+    @pytest.mark.asyncio
+    async def test_sessions_share_app_context(self):
+        with patch.dict(os.environ, self.ENV, clear=True):
+            async with app_lifespan(mcp) as first:
+                async with app_lifespan(mcp) as second:
+                    assert first is second
+                    assert shared_context.holders == 2
+
+        assert shared_context.holders == 0
+        assert first.http_client.is_closed
+
+    def test_http_app_holds_context_until_shutdown(self):
+        app = build_http_app("sse")
+
+        with patch.dict(os.environ, self.ENV, clear=True):
+            with TestClient(app):
+                assert shared_context.holders == 1
+
+        assert shared_context.holders == 0
+
+    def test_transport_options_from_env(self):
+        env = {"OUTLINE_TRANSPORT": "streamable-http", "OUTLINE_MAX_CLIENTS": "64"}
+        with patch.dict(os.environ, env, clear=True):
+            args = parse_args(["--port", "9000"])
+
+        assert args.transport == "streamable-http"
+        assert args.port == 9000
+        assert args.max_clients == 64
+        assert args.stateless is False
+
+    def test_workers_require_streamable_http(self):
+        with patch.dict(os.environ, {}, clear=True):
+            with pytest.raises(SystemExit):
+                parse_args(["--transport", "sse", "--workers", "2"])
+
+    def test_workers_refuse_vector_index(self):
+        env = {"OUTLINE_VECTOR_INDEX": "true"}
+        with patch.dict(os.environ, env, clear=True):
+            with pytest.raises(SystemExit):
+                parse_args(["--transport", "streamable-http", "--workers", "2"])
+
+    @pytest.mark.asyncio
+    async def test_shared_state_uses_sqlite(self, tmp_path):
+        env = {**self.ENV, "OUTLINE_SHARED_STATE": "true"}
+        env["OUTLINE_DATA_DIR"] = str(tmp_path)
+        with patch.dict(os.environ, env, clear=True):
+            async with app_lifespan(mcp) as app_context:
+                assert isinstance(app_context.response_cache.backend, SQLiteBackend)
+                assert isinstance(app_context.rate_limiter, SharedTokenBucket)
+
+        assert (tmp_path / "shared.sqlite").exists()
+
+    @pytest.mark.asyncio
+    async def test_one_worker_runs_the_sync(self, tmp_path):
+        env = {**self.ENV, "OUTLINE_SHARED_STATE": "true", "OUTLINE_SYNC": "true"}
+        env["OUTLINE_DATA_DIR"] = str(tmp_path)
+        with (
+            patch.dict(os.environ, env, clear=True),
+            patch.object(WorkspaceSync, "start") as start,
+        ):
+            async with create_app_context(), create_app_context():
+                await asyncio.sleep(0.01)
+
+        assert start.call_count == 1
+
+
+class TestPagination:
+    """Test walking paginated endpoints."""
+
+    @pytest.fixture
+    def paged_context(self):
+        """Create a context whose client serves 250 documents in pages."""
+
+        documents = [{"id": f"doc-{i}", "title": f"Doc {i}"} for i in range(250)]
+        http_client = fake_outline({"documents.list": paged(documents)})
+        return make_context(http_client), http_client
+
+    @pytest.mark.asyncio
+    async def test_iter_pages_walks_until_short_page(self, paged_context):
+        context, http_client = paged_context
+
+        pages = [
+            page async for page in iter_outline_pages(context, "documents.list", {})
+        ]
+
+        assert [len(page) for page in pages] == [100, 100, 50]
+        assert http_client.post.call_count == 3
+
+    @pytest.mark.asyncio
+    async def test_iter_pages_respects_max_results(self, paged_context):
+        context, http_client = paged_context
+
+        pages = [
+            page
+            async for page in iter_outline_pages(
+                context, "documents.list", {"offset": 10}, max_results=120
+            )
+        ]
+
+        assert sum(len(page) for page in pages) == 120
+        assert pages[0][0]["id"] == "doc-10"
+        assert http_client.post.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_list_documents_fetch_all(self, paged_context):
+        context, _ = paged_context
+
+        result = json.loads(await list_documents(context, fetch_all=True))
+
+        assert result["total_documents"] == 250
+        assert result["documents"][-1]["id"] == "doc-249"
+        assert result["pagination"]["pages"] == 3
+        assert result["pagination"]["max_results_reached"] is False
+
+    @pytest.mark.asyncio
+    async def test_list_documents_projection_as_ndjson(self, paged_context):
+        context, _ = paged_context
+
+        output = await list_documents(
+            context, limit=3, fields=["id", "title"], format="ndjson"
+        )
+        lines = [json.loads(line) for line in output.splitlines()]
+
+        assert lines[0]["total_documents"] == 3
+        assert lines[1:] == [
+            {"id": "doc-0", "title": "Doc 0"},
+            {"id": "doc-1", "title": "Doc 1"},
+            {"id": "doc-2", "title": "Doc 2"},
+        ]
+
+    @pytest.mark.asyncio
+    async def test_list_documents_rejects_unknown_fields(self, paged_context):
+        context, http_client = paged_context
+
+        with pytest.raises(ValueError, match="Unknown document fields: body"):
+            await list_documents(context, fields=["id", "body"])
+        http_client.post.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_list_documents_continues_from_cursor(self, paged_context):
+        context, http_client = paged_context
+
+        first = json.loads(await list_documents(context, limit=10))
+        cursor = first["pagination"]["next_cursor"]
+        second = json.loads(await list_documents(context, limit=3, cursor=cursor))
+
+        assert second["documents"][0]["id"] == "doc-10"
+        assert second["total_documents"] == 10
+        assert second["pagination"]["offset"] == 10
+
+    @pytest.mark.asyncio
+    async def test_list_documents_rejects_cursor_with_fetch_all(self, paged_context):
+        context, http_client = paged_context
+
+        with pytest.raises(ValueError, match="cursor cannot be combined"):
+            await list_documents(context, cursor="x", fetch_all=True)
+        http_client.post.assert_not_called()
+
+
+class TestGetDocuments:
+    """Test the batch get_documents tool."""
+
+    @pytest.fixture
+    def batch_context(self):
+        """Create a context whose client tracks concurrent documents.info calls."""
+        state = {"active": 0, "peak": 0}
+
+        async def info(body):
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+            await asyncio.sleep(0.01)
+            state["active"] -= 1
+            if body["id"] == "missing":
+                return ErrorBody("Not Found")
+            return {"id": body["id"], "title": f"Title {body['id']}"}
+
+        http_client = fake_outline({"documents.info": info})
+        return make_context(http_client), state
+
+    @pytest.mark.asyncio
+    async def test_preserves_order_and_reports_errors(self, batch_context):
+        context, _ = batch_context
+
+        result = json.loads(
+            await get_documents(
+                context, ["doc-1", "missing", "doc-2"], fields=["id", "title"]
+            )
+        )
+
+        assert [doc["id"] for doc in result["documents"]] == [
+            "doc-1",
+            "missing",
+            "doc-2",
+        ]
+        assert result["documents"][0] == {"id": "doc-1", "title": "Title doc-1"}
+        assert "Not Found" in result["documents"][1]["error"]
+        assert result["succeeded"] == 2
+        assert result["failed"] == 1
+
+    @pytest.mark.asyncio
+    async def test_bounds_concurrency(self, batch_context):
+        context, state = batch_context
+
+        await get_documents(context, [f"doc-{i}" for i in range(10)], max_concurrency=3)
+
+        assert state["peak"] == 3
+
+    @pytest.mark.asyncio
+    async def test_budget_is_shared_by_the_batch(self):
+        texts = {"short": "Short note.\n", "long": "# Long\n\n" + "word " * 2000}
+        http_client = fake_outline(
+            {
+                "documents.info": lambda body: {
+                    "id": body["id"],
+                    "text": texts[body["id"]],
+                }
+            }
+        )
+        context = make_context(http_client)
+
+        result = json.loads(
+            await get_documents(context, ["long", "short"], max_bytes=1000)
+        )
+
+        long_doc, short_doc = result["documents"]
+        assert short_doc["text"] == texts["short"]
+        assert "truncation" not in short_doc
+        assert long_doc["truncation"]["next_byte"] is not None
+        assert sum(len(doc["text"].encode()) for doc in (long_doc, short_doc)) <= 1000
+
+    @pytest.mark.asyncio
+    async def test_rejects_unknown_fields(self, batch_context):
+        context, _ = batch_context
+
+        with pytest.raises(ValueError, match="Unknown document fields: bogus"):
+            await get_documents(context, ["doc-1"], fields=["id", "bogus"])
+
+
+class TestLocalSearch:
+    """Test searching through the local index."""
+
+    @pytest.fixture
+    def index_context(self):
+        """Create a context with a local index and a workspace of two documents."""
+        documents = [
+            {"id": "doc-1", "title": "Hiring Policy", "revision": 1, "text": "hire"},
+            {"id": "doc-2", "title": "Deploy Runbook", "revision": 3},
+        ]
+
+        http_client = fake_outline(
+            {"documents.list": paged(documents), "documents.export": "deploy steps"}
+        )
+        index = LocalSearchIndex(":memory:")
+        context = make_context(http_client, search_index=index)
+        app_context = context.request_context.lifespan_context
+        app_context.workspace_sync = create_workspace_sync(
+            app_context, SyncState(":memory:")
+        )
+        yield context, http_client
+        index.close()
+
+    @pytest.mark.asyncio
+    async def test_sync_then_search_locally(self, index_context):
+        context, http_client = index_context
+
+        counts = json.loads(await sync_workspace(context))
+        assert counts["fetched"] == 2
+        assert counts["reconciled"] is True
+
+        calls = http_client.post.call_count
+        result = json.loads(await search_documents(context, "deploy", backend="auto"))
+
+        assert result["backend"] == "local"
+        assert result["results"][0]["id"] == "doc-2"
+        assert http_client.post.call_count == calls
+
+    @pytest.mark.asyncio
+    async def test_sync_skips_unchanged_documents(self, index_context):
+        context, _ = index_context
+
+        await sync_workspace(context)
+        counts = json.loads(await sync_workspace(context, full=False))
+
+        assert counts["fetched"] == 0
+
+    @pytest.mark.asyncio
+    async def test_local_backend_requires_index(self, mock_context_factory):
+        context = mock_context_factory()
+        with pytest.raises(ValueError, match="OUTLINE_LOCAL_INDEX"):
+            await search_documents(context, "deploy", backend="local")
+
+    @pytest.mark.asyncio
+    async def test_local_backend_rejects_cursor(self, index_context):
+        context, http_client = index_context
+
+        with pytest.raises(ValueError, match="cursor cannot be combined"):
+            await search_documents(context, "deploy", cursor="x", backend="local")
+        http_client.post.assert_not_called()
+
+
+class TestMultiSearch:
+    """Test merging several searches into one ranked list."""
+
+    @pytest.fixture
+    def search_context(self):
+        """Create a context answering each query with its own ranked hits."""
+        hits = {
+            "deploy": [("runbook", 0.9, "<b>deploy</b> steps"), ("faq", 0.2, "")],
+            "release": [("notes", 0.8, ""), ("runbook", 0.6, "the deploy steps")],
+        }
+
+        def search(body):
+            if body["query"] == "broken":
+                return ErrorBody("bad query")
+            return [
+                {
+                    "ranking": ranking,
+                    "context": context,
+                    "document": {"id": document_id, "title": document_id.title()},
+                }
+                for document_id, ranking, context in hits[body["query"]]
+            ]
+
+        http_client = fake_outline({"documents.search": search})
+        return make_context(http_client), http_client
+
+    @pytest.mark.asyncio
+    async def test_results_are_fused_and_deduplicated(self, search_context):
+        context, http_client = search_context
+
+        result = json.loads(
+            await multi_search(
+                context, ["deploy", "release", "Deploy "], fields=["id", "context"]
+            )
+        )
+
+        assert http_client.post.call_count == 2
+        assert result["queries"] == ["deploy", "release"]
+        assert [r["id"] for r in result["results"]] == ["runbook", "notes", "faq"]
+        assert result["results"][0]["context"] == "the deploy steps"
+        assert result["results"][0]["matched_queries"] == [0, 1]
+
+    @pytest.mark.asyncio
+    async def test_failed_query_is_reported(self, search_context):
+        context, _ = search_context
+
+        result = json.loads(await multi_search(context, ["deploy", "broken"], limit=1))
+
+        assert [r["id"] for r in result["results"]] == ["runbook"]
+        assert result["unique_documents"] == 2
+        assert result["errors"][0]["query"] == "broken"
+
+    @pytest.mark.asyncio
+    async def test_requires_a_query(self, mock_context_factory):
+        with pytest.raises(ValueError, match="non-empty query"):
+            await multi_search(mock_context_factory(), [" ", ""])
+
+
+class TestLocalAnswers:
+    """Test answering questions from the local vector index."""
+
+    @pytest.fixture
+    def vector_context(self, tmp_path):
+        """Create a context whose vector index holds two documents."""
+        pytest.importorskip("numpy")
+        from src.vector_index import HashingEmbedder, VectorIndex
+
+        index = VectorIndex(str(tmp_path), HashingEmbedder())
+        index.upsert_many(
+            [
+                (
+                    {"id": "doc-1", "title": "Deploy", "urlId": "deploy-abc"},
+                    "Deploy with the release pipeline.",
+                ),
+                ({"id": "doc-2", "title": "Leave"}, "Vacation days and holidays."),
+            ]
+        )
+        http_client = AsyncMock()
+        yield make_context(http_client, vector_index=index), http_client
+        index.close()
+
+    @pytest.mark.asyncio
+    async def test_auto_backend_answers_locally(self, vector_context):
+        context, http_client = vector_context
+
+        result = json.loads(
+            await answer_question(context, "release pipeline", backend="auto", limit=1)
+        )
+
+        http_client.post.assert_not_called()
+        assert result["answer"] is None
+        assert result["search_metadata"]["source"] == "local"
+        [document] = result["supporting_documents"]
+        assert document["id"] == "doc-1"
+        assert document["url_id"] == "deploy-abc"
+        assert document["passages"][0]["text"] == "Deploy with the release pipeline."
+
+    @pytest.mark.asyncio
+    async def test_local_backend_requires_index(self, mock_context_factory):
+        with pytest.raises(ValueError, match="OUTLINE_VECTOR_INDEX"):
+            await answer_question(mock_context_factory(), "why", backend="local")
+
+
+class TestDocumentStore:
+    """Test serving document reads from the on-disk store."""
+
+    @pytest.fixture
+    def post_document(self):
+        """Return an http client answering documents.info with a fixed document."""
+        document = {"id": "doc-1", "urlId": "abc", "title": "Policy", "revision": 2}
+
+        return fake_outline({"documents.info": {**document, "text": "# Policy"}})
+
+    @pytest.mark.asyncio
+    async def test_restarted_server_serves_warm_reads(self, tmp_path, post_document):
+        store = DocumentStore(str(tmp_path))
+        context = make_context(post_document, document_store=store)
+        first = await make_outline_request(context, "documents.info", {"id": "abc"})
+
+        restarted = make_context(
+            AsyncMock(), document_store=store, response_cache=ResponseCache()
+        )
+        second = await make_outline_request(restarted, "documents.info", {"id": "abc"})
+
+        assert second == first
+        restarted.request_context.lifespan_context.http_client.post.assert_not_called()
+        store.close()
+
+    @pytest.mark.asyncio
+    async def test_store_hits_are_cached_only_while_fresh(
+        self, tmp_path, post_document
+    ):
+        store = DocumentStore(str(tmp_path))
+        context = make_context(post_document, document_store=store)
+        await make_outline_request(context, "documents.info", {"id": "abc"})
+
+        cache = ResponseCache(ttls={"documents.info": 3600})
+        restarted = make_context(
+            AsyncMock(), document_store=store, response_cache=cache
+        )
+        config = restarted.request_context.lifespan_context.outline_config
+        config.document_store_max_age = 10
+        await make_outline_request(restarted, "documents.info", {"id": "abc"})
+
+        [(_, entry)] = cache.backend.items()
+        assert entry.expires_at - entry.stored_at <= 10
+        store.close()
+
+    @pytest.mark.asyncio
+    async def test_newer_revision_bypasses_store(self, tmp_path, post_document):
+        store = DocumentStore(str(tmp_path))
+        cache = ResponseCache(ttls={"documents.info": 0})
+        context = make_context(
+            post_document, document_store=store, response_cache=cache
+        )
+        await make_outline_request(context, "documents.info", {"id": "doc-1"})
+
+        cache.observe("documents.list", {}, {"data": [{"id": "doc-1", "revision": 3}]})
+        await make_outline_request(context, "documents.info", {"id": "doc-1"})
+
+        assert post_document.post.call_count == 2
+        store.close()
+
+
+class TestStaleServing:
+    """Test serving expired responses while refreshing and during outages."""
+
+    @pytest.fixture
+    def stale_context(self):
+        """Create a context whose cache clock and Outline revision can advance."""
+        state = {"now": 0.0, "revision": 1, "down": False}
+
+        def info(body):
+            if state["down"]:
+                raise httpx.ConnectError("Connection refused")
+            return {"id": "doc-1", "title": "Doc", "revision": state["revision"]}
+
+        http_client = fake_outline({"documents.info": info})
+        cache = ResponseCache(
+            ttls={"documents.info": 10}, clock=lambda: state["now"], max_stale=3600
+        )
+        context = make_context(http_client, response_cache=cache)
+        context.request_context.lifespan_context.outline_config = OutlineConfig(
+            api_token="test_token",
+            cache_stale_while_revalidate=60,
+            cache_stale_if_error=3600,
+        )
+        return context, http_client, state
+
+    @pytest.mark.asyncio
+    async def test_expired_entry_is_served_while_refreshing(self, stale_context):
+        context, http_client, state = stale_context
+        app_context = context.request_context.lifespan_context
+        await make_outline_request(context, "documents.info", {"id": "doc-1"})
+
+        state["now"], state["revision"] = 20.0, 2
+        stale = await make_outline_request(context, "documents.info", {"id": "doc-1"})
+        await asyncio.gather(*app_context.revalidations.values())
+        fresh = await make_outline_request(context, "documents.info", {"id": "doc-1"})
+
+        assert stale["stale"] is True
+        assert stale["age"] == 20.0
+        assert stale["data"]["revision"] == 1
+        assert "stale" not in fresh
+        assert fresh["data"]["revision"] == 2
+        assert http_client.post.call_count == 2
+        assert app_context.revalidations == {}
+
+    @pytest.mark.asyncio
+    async def test_last_good_response_is_served_during_outage(self, stale_context):
+        context, _, state = stale_context
+        await get_document(context, "doc-1")
+
+        state["now"], state["down"] = 600.0, True
+        result = json.loads(await get_document(context, "doc-1"))
+
+        assert result["id"] == "doc-1"
+        assert result["stale"] is True
+        assert result["age"] == 600.0
+
+    @pytest.mark.asyncio
+    async def test_outage_without_cached_response_fails(self, stale_context):
+        context, _, state = stale_context
+        state["down"] = True
+
+        with pytest.raises(Exception, match="Failed to call Outline API"):
+            await get_document(context, "doc-1")
+
+    @pytest.mark.asyncio
+    async def test_refused_requests_are_not_served_stale(self, stale_context):
+        context, http_client, state = stale_context
+        await get_document(context, "doc-1")
+        request = httpx.Request("POST", "https://app.getoutline.com/api/documents.info")
+        http_client.post.side_effect = None
+        http_client.post.return_value = httpx.Response(404, request=request)
+
+        state["now"] = 600.0
+        with pytest.raises(Exception, match="Failed to call Outline API"):
+            await get_document(context, "doc-1")
+
+
+class TestBudgets:
+    """Test token budgets of document tools."""
+
+    TEXT = "# Guide\n\nIntro.\n\n" + "\n\n".join(
+        f"## Part {i}\n\n" + "detail " * 200 for i in range(10)
+    )
+
+    @pytest.fixture
+    def budget_context(self):
+        """Create a context serving one long document."""
+
+        http_client = fake_outline(
+            {
+                "documents.export": self.TEXT,
+                "documents.info": {"id": "doc-1", "title": "Guide", "text": self.TEXT},
+            }
+        )
+        return make_context(http_client)
+
+    @pytest.mark.asyncio
+    async def test_document_over_budget_is_excerpted(self, budget_context):
+        result = json.loads(await get_document(budget_context, "doc-1", max_tokens=200))
+
+        assert "## Part 9" in result["text"]
+        assert len(result["text"]) < len(self.TEXT)
+        assert result["truncation"]["mode"] == "smart"
+        assert result["truncation"]["total_bytes"] == len(self.TEXT)
+        assert result["truncation"]["next_byte"] == self.TEXT.index("detail")
+
+    @pytest.mark.asyncio
+    async def test_document_within_budget_is_unchanged(self, budget_context):
+        result = json.loads(
+            await get_document(budget_context, "doc-1", max_tokens=100000)
+        )
+
+        assert result["text"] == self.TEXT
+        assert "truncation" not in result
+
+    @pytest.mark.asyncio
+    async def test_default_budget_from_config(self, budget_context):
+        app_context = budget_context.request_context.lifespan_context
+        app_context.outline_config.default_max_tokens = 100
+
+        result = json.loads(await get_document(budget_context, "doc-1"))
+
+        assert "truncation" in result
+
+    @pytest.mark.asyncio
+    async def test_export_over_budget_points_to_sections(self, budget_context):
+        markdown = await export_document(
+            budget_context, "doc-1", max_bytes=300, truncation="head"
+        )
+
+        assert markdown.startswith("# Guide\n\nIntro.\n")
+        assert "read on with get_document_section]" in markdown
+        assert "start_byte" not in markdown
+
+    @pytest.mark.asyncio
+    async def test_range_with_token_budget(self, budget_context):
+        result = json.loads(
+            await get_document_range(budget_context, "doc-1", max_tokens=50)
+        )
+
+        assert result["truncated"] is True
+        assert result["next_byte"] == result["byte_end"]
+        assert self.TEXT.encode()[: result["byte_end"]].decode() == result["text"]
+
+
+class TestCollectionTrees:
+    """Test the cached collection tree tools."""
+
+    @pytest.fixture
+    def tree_context(self):
+        """Create a context serving one collection whose version can change."""
+        state = {"updated_at": "v1"}
+        tree = [
+            {
+                "id": "eng",
+                "title": "Engineering",
+                "url": "/doc/eng",
+                "children": [{"id": "deploy", "title": "Deploy", "url": "/doc/deploy"}],
+            }
+        ]
+
+        http_client = fake_outline(
+            {
+                "collections.info": lambda body: {
+                    "id": "col-1",
+                    "updatedAt": state["updated_at"],
+                },
+                "collections.documents": tree,
+            }
+        )
+        context = make_context(http_client, collection_trees=CollectionTreeCache())
+        return context, http_client, state
+
+    @staticmethod
+    def tree_downloads(http_client):
+        return sum(
+            call.args[0].endswith("collections.documents")
+            for call in http_client.post.call_args_list
+        )
+
+    @pytest.mark.asyncio
+    async def test_tree_is_downloaded_once_per_version(self, tree_context):
+        context, http_client, state = tree_context
+
+        resolved = json.loads(
+            await resolve_document_path(context, "col-1", "engineering/deploy")
+        )
+        subtree = json.loads(await list_subtree(context, "col-1", "eng"))
+        assert self.tree_downloads(http_client) == 1
+
+        state["updated_at"] = "v2"
+        await list_subtree(context, "col-1")
+        assert self.tree_downloads(http_client) == 2
+
+        assert resolved["matches"][0]["id"] == "deploy"
+        assert resolved["matches"][0]["ancestors"] == [
+            {"id": "eng", "title": "Engineering"}
+        ]
+        assert [d["id"] for d in subtree["documents"]] == ["deploy"]
+
+    @pytest.mark.asyncio
+    async def test_tree_over_budget_is_cut_by_depth(self, tree_context):
+        context, _, _ = tree_context
+
+        result = json.loads(
+            await get_collection_documents(context, "col-1", max_bytes=80)
+        )
+
+        assert result["document_tree"] == [
+            {
+                "id": "eng",
+                "title": "Engineering",
+                "url": "/doc/eng",
+                "children": [],
+                "more": 1,
+            }
+        ]
+        assert result["truncation"]["max_depth"] == 1
+        assert result["truncation"]["total_documents"] == 2
+
+    @pytest.mark.asyncio
+    async def test_subtree_projection(self, tree_context):
+        context, _, _ = tree_context
+
+        result = json.loads(
+            await list_subtree(context, "col-1", fields=["title", "depth"])
+        )
+
+        assert result["documents"] == [
+            {"title": "Engineering", "depth": 0},
+            {"title": "Deploy", "depth": 1},
+        ]
+
+    @pytest.mark.asyncio
+    async def test_subtree_rejects_unknown_document(self, tree_context):
+        context, _, _ = tree_context
+
+        with pytest.raises(ValueError, match="is not in collection"):
+            await list_subtree(context, "col-1", "missing")
+
+
+class TestChangeFeed:
+    """Test applying change-feed invalidations and receiving webhooks."""
+
+    ENV = {"OUTLINE_API_TOKEN": "test_token", "OUTLINE_METRICS": "false"}
+
+    @pytest.mark.asyncio
+    async def test_invalidation_drops_documents_listings_and_trees(self):
+        cache = ResponseCache()
+        trees = CollectionTreeCache()
+        app_context = make_context(
+            AsyncMock(), response_cache=cache, collection_trees=trees
+        ).request_context.lifespan_context
+        for document_id in ("doc-1", "doc-2"):
+            document = {"ok": True, "data": {"id": document_id, "revision": 1}}
+            cache.set("documents.info", {"id": document_id}, document)
+        cache.set("documents.list", {"limit": 25}, {"ok": True, "data": []})
+        cache.set("collections.info", {"id": "col-2"}, {"ok": True, "data": {}})
+        cache.set("collections.list", {}, {"ok": True, "data": []})
+        trees.put(CollectionTree("col-1", [{"id": "doc-1", "title": "Doc"}], "v1"))
+        trees.put(CollectionTree("col-3", [], "v1"))
+
+        await apply_invalidation(
+            app_context,
+            Invalidation(documents={"doc-1": "col-1"}, collections={"col-2"}),
+        )
+
+        assert cache.get("documents.info", {"id": "doc-1"}) is None
+        assert cache.get("documents.list", {"limit": 25}) is None
+        assert cache.get("collections.info", {"id": "col-2"}) is None
+        assert cache.get("collections.list", {}) is None
+        assert cache.get("documents.info", {"id": "doc-2"}) is not None
+        assert trees.get("col-1", "v1") is None
+        assert trees.get("col-3", "v1") is not None
+
+    @pytest.mark.asyncio
+    async def test_missed_changes_clear_everything(self):
+        cache = ResponseCache()
+        trees = CollectionTreeCache()
+        app_context = make_context(
+            AsyncMock(), response_cache=cache, collection_trees=trees
+        ).request_context.lifespan_context
+        cache.set("documents.info", {"id": "doc-1"}, {"ok": True, "data": {}})
+        trees.put(CollectionTree("col-1", [], "v1"))
+
+        await apply_invalidation(app_context, Invalidation(everything=True))
+
+        assert len(cache.backend) == 0
+        assert trees.get("col-1", "v1") is None
+
+    def test_webhook_requires_valid_signature(self, tmp_path):
+        env = {
+            **self.ENV,
+            "OUTLINE_WEBHOOK_SECRET": "secret",
+            "OUTLINE_DATA_DIR": str(tmp_path),
+        }
+        body = json.dumps(
+            {
+                "event": "documents.update",
+                "payload": {"id": "doc-1", "model": {"collectionId": "col-1"}},
+            }
+        ).encode()
+        timestamp = str(int(time.time() * 1000))
+        digest = hmac.new(
+            b"secret", f"{timestamp}.".encode() + body, hashlib.sha256
+        ).hexdigest()
+
+        with patch.dict(os.environ, env, clear=True):
+            with TestClient(build_http_app("sse")) as client:
+                rejected = client.post(
+                    WEBHOOK_PATH,
+                    content=body,
+                    headers={"Outline-Signature": f"t={timestamp},s=bad"},
+                )
+                accepted = client.post(
+                    WEBHOOK_PATH,
+                    content=body,
+                    headers={"Outline-Signature": f"t={timestamp},s={digest}"},
+                )
+
+        assert rejected.status_code == 401
+        assert accepted.status_code == 200
+        assert accepted.json() == {"ok": True, "documents": 1, "collections": 1}
+
+    @pytest.mark.asyncio
+    async def test_webhook_secret_alone_keeps_ttls_on_stdio(self, tmp_path):
+        env = {**self.ENV, "OUTLINE_WEBHOOK_SECRET": "secret"}
+        env["OUTLINE_DATA_DIR"] = str(tmp_path)
+        with patch.dict(os.environ, env, clear=True):
+            async with create_app_context() as app_context:
+                ttls = dict(app_context.response_cache.ttls)
+
+        assert ttls["documents.info"] < CHANGE_FEED_TTLS["documents.info"]
+
+    def test_webhooks_over_http_raise_ttls(self, tmp_path):
+        env = {**self.ENV, "OUTLINE_WEBHOOK_SECRET": "secret"}
+        env["OUTLINE_DATA_DIR"] = str(tmp_path)
+        env["OUTLINE_CACHE_TTLS"] = "documents.list=5"
+        with patch.dict(os.environ, env, clear=True):
+            with TestClient(build_http_app("sse")):
+                ttls = dict(shared_context.current.response_cache.ttls)
+
+        assert ttls["documents.info"] == CHANGE_FEED_TTLS["documents.info"]
+        assert ttls["documents.list"] == 5
+
+    @pytest.mark.asyncio
+    async def test_invalidations_reach_other_workers(self, tmp_path):
+        env = {**self.ENV, "OUTLINE_SHARED_STATE": "true"}
+        env["OUTLINE_DATA_DIR"] = str(tmp_path)
+        with (
+            patch.dict(os.environ, env, clear=True),
+            patch("src.outline_mcp_server.INVALIDATION_LOG_INTERVAL", 0.01),
+        ):
+            async with create_app_context() as first, create_app_context() as second:
+                for app_context in (first, second):
+                    tree = CollectionTree("col-1", [{"id": "doc-1"}], "v1")
+                    app_context.collection_trees.put(tree)
+
+                await apply_invalidation(first, Invalidation(documents={"doc-1": None}))
+                await asyncio.sleep(0.1)
+
+                assert first.collection_trees.get("col-1", "v1") is None
+                assert second.collection_trees.get("col-1", "v1") is None
+
+    def test_webhook_disabled_without_secret(self):
+        with patch.dict(os.environ, self.ENV, clear=True):
+            with TestClient(build_http_app("sse")) as client:
+                response = client.post(WEBHOOK_PATH, content=b"{}")
+
+        assert response.status_code == 404
+
+
+class TestExportCollection:
+    """Test exporting a collection through the tool."""
+
+    @pytest.fixture
+    def export_context(self, tmp_path):
+        """Create a context serving a two-document collection."""
+        responses = {
+            "collections.info": {"id": "col-1", "updatedAt": "v1"},
+            "collections.documents": [
+                {
+                    "id": "eng",
+                    "title": "Engineering",
+                    "children": [{"id": "deploy", "title": "Deploy"}],
+                }
+            ],
+            "documents.list": [
+                {"id": "eng", "revision": 3},
+                {"id": "deploy", "revision": 7},
+            ],
+        }
+
+        responses["documents.list"] = paged(responses["documents.list"])
+        responses["documents.export"] = lambda body: f"# {body['id']}"
+        http_client = fake_outline(responses)
+        context = make_context(http_client, response_cache=ResponseCache())
+        context.request_context.lifespan_context.outline_config.export_dir = str(
+            tmp_path
+        )
+        return context, http_client
+
+    @staticmethod
+    def exports(http_client):
+        return sum(
+            call.args[0].endswith("documents.export")
+            for call in http_client.post.call_args_list
+        )
+
+    @pytest.mark.asyncio
+    async def test_export_writes_files_and_resumes(self, export_context, tmp_path):
+        context, http_client = export_context
+
+        first = json.loads(await export_collection(context, "col-1", "nightly"))
+        second = json.loads(await export_collection(context, "col-1", "nightly"))
+
+        assert (first["fetched"], second["fetched"], second["unchanged"]) == (2, 0, 2)
+        assert self.exports(http_client) == 2
+        assert (tmp_path / "nightly" / "Engineering" / "Deploy.md").read_text() == (
+            "# deploy"
+        )
+        # Exported bodies bypass the response cache.
+        cache = context.request_context.lifespan_context.response_cache
+        assert cache.snapshot()["entries"] <= 2
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("destination", ["../outside", "/tmp/elsewhere", "."])
+    async def test_rejects_destination_outside_export_dir(
+        self, export_context, destination
+    ):
+        context, _ = export_context
+
+        with pytest.raises(ValueError, match="inside the export directory"):
+            await export_collection(context, "col-1", destination)
+
+
+class TestDocumentSections:
+    """Test the outline, section and range tools."""
+
+    @pytest.fixture
+    def sections_context(self):
+        """Create a context serving one document with nested headings."""
+        text = "# Setup\nInstall.\n## Linux\napt install\n# Usage\n" + "x\n" * 50
+
+        http_client = fake_outline(
+            {
+                "documents.info": {
+                    "id": "doc-1",
+                    "title": "Guide",
+                    "revision": 4,
+                    "text": text,
+                }
+            }
+        )
+        cache = OutlineCache()
+        return make_context(http_client, outline_cache=cache), cache
+
+    @pytest.mark.asyncio
+    async def test_outline_lists_sections_without_body(self, sections_context):
+        context, _ = sections_context
+
+        result = json.loads(await get_document_outline(context, "doc-1"))
+
+        assert [s["title"] for s in result["sections"]] == ["Setup", "Linux", "Usage"]
+        assert result["total_lines"] == 55
+        assert "text" not in result
+
+    @pytest.mark.asyncio
+    async def test_section_by_heading(self, sections_context):
+        context, cache = sections_context
+
+        result = json.loads(await get_document_section(context, "doc-1", "setup"))
+        body = json.loads(
+            await get_document_section(
+                context, "doc-1", index=0, include_subsections=False
+            )
+        )
+
+        assert result["text"] == "# Setup\nInstall.\n## Linux\napt install\n"
+        assert body["text"] == "# Setup\nInstall.\n"
+        assert cache.snapshot()["hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_section_is_truncated_on_line_boundary(self, sections_context):
+        context, _ = sections_context
+
+        result = json.loads(
+            await get_document_section(context, "doc-1", "Usage", max_bytes=11)
+        )
+
+        assert result["text"] == "# Usage\nx\n"
+        assert result["truncated"] is True
+        assert result["next_byte"] == result["byte_end"]
+
+    @pytest.mark.asyncio
+    async def test_range_by_lines(self, sections_context):
+        context, _ = sections_context
+
+        result = json.loads(
+            await get_document_range(context, "doc-1", start_line=3, end_line=4)
+        )
+
+        assert result["text"] == "## Linux\napt install\n"
+        assert (result["line_start"], result["line_end"]) == (3, 4)
+
+    @pytest.mark.asyncio
+    async def test_range_rejects_mixed_units(self, sections_context):
+        context, _ = sections_context
+
+        with pytest.raises(ValueError, match="either a line range or a byte range"):
+            await get_document_range(context, "doc-1", start_line=1, end_byte=10)
+
 
 class TestServerIntegration:
     """Integration tests for the MCP server."""
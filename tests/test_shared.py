@@ -0,0 +1,127 @@
+"""
+Tests for resources shared between MCP sessions
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+from src.shared import LeaderLease, SharedLifespan
+
+
+class Resource:
+    def __init__(self):
+        self.closed = False
+
+
+@pytest.fixture
+def shared():
+    created = []
+
+    @asynccontextmanager
+    async def factory():
+        resource = Resource()
+        created.append(resource)
+        try:
+            yield resource
+        finally:
+            resource.closed = True
+
+    return SharedLifespan(factory), created
+
+
+class TestSharedLifespan:
+    """Test sharing one context between holders."""
+
+    @pytest.mark.asyncio
+    async def test_holders_share_one_instance(self, shared):
+        lifespan, created = shared
+
+        async with lifespan.acquire() as first:
+            async with lifespan.acquire() as second:
+                assert first is second
+                assert lifespan.holders == 2
+            assert not first.closed
+
+        assert first.closed
+        assert lifespan.holders == 0
+        assert len(created) == 1
+
+    @pytest.mark.asyncio
+    async def test_reopens_after_last_release(self, shared):
+        lifespan, created = shared
+
+        async with lifespan.acquire():
+            pass
+        async with lifespan.acquire() as resource:
+            assert not resource.closed
+
+        assert lifespan.opened == 2
+
+    @pytest.mark.asyncio
+    async def test_concurrent_first_holders_create_once(self, shared):
+        lifespan, created = shared
+        release = asyncio.Event()
+
+        async def session():
+            async with lifespan.acquire() as resource:
+                await release.wait()
+                return resource
+
+        tasks = [asyncio.create_task(session()) for _ in range(5)]
+        await asyncio.sleep(0)
+        release.set()
+        resources = await asyncio.gather(*tasks)
+
+        assert len(created) == 1
+        assert all(r is created[0] for r in resources)
+        assert created[0].closed
+
+    @pytest.mark.asyncio
+    async def test_cancelled_holder_still_closes(self, shared):
+        lifespan, created = shared
+        started = asyncio.Event()
+
+        async def session():
+            async with lifespan.acquire():
+                started.set()
+                await asyncio.Event().wait()
+
+        task = asyncio.create_task(session())
+        await started.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        assert created[0].closed
+
+
+class TestLeaderLease:
+    """Test electing one process to run background loops."""
+
+    def test_one_holder_at_a_time(self, tmp_path):
+        path = str(tmp_path / "leader.lock")
+        first, second = LeaderLease(path), LeaderLease(path)
+
+        assert first.try_acquire()
+        assert not second.try_acquire()
+
+        first.release()
+        assert second.try_acquire()
+        second.release()
+
+    @pytest.mark.asyncio
+    async def test_follower_takes_over(self, tmp_path):
+        path = str(tmp_path / "leader.lock")
+        leader, follower = LeaderLease(path), LeaderLease(path)
+        leader.try_acquire()
+
+        waiting = asyncio.create_task(follower.acquire(interval=0.01))
+        await asyncio.sleep(0.05)
+        assert not waiting.done()
+
+        leader.release()
+        await asyncio.wait_for(waiting, 1)
+        assert follower.held
+        follower.release()
@@ -0,0 +1,75 @@
+"""
+Tests for request coalescing
+"""
+
+import asyncio
+
+import pytest
+
+from src.singleflight import SingleFlight
+
+
+class TestSingleFlight:
+    """Test sharing of in-flight calls."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_callers_share_result(self):
+        flight = SingleFlight()
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return {"value": calls}
+
+        results = await asyncio.gather(*(flight.do("key", fetch) for _ in range(3)))
+
+        assert calls == 1
+        assert results == [{"value": 1}] * 3
+        assert flight.stats.executed == 1
+        assert flight.stats.coalesced == 2
+        assert flight.inflight == 0
+
+    @pytest.mark.asyncio
+    async def test_errors_propagate_to_all_callers(self):
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("boom")
+
+        results = await asyncio.gather(
+            *(flight.do("key", fail) for _ in range(3)), return_exceptions=True
+        )
+
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert flight.stats.executed == 1
+
+    @pytest.mark.asyncio
+    async def test_sequential_calls_are_not_coalesced(self):
+        flight = SingleFlight()
+
+        async def fetch():
+            return 1
+
+        await flight.do("key", fetch)
+        await flight.do("key", fetch)
+
+        assert flight.stats.executed == 2
+        assert flight.stats.coalesced == 0
+
+    @pytest.mark.asyncio
+    async def test_cancelled_caller_does_not_cancel_others(self):
+        flight = SingleFlight()
+
+        async def fetch():
+            await asyncio.sleep(0.02)
+            return "done"
+
+        first = asyncio.ensure_future(flight.do("key", fetch))
+        second = asyncio.ensure_future(flight.do("key", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+
+        assert await second == "done"
@@ -0,0 +1,63 @@
+"""
+Tests for cold start time of the stdio server
+"""
+
+import os
+import subprocess
+import sys
+from unittest.mock import patch
+
+import pytest
+
+from src.outline_mcp_server import app_lifespan, mcp
+from src.startup import measure_imports, parse_importtime
+
+# Generous enough for slow CI machines; importing the MCP SDK alone takes most
+# of it. Override with OUTLINE_STARTUP_BUDGET to tighten it locally.
+STARTUP_BUDGET_SECONDS = float(os.getenv("OUTLINE_STARTUP_BUDGET", "4"))
+
+IMPORTTIME = """import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:      2000 |       5000 | httpx
+"""
+
+
+def test_parse_importtime():
+    timings = parse_importtime(IMPORTTIME)
+
+    assert [t.module for t in timings] == ["_io", "httpx"]
+    assert timings[1].self_seconds == 0.002
+    assert timings[1].cumulative_seconds == 0.005
+
+
+def test_cold_start_within_budget():
+    profile = measure_imports()
+
+    assert profile["seconds"] < STARTUP_BUDGET_SECONDS
+    assert any(t.module.strip() == "src.outline_mcp_server" for t in profile["imports"])
+
+
+def test_package_import_does_not_load_server():
+    completed = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, src; print('src.outline_mcp_server' in sys.modules)",
+        ],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    assert completed.stdout.strip() == "False"
+
+
+@pytest.mark.asyncio
+async def test_http_client_is_built_on_first_request():
+    env = {"OUTLINE_API_TOKEN": "test_token"}
+    with patch.dict(os.environ, env, clear=True):
+        async with app_lifespan(mcp) as app_context:
+            assert not app_context.http_client.started
+
+    assert app_context.http_client.is_closed
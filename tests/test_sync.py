@@ -0,0 +1,150 @@
+"""
+Tests for the incremental workspace sync
+"""
+
+import threading
+
+import pytest
+
+from src.sync import SyncState, WorkspaceSync
+
+
+class FakeWorkspace:
+    """In-memory stand-in for the Outline document endpoints."""
+
+    def __init__(self, count):
+        self.documents = {
+            f"doc-{i}": {
+                "id": f"doc-{i}",
+                "revision": 1,
+                "updatedAt": f"2024-01-01T{i // 60:02d}:{i % 60:02d}:00.000Z",
+            }
+            for i in range(count)
+        }
+        self.archived = {}
+        self.calls = []
+
+    def edit(self, doc_id, timestamp):
+        doc = self.documents[doc_id]
+        doc["revision"] += 1
+        doc["updatedAt"] = timestamp
+
+    async def request(self, endpoint, data):
+        self.calls.append((endpoint, data.get("offset")))
+        if endpoint == "documents.export":
+            return {"ok": True, "data": f"body of {data['id']}"}
+        source = self.documents if endpoint == "documents.list" else self.archived
+        ordered = sorted(source.values(), key=lambda d: d["updatedAt"], reverse=True)
+        page = ordered[data["offset"] : data["offset"] + data["limit"]]
+        return {"ok": True, "data": [dict(doc) for doc in page]}
+
+
+@pytest.fixture
+def workspace():
+    return FakeWorkspace(250)
+
+
+def make_sync(workspace, state, upserted, removed):
+    async def on_upsert(items):
+        upserted.extend(doc["id"] for doc, _ in items)
+
+    async def on_remove(document_ids):
+        removed.extend(document_ids)
+
+    return WorkspaceSync(workspace.request, state, on_upsert, on_remove)
+
+
+class TestWorkspaceSync:
+    """Test watermarks, deletion handling and persistence."""
+
+    @pytest.mark.asyncio
+    async def test_first_pass_fetches_everything(self, workspace):
+        upserted, removed = [], []
+        sync = make_sync(workspace, SyncState(":memory:"), upserted, removed)
+
+        result = await sync.run_once()
+
+        assert result.fetched == 250
+        assert result.reconciled is True
+        assert sync.watermark == "2024-01-01T04:09:00.000Z"
+
+    @pytest.mark.asyncio
+    async def test_incremental_pass_stops_at_watermark(self, workspace):
+        upserted, removed = [], []
+        sync = make_sync(workspace, SyncState(":memory:"), upserted, removed)
+        await sync.run_once()
+        upserted.clear()
+        workspace.calls.clear()
+
+        workspace.edit("doc-3", "2024-02-01T00:00:00.000Z")
+        result = await sync.run_once()
+
+        assert upserted == ["doc-3"]
+        assert result.fetched == 1
+        assert result.reconciled is False
+        listing_calls = [c for c in workspace.calls if c[0] == "documents.list"]
+        assert listing_calls == [("documents.list", 0)]
+
+    @pytest.mark.asyncio
+    async def test_archived_documents_are_removed(self, workspace):
+        upserted, removed = [], []
+        sync = make_sync(workspace, SyncState(":memory:"), upserted, removed)
+        await sync.run_once()
+
+        doc = workspace.documents.pop("doc-7")
+        doc["updatedAt"] = "2024-02-01T00:00:00.000Z"
+        workspace.archived["doc-7"] = doc
+        result = await sync.run_once()
+
+        assert removed == ["doc-7"]
+        assert result.removed == 1
+
+    @pytest.mark.asyncio
+    async def test_reconciliation_detects_deletions(self, workspace):
+        upserted, removed = [], []
+        sync = make_sync(workspace, SyncState(":memory:"), upserted, removed)
+        await sync.run_once()
+
+        del workspace.documents["doc-42"]
+        result = await sync.run_once(full=True)
+
+        assert removed == ["doc-42"]
+        assert result.fetched == 249
+
+    @pytest.mark.asyncio
+    async def test_state_survives_restart(self, workspace, tmp_path):
+        path = str(tmp_path / "sync.sqlite")
+        upserted, removed = [], []
+        state = SyncState(path)
+        await make_sync(workspace, state, upserted, removed).run_once()
+        state.close()
+
+        upserted.clear()
+        restarted = make_sync(workspace, SyncState(path), upserted, removed)
+        result = await restarted.run_once()
+
+        assert result.fetched == 0
+        assert upserted == []
+
+    @pytest.mark.asyncio
+    async def test_state_is_read_and_written_off_the_event_loop(self, workspace):
+        loop_thread = threading.get_ident()
+        threads = set()
+
+        class RecordingState(SyncState):
+            def get(self, key):
+                threads.add(threading.get_ident())
+                return super().get(key)
+
+            def revisions(self, collection_id=None):
+                threads.add(threading.get_ident())
+                return super().revisions(collection_id)
+
+            def record(self, docs):
+                threads.add(threading.get_ident())
+                super().record(docs)
+
+        sync = make_sync(workspace, RecordingState(":memory:"), [], [])
+        await sync.run_once()
+
+        assert threads and loop_thread not in threads
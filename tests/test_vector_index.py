@@ -0,0 +1,110 @@
+"""
+Tests for local semantic retrieval
+"""
+
+import pytest
+
+from src.vector_index import chunk_text
+
+DEPLOY = """# Deploy
+
+Build the release image and push it to the registry.
+
+## Rollback
+
+Roll back by redeploying the previous image tag.
+"""
+
+
+class TestChunkText:
+    """Test splitting documents into passages."""
+
+    def test_headings_start_passages(self):
+        passages = chunk_text(DEPLOY)
+
+        assert [p.heading for p in passages] == ["Deploy", "Rollback"]
+        assert passages[0].text.startswith("# Deploy\n\nBuild the release")
+        assert passages[1].text.endswith("previous image tag.")
+
+    def test_long_paragraphs_are_split(self):
+        passages = chunk_text("word " * 100, max_chars=120)
+
+        assert len(passages) == 5
+        assert all(len(p.text) <= 120 for p in passages)
+        assert passages[0].heading is None
+
+
+class TestVectorIndex:
+    """Test indexing and similarity search."""
+
+    @pytest.fixture
+    def index(self, tmp_path):
+        pytest.importorskip("numpy")
+        from src.vector_index import HashingEmbedder, VectorIndex
+
+        index = VectorIndex(str(tmp_path / "vectors"), HashingEmbedder(256))
+        index.upsert_many(
+            [
+                (
+                    {"id": "deploy", "title": "Deploy", "collectionId": "eng"},
+                    DEPLOY,
+                ),
+                (
+                    {"id": "leave", "title": "Leave", "collectionId": "hr"},
+                    "Request vacation days in the HR portal.",
+                ),
+            ]
+        )
+        yield index
+        index.close()
+
+    def test_search_returns_best_passages(self, index):
+        results = index.search("redeploy the previous image", limit=1)
+
+        assert [r["document"]["id"] for r in results] == ["deploy"]
+        assert results[0]["passages"][0]["heading"] == "Rollback"
+        assert results[0]["score"] == results[0]["passages"][0]["score"]
+
+    def test_filters_and_removal(self, index):
+        assert index.search("release", collection_id="hr")[0]["document"]["id"] == (
+            "leave"
+        )
+
+        assert index.remove("deploy")
+        assert [r["document"]["id"] for r in index.search("release")] == ["leave"]
+        assert index.snapshot()["passages"] == 1
+
+    def test_reopened_index_keeps_vectors(self, index, tmp_path):
+        from src.vector_index import HashingEmbedder, VectorIndex
+
+        index.close()
+        reopened = VectorIndex(str(tmp_path / "vectors"), HashingEmbedder(256))
+        try:
+            assert len(reopened) == 2
+            assert reopened.search("vacation")[0]["document"]["id"] == "leave"
+        finally:
+            reopened.close()
+
+    def test_other_dimensions_clear_the_index(self, index, tmp_path):
+        from src.vector_index import HashingEmbedder, VectorIndex
+
+        index.close()
+        rebuilt = VectorIndex(str(tmp_path / "vectors"), HashingEmbedder(128))
+        assert len(rebuilt) == 0
+        rebuilt.close()
+
+    def test_replaced_documents_are_compacted(self, tmp_path, monkeypatch):
+        pytest.importorskip("numpy")
+        from src import vector_index
+        from src.vector_index import HashingEmbedder, VectorIndex
+
+        monkeypatch.setattr(vector_index, "COMPACT_MIN_HOLES", 2)
+        index = VectorIndex(str(tmp_path / "vectors"), HashingEmbedder(64))
+        for revision in range(5):
+            index.upsert_many([({"id": "doc"}, f"revision {revision}\n\nmore text")])
+
+        assert index.snapshot()["rows"] < 8
+        assert index.search("revision 4")[0]["passages"][0]["text"].startswith(
+            "revision 4"
+        )
+        index.close()